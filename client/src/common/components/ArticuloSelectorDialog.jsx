@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useCallback, useEffect, useRef, useState } from 'react';
 import { Link } from "react-router-dom";
 import { Box, Button, Dialog, DialogActions, DialogContent, DialogTitle, IconButton } from "@mui/material";
 import { Add, Checklist, Refresh } from '@mui/icons-material';
@@ -53,6 +53,12 @@ const ArticuloSelectorDialog = ({ open, onClose, selectedArticulo, setSelectedAr
     const [listArticulo, setListArticulo] = useState([]);
     const [showSelected, setShowSelected] = useState(false);
     const [loading, setLoading] = useState(false);
+    // La búsqueda se resuelve en el servidor, de a una página (ver ArticuloSearchService)
+    const [query, setQuery] = useState('');
+    const [paginationModel, setPaginationModel] = useState({ page: 0, pageSize: 25 });
+    const [hasNextPage, setHasNextPage] = useState(false);
+    // Artículos ya recibidos, para conservar los seleccionados de otras búsquedas
+    const articulos = useRef({});
 
     const columns = [
         { field: 'stock_actual', headerName: 'Stock', flex: 0.5 },
@@ -65,7 +71,7 @@ const ArticuloSelectorDialog = ({ open, onClose, selectedArticulo, setSelectedAr
     ];
 
     const filteredArticulo = showSelected
-        ? listArticulo.filter((item) => selectedArticulo.includes(item.id))
+        ? selectedArticulo.map((id) => articulos.current[id]).filter(Boolean)
         : listArticulo;
 
     const rows = filteredArticulo.map((item) => {
@@ -82,26 +88,45 @@ const ArticuloSelectorDialog = ({ open, onClose, selectedArticulo, setSelectedAr
         }
     });
 
-    const fetchData = async () => {
+    const fetchData = useCallback(async () => {
+        if (!query) {
+            setListArticulo([]);
+            setHasNextPage(false);
+            return;
+        }
         setLoading(true);
         try {
-            const url = `${API}/articulos/selector`;
-            const res = await fetchWithAuth(url);
+            const params = new URLSearchParams({
+                query,
+                page: paginationModel.page + 1,
+                pageSize: paginationModel.pageSize,
+            });
+            const res = await fetchWithAuth(`${API}/articulos/selector?${params}`);
             const data = await res.json();
             if (!res.ok) {
                 throw new Error(data['error']);
             }
-            setListArticulo(data);
+            data['articulos'].forEach((item) => {
+                articulos.current[item.id] = item;
+            });
+            setListArticulo(data['articulos']);
+            setHasNextPage(data['has_next']);
         } catch (e) {
             console.error(e);
             alert(e.message);
         } finally {
             setLoading(false);
         }
-    };
+    }, [query, paginationModel]);
 
     useEffect(() => {
         fetchData();
+    }, [fetchData]);
+
+    const handleFilterModelChange = useCallback((filterModel) => {
+        // Una nueva búsqueda vuelve a la primera página
+        setQuery((filterModel.quickFilterValues || []).join(' '));
+        setPaginationModel((model) => ({ ...model, page: 0 }));
     }, []);
 
     return (
@@ -131,20 +156,13 @@ const ArticuloSelectorDialog = ({ open, onClose, selectedArticulo, setSelectedAr
                         checkboxSelection
                         columns={columns}
                         disableRowSelectionOnClick
-                        hideFooter
+                        keepNonExistentRowsSelected
                         loading={loading}
                         localeText={esES.components.MuiDataGrid.defaultProps.localeText}
                         onRowSelectionModelChange={(newSelection) => {
-                            if (listArticulo.length === 0) {
-                                // Importante condicion para que no resetee los items
-                                // mientras se carga la lista de articulos
-                                return;
-                            }
-                            const rowSelectionArticulo = newSelection.map((row) => {
-                                return listArticulo.find((item) => item.id === row);
-                            });
-                            const newItems = rowSelectionArticulo.map((row) => {
-                                const exist = items.find((r) => r.articulo_id === row.id);
+                            const newItems = newSelection.map((id) => {
+                                const exist = items.find((r) => r.articulo_id === id);
+                                const row = articulos.current[id];
                                 return exist || {
                                     articulo_id: row.id,
                                     descripcion: row.linea_factura,
@@ -163,6 +181,14 @@ const ArticuloSelectorDialog = ({ open, onClose, selectedArticulo, setSelectedAr
                         rowHeight={30}
                         rowSelectionModel={selectedArticulo}
                         rows={rows}
+                        filterMode="server"
+                        onFilterModelChange={handleFilterModelChange}
+                        pageSizeOptions={[25, 50, 100]}
+                        paginationMode="server"
+                        paginationModel={paginationModel}
+                        onPaginationModelChange={setPaginationModel}
+                        rowCount={showSelected ? rows.length : -1}
+                        paginationMeta={{ hasNextPage: !showSelected && hasNextPage }}
                         slots={{
                             toolbar: (props) => <SelectorToolbar
                                 {...props}
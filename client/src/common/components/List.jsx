@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { Link } from 'react-router-dom';
 import { DataGrid, GridActionsCellItem } from '@mui/x-data-grid';
 import { esES } from '@mui/x-data-grid/locales';
@@ -22,7 +22,11 @@ const List = ({
     initialSortOrder = 'desc',
     toolbarProps,
     mapDataToRows,
-    serverSide = false // New prop to enable server-side rendering
+    serverSide = false, // New prop to enable server-side rendering
+    // Paginación por cursor: la API recibe `cursor` y `pageSize` y devuelve `next_cursor`
+    cursorPagination = false,
+    // Parámetro de la API con el texto de búsqueda (filtra en el servidor)
+    searchParam = null
 }) => {
     const [list, setList] = useState([]);
     const [openSnackbar, setOpenSnackbar] = useState(false);
@@ -38,6 +42,10 @@ const List = ({
         pageSize: 50,
         page: 0,
     });
+    // Cursor de cada página visitada (la primera página no tiene cursor)
+    const cursors = useRef([null]);
+    const [hasNextPage, setHasNextPage] = useState(false);
+    const [search, setSearch] = useState('');
 
     const confirm = useConfirm();
 
@@ -48,16 +56,32 @@ const List = ({
     const fetchData = useCallback(async () => {
         setLoading(true);
         try {
-            const url = serverSide 
-                ? `${apiUrl}?page=${paginationModel.page + 1}&page_size=${paginationModel.pageSize}`
-                : apiUrl;
+            let url = apiUrl;
+            if (cursorPagination) {
+                const params = new URLSearchParams({ pageSize: paginationModel.pageSize });
+                const cursor = cursors.current[paginationModel.page];
+                if (cursor) {
+                    params.set('cursor', cursor);
+                }
+                if (searchParam && search) {
+                    params.set(searchParam, search);
+                }
+                url = `${apiUrl}?${params}`;
+            } else if (serverSide) {
+                url = `${apiUrl}?page=${paginationModel.page + 1}&page_size=${paginationModel.pageSize}`;
+            }
             const res = await fetchWithAuth(url);
             const data = await res.json();
             if (!res.ok) {
                 throw new Error(data['error']);
             }
             setList(mapDataToRows(data));
-            if (serverSide) {
+            if (cursorPagination) {
+                cursors.current[paginationModel.page + 1] = data.next_cursor;
+                setHasNextPage(Boolean(data.next_cursor));
+                // Sin total, la grilla sólo habilita la página siguiente si hay cursor
+                setRowCount(data.total ?? -1);
+            } else if (serverSide) {
                 setRowCount(data.total); // Assuming the API returns the total count
             }
         } catch (e) {
@@ -72,7 +96,16 @@ const List = ({
         } finally {
             setLoading(false);
         }
-    }, [apiUrl, mapDataToRows, handleCloseSnackbar, paginationModel, serverSide]);
+    }, [apiUrl, mapDataToRows, handleCloseSnackbar, paginationModel, serverSide, cursorPagination, searchParam, search]);
+
+    const handleFilterModelChange = useCallback((filterModel) => {
+        const value = (filterModel.quickFilterValues || []).join(' ');
+        if (value !== search) {
+            cursors.current = [null];
+            setSearch(value);
+            setPaginationModel((model) => ({ ...model, page: 0 }));
+        }
+    }, [search]);
 
     useEffect(() => {
         fetchData();
@@ -175,8 +208,11 @@ const List = ({
                         toolbar: () => <ListToolbar {...toolbarProps} />
                     }}
                     ignoreDiacritics
-                    paginationMode={serverSide ? 'server' : 'client'} // Enable server-side pagination
-                    rowCount={serverSide ? rowCount : undefined} // Set total row count for server-side pagination
+                    paginationMode={serverSide || cursorPagination ? 'server' : 'client'} // Enable server-side pagination
+                    rowCount={serverSide || cursorPagination ? rowCount : undefined} // Set total row count for server-side pagination
+                    paginationMeta={cursorPagination ? { hasNextPage } : undefined}
+                    filterMode={searchParam ? 'server' : 'client'}
+                    onFilterModelChange={searchParam ? handleFilterModelChange : undefined}
                     paginationModel={paginationModel}
                     onPaginationModelChange={setPaginationModel}
                 />
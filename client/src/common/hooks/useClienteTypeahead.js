@@ -0,0 +1,49 @@
+import { useEffect, useState } from 'react';
+import { API } from '../../App';
+import fetchWithAuth from '../../config/auth/fetchWithAuth';
+
+/**
+ * Opciones del select de clientes buscadas en el servidor a medida que se escribe
+ * (ver /clientes/typeahead), en lugar de cargar todos los clientes con el formulario.
+ * Devuelve las opciones encontradas y el manejador de `onInputChange` del Autocomplete.
+ */
+export default function useClienteTypeahead(delay = 300) {
+    const [inputValue, setInputValue] = useState('');
+    const [options, setOptions] = useState([]);
+
+    useEffect(() => {
+        if (!inputValue) {
+            setOptions([]);
+            return undefined;
+        }
+        let active = true;
+        const timeout = setTimeout(async () => {
+            try {
+                const url = `${API}/clientes/typeahead?q=${encodeURIComponent(inputValue)}`;
+                const res = await fetchWithAuth(url);
+                const data = await res.json();
+                if (!res.ok) {
+                    throw new Error(data['error']);
+                }
+                if (active) {
+                    setOptions(data.clientes);
+                }
+            } catch (e) {
+                console.error('Error al buscar clientes:', e);
+            }
+        }, delay);
+        return () => {
+            active = false;
+            clearTimeout(timeout);
+        };
+    }, [inputValue, delay]);
+
+    const onInputChange = (event, value, reason) => {
+        // Al seleccionar una opción el texto cambia a su etiqueta: no se vuelve a buscar
+        if (reason === 'input') {
+            setInputValue(value);
+        }
+    };
+
+    return { options, onInputChange };
+}
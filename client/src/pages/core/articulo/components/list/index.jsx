@@ -13,15 +13,13 @@ import PageTitle from '../../../../../common/components/PageTitle';
 import checkPermissions from '../../../../../config/auth/checkPermissions';
 import { API } from '../../../../../App';
 
-const ArticuloListToolbar = ({ show_btn_add, txt_btn_add, url_btn_add, onSearch }) => {
-    const [searchQuery, setSearchQuery] = useState('');
+const ArticuloListToolbar = ({ show_btn_add, txt_btn_add, url_btn_add, onSearch, query }) => {
+    const [searchQuery, setSearchQuery] = useState(query);
 
     const handleSearch = (event) => {
         if (event.key === 'Enter' || event.type === 'blur') {
             if (searchQuery.length >= 3) {
-                // Si hay un + en la búsqueda, se reemplaza por %2B
-                const searchQueryFixed = searchQuery.replace('+', '%2B');
-                onSearch(searchQueryFixed);
+                onSearch(searchQuery);
             }
         }
     };
@@ -66,6 +64,10 @@ export default function ArticuloList({ permissions }) {
         onClose: () => handleCloseSnackbar(false)
     });
     const [loading, setLoading] = useState(false);
+    // La API devuelve los resultados de a una página, sin el total: sólo indica si hay más
+    const [query, setQuery] = useState('');
+    const [paginationModel, setPaginationModel] = useState({ page: 0, pageSize: 25 });
+    const [hasNextPage, setHasNextPage] = useState(false);
     const confirm = useConfirm();
 
     const apiUrl = `${API}/articulos`;
@@ -183,16 +185,24 @@ export default function ArticuloList({ permissions }) {
         }
     ];
 
-    const fetchData = useCallback(async (query = '') => {
+    const fetchData = useCallback(async () => {
+        if (!query) {
+            return;
+        }
         setLoading(true);
         try {
-            const url = `${apiUrl}?query=${query}`;
-            const res = await fetchWithAuth(url);
+            const params = new URLSearchParams({
+                query,
+                page: paginationModel.page + 1,
+                pageSize: paginationModel.pageSize,
+            });
+            const res = await fetchWithAuth(`${apiUrl}?${params}`);
             const data = await res.json();
             if (!res.ok) {
                 throw new Error(data['error']);
             }
             setList(mapDataToRows(data));
+            setHasNextPage(data['has_next']);
         } catch (e) {
             setSnackbar({
                 message: `Error al cargar los registros: ${e.message}`,
@@ -204,17 +214,24 @@ export default function ArticuloList({ permissions }) {
         } finally {
             setLoading(false);
         }
-    }, [apiUrl, handleCloseSnackbar]);
+    }, [apiUrl, handleCloseSnackbar, query, paginationModel]);
 
-    const handleSearch = useCallback((query) => {
-        fetchData(query);
+    useEffect(() => {
+        fetchData();
     }, [fetchData]);
 
+    const handleSearch = useCallback((value) => {
+        // Una nueva búsqueda vuelve a la primera página
+        setQuery(value);
+        setPaginationModel((model) => ({ ...model, page: 0 }));
+    }, []);
+
     const toolbarProps = {
         show_btn_add: allowCreate,
         txt_btn_add: 'Nuevo Artículo',
         url_btn_add: '/articulos/form',
-        onSearch: handleSearch
+        onSearch: handleSearch,
+        query
     };
 
     return (
@@ -226,7 +243,12 @@ export default function ArticuloList({ permissions }) {
                     columns={enhancedColumns}
                     rows={list}
                     disableRowSelectionOnClick
-                    pageSizeOptions={[]}
+                    pageSizeOptions={[25, 50, 100]}
+                    paginationMode="server"
+                    paginationModel={paginationModel}
+                    onPaginationModelChange={setPaginationModel}
+                    rowCount={-1}
+                    paginationMeta={{ hasNextPage }}
                     rowHeight={30}
                     localeText={esES.components.MuiDataGrid.defaultProps.localeText}
                     slots={{
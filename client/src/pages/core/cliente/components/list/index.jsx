@@ -66,6 +66,10 @@ export default function ClienteList({ permissions }) {
                 mapDataToRows={mapDataToRows}
                 toolbarProps={toolbarProps}
                 snackbarMessages={snackbarMessages}
+                initialSortField='razon_social'
+                initialSortOrder='asc'
+                cursorPagination
+                searchParam='query'
             />
         </>
     )
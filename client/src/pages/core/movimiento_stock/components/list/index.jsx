@@ -72,6 +72,7 @@ export default function MovimientoStockList({ permissions }) {
                 toolbarProps={toolbarProps}
                 initialSortField='fecha_hora'
                 initialSortOrder='desc'
+                cursorPagination
             />
         </>
     );
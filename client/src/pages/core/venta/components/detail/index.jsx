@@ -21,7 +21,7 @@ import {
     CardContent,
     Alert
 } from "@mui/material";
-import { Block, Edit, Print, KeyboardArrowDown, Delete, Add } from '@mui/icons-material';
+import { Block, Edit, Print, KeyboardArrowDown, Delete, Add, Replay } from '@mui/icons-material';
 import { useConfirm } from 'material-ui-confirm';
 import PageTitle from '../../../../../common/components/PageTitle';
 import checkPermissions from '../../../../../config/auth/checkPermissions';
@@ -198,6 +198,37 @@ export default function VentaDetail({ permissions }) {
             });
     }
 
+    const handleReencolar = () => {
+        withLoading(async () => {
+            const url = `${API}/ventas/${pk}`;
+            fetchWithAuth(url, 'POST', { action: 'reencolar' })
+                .then(response => {
+                    if (!response.ok) {
+                        return response.json().then(data => {
+                            throw new Error(data['error']);
+                        });
+                    }
+                    return response.json();
+                })
+                .then(() => {
+                    setSnackbar({
+                        message: 'La venta se volvió a encolar para su facturación',
+                        severity: 'success',
+                        onClose: () => handleCloseSnackbar(true, `/ventas/${pk}`)
+                    });
+                    setOpenSnackbar(true);
+                })
+                .catch((error) => {
+                    setSnackbar({
+                        message: `Error al reintentar la facturación: ${error.message}`,
+                        severity: 'error',
+                        onClose: () => handleCloseSnackbar(false)
+                    });
+                    setOpenSnackbar(true);
+                });
+        });
+    }
+
     const handleDelete = async () => {
         confirm({
             title: 'Confirmar acción',
@@ -258,6 +289,12 @@ export default function VentaDetail({ permissions }) {
             {venta.estado === 'anulado' && (
                 <Alert severity="warning">Esta venta actualmente se encuentra anulada</Alert>
             )}
+            {venta.estado === 'error_cae' && (
+                <Alert severity="error">
+                    No se pudo obtener el CAE de esta venta. Puede reintentar la facturación
+                    o anularla.
+                </Alert>
+            )}
             {venta.estado === 'orden' && (
                 <Alert severity="info">
                     Esta venta actualmente se encuentra en estado de orden.
@@ -272,7 +309,8 @@ export default function VentaDetail({ permissions }) {
 
                     <Box>
                         {
-                            (venta.estado === 'facturado' || venta.estado === 'ticket')
+                            (venta.estado === 'facturado' || venta.estado === 'ticket'
+                                || venta.estado === 'error_cae')
                             && venta.tipo_comprobante
                             && venta.tipo_comprobante['es_anulable']
                             && (
@@ -285,6 +323,17 @@ export default function VentaDetail({ permissions }) {
                                     Anular
                                 </Button>
                             )}
+                        {venta.estado === 'error_cae' && (
+                            <Button
+                                startIcon={<Replay />}
+                                variant="contained"
+                                color="warning"
+                                onClick={handleReencolar}
+                                sx={{ ml: 2 }}
+                            >
+                                Reintentar facturación
+                            </Button>
+                        )}
                         <Button
                             startIcon={<Edit />}
                             variant="contained"
@@ -43,6 +43,7 @@ import fetchWithAuth from '../../../../../config/auth/fetchWithAuth';
 import { useLoading } from '../../../../../common/contexts/LoadingContext';
 import checkPermissions from '../../../../../config/auth/checkPermissions';
 import PageTitle from '../../../../../common/components/PageTitle';
+import useClienteTypeahead from '../../../../../common/hooks/useClienteTypeahead';
 
 const CustomToolbar = ({ onOpen, fetchVentaItems }) => {
     const [ventaNumber, setVentaNumber] = useState('');
@@ -119,6 +120,21 @@ export default function VentaForm({ permissions }) {
     const [ventaItems, setVentaItems] = useState([]);
     const [isClienteExento, setIsClienteExento] = useState(false);
     const { withLoading } = useLoading();
+    const clienteTypeahead = useClienteTypeahead();
+    // Opciones buscadas y las ya seleccionadas (el cliente inicial y los elegidos)
+    const clienteOptions = [
+        ...clienteTypeahead.options,
+        ...selectOptions.cliente.filter((c) => !clienteTypeahead.options.some((o) => o.value === c.value))
+    ];
+
+    const recordarCliente = (value) => {
+        if (value) {
+            setSelectOptions((prev) => ({
+                ...prev,
+                cliente: [value, ...prev.cliente.filter((c) => c.value !== value.value)]
+            }));
+        }
+    };
     const hasFetchedItems = useRef(false);
     const ivaSnapshotRef = useRef(new Map());
     const [alertMessage, setAlertMessage] = useState('');
@@ -457,16 +473,19 @@ export default function VentaForm({ permissions }) {
                                                     helperText={errors.cliente && errors.cliente.message}
                                                 />
                                             )}
-                                            options={selectOptions.cliente}
+                                            options={clienteOptions}
+                                            filterOptions={(options) => options}
+                                            onInputChange={clienteTypeahead.onInputChange}
                                             getOptionLabel={(option) => option.label ? option.label : ''}
                                             getOptionKey={(option) => option.value}
-                                            value={selectOptions.cliente.find((c) => c.value === field.value) || ""}
+                                            value={clienteOptions.find((c) => c.value === field.value) || ""}
                                             isOptionEqualToValue={(option, value) =>
                                                 value === undefined || value === "" || option.value === value.value
                                             }
                                             onChange={(event, value) => {
                                                 const clienteValue = value ? value.value : "";
                                                 const nextIsClienteExento = isClienteOptionExento(value);
+                                                recordarCliente(value);
                                                 field.onChange(clienteValue);
 
                                                 if (nextIsClienteExento === isClienteExento) {
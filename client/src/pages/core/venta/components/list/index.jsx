@@ -157,6 +157,11 @@ export default function VentaList({ permissions }) {
                         icon = <Info />;
                         text = 'Orden';
                         break;
+                    case 'error_cae':
+                        color = 'error';
+                        icon = <Block />;
+                        text = 'Error CAE';
+                        break;
                     case 'presupuesto':
                         color = 'default';
                         icon = null;
@@ -26,6 +26,7 @@ import fetchWithAuth from '../../../../../../config/auth/fetchWithAuth';
 import { useLoading } from '../../../../../../common/contexts/LoadingContext';
 import checkAuth from '../../../../../../config/auth/checkAuth';
 import PageTitle from '../../../../../../common/components/PageTitle';
+import useClienteTypeahead from '../../../../../../common/hooks/useClienteTypeahead';
 
 
 const CustomToolbar = ({ onOpen }) => {
@@ -67,6 +68,21 @@ export default function VentaOrdenForm() {
     const [ventaItems, setVentaItems] = useState([]);
     const [isSubmitting, setIsSubmitting] = useState(false);
     const { withLoading } = useLoading();
+    const clienteTypeahead = useClienteTypeahead();
+    // Opciones buscadas y las ya seleccionadas (el cliente inicial y los elegidos)
+    const clienteOptions = [
+        ...clienteTypeahead.options,
+        ...selectOptions.cliente.filter((c) => !clienteTypeahead.options.some((o) => o.value === c.value))
+    ];
+
+    const recordarCliente = (value) => {
+        if (value) {
+            setSelectOptions((prev) => ({
+                ...prev,
+                cliente: [value, ...prev.cliente.filter((c) => c.value !== value.value)]
+            }));
+        }
+    };
 
     const handleTabChange = (event, newValue) => {
         setTabValue(newValue);
@@ -223,14 +239,17 @@ export default function VentaOrdenForm() {
                                                     helperText={errors.cliente && errors.cliente.message}
                                                 />
                                             )}
-                                            options={selectOptions.cliente}
+                                            options={clienteOptions}
+                                            filterOptions={(options) => options}
+                                            onInputChange={clienteTypeahead.onInputChange}
                                             getOptionLabel={(option) => option.label ? option.label : ''}
                                             getOptionKey={(option) => option.value}
-                                            value={selectOptions.cliente.find((c) => c.value === field.value) || ""}
+                                            value={clienteOptions.find((c) => c.value === field.value) || ""}
                                             isOptionEqualToValue={(option, value) =>
                                                 value === undefined || value === "" || option.value === value.value
                                             }
                                             onChange={(event, value) => {
+                                                recordarCliente(value);
                                                 field.onChange(value ? value.value : "");
                                             }}
                                         />
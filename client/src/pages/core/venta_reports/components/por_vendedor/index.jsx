@@ -46,6 +46,8 @@ const TIPOS_COMPROBANTE = [
 
 export default function VentaReporteVendedor({ permissions }) {
   const [list, setList] = useState([]);
+  const [resumen, setResumen] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
   const [from, setFrom] = useState(null);
   const [to, setTo] = useState(null);
   const [selectedUsuarioId, setSelectedUsuarioId] = useState('');
@@ -78,9 +80,10 @@ export default function VentaReporteVendedor({ permissions }) {
     }
   }, []);
 
-  const fetchReporteData = useCallback(async () => {
+  const fetchReporteData = useCallback(async (cursor = null) => {
     if (!selectedUsuarioId) {
       setList([]);
+      setResumen(null);
       return;
     }
 
@@ -89,11 +92,16 @@ export default function VentaReporteVendedor({ permissions }) {
     const toStr = to ? to.toISOString() : '';
 
     try {
+      // Los totales se calculan en el servidor; el detalle se obtiene por páginas
       const res = await fetchWithAuth(`${API}/ventas/reporte-ventas/por-vendedor`, 'POST', {
         desde: fromStr,
         hasta: toStr,
-        usuario_id: parseInt(selectedUsuarioId),
-        tipo_comprobante_ids: selectedTiposComprobante
+        usuario_ids: [parseInt(selectedUsuarioId)],
+        tipo_comprobante_ids: selectedTiposComprobante,
+        estados: selectedEstados,
+        detalle: true,
+        pageSize: 100,
+        cursor: cursor
       });
 
       const data = await res.json();
@@ -101,12 +109,9 @@ export default function VentaReporteVendedor({ permissions }) {
         throw new Error(data['error']);
       }
 
-      // Filtrar por estados seleccionados
-      const ventasFiltradas = data.ventas.filter(venta =>
-        selectedEstados.includes(venta.estado)
-      );
-
-      setList(ventasFiltradas);
+      setResumen(data.resumen);
+      setList(prev => cursor ? [...prev, ...data.ventas] : data.ventas);
+      setNextCursor(data.next_cursor);
     } catch (error) {
       console.error(error);
       setSnackbar({
@@ -117,6 +122,8 @@ export default function VentaReporteVendedor({ permissions }) {
       });
       setOpenSnackbar(true);
       setList([]);
+      setResumen(null);
+      setNextCursor(null);
     } finally {
       setLoading(false);
     }
@@ -133,9 +140,18 @@ export default function VentaReporteVendedor({ permissions }) {
         <GridToolbarQuickFilter size={'small'} />
         <GridToolbarColumnsButton />
         <Box sx={{ flexGrow: 1 }} />
+        {nextCursor && (
+          <Button
+            onClick={() => fetchReporteData(nextCursor)}
+            size="small"
+            disabled={loading}
+          >
+            Cargar más ventas
+          </Button>
+        )}
         <Button
           startIcon={<Search />}
-          onClick={fetchReporteData}
+          onClick={() => fetchReporteData()}
           size="small"
           variant="contained"
           color='primary'
@@ -195,8 +211,8 @@ export default function VentaReporteVendedor({ permissions }) {
     }
   ];
 
-  const totalVentas = list.reduce((sum, venta) => sum + parseFloat(venta.total || 0), 0);
-  const cantidadVentas = list.length;
+  const totalVentas = resumen ? resumen.total : 0;
+  const cantidadVentas = resumen ? resumen.ventas : 0;
 
   return (
     <>
@@ -302,7 +318,7 @@ export default function VentaReporteVendedor({ permissions }) {
       </Card>
 
       {/* Resumen */}
-      {list.length > 0 && (
+      {resumen && (
         <Card sx={{ mb: 2 }}>
           <CardContent>
             <Grid container spacing={2}>
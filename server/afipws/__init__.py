@@ -1,3 +1,6 @@
 from .wsfev1 import WSFEv1
 from .wsaa import WSAA
-from .ws_sr_padron import WSSrPadronA13
\ No newline at end of file
+from .ws_sr_padron import WSSrPadronA13
+from .pool import WSPool, get_pool
+from .sequence import CbteSequence, cbte_sequence
+from .ta_cache import TACache, ta_cache
@@ -0,0 +1,108 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+from requests.exceptions import RequestException
+from zeep.exceptions import TransportError
+
+# Errores tras los cuales el cliente no se reutiliza (conexión cortada, etc.)
+CONNECTION_ERRORS = (RequestException, TransportError, OSError)
+
+
+class WSPool:
+    """
+    Pool de clientes de un servicio web de AFIP (WSFEv1, WSSrPadronA13), compartido
+    por todo el proceso.
+
+    Construir un cliente implica descargar y procesar el WSDL y cargar el TA, por lo que
+    los clientes se crean a demanda (hasta `maxsize`) y se reutilizan entre peticiones.
+    Cada cliente es utilizado por un único hilo a la vez; antes de entregarlo se renueva
+    su TA si está próximo a vencer.
+
+    Métodos:
+    - client: Context manager que entrega un cliente del pool y lo devuelve al finalizar.
+    - clear: Descarta los clientes libres (por ejemplo, luego de cambiar el certificado).
+    """
+
+    def __init__(self, ws_class, options: dict, maxsize: int = 4, timeout: int = 60):
+        self.ws_class = ws_class
+        self.options = options
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._size = 0
+
+    @contextmanager
+    def client(self):
+        ws = self._acquire()
+        reutilizar = True
+        try:
+            ws.ensure_ticket_access()
+            yield ws
+        except CONNECTION_ERRORS:
+            # Los errores informados por AFIP no afectan al cliente, pero uno de
+            # conexión puede dejarlo en un estado inconsistente
+            reutilizar = False
+            raise
+        finally:
+            if reutilizar:
+                self._idle.put(ws)
+            else:
+                self._discard()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            crear = self._size < self.maxsize
+            if crear:
+                self._size += 1
+        if not crear:
+            try:
+                return self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError(
+                    f"No hay clientes de {self.ws_class.__name__} disponibles"
+                )
+        try:
+            return self.ws_class(self.options)
+        except BaseException:
+            self._discard()
+            raise
+
+    def _discard(self):
+        with self._lock:
+            self._size -= 1
+
+    def clear(self):
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(ws_class, options: dict, maxsize: int = 4) -> WSPool:
+    """
+    Devuelve el pool del proceso para el servicio y las credenciales indicadas.
+    """
+    key = (
+        ws_class,
+        options.get("CUIT"),
+        options.get("cert"),
+        options.get("key"),
+        options.get("production", False),
+        options.get("standin_url"),
+    )
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = WSPool(ws_class, options, maxsize=maxsize)
+        return _pools[key]
@@ -0,0 +1,77 @@
+import threading
+from contextlib import contextmanager
+
+
+class CbteSequence:
+    """
+    Registro en memoria, compartido por todo el proceso, del último número de comprobante
+    autorizado por cada punto de venta y tipo de comprobante.
+
+    El número se obtiene de AFIP (FECompUltimoAutorizado) la primera vez y luego se
+    incrementa localmente con cada CAE otorgado. Ante un error de numeración (código
+    10016) se vuelve a consultar, y ante un resultado incierto (por ejemplo, un error de
+    conexión) se descarta para consultarlo en la próxima solicitud.
+
+    Métodos:
+    - reserve: Context manager que bloquea la numeración y devuelve una reserva con el
+      próximo número.
+    - reset: Descarta el número registrado.
+    - last: Devuelve el último número registrado (None si no fue consultado).
+    """
+
+    class Reserva:
+        "Reserva del próximo número de comprobante."
+
+        def __init__(self, sequence, key, fetch_last):
+            self.sequence = sequence
+            self.key = key
+            self.fetch_last = fetch_last
+            if sequence.last(key) is None:
+                self.resync()
+
+        @property
+        def numero(self) -> int:
+            return self.sequence._last[self.key] + 1
+
+        def resync(self):
+            "Vuelve a consultar en AFIP el último número autorizado."
+            self.sequence._last[self.key] = int(self.fetch_last())
+
+        def confirm(self, numero: int = None):
+            """
+            Registra el número reservado como autorizado o, en una solicitud de varios
+            comprobantes, el último número autorizado.
+            """
+            self.sequence._last[self.key] = numero if numero is not None else self.numero
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks = {}
+        self._last = {}
+
+    def _key_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    @contextmanager
+    def reserve(self, key, fetch_last):
+        """
+        Bloquea la numeración de `key` mientras se solicita el CAE. `fetch_last` consulta
+        el último número autorizado en AFIP y sólo se invoca si el número no está
+        registrado o si debe resincronizarse.
+        """
+        with self._key_lock(key):
+            try:
+                yield self.Reserva(self, key, fetch_last)
+            except BaseException:
+                self.reset(key)
+                raise
+
+    def reset(self, key):
+        self._last.pop(key, None)
+
+    def last(self, key):
+        return self._last.get(key)
+
+
+cbte_sequence = CbteSequence()
@@ -0,0 +1,10 @@
+"""
+Servidor local que reemplaza a los servicios web de AFIP, para pruebas de carga y de
+latencia sin conexión (ver AfipStandIn). Se inicia con `python -m server.afipws.standin`.
+"""
+
+from pathlib import Path
+
+WSDL_DIR = Path(__file__).parent / "wsdl"
+
+from .app import AfipStandIn  # noqa: E402
@@ -0,0 +1,96 @@
+import argparse
+import os
+from datetime import datetime, timedelta, timezone
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+from . import AfipStandIn
+
+
+def create_cert(directory: str) -> tuple:
+    """
+    Genera un certificado autofirmado y su clave privada en `directory`, para firmar los
+    TRA enviados al servidor de pruebas. Devuelve las rutas del certificado y la clave.
+    """
+    os.makedirs(directory, exist_ok=True)
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "afipws-standin")])
+    ahora = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(ahora)
+        .not_valid_after(ahora + timedelta(days=365))
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "afipws_standin.cert")
+    key_path = os.path.join(directory, "afipws_standin.key")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.TraditionalOpenSSL,
+                serialization.NoEncryption(),
+            )
+        )
+    return cert_path, key_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Servidor local que reemplaza a los servicios web de AFIP"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Demora de cada respuesta (segundos)"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Demora aleatoria adicional (segundos)"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Probabilidad de un SOAP Fault"
+    )
+    parser.add_argument(
+        "--reject-rate",
+        type=float,
+        default=0.0,
+        help="Probabilidad de rechazar un comprobante",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--create-cert",
+        metavar="DIR",
+        help="Genera un certificado autofirmado y su clave en DIR y finaliza",
+    )
+    args = parser.parse_args()
+
+    if args.create_cert:
+        for path in create_cert(args.create_cert):
+            print(path)
+        return
+
+    from waitress import serve
+
+    standin = AfipStandIn(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        reject_rate=args.reject_rate,
+        seed=args.seed,
+    )
+    print(f"AFIP stand-in en http://{args.host}:{args.port}/")
+    serve(standin.create_app(), host=args.host, port=args.port, threads=args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+import base64
+import random
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+from flask import Flask, Response, request
+
+from . import WSDL_DIR
+
+SOAP_ENV = "http://schemas.xmlsoap.org/soap/envelope/"
+FEV1_NS = "http://ar.gov.afip.dif.FEV1/"
+WSAA_NS = "http://wsaa.view.sua.dvadac.desein.afip.gov"
+PADRON_A13_NS = "http://a13.soap.ws.server.puc.sr/"
+
+# Ruta del servicio -> WSDL publicado
+SERVICES = {
+    "ws/services/LoginCms": "wsaa.wsdl",
+    "wsfev1/service.asmx": "wsfev1.wsdl",
+    "sr-padron/webservices/personaServiceA13": "padron_a13.wsdl",
+}
+
+
+class SoapFault(Exception):
+    "Error devuelto como SOAP Fault"
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _find(element: ET.Element, *path: str):
+    "Busca un descendiente por los nombres locales de `path`, ignorando los namespaces"
+    for name in path:
+        if element is None:
+            return None
+        element = next((e for e in element if _local(e.tag) == name), None)
+    return element
+
+
+def _text(element: ET.Element, *path: str, default=None):
+    found = _find(element, *path)
+    return found.text if found is not None and found.text is not None else default
+
+
+def _xml(tag: str, value) -> str:
+    return f"<{tag}>{escape(str(value))}</{tag}>" if value is not None else ""
+
+
+def _codes(tag: str, child: str, items: list) -> str:
+    if not items:
+        return ""
+    body = "".join(
+        f"<{child}><Code>{code}</Code>{_xml('Msg', msg)}</{child}>"
+        for code, msg in items
+    )
+    return f"<{tag}>{body}</{tag}>"
+
+
+class AfipStandIn:
+    """
+    Servidor SOAP local que reemplaza a los servicios web de AFIP (WSAA, WSFEv1 y padrón
+    A13) para pruebas de carga y de latencia sin conexión.
+
+    Implementa LoginCms, FECAESolicitar, FECompUltimoAutorizado, FECompConsultar,
+    FEDummy, getPersona y dummy, con la numeración de los comprobantes en memoria: los
+    comprobantes deben ser correlativos (error 10016 en caso contrario), como en AFIP.
+
+    Parámetros:
+    - latency / jitter: Segundos de demora de cada respuesta (latency más un valor
+      aleatorio entre 0 y jitter).
+    - error_rate: Probabilidad de responder con un SOAP Fault (error del servidor).
+    - reject_rate: Probabilidad de rechazar un comprobante con una observación.
+    - seed: Semilla de los valores aleatorios, para repetir una prueba.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        reject_rate: float = 0.0,
+        seed: int = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.reject_rate = reject_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # (Cuit, PtoVta, CbteTipo) -> último número autorizado
+        self._ultimos = {}
+        # (Cuit, PtoVta, CbteTipo, CbteNro) -> comprobante autorizado
+        self._comprobantes = {}
+
+    def _chance(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+    def _demorar(self):
+        with self._lock:
+            demora = self.latency + self._random.uniform(0, self.jitter)
+        if demora > 0:
+            time.sleep(demora)
+
+    def create_app(self) -> Flask:
+        app = Flask(__name__)
+
+        @app.route("/<path:service>", methods=["GET", "POST"])
+        def soap(service):
+            if service not in SERVICES:
+                return Response("Servicio inexistente", status=404)
+            if request.method == "GET":
+                return self._wsdl(service)
+            return self._dispatch(request.get_data())
+
+        return app
+
+    def _wsdl(self, service: str) -> Response:
+        with open(WSDL_DIR / SERVICES[service], encoding="utf-8") as f:
+            wsdl = f.read().replace("{location}", escape(request.base_url))
+        return Response(wsdl, mimetype="text/xml")
+
+    def _dispatch(self, data: bytes) -> Response:
+        self._demorar()
+        try:
+            if self._chance(self.error_rate):
+                raise SoapFault("Error interno del servidor (simulado)")
+            body = _find(ET.fromstring(data), "Body")
+            operation = body[0]
+            handler = getattr(self, f"_op_{_local(operation.tag)}", None)
+            if handler is None:
+                raise SoapFault(f"Operación no implementada: {_local(operation.tag)}")
+            return self._envelope(handler(operation))
+        except SoapFault as e:
+            fault = (
+                "<soap:Fault><faultcode>soap:Server</faultcode>"
+                f"{_xml('faultstring', e)}</soap:Fault>"
+            )
+            return self._envelope(fault, status=500)
+
+    @staticmethod
+    def _envelope(body: str, status: int = 200) -> Response:
+        xml = (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            f'<soap:Envelope xmlns:soap="{SOAP_ENV}"><soap:Body>{body}'
+            "</soap:Body></soap:Envelope>"
+        )
+        return Response(xml, status=status, mimetype="text/xml")
+
+    # WSAA
+
+    def _op_loginCms(self, operation: ET.Element) -> str:
+        try:
+            cms = base64.b64decode(_text(operation, "in0", default=""))
+        except ValueError:
+            raise SoapFault("cms.bad: El CMS no es valido")
+        service = re.search(rb"<service>([^<]+)</service>", cms)
+        if service is None:
+            raise SoapFault("xml.bad: No se encontro el servicio en el TRA")
+        ahora = datetime.now(timezone.utc)
+        vencimiento = ahora + timedelta(hours=12)
+        token = f"standin-{service.group(1).decode()}-{int(ahora.timestamp())}"
+        ticket = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<loginTicketResponse version="1.0"><header>'
+            "<source>CN=wsaa-standin</source><destination>CN=standin</destination>"
+            f"<uniqueId>{int(ahora.timestamp())}</uniqueId>"
+            f"<generationTime>{ahora.isoformat()}</generationTime>"
+            f"<expirationTime>{vencimiento.isoformat()}</expirationTime>"
+            "</header><credentials>"
+            f"<token>{token}</token>"
+            "<sign>standin</sign>"
+            f"</credentials></loginTicketResponse>"
+        )
+        return (
+            f'<loginCmsResponse xmlns="{WSAA_NS}">'
+            f"{_xml('loginCmsReturn', ticket)}</loginCmsResponse>"
+        )
+
+    # WSFEv1
+
+    @staticmethod
+    def _auth_errors(operation: ET.Element) -> list:
+        auth = _find(operation, "Auth")
+        if not _text(auth, "Token") or not _text(auth, "Cuit"):
+            return [(600, "ValidacionDeToken: No validaron las credenciales")]
+        return []
+
+    def _op_FECAESolicitar(self, operation: ET.Element) -> str:
+        cuit = _text(operation, "Auth", "Cuit")
+        pto_vta = int(_text(operation, "FeCAEReq", "FeCabReq", "PtoVta", default=0))
+        cbte_tipo = int(_text(operation, "FeCAEReq", "FeCabReq", "CbteTipo", default=0))
+        cab = (
+            f"<Cuit>{cuit or 0}</Cuit><PtoVta>{pto_vta}</PtoVta>"
+            f"<CbteTipo>{cbte_tipo}</CbteTipo>"
+            f"<FchProceso>{datetime.now().strftime('%Y%m%d%H%M%S')}</FchProceso>"
+        )
+        errors = self._auth_errors(operation)
+        if errors:
+            return self._fecae_response(
+                cab + "<CantReg>0</CantReg><Resultado>R</Resultado>", "", errors
+            )
+
+        dets = []
+        aprobados = 0
+        for det in _find(operation, "FeCAEReq", "FeDetReq"):
+            numero = int(_text(det, "CbteDesde", default=0))
+            observaciones = []
+            cae = vencimiento = None
+            with self._lock:
+                key = (cuit, pto_vta, cbte_tipo)
+                if numero != int(_text(det, "CbteHasta", default=0)):
+                    observaciones.append(
+                        (10011, "El numero de CbteDesde debe ser igual a CbteHasta")
+                    )
+                elif numero != self._ultimos.get(key, 0) + 1:
+                    observaciones.append(
+                        (
+                            10016,
+                            "El numero o fecha del comprobante no se corresponde con "
+                            "el proximo a autorizar. Consultar metodo "
+                            "FECompUltimoAutorizado.",
+                        )
+                    )
+                elif self.reject_rate > 0 and self._random.random() < self.reject_rate:
+                    observaciones.append((10015, "Comprobante rechazado (simulado)"))
+                else:
+                    self._ultimos[key] = numero
+                    cae = f"7{int(time.time()) % 10**5:05d}{numero % 10**8:08d}"
+                    vencimiento = datetime.now() + timedelta(days=10)
+                    vencimiento = vencimiento.strftime("%Y%m%d")
+                    self._comprobantes[(*key, numero)] = {
+                        **{
+                            _local(e.tag): e.text
+                            for e in det
+                            if e.text is not None and len(e) == 0
+                        },
+                        "CAE": cae,
+                        "CAEFchVto": vencimiento,
+                    }
+                    aprobados += 1
+            dets.append(
+                "<FECAEDetResponse>"
+                + "".join(
+                    _xml(name, _text(det, name))
+                    for name in (
+                        "Concepto",
+                        "DocTipo",
+                        "DocNro",
+                        "CbteDesde",
+                        "CbteHasta",
+                        "CbteFch",
+                    )
+                )
+                + _xml("Resultado", "R" if observaciones else "A")
+                + _codes("Observaciones", "Obs", observaciones)
+                + _xml("CAE", cae)
+                + _xml("CAEFchVto", vencimiento)
+                + "</FECAEDetResponse>"
+            )
+
+        resultado = "A" if aprobados == len(dets) else "P" if aprobados else "R"
+        cab += f"<CantReg>{len(dets)}</CantReg><Resultado>{resultado}</Resultado>"
+        return self._fecae_response(cab, "".join(dets), [])
+
+    @staticmethod
+    def _fecae_response(cab: str, dets: str, errors: list) -> str:
+        return (
+            f'<FECAESolicitarResponse xmlns="{FEV1_NS}"><FECAESolicitarResult>'
+            f"<FeCabResp>{cab}<Reproceso>N</Reproceso></FeCabResp>"
+            f"<FeDetResp>{dets}</FeDetResp>"
+            f"{_codes('Errors', 'Err', errors)}"
+            "</FECAESolicitarResult></FECAESolicitarResponse>"
+        )
+
+    def _op_FECompUltimoAutorizado(self, operation: ET.Element) -> str:
+        cuit = _text(operation, "Auth", "Cuit")
+        pto_vta = int(_text(operation, "PtoVta", default=0))
+        cbte_tipo = int(_text(operation, "CbteTipo", default=0))
+        with self._lock:
+            ultimo = self._ultimos.get((cuit, pto_vta, cbte_tipo), 0)
+        return (
+            f'<FECompUltimoAutorizadoResponse xmlns="{FEV1_NS}">'
+            "<FECompUltimoAutorizadoResult>"
+            f"<PtoVta>{pto_vta}</PtoVta><CbteTipo>{cbte_tipo}</CbteTipo>"
+            f"<CbteNro>{ultimo}</CbteNro>"
+            f"{_codes('Errors', 'Err', self._auth_errors(operation))}"
+            "</FECompUltimoAutorizadoResult></FECompUltimoAutorizadoResponse>"
+        )
+
+    def _op_FECompConsultar(self, operation: ET.Element) -> str:
+        cuit = _text(operation, "Auth", "Cuit")
+        pto_vta = int(_text(operation, "FeCompConsReq", "PtoVta", default=0))
+        cbte_tipo = int(_text(operation, "FeCompConsReq", "CbteTipo", default=0))
+        numero = int(_text(operation, "FeCompConsReq", "CbteNro", default=0))
+        errors = self._auth_errors(operation)
+        with self._lock:
+            comprobante = self._comprobantes.get((cuit, pto_vta, cbte_tipo, numero))
+        result = ""
+        if comprobante is None:
+            errors = errors or [(602, "Sin Resultados: - en la Base de datos")]
+        else:
+            result = (
+                "<ResultGet>"
+                + "".join(
+                    _xml(name, comprobante.get(name))
+                    for name in (
+                        "Concepto",
+                        "DocTipo",
+                        "DocNro",
+                        "CbteDesde",
+                        "CbteHasta",
+                        "CbteFch",
+                        "ImpTotal",
+                        "ImpTotConc",
+                        "ImpNeto",
+                        "ImpOpEx",
+                        "ImpTrib",
+                        "ImpIVA",
+                        "MonId",
+                        "MonCotiz",
+                    )
+                )
+                + "<Resultado>A</Resultado>"
+                + _xml("CodAutorizacion", comprobante["CAE"])
+                + "<EmisionTipo>CAE</EmisionTipo>"
+                + _xml("FchVto", comprobante["CAEFchVto"])
+                + f"<PtoVta>{pto_vta}</PtoVta><CbteTipo>{cbte_tipo}</CbteTipo>"
+                + "</ResultGet>"
+            )
+        return (
+            f'<FECompConsultarResponse xmlns="{FEV1_NS}"><FECompConsultarResult>'
+            f"{result}{_codes('Errors', 'Err', errors)}"
+            "</FECompConsultarResult></FECompConsultarResponse>"
+        )
+
+    def _op_FEDummy(self, operation: ET.Element) -> str:
+        return (
+            f'<FEDummyResponse xmlns="{FEV1_NS}"><FEDummyResult>'
+            "<AppServer>OK</AppServer><DbServer>OK</DbServer><AuthServer>OK</AuthServer>"
+            "</FEDummyResult></FEDummyResponse>"
+        )
+
+    # Padrón A13
+
+    def _op_getPersona(self, operation: ET.Element) -> str:
+        id_persona = _text(operation, "idPersona", default="")
+        if not _text(operation, "token"):
+            raise SoapFault("No se ha encontrado el token de autenticación")
+        if len(id_persona) != 11:
+            raise SoapFault("No existe persona con ese Id")
+        id_provincia = int(id_persona) % 24
+        persona = (
+            "<domicilio>"
+            f"<codigoPostal>{1000 + int(id_persona) % 9000}</codigoPostal>"
+            f"<descripcionProvincia>PROVINCIA {id_provincia}</descripcionProvincia>"
+            f"<direccion>CALLE {id_persona[-4:]}</direccion>"
+            f"<idProvincia>{id_provincia}</idProvincia>"
+            "<localidad>LOCALIDAD</localidad>"
+            "<tipoDomicilio>FISCAL</tipoDomicilio>"
+            "</domicilio>"
+            "<estadoClave>ACTIVO</estadoClave>"
+            f"<idPersona>{id_persona}</idPersona>"
+            f"<razonSocial>CONTRIBUYENTE {id_persona}</razonSocial>"
+            "<tipoClave>CUIT</tipoClave>"
+            "<tipoPersona>JURIDICA</tipoPersona>"
+        )
+        return (
+            f'<ns2:getPersonaResponse xmlns:ns2="{PADRON_A13_NS}"><personaReturn>'
+            f"<metadata><fechaHora>{datetime.now().isoformat()}</fechaHora>"
+            "<servidor>standin</servidor></metadata>"
+            f"<persona>{persona}</persona>"
+            "</personaReturn></ns2:getPersonaResponse>"
+        )
+
+    def _op_dummy(self, operation: ET.Element) -> str:
+        return (
+            f'<ns2:dummyResponse xmlns:ns2="{PADRON_A13_NS}"><return>'
+            "<appserver>OK</appserver><authserver>OK</authserver><dbserver>OK</dbserver>"
+            "</return></ns2:dummyResponse>"
+        )
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def ta_expiration(ta_xml: ET.Element) -> datetime:
+    "Vencimiento (UTC) de un Ticket de Autorización (TA)"
+    expiration_time = ta_xml.find("header/expirationTime").text
+    return datetime.fromisoformat(expiration_time).astimezone(timezone.utc)
+
+
+def ta_ttl(ta_xml: ET.Element) -> float:
+    "Segundos de validez restantes de un Ticket de Autorización (TA)"
+    return (ta_expiration(ta_xml) - datetime.now(timezone.utc)).total_seconds()
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Bloqueo exclusivo entre procesos sobre el archivo `path`, que se crea si no existe.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class TACache:
+    """
+    Cache de los Tickets de Autorización (TA) del WSAA, compartido por todo el proceso.
+
+    Los TA se mantienen en memoria, por lo que el archivo del TA sólo se lee la primera
+    vez. Cuando un TA vence o conserva menos de `min_ttl` segundos de validez, se renueva
+    bajo un bloqueo de archivo: un único hilo o proceso solicita el nuevo TA a AFIP y los
+    demás utilizan el que éste guarda, evitando los inicios de sesión duplicados que AFIP
+    rechaza.
+
+    Si la renovación anticipada falla (por ejemplo, porque AFIP todavía considera válido
+    el TA actual), se sigue utilizando el TA vigente y no se vuelve a intentar hasta
+    pasados RETRY_INTERVAL segundos.
+
+    Métodos:
+    - get: Devuelve un TA vigente del WSAA indicado, renovándolo si corresponde.
+    - clear: Descarta los TA en memoria.
+    """
+
+    RETRY_INTERVAL = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks = {}
+        # ruta del TA -> (TA, momento a partir del cual reintentar la renovación)
+        self._entries = {}
+
+    def _path_lock(self, path: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def _vigente(self, path: str, min_ttl: int):
+        entry = self._entries.get(path)
+        if entry is not None and ta_ttl(entry[0]) > min_ttl:
+            return entry[0]
+        return None
+
+    def get(self, wsaa, min_ttl: int = 0) -> ET.Element:
+        path = wsaa.ta_path
+        ta_xml = self._vigente(path, min_ttl)
+        if ta_xml is not None:
+            return ta_xml
+
+        with self._path_lock(path), file_lock(f"{path}.lock"):
+            # Otro hilo o proceso pudo haber renovado el TA mientras se esperaba el bloqueo
+            guardado = wsaa.load_ta_from_file()
+            if guardado is not False:
+                entry = self._entries.get(path)
+                if entry is None or ta_expiration(guardado) > ta_expiration(entry[0]):
+                    self._entries[path] = (guardado, 0)
+            ta_xml = self._vigente(path, min_ttl)
+            if ta_xml is not None:
+                return ta_xml
+
+            actual = self._vigente(path, 0)
+            if actual is not None and time.monotonic() < self._entries[path][1]:
+                return actual
+            try:
+                ta_xml = wsaa.login_cms(wsaa.sign_tra(wsaa.create_tra()))
+            except Exception:
+                if actual is None:
+                    raise
+                self._entries[path] = (actual, time.monotonic() + self.RETRY_INTERVAL)
+                return actual
+            wsaa.save_ta_to_file(ta_xml)
+            self._entries[path] = (ta_xml, 0)
+            return ta_xml
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+ta_cache = TACache()
@@ -0,0 +1,113 @@
+import threading
+import pytest
+from datetime import datetime, timedelta, timezone
+from ..pool import WSPool
+from ..ta_cache import TACache
+from ..wsbase import WSBase
+from .ta_cache_test import FakeWSAA
+
+
+class FakeWS:
+    "Cliente de prueba: registra las instancias creadas y las renovaciones del TA"
+
+    instancias = 0
+
+    def __init__(self, options: dict):
+        FakeWS.instancias += 1
+        self.options = options
+        self.renovaciones = 0
+
+    def ensure_ticket_access(self):
+        self.renovaciones += 1
+
+
+@pytest.fixture
+def pool():
+    FakeWS.instancias = 0
+    return WSPool(FakeWS, {"CUIT": 1}, maxsize=2, timeout=1)
+
+
+def test_pool_reutiliza_clientes(pool):
+    with pool.client() as ws:
+        primero = ws
+    with pool.client() as ws:
+        assert ws is primero
+    assert FakeWS.instancias == 1
+    assert primero.renovaciones == 2
+
+
+def test_pool_respeta_maxsize(pool):
+    ocupados = threading.Barrier(3)
+    liberar = threading.Event()
+    en_uso = []
+
+    def usar(esperar: bool):
+        with pool.client() as ws:
+            en_uso.append(ws)
+            if esperar:
+                ocupados.wait()
+                liberar.wait()
+
+    hilos = [threading.Thread(target=usar, args=(True,)) for _ in range(2)]
+    for hilo in hilos:
+        hilo.start()
+    ocupados.wait()
+
+    # Con los dos clientes en uso, el tercer hilo espera a que se libere uno
+    tercero = threading.Thread(target=usar, args=(False,))
+    tercero.start()
+    tercero.join(0.2)
+    assert len(en_uso) == 2
+
+    liberar.set()
+    for hilo in [*hilos, tercero]:
+        hilo.join()
+    assert len(en_uso) == 3
+    assert FakeWS.instancias == 2
+
+
+def test_pool_descarta_cliente_con_error_de_conexion(pool):
+    with pytest.raises(ConnectionError):
+        with pool.client():
+            raise ConnectionError("conexión cortada")
+    with pytest.raises(ValueError):
+        with pool.client():
+            raise ValueError("comprobante rechazado")
+    with pool.client():
+        pass
+    # El primer cliente se descartó; el segundo se reutilizó luego del error de AFIP
+    assert FakeWS.instancias == 2
+
+
+def test_ticket_access_expiring():
+    ws = WSBase.__new__(WSBase)
+    vencimiento = datetime.now(timezone.utc) + timedelta(
+        seconds=WSBase.TA_RENEWAL_MARGIN + 60
+    )
+    ws.expiration_time = vencimiento.isoformat()
+    assert not ws.ticket_access_expiring()
+    ws.expiration_time = (vencimiento - timedelta(seconds=120)).isoformat()
+    assert ws.ticket_access_expiring()
+
+
+def test_ensure_ticket_access_renovacion_rechazada(tmp_path, monkeypatch):
+    FakeWSAA.TA_DIR = str(tmp_path)
+    wsaa = FakeWSAA({"service": "wsfe", "cert": "cert", "key": "key"})
+    cache = TACache()
+    monkeypatch.setattr(FakeWSAA, "ttl", WSBase.TA_RENEWAL_MARGIN - 60)
+    ws = WSBase.__new__(WSBase)
+    ws.options = {}
+    monkeypatch.setattr(
+        ws, "_configure_wsaa", lambda options, min_ttl: cache.get(wsaa, min_ttl)
+    )
+    ws.wsaa = cache.get(wsaa)
+    ws._load_credentials()
+
+    # AFIP rechaza la renovación: se sigue usando el TA vigente y TACache decide
+    # cuándo reintentar, sin otro intento en cada uso del cliente
+    monkeypatch.setattr(FakeWSAA, "falla", True)
+    vencimiento = ws.expiration_time
+    ws.ensure_ticket_access()
+    ws.ensure_ticket_access()
+    assert ws.expiration_time == vencimiento
+    assert wsaa.logins() == 2
@@ -0,0 +1,125 @@
+import pytest
+from ..sequence import cbte_sequence
+from ..wsfev1 import WSFEv1
+
+
+class FakeService:
+    "Servicio WSFEv1 de prueba: autoriza los comprobantes correlativos"
+
+    def __init__(self, ultimo: int):
+        self.ultimo = ultimo
+        self.consultas = 0
+        self.solicitados = []
+
+    def FECompUltimoAutorizado(self, Auth, PtoVta, CbteTipo):
+        self.consultas += 1
+        return {"PtoVta": PtoVta, "CbteTipo": CbteTipo, "CbteNro": self.ultimo}
+
+    def FECAESolicitar(self, Auth, FeCAEReq):
+        dets = FeCAEReq["FeDetReq"]["FECAEDetRequest"]
+        if isinstance(dets, dict):
+            dets = [dets]
+        respuestas = []
+        for det in dets:
+            numero = det["CbteDesde"]
+            self.solicitados.append(numero)
+            if numero != self.ultimo + 1:
+                obs = {"Code": 10016, "Msg": "Numeración"}
+            elif det["DocNro"] < 0:
+                obs = {"Code": 10015, "Msg": "Documento inválido"}
+            else:
+                obs = None
+            if obs is None:
+                self.ultimo = numero
+            respuestas.append(
+                {
+                    "CbteDesde": numero,
+                    "Resultado": "R" if obs else "A",
+                    "CAE": None if obs else "74000000000000",
+                    "CAEFchVto": None if obs else "20240908",
+                    "Observaciones": {"Obs": [obs]} if obs else None,
+                }
+            )
+        aprobados = sum(r["Resultado"] == "A" for r in respuestas)
+        return {
+            "FeCabResp": {
+                "Resultado": (
+                    "A" if aprobados == len(dets) else "P" if aprobados else "R"
+                )
+            },
+            "FeDetResp": {"FECAEDetResponse": respuestas},
+            "Errors": None,
+        }
+
+
+@pytest.fixture
+def wsfev1():
+    ws = WSFEv1.__new__(WSFEv1)
+    ws.CUIT = 20428129572
+    ws.production = False
+    ws.standin_url = None
+    ws.token = ws.sign = "test"
+    ws.client = type("Client", (), {"service": FakeService(ultimo=41)})()
+    yield ws
+    cbte_sequence.reset((ws.CUIT, ws.production, ws.standin_url, 3, 6))
+
+
+def comprobante(DocNro: int = 0):
+    return {
+        "PtoVta": 3,
+        "CbteTipo": 6,
+        "Concepto": 1,
+        "DocTipo": 99,
+        "DocNro": DocNro,
+        "CbteDesde": None,
+        "CbteHasta": None,
+        "CbteFch": "20240829",
+        "ImpTotal": 121,
+        "ImpTotConc": 0,
+        "ImpNeto": 100,
+        "ImpOpEx": 0,
+        "ImpTrib": 0,
+        "ImpIVA": 21,
+        "MonId": "PES",
+        "MonCotiz": 1,
+    }
+
+
+def test_numeracion_local(wsfev1):
+    service = wsfev1.client.service
+    numeros = [
+        wsfev1.CAESolicitar(comprobante(), fetch_last_cbte=True)["NroCbte"]
+        for _ in range(3)
+    ]
+    assert numeros == [42, 43, 44]
+    # El último número autorizado sólo se consulta para el primer comprobante
+    assert service.consultas == 1
+
+
+def test_numeracion_resincroniza(wsfev1):
+    service = wsfev1.client.service
+    wsfev1.CAESolicitar(comprobante(), fetch_last_cbte=True)
+    # Otro sistema autoriza comprobantes en el mismo punto de venta
+    service.ultimo += 5
+
+    res = wsfev1.CAESolicitar(comprobante(), fetch_last_cbte=True)
+    assert res["NroCbte"] == 48
+    assert service.solicitados == [42, 43, 48]
+    assert service.consultas == 2
+
+
+def test_lote(wsfev1):
+    service = wsfev1.client.service
+    res = wsfev1.CAESolicitarLote([comprobante() for _ in range(3)])
+    assert [r["NroCbte"] for r in res] == [42, 43, 44]
+    assert all(r["Resultado"] == "A" and r["CAE"] for r in res)
+
+    # Un comprobante rechazado impide autorizar los siguientes del lote
+    res = wsfev1.CAESolicitarLote([comprobante(), comprobante(-1), comprobante()])
+    assert [r["Resultado"] for r in res] == ["A", "R", "R"]
+    assert res[1]["Observaciones"][0]["Code"] == 10015
+    assert service.ultimo == 45
+
+    res = wsfev1.CAESolicitarLote([comprobante()])
+    assert res[0]["NroCbte"] == 46
+    assert service.consultas == 1
@@ -0,0 +1,112 @@
+import threading
+import pytest
+from werkzeug.serving import make_server
+from ..standin import AfipStandIn
+from ..standin.__main__ import create_cert
+from ..ta_cache import ta_cache
+from ..wsaa import WSAA
+from ..wsfev1 import WSFEv1
+from ..ws_sr_padron import WSSrPadronA13
+
+CUIT = 20428129572
+
+
+@pytest.fixture
+def standin(tmp_path, monkeypatch):
+    "Servidor de pruebas local en un puerto libre, con un certificado autofirmado"
+    monkeypatch.setattr(WSAA, "TA_DIR", str(tmp_path))
+    cert, key = create_cert(str(tmp_path))
+    servidor = AfipStandIn(seed=1)
+    http = make_server("127.0.0.1", 0, servidor.create_app(), threaded=True)
+    hilo = threading.Thread(target=http.serve_forever, daemon=True)
+    hilo.start()
+    options = {
+        "CUIT": CUIT,
+        "cert": cert,
+        "key": key,
+        "standin_url": f"http://127.0.0.1:{http.server_port}/",
+    }
+    yield servidor, options
+    http.shutdown()
+    ta_cache.clear()
+
+
+def factura_b(numero=None) -> dict:
+    return {
+        "PtoVta": 3,
+        "CbteTipo": 6,
+        "Concepto": 1,
+        "DocTipo": 99,
+        "DocNro": 0,
+        "CbteDesde": numero,
+        "CbteHasta": numero,
+        "CbteFch": "20240829",
+        "ImpTotal": 121,
+        "ImpTotConc": 0,
+        "ImpNeto": 100,
+        "ImpOpEx": 0,
+        "ImpIVA": 21,
+        "ImpTrib": 0,
+        "MonId": "PES",
+        "MonCotiz": 1,
+        "CondicionIVAReceptorId": 5,
+        "Iva": [{"Id": 5, "BaseImp": 100, "Importe": 21}],
+    }
+
+
+def test_standin_wsfev1(standin, tmp_path):
+    servidor, options = standin
+    wsfev1 = WSFEv1(options)
+    assert wsfev1.token.startswith("standin-wsfe")
+    assert (tmp_path / "loginTicketResponse_wsfe_standin.xml").exists()
+
+    assert wsfev1.CompUltimoAutorizado(3, 6) == 0
+    primero = wsfev1.CAESolicitar(factura_b(), fetch_last_cbte=True)
+    segundo = wsfev1.CAESolicitar(factura_b(), fetch_last_cbte=True)
+    assert (primero["NroCbte"], segundo["NroCbte"]) == (1, 2)
+    assert len(primero["CAE"]) == 14
+    assert wsfev1.CompUltimoAutorizado(3, 6) == 2
+
+    # Un número que no es el próximo a autorizar se rechaza como en AFIP
+    res = wsfev1.CAESolicitar(factura_b(5), return_response=True)
+    assert res["FeCabResp"]["Resultado"] == "R"
+    assert WSFEv1.NUMBERING_ERROR in WSFEv1.response_codes(res)
+
+    assert wsfev1.CompConsultar({"PtoVta": 3, "CbteTipo": 6, "CbteNro": 2}) == "A"
+    with pytest.raises(Exception):
+        wsfev1.CompConsultar({"PtoVta": 3, "CbteTipo": 6, "CbteNro": 9})
+
+
+def test_standin_padron(standin):
+    servidor, options = standin
+    padron = WSSrPadronA13(options)
+    persona = padron.GetPersona(30712345678)
+    assert persona["persona"]["idPersona"] == 30712345678
+    assert persona["persona"]["domicilio"][0]["tipoDomicilio"] == "FISCAL"
+    with pytest.raises(Exception):
+        padron.GetPersona(123)
+
+
+def test_standin_errores(standin):
+    servidor, options = standin
+    wsfev1 = WSFEv1(options)
+
+    servidor.error_rate = 1
+    with pytest.raises(Exception):
+        wsfev1.CompUltimoAutorizado(3, 6)
+
+    servidor.error_rate = 0
+    servidor.reject_rate = 1
+    res = wsfev1.CAESolicitar(factura_b(), return_response=True, fetch_last_cbte=True)
+    assert 10015 in WSFEv1.response_codes(res)
+    assert wsfev1.CompUltimoAutorizado(3, 6) == 0
+
+
+def test_standin_en_produccion(standin):
+    servidor, options = standin
+    options = {**options, "production": True}
+    # No se contacta al servidor: la configuración se rechaza antes de crear el cliente
+    with pytest.raises(Exception, match="producción"):
+        WSFEv1(options)
+    with pytest.raises(Exception, match="producción"):
+        WSAA({**options, "service": "wsfe"})
@@ -0,0 +1,132 @@
+import multiprocessing
+import threading
+import time
+import pytest
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from ..ta_cache import TACache, ta_ttl
+from ..wsaa import WSAA, load_signer
+
+
+class FakeWSAA(WSAA):
+    "WSAA de prueba: registra en un archivo cada inicio de sesión en AFIP"
+
+    ttl = 12 * 60 * 60
+    falla = False
+
+    def create_tra(self, ttl=2400):
+        return b"<loginTicketRequest/>"
+
+    def sign_tra(self, tra):
+        return "cms"
+
+    def login_cms(self, cms):
+        with open(f"{self.TA_DIR}/logins", "a") as f:
+            f.write("login\n")
+        time.sleep(0.2)
+        if self.falla:
+            raise RuntimeError("Error en login_cms: coe.alreadyAuthenticated")
+        vencimiento = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        return ET.fromstring(
+            "<loginTicketResponse><header>"
+            f"<expirationTime>{vencimiento.isoformat()}</expirationTime>"
+            "</header><credentials><token>t</token><sign>s</sign></credentials>"
+            "</loginTicketResponse>"
+        )
+
+    def logins(self) -> int:
+        try:
+            with open(f"{self.TA_DIR}/logins") as f:
+                return len(f.readlines())
+        except FileNotFoundError:
+            return 0
+
+
+@pytest.fixture
+def wsaa(tmp_path):
+    FakeWSAA.TA_DIR = str(tmp_path)
+    return FakeWSAA({"service": "wsfe", "cert": "cert", "key": "key"})
+
+
+def obtener_ta(ta_dir: str):
+    FakeWSAA.TA_DIR = ta_dir
+    TACache().get(FakeWSAA({"service": "wsfe", "cert": "cert", "key": "key"}))
+
+
+def test_ta_en_memoria(wsaa):
+    cache = TACache()
+    hilos = [threading.Thread(target=cache.get, args=(wsaa,)) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert wsaa.logins() == 1
+
+    # Los siguientes accesos no leen el archivo
+    wsaa.load_ta_from_file = None
+    assert ta_ttl(cache.get(wsaa)) > 0
+
+
+def test_ta_compartido_entre_procesos(wsaa):
+    ctx = multiprocessing.get_context("fork")
+    procesos = [ctx.Process(target=obtener_ta, args=(wsaa.TA_DIR,)) for _ in range(4)]
+    for proceso in procesos:
+        proceso.start()
+    for proceso in procesos:
+        proceso.join()
+    assert [p.exitcode for p in procesos] == [0] * 4
+    assert wsaa.logins() == 1
+
+
+def test_ta_renovacion_anticipada(wsaa, monkeypatch):
+    cache = TACache()
+    monkeypatch.setattr(FakeWSAA, "ttl", 300)
+    ta_xml = cache.get(wsaa)
+
+    # El TA vence antes de los 10 minutos requeridos: se renueva
+    monkeypatch.setattr(FakeWSAA, "ttl", 12 * 60 * 60)
+    renovado = cache.get(wsaa, min_ttl=600)
+    assert renovado is not ta_xml
+    assert wsaa.logins() == 2
+
+    # Si la renovación falla se sigue usando el TA vigente, sin reintentar en cada acceso
+    monkeypatch.setattr(FakeWSAA, "falla", True)
+    assert cache.get(wsaa, min_ttl=13 * 60 * 60) is renovado
+    assert cache.get(wsaa, min_ttl=13 * 60 * 60) is renovado
+    assert wsaa.logins() == 3
+
+
+def test_load_signer_cache(tmp_path):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test")])
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(datetime.now(timezone.utc))
+        .not_valid_after(datetime.now(timezone.utc) + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = tmp_path / "test.cert"
+    key_path = tmp_path / "test.key"
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption(),
+        )
+    )
+
+    wsaa = WSAA({"service": "wsfe", "cert": str(cert_path), "key": str(key_path)})
+    assert wsaa.sign_tra(wsaa.create_tra())
+    assert wsaa.sign_tra(wsaa.create_tra())
+    assert load_signer(str(cert_path), str(key_path)) is load_signer(
+        str(cert_path), str(key_path)
+    )
@@ -0,0 +1,53 @@
+import os
+import ssl
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.poolmanager import PoolManager
+from zeep.cache import SqliteCache
+from zeep.transports import Transport
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CACERT = os.path.join(BASE_DIR, "cacert.pem")
+# Los WSDL y XSD descargados se guardan en disco y se reutilizan entre procesos
+WSDL_CACHE_PATH = os.path.join(BASE_DIR, "instance", "wsdl_cache.db")
+WSDL_CACHE_TIMEOUT = 24 * 60 * 60  # segundos
+
+
+class TLSAdapter(HTTPAdapter):
+    """
+    Clase para configurar el adaptador TLS para el cliente HTTP
+    """
+
+    def init_poolmanager(self, connections, maxsize, block=False):
+        """Create and initialize the urllib3 PoolManager."""
+        ctx = ssl.create_default_context()
+        ctx.set_ciphers("DEFAULT@SECLEVEL=1")
+        self.poolmanager = PoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            ssl_version=ssl.PROTOCOL_TLS,
+            ssl_context=ctx,
+        )
+
+
+def get_wsdl_cache() -> SqliteCache:
+    """
+    Devuelve la cache de documentos WSDL de zeep, evitando descargarlos en cada cliente.
+    """
+    os.makedirs(os.path.dirname(WSDL_CACHE_PATH), exist_ok=True)
+    return SqliteCache(path=WSDL_CACHE_PATH, timeout=WSDL_CACHE_TIMEOUT)
+
+
+def create_transport(production: bool = False) -> Transport:
+    """
+    Crea el transporte HTTP de un cliente zeep. La sesión de requests mantiene las
+    conexiones abiertas (keep-alive) entre llamadas del mismo cliente.
+    """
+    session = Session()
+    if production:
+        session.verify = CACERT
+        session.mount("https://", TLSAdapter())
+    return Transport(session=session, cache=get_wsdl_cache())
@@ -13,6 +13,7 @@ class WSSrPadronA13(WSBase):
         "https://awshomo.afip.gov.ar/sr-padron/webservices/personaServiceA13?WSDL"
     )
     URL_TEST = "https://awshomo.afip.gov.ar/sr-padron/webservices/personaServiceA13"
+    STANDIN_PATH = "sr-padron/webservices/personaServiceA13"
     SERVICE = "ws_sr_padron_a13"
 
     def __init__(self, options: dict):
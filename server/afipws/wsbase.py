@@ -1,31 +1,9 @@
 import zeep
-import ssl
-import os
 import xml.etree.ElementTree as ET
 
-from requests import Session
-from requests.adapters import HTTPAdapter
-from zeep.transports import Transport
-from urllib3.poolmanager import PoolManager
-from .wsaa import WSAA
-
-
-class TLSAdapter(HTTPAdapter):
-    """
-    Clase para configurar el adaptador TLS para el cliente HTTP
-    """
-
-    def init_poolmanager(self, connections, maxsize, block=False):
-        """Create and initialize the urllib3 PoolManager."""
-        ctx = ssl.create_default_context()
-        ctx.set_ciphers("DEFAULT@SECLEVEL=1")
-        self.poolmanager = PoolManager(
-            num_pools=connections,
-            maxsize=maxsize,
-            block=block,
-            ssl_version=ssl.PROTOCOL_TLS,
-            ssl_context=ctx,
-        )
+from datetime import datetime, timedelta, timezone
+from .transport import TLSAdapter, CACERT, create_transport
+from .wsaa import WSAA, standin_wsdl, validate_standin
 
 
 class WSBase:
@@ -39,19 +17,24 @@ class WSBase:
     WSDL_TEST = ""
     URL_TEST = ""
     SERVICE = ""
-    CACERT = os.path.join(os.path.dirname(__file__), "cacert.pem")
+    # Ruta del servicio en el servidor de pruebas local (ver afipws.standin)
+    STANDIN_PATH = ""
+    CACERT = CACERT
+    # Segundos de validez mínimos del TA; por debajo se renueva antes de usarlo (si la
+    # renovación falla se sigue utilizando el TA vigente, ver TACache)
+    TA_RENEWAL_MARGIN = 10 * 60
 
     def __init__(self, options: dict):
         self._validate_options(options)
         self.CUIT = options.get("CUIT")
         self.production = options.get("production", False)
+        # URL base del servidor de pruebas local; si se indica, reemplaza a AFIP
+        self.standin_url = options.get("standin_url")
+        self.options = options
 
         self.client = self._configure_client()
-        self.wsaa = self._configure_wsaa(options)
-
-        self.token = str(self.wsaa.find("credentials/token").text)
-        self.sign = str(self.wsaa.find("credentials/sign").text)
-        self.expiration_time = str(self.wsaa.find("header/expirationTime").text)
+        self.wsaa = self._configure_wsaa(options, self.TA_RENEWAL_MARGIN)
+        self._load_credentials()
 
     def _validate_options(self, options: dict):
         """
@@ -63,21 +46,23 @@ class WSBase:
                 raise Exception(
                     f"Faltan datos de configuración ({', '.join(required_keys)})"
                 )
+        validate_standin(options)
 
     def _configure_client(self):
         """
-        Configura el cliente zeep
+        Configura el cliente zeep, con una sesión HTTP persistente y los WSDL en cache
         """
-        if self.production:
-            session = Session()
-            session.verify = self.CACERT
-            adapter = TLSAdapter()
-            session.mount("https://", adapter)
-            return zeep.Client(wsdl=self.WSDL, transport=Transport(session=session))
-        else:
-            return zeep.Client(wsdl=self.WSDL_TEST)
+        if self.standin_url:
+            return zeep.Client(
+                wsdl=standin_wsdl(self.standin_url, self.STANDIN_PATH),
+                transport=create_transport(),
+            )
+        return zeep.Client(
+            wsdl=self.WSDL if self.production else self.WSDL_TEST,
+            transport=create_transport(self.production),
+        )
 
-    def _configure_wsaa(self, options: dict) -> ET.Element:
+    def _configure_wsaa(self, options: dict, min_ttl: int = 0) -> ET.Element:
         """
         Configura el objeto WSAA
         """
@@ -88,5 +73,33 @@ class WSBase:
                 "passphrase": options.get("passphrase", ""),
                 "service": self.SERVICE,
                 "production": self.production,
+                "standin_url": self.standin_url,
             }
-        ).get_ticket_access()
+        ).get_ticket_access(min_ttl)
+
+    def _load_credentials(self):
+        """
+        Carga el token, la firma y el vencimiento del TA
+        """
+        self.token = str(self.wsaa.find("credentials/token").text)
+        self.sign = str(self.wsaa.find("credentials/sign").text)
+        self.expiration_time = str(self.wsaa.find("header/expirationTime").text)
+
+    def ticket_access_expiring(self) -> bool:
+        """
+        Indica si el TA vence dentro del margen de renovación
+        """
+        expiration = datetime.fromisoformat(self.expiration_time).astimezone(
+            timezone.utc
+        )
+        limit = datetime.now(timezone.utc) + timedelta(seconds=self.TA_RENEWAL_MARGIN)
+        return expiration <= limit
+
+    def ensure_ticket_access(self):
+        """
+        Renueva el TA si está próximo a vencer. Los clientes de larga duración
+        (ver WSPool) lo llaman antes de cada uso.
+        """
+        if self.ticket_access_expiring():
+            self.wsaa = self._configure_wsaa(self.options, self.TA_RENEWAL_MARGIN)
+            self._load_credentials()
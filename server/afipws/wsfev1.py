@@ -1,4 +1,5 @@
 from .wsbase import WSBase
+from .sequence import cbte_sequence
 
 
 class WSFEv1(WSBase):
@@ -6,7 +7,12 @@ class WSFEv1(WSBase):
     URL = "https://servicios1.afip.gov.ar/wsfev1/service.asmx"
     WSDL_TEST = "https://wswhomo.afip.gov.ar/wsfev1/service.asmx?WSDL"
     URL_TEST = "https://wswhomo.afip.gov.ar/wsfev1/service.asmx"
+    STANDIN_PATH = "wsfev1/service.asmx"
     SERVICE = "wsfe"
+    # El número o fecha del comprobante no se corresponde con el próximo a autorizar
+    NUMBERING_ERROR = 10016
+    # Cantidad máxima de comprobantes por solicitud (ver FECompTotXRequest)
+    MAX_CANT_REG = 250
 
     def __init__(self, options: dict):
         super().__init__(options)
@@ -18,50 +24,80 @@ class WSFEv1(WSBase):
 
         :param data: dict con los datos del comprobante
         :param return_response: bool, si se debe devolver la respuesta completa o solo los datos del CAE
-        :param fetch_last_cbte: bool, si se debe obtener el último comprobante autorizado
+        :param fetch_last_cbte: bool, si se debe asignar el número siguiente al último comprobante
+            autorizado (ver CbteSequence)
         """
         data = data.copy()
 
         Auth = {"Token": self.token, "Sign": self.sign, "Cuit": self.CUIT}
 
-        if fetch_last_cbte:
-            last_cbte = self.CompUltimoAutorizado(data["PtoVta"], data["CbteTipo"])
-
         Req = {
             "FeCabReq": {
                 "CantReg": 1,  # int
                 "PtoVta": data["PtoVta"],  # int
                 "CbteTipo": data["CbteTipo"],  # int
             },
-            "FeDetReq": {
-                "FECAEDetRequest": {
-                    "Concepto": data["Concepto"],  # int
-                    "DocTipo": data["DocTipo"],  # int
-                    "DocNro": data["DocNro"],  # long
-                    "CbteDesde": (
-                        last_cbte + 1 if fetch_last_cbte else data["CbteDesde"]
-                    ),  # long
-                    "CbteHasta": (
-                        last_cbte + 1 if fetch_last_cbte else data["CbteHasta"]
-                    ),  # long
-                    # string
-                    "CbteFch": data["CbteFch"],
-                    "ImpTotal": data["ImpTotal"],  # double
-                    "ImpTotConc": data["ImpTotConc"],  # double
-                    "ImpNeto": data["ImpNeto"],  # double
-                    "ImpOpEx": data["ImpOpEx"],  # double
-                    "ImpTrib": data["ImpTrib"],  # double
-                    "ImpIVA": data["ImpIVA"],  # double
-                    "MonId": data["MonId"],  # string
-                    "MonCotiz": data["MonCotiz"],  # double
-                }
-            },
+            "FeDetReq": {"FECAEDetRequest": self._det_request(data)},
+        }
+
+        if fetch_last_cbte:
+            res = self._solicitar_numerado(Auth, Req, data["PtoVta"], data["CbteTipo"])
+        else:
+            res = self.client.service.FECAESolicitar(Auth=Auth, FeCAEReq=Req)
+
+        if return_response:
+            return res
+
+        if "Errors" in res and res["Errors"] is not None:
+            raise Exception(res["Errors"])
+
+        if not res["FeCabResp"]["Resultado"] == "A":
+            if "Errors" in res and res["Errors"] is not None:
+                raise Exception(res["Errors"])
+            if "Observaciones" in res["FeDetResp"]["FECAEDetResponse"][0]:
+                raise Exception(
+                    res["FeDetResp"]["FECAEDetResponse"][0]["Observaciones"]
+                )
+            raise Exception("Error desconocido:", res)
+
+        events = []
+        if "Events" in res and res["Events"] is not None:
+            for event in res["Events"]["Evt"]:
+                events.append({"Code": event["Code"], "Msg": event["Msg"]})
+
+        if type(res["FeDetResp"]["FECAEDetResponse"]) == list:
+            det = res["FeDetResp"]["FECAEDetResponse"][0]
+        else:
+            det = res["FeDetResp"]["FECAEDetResponse"]
+
+        return {
+            "NroCbte": det["CbteDesde"],
+            "CAE": det["CAE"],
+            "CAEFchVto": det["CAEFchVto"],
+        }
+
+    def _det_request(self, data: dict) -> dict:
+        "Armar el detalle (FECAEDetRequest) de un comprobante"
+        det = {
+            "Concepto": data["Concepto"],  # int
+            "DocTipo": data["DocTipo"],  # int
+            "DocNro": data["DocNro"],  # long
+            "CbteDesde": data["CbteDesde"],  # long
+            "CbteHasta": data["CbteHasta"],  # long
+            # string
+            "CbteFch": data["CbteFch"],
+            "ImpTotal": data["ImpTotal"],  # double
+            "ImpTotConc": data["ImpTotConc"],  # double
+            "ImpNeto": data["ImpNeto"],  # double
+            "ImpOpEx": data["ImpOpEx"],  # double
+            "ImpTrib": data["ImpTrib"],  # double
+            "ImpIVA": data["ImpIVA"],  # double
+            "MonId": data["MonId"],  # string
+            "MonCotiz": data["MonCotiz"],  # double
         }
 
         if data.get("CondicionIVAReceptorId") is not None:
-            Req["FeDetReq"]["FECAEDetRequest"]["CondicionIVAReceptorId"] = data[
-                "CondicionIVAReceptorId"
-            ]
+            det["CondicionIVAReceptorId"] = data["CondicionIVAReceptorId"]
 
         if data.get("Concepto") == 2 or data.get("Concepto") == 3:
             if (
@@ -72,9 +108,9 @@ class WSFEv1(WSBase):
                 raise Exception(
                     "FchServDesde, FchServHasta y FchVtoPago son obligatorios para Concepto 2 y 3"
                 )
-            Req["FeDetReq"]["FECAEDetRequest"]["FchServDesde"] = data["FchServDesde"]
-            Req["FeDetReq"]["FECAEDetRequest"]["FchServHasta"] = data["FchServHasta"]
-            Req["FeDetReq"]["FECAEDetRequest"]["FchVtoPago"] = data["FchVtoPago"]
+            det["FchServDesde"] = data["FchServDesde"]
+            det["FchServHasta"] = data["FchServHasta"]
+            det["FchVtoPago"] = data["FchVtoPago"]
 
         """
         La forma correcta de enviar estructuras de datos es la siguiente:
@@ -87,7 +123,7 @@ class WSFEv1(WSBase):
         """
 
         if data.get("CbtesAsoc"):
-            Req["FeDetReq"]["FECAEDetRequest"]["CbtesAsoc"] = {
+            det["CbtesAsoc"] = {
                 "CbteAsoc": [
                     {
                         "Tipo": cbte["Tipo"],
@@ -101,7 +137,7 @@ class WSFEv1(WSBase):
             }
 
         if data.get("Tributos"):
-            Req["FeDetReq"]["FECAEDetRequest"]["Tributos"] = {
+            det["Tributos"] = {
                 "Tributo": [
                     {
                         "Id": tributo["Id"],  # int
@@ -115,7 +151,7 @@ class WSFEv1(WSBase):
             }
 
         if data.get("Iva"):
-            Req["FeDetReq"]["FECAEDetRequest"]["Iva"] = {
+            det["Iva"] = {
                 "AlicIva": [
                     {
                         "Id": iva["Id"],  # int
@@ -127,7 +163,7 @@ class WSFEv1(WSBase):
             }
 
         if data.get("Opcionales"):
-            Req["FeDetReq"]["FECAEDetRequest"]["Opcionales"] = {
+            det["Opcionales"] = {
                 "Opcional": [
                     {
                         "Id": opcional["Id"],  # int
@@ -138,7 +174,7 @@ class WSFEv1(WSBase):
             }
 
         if data.get("Compradores"):
-            Req["FeDetReq"]["FECAEDetRequest"]["Compradores"] = {
+            det["Compradores"] = {
                 "Comprador": [
                     {
                         "DocTipo": comprador["DocTipo"],  # int
@@ -150,19 +186,60 @@ class WSFEv1(WSBase):
             }
 
         if data.get("PeriodoAsoc"):
-            Req["FeDetReq"]["FECAEDetRequest"]["PeriodoAsoc"] = {
+            det["PeriodoAsoc"] = {
                 "FchDesde": data["PeriodoAsoc"]["FchDesde"],  # string
                 "FchHasta": data["PeriodoAsoc"]["FchHasta"],  # string
             }
 
         if data.get("Actividades"):
-            Req["FeDetReq"]["FECAEDetRequest"]["Actividades"] = {
+            det["Actividades"] = {
                 "Actividad": [
                     {"Id": actividad["Id"]} for actividad in data["Actividades"]  # int
                 ]
             }
 
-        res = self.client.service.FECAESolicitar(Auth=Auth, FeCAEReq=Req)
+        return det
+
+    def CAESolicitarLote(self, comprobantes: list, return_response: bool = False):
+        """Solicitar CAE a AFIP para varios comprobantes en una única solicitud (CantReg > 1).
+
+        Los comprobantes deben ser del mismo punto de venta y tipo, y se numeran en forma
+        correlativa a partir del último autorizado (ver CbteSequence).
+
+        :param comprobantes: lista de dict con los datos de cada comprobante, como en CAESolicitar
+        :param return_response: bool, si se debe devolver la respuesta completa o solo el resultado
+            de cada comprobante
+        :return: lista con el resultado de cada comprobante, en el mismo orden: NroCbte, Resultado
+            ("A" aprobado o "R" rechazado), CAE, CAEFchVto y Observaciones
+        """
+        if not comprobantes:
+            return []
+        if len(comprobantes) > self.MAX_CANT_REG:
+            raise Exception(
+                f"No se pueden autorizar más de {self.MAX_CANT_REG} comprobantes por solicitud"
+            )
+        PtoVta = comprobantes[0]["PtoVta"]
+        CbteTipo = comprobantes[0]["CbteTipo"]
+        if any(
+            data["PtoVta"] != PtoVta or data["CbteTipo"] != CbteTipo
+            for data in comprobantes
+        ):
+            raise Exception(
+                "Los comprobantes deben ser del mismo punto de venta y tipo de comprobante"
+            )
+
+        Auth = {"Token": self.token, "Sign": self.sign, "Cuit": self.CUIT}
+        dets = [self._det_request(data) for data in comprobantes]
+        Req = {
+            "FeCabReq": {
+                "CantReg": len(dets),  # int
+                "PtoVta": PtoVta,  # int
+                "CbteTipo": CbteTipo,  # int
+            },
+            "FeDetReq": {"FECAEDetRequest": dets},
+        }
+
+        res = self._solicitar_numerado(Auth, Req, PtoVta, CbteTipo)
 
         if return_response:
             return res
@@ -170,30 +247,84 @@ class WSFEv1(WSBase):
         if "Errors" in res and res["Errors"] is not None:
             raise Exception(res["Errors"])
 
-        if not res["FeCabResp"]["Resultado"] == "A":
-            if "Errors" in res and res["Errors"] is not None:
-                raise Exception(res["Errors"])
-            if "Observaciones" in res["FeDetResp"]["FECAEDetResponse"][0]:
-                raise Exception(
-                    res["FeDetResp"]["FECAEDetResponse"][0]["Observaciones"]
-                )
-            raise Exception("Error desconocido:", res)
+        por_numero = {det["CbteDesde"]: det for det in self._det_responses(res)}
+        resultados = []
+        for det_req in dets:
+            det = por_numero.get(det_req["CbteDesde"])
+            if det is None:
+                raise Exception("Error desconocido:", res)
+            observaciones = []
+            if "Observaciones" in det and det["Observaciones"] is not None:
+                observaciones = [
+                    {"Code": obs["Code"], "Msg": obs["Msg"]}
+                    for obs in det["Observaciones"]["Obs"]
+                ]
+            resultados.append(
+                {
+                    "NroCbte": det["CbteDesde"],
+                    "Resultado": det["Resultado"],
+                    "CAE": det["CAE"] if det["Resultado"] == "A" else None,
+                    "CAEFchVto": det["CAEFchVto"] if det["Resultado"] == "A" else None,
+                    "Observaciones": observaciones,
+                }
+            )
+        return resultados
 
-        events = []
-        if "Events" in res and res["Events"] is not None:
-            for event in res["Events"]["Evt"]:
-                events.append({"Code": event["Code"], "Msg": event["Msg"]})
+    def _solicitar_numerado(self, Auth: dict, Req: dict, PtoVta: int, CbteTipo: int):
+        """Solicitar CAE asignando los próximos números de comprobante.
 
-        if type(res["FeDetResp"]["FECAEDetResponse"]) == list:
-            det = res["FeDetResp"]["FECAEDetResponse"][0]
-        else:
-            det = res["FeDetResp"]["FECAEDetResponse"]
+        El último número autorizado se mantiene en memoria (ver CbteSequence), por lo que
+        FECompUltimoAutorizado sólo se consulta la primera vez o ante un error de numeración,
+        en cuyo caso se reintenta la solicitud con el número actualizado.
+        """
+        key = (self.CUIT, self.production, self.standin_url, PtoVta, CbteTipo)
+        dets = Req["FeDetReq"]["FECAEDetRequest"]
+        if isinstance(dets, dict):
+            dets = [dets]
+        with cbte_sequence.reserve(
+            key, lambda: self.CompUltimoAutorizado(PtoVta, CbteTipo)
+        ) as reserva:
+            for intento in range(2):
+                for i, det in enumerate(dets):
+                    det["CbteDesde"] = det["CbteHasta"] = reserva.numero + i
+                res = self.client.service.FECAESolicitar(Auth=Auth, FeCAEReq=Req)
+                autorizados = [
+                    det["CbteDesde"]
+                    for det in self._det_responses(res)
+                    if det["Resultado"] == "A"
+                ]
+                if (
+                    intento == 0
+                    and not autorizados
+                    and self.NUMBERING_ERROR in self.response_codes(res)
+                ):
+                    reserva.resync()
+                    continue
+                break
+            if autorizados:
+                # Un comprobante rechazado impide autorizar los siguientes del lote,
+                # por lo que los autorizados son siempre los primeros números
+                reserva.confirm(max(autorizados))
+        return res
 
-        return {
-            "NroCbte": det["CbteDesde"],
-            "CAE": det["CAE"],
-            "CAEFchVto": det["CAEFchVto"],
-        }
+    @staticmethod
+    def _det_responses(res) -> list:
+        "Obtener los detalles (FECAEDetResponse) de una respuesta"
+        if "FeDetResp" not in res or res["FeDetResp"] is None:
+            return []
+        dets = res["FeDetResp"]["FECAEDetResponse"]
+        return dets if isinstance(dets, list) else [dets]
+
+    @classmethod
+    def response_codes(cls, res) -> set:
+        "Obtener los códigos de error y observaciones de una respuesta"
+        codes = set()
+        if "Errors" in res and res["Errors"] is not None:
+            codes.update(err["Code"] for err in res["Errors"]["Err"])
+        for det in cls._det_responses(res):
+            if "Observaciones" in det and det["Observaciones"] is not None:
+                codes.update(obs["Code"] for obs in det["Observaciones"]["Obs"])
+        return codes
 
     def CompUltimoAutorizado(
         self, PtoVta: int, CbteTipo: int, return_response: bool = False
@@ -320,13 +451,13 @@ class WSFEv1(WSBase):
         data = data.copy()
         Auth = {"Token": self.token, "Sign": self.sign, "Cuit": self.CUIT}
         Req = {
-            "FeCompConsReq": {
-                "CbteTipo": data["CbteTipo"],  # int
-                "PtoVta": data["PtoVta"],  # int
-                "CbteNro": data["CbteNro"],  # long
-            }
+            "CbteTipo": data["CbteTipo"],  # int
+            "PtoVta": data["PtoVta"],  # int
+            "CbteNro": data["CbteNro"],  # long
         }
         res = self.client.service.FECompConsultar(Auth=Auth, FeCompConsReq=Req)
         if return_response:
             return res
-        return res["Resultado"]
+        if "Errors" in res and res["Errors"] is not None:
+            raise Exception(res["Errors"])
+        return res["ResultGet"]["Resultado"]
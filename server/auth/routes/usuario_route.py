@@ -6,6 +6,7 @@ from server.auth.models import Usuario, Permiso
 from server.auth.schemas import usuario_schema
 from server.config import db
 from server.auth.decorators import permission_required
+from server.core.decorators import write_transaction
 from server.utils.utils import get_datagrid_options
 
 usuario_bp = Blueprint("usuario_bp", __name__)
@@ -21,6 +22,7 @@ def index():
 
 
 @usuario_bp.route("/usuarios/create", methods=["GET", "POST"])
+@write_transaction
 @jwt_required()
 @permission_required("usuario.create")
 def create():
@@ -47,6 +49,7 @@ def create():
 
 
 @usuario_bp.route("/usuarios/<int:pk>/update", methods=["GET", "PUT"])
+@write_transaction
 @jwt_required()
 @permission_required("usuario.update")
 def update(pk):
@@ -16,6 +16,8 @@ class ArticuloController:
         si el stock actual del artículo es distinto de cero.
         """
 
+        # El contexto del schema es compartido, se descarta la instancia de una actualización previa
+        articulo_form_schema.context.pop("instance", None)
         new_articulo = articulo_form_schema.load(data, session=session)
         session.add(new_articulo)
 
@@ -3,6 +3,7 @@ from datetime import datetime
 from flask import jsonify
 from server.config import db
 from server.core.models import MovimientoStock, Articulo, MovimientoStockItem, Venta, Compra
+from server.core.services import StockLedger
 
 local_tz = pytz.timezone("America/Argentina/Buenos_Aires")
 
@@ -45,23 +46,12 @@ class MovimientoStockController:
                 updated_by=data["updated_by"]
             )
             db.session.add(movimiento)
-            db.session.flush()
-            renglones = data["renglones"]
-            for item in renglones:
-                articulo = Articulo.query.get(item["articulo_id"])
-                movimiento_item = MovimientoStockItem(
-                    articulo=articulo,
-                    movimiento_stock_id=movimiento.id,
-                    codigo_principal=item["codigo_principal"],
-                    cantidad=item["cantidad"],
-                )
-                if movimiento.tipo_movimiento == "ingreso":
-                    articulo.stock_actual += item["cantidad"]
-                else:
-                    articulo.stock_actual -= item["cantidad"]
-                movimiento_item.stock_posterior = articulo.stock_actual
-                db.session.add(movimiento_item)
-                db.session.add(articulo)
+            StockLedger.registrar(
+                db.session,
+                movimiento,
+                [(item["articulo_id"], item["cantidad"]) for item in data["renglones"]],
+                retroactivo=True,
+            )
             db.session.commit()
             return jsonify({"movimiento_id": movimiento.id}), 201
         except Exception as e:
@@ -90,19 +80,11 @@ class MovimientoStockController:
                 updated_by=venta.updated_by,
             )
             db.session.add(movimiento)
-            db.session.flush()
-            for item in venta.items:
-                articulo = Articulo.query.get(item.articulo_id)
-                movimiento_item = MovimientoStockItem(
-                    articulo=articulo,
-                    movimiento_stock_id=movimiento.id,
-                    codigo_principal=articulo.codigo_principal,
-                    cantidad=item.cantidad,
-                )
-                articulo.stock_actual -= item.cantidad
-                movimiento_item.stock_posterior = articulo.stock_actual
-                db.session.add(movimiento_item)
-                db.session.add(articulo)
+            StockLedger.registrar(
+                db.session,
+                movimiento,
+                [(item.articulo_id, item.cantidad) for item in venta.items],
+            )
         except Exception as e:
             db.session.rollback()
             print(e)
@@ -127,19 +109,11 @@ class MovimientoStockController:
                 updated_by=venta.updated_by,
             )
             db.session.add(movimiento)
-            db.session.flush()
-            for item in venta.items:
-                articulo = Articulo.query.get(item.articulo_id)
-                movimiento_item = MovimientoStockItem(
-                    articulo=articulo,
-                    movimiento_stock_id=movimiento.id,
-                    codigo_principal=articulo.codigo_principal,
-                    cantidad=item.cantidad,
-                )
-                articulo.stock_actual += item.cantidad
-                movimiento_item.stock_posterior = articulo.stock_actual
-                db.session.add(movimiento_item)
-                db.session.add(articulo)
+            StockLedger.registrar(
+                db.session,
+                movimiento,
+                [(item.articulo_id, item.cantidad) for item in venta.items],
+            )
         except Exception as e:
             db.session.rollback()
             print(e)
@@ -200,19 +174,11 @@ class MovimientoStockController:
                 updated_by=compra.updated_by,
             )
             db.session.add(movimiento)
-            db.session.flush()
-            for item in compra.items:
-                articulo = Articulo.query.get(item.articulo_id)
-                movimiento_item = MovimientoStockItem(
-                    articulo=articulo,
-                    movimiento_stock_id=movimiento.id,
-                    codigo_principal=articulo.codigo_principal,
-                    cantidad=item.cantidad,
-                )
-                articulo.stock_actual += item.cantidad
-                movimiento_item.stock_posterior = articulo.stock_actual
-                db.session.add(movimiento_item)
-                db.session.add(articulo)
+            StockLedger.registrar(
+                db.session,
+                movimiento,
+                [(item.articulo_id, item.cantidad) for item in compra.items],
+            )
         except Exception as e:
             db.session.rollback()
             print(e)
@@ -237,19 +203,11 @@ class MovimientoStockController:
                 updated_by=compra.updated_by,
             )
             db.session.add(movimiento)
-            db.session.flush()
-            for item in compra.items:
-                articulo = Articulo.query.get(item.articulo_id)
-                movimiento_item = MovimientoStockItem(
-                    articulo=articulo,
-                    movimiento_stock_id=movimiento.id,
-                    codigo_principal=articulo.codigo_principal,
-                    cantidad=item.cantidad,
-                )
-                articulo.stock_actual -= item.cantidad
-                movimiento_item.stock_posterior = articulo.stock_actual
-                db.session.add(movimiento_item)
-                db.session.add(articulo)
+            StockLedger.registrar(
+                db.session,
+                movimiento,
+                [(item.articulo_id, item.cantidad) for item in compra.items],
+            )
         except Exception as e:
             db.session.rollback()
             print(e)
@@ -4,6 +4,8 @@ from datetime import datetime
 from server.config import db
 from server.core.models import (
     Venta,
+    EstadoVenta,
+    EstadoTareaFacturacion,
     VentaItem,
     Cliente,
     TipoComprobante,
@@ -12,7 +14,8 @@ from server.core.models import (
 )
 from server.core.models.tributo import BaseCalculo
 from server.core.models.association_table import tributo_venta
-from server.core.services import AfipService
+from server.core.services import AfipService, FacturacionQueue
+from server.utils.database import restart_write
 from server.core.schemas import VentaFormSchema
 from .movimiento_stock_controller import MovimientoStockController
 
@@ -52,23 +55,12 @@ class VentaController:
 
         # Facturar venta si corresponde
         if not orden:
-            if not venta.tipo_comprobante.codigo_afip is None:
-                afip = AfipService()
-                res = afip.obtener_cae(venta)
-                venta.numero = res["numero"]
-                venta.cae = res["cae"]
-                venta.vencimiento_cae = datetime.fromisoformat(res["vencimiento_cae"])
-            if venta.tipo_comprobante.estado_venta is None:
-                # Si el tipo de comprobante no tiene un estado de venta asociado, se asume que es un ticket
-                venta.estado = "ticket"
-            else:
-                venta.estado = venta.tipo_comprobante.estado_venta
-
-            # Registrar movimiento de stock
-            if venta.tipo_comprobante.descontar_stock:
-                MovimientoStockController.create_movimiento_from_venta(venta)
+            VentaController.registrar_stock(venta)
+            res = VentaController.solicitar_cae(venta, session)
+            VentaController.facturar(venta, res)
 
         session.commit()
+        FacturacionQueue.notificar()
         return venta.id
 
     @staticmethod
@@ -113,31 +105,142 @@ class VentaController:
         # Facturar venta si corresponde
         if not orden:
             if instance.estado.value == "Orden":
-                if not instance.tipo_comprobante.codigo_afip is None:
-                    afip = AfipService()
-                    res = afip.obtener_cae(instance)
-                    instance.numero = res["numero"]
-                    instance.cae = res["cae"]
-                    instance.vencimiento_cae = datetime.fromisoformat(
-                        res["vencimiento_cae"]
-                    )
-                if instance.tipo_comprobante.estado_venta is None:
-                    # Si el tipo de comprobante no tiene un estado de venta asociado, se asume que es un ticket
-                    instance.estado = "ticket"
-                else:
-                    instance.estado = instance.tipo_comprobante.estado_venta
-
-                # Registrar movimiento de stock
-                if instance.tipo_comprobante.descontar_stock:
-                    MovimientoStockController.create_movimiento_from_venta(instance)
+                VentaController.registrar_stock(instance)
+                res = VentaController.solicitar_cae(instance, session)
+                VentaController.facturar(instance, res)
 
         session.commit()
+        FacturacionQueue.notificar()
         return instance.id
 
+    @staticmethod
+    def solicitar_cae(instance: Venta, session) -> dict | None:
+        """
+        Solicita el CAE de la venta si el comprobante lo requiere. Con la facturación
+        asincrónica habilitada, la venta queda pendiente de CAE y la solicitud se encola
+        (ver FacturacionQueue), por lo que devuelve None. En caso contrario, el CAE se
+        solicita fuera del bloqueo de escritura (ver solicitar_sin_bloqueo).
+        """
+        if instance.tipo_comprobante.codigo_afip is None:
+            return None
+        if FacturacionQueue.habilitada():
+            FacturacionQueue.encolar(instance, session)
+            return None
+        return VentaController.solicitar_sin_bloqueo(instance, session)
+
+    @staticmethod
+    def solicitar_sin_bloqueo(instance: Venta, session) -> dict:
+        """
+        Solicita el CAE de la venta (ver FacturacionQueue.solicitar) sin retener el
+        bloqueo de escritura de la base de datos, para que una demora de AFIP no
+        detenga las escrituras de las demás peticiones: la venta se confirma como
+        pendiente de CAE junto con su tarea de facturación en proceso, se realiza la
+        solicitud y luego se reserva nuevamente el bloqueo para registrar el resultado,
+        que se devuelve.
+
+        Si la solicitud falla, AFIP pudo haber autorizado el comprobante sin que se
+        recibiera la respuesta, por lo que la venta no se elimina: queda con estado
+        "Error CAE" y se propaga el error. Si el proceso se interrumpe durante la
+        solicitud, la tarea permite retomarla (ver FacturacionQueue.iniciar).
+        """
+        tarea = FacturacionQueue.iniciar(instance, session)
+        session.commit()
+        try:
+            res = FacturacionQueue.solicitar(instance)
+        except Exception as e:
+            restart_write(session)
+            FacturacionQueue.fallar(tarea, str(e))
+            session.commit()
+            raise
+        restart_write(session)
+        tarea.estado = EstadoTareaFacturacion.completada
+        return res
+
+    @staticmethod
+    def registrar_stock(instance: Venta):
+        "Registra el movimiento de stock de la venta, si el comprobante lo requiere"
+        if instance.tipo_comprobante.descontar_stock:
+            MovimientoStockController.create_movimiento_from_venta(instance)
+
+    @staticmethod
+    def facturar(instance: Venta, res: dict = None):
+        """
+        Registra la facturación de una orden de venta: el CAE obtenido (si el comprobante
+        lo requiere) y el estado correspondiente al tipo de comprobante. El movimiento
+        de stock se registra antes de solicitar el CAE (ver registrar_stock).
+        """
+        if res is not None:
+            instance.numero = res["numero"]
+            instance.cae = res["cae"]
+            instance.vencimiento_cae = datetime.fromisoformat(res["vencimiento_cae"])
+        # Las ventas pendientes de CAE reciben su estado al procesarse en la cola de facturación
+        if res is not None or instance.estado != EstadoVenta.pendiente_cae:
+            if instance.tipo_comprobante.estado_venta is None:
+                # Si el tipo de comprobante no tiene un estado de venta asociado, se asume que es un ticket
+                instance.estado = "ticket"
+            else:
+                instance.estado = instance.tipo_comprobante.estado_venta
+
+    @staticmethod
+    def facturar_ordenes(
+        session, venta_ids: list = None, chunk_size: int = None
+    ) -> dict:
+        """
+        Factura las órdenes de venta pendientes (o las indicadas en `venta_ids`) cuyo
+        comprobante requiere CAE, solicitándolo a AFIP en lotes (ver AfipService.obtener_cae_lote).
+
+        Los cambios se confirman luego de cada lote, por lo que un error en un lote no
+        descarta los CAE ya obtenidos. Devuelve los ids de las ventas facturadas y las
+        observaciones de las rechazadas, que permanecen como órdenes.
+        """
+        query = (
+            session.query(Venta)
+            .join(Venta.tipo_comprobante)
+            .filter(
+                Venta.deleted == False,
+                Venta.estado == "orden",
+                TipoComprobante.codigo_afip.isnot(None),
+            )
+        )
+        if venta_ids is not None:
+            query = query.filter(Venta.id.in_(venta_ids))
+
+        facturadas = []
+        rechazadas = {}
+        afip = AfipService()
+        for lote in afip.obtener_cae_lote(query.all(), chunk_size):
+            # El bloqueo de escritura se reserva luego de obtener los CAE del lote
+            restart_write(session)
+            for venta, res in lote:
+                if "cae" in res:
+                    VentaController.facturar(venta, res)
+                    VentaController.registrar_stock(venta)
+                    facturadas.append(venta.id)
+                else:
+                    rechazadas[venta.id] = res["observaciones"]
+            session.commit()
+        return {"facturadas": facturadas, "rechazadas": rechazadas}
+
     @staticmethod
     def anular(instance: Venta) -> tuple:
+        # Una solicitud de CAE interrumpida se resuelve como un error de CAE
+        FacturacionQueue.recuperar_interrumpida(instance, db.session)
         match instance.estado.value:
             case "Facturado":
+                pendiente = (
+                    db.session.query(Venta.id)
+                    .filter(
+                        Venta.venta_asociada_id == instance.id,
+                        Venta.estado.in_(
+                            [EstadoVenta.pendiente_cae, EstadoVenta.error_cae]
+                        ),
+                    )
+                    .first()
+                )
+                if pendiente is not None:
+                    raise Exception(
+                        "La venta tiene una nota de crédito pendiente de CAE"
+                    )
                 if instance.tipo_comprobante.letra == "A":
                     tipo_comprobante = TipoComprobante.query.filter_by(
                         letra="A", codigo_afip=3
@@ -178,17 +281,9 @@ class VentaController:
                         subtotal=item.subtotal,
                     )
                     db.session.add(venta_item)
-                afip = AfipService()
-                res = afip.anular_cae(nota_credito)
-                nota_credito.numero = res["numero"]
-                nota_credito.cae = res["cae"]
-                nota_credito.vencimiento_cae = datetime.fromisoformat(
-                    res["vencimiento_cae"]
-                )
-                nota_credito.estado = "facturado"
-                instance.estado = "anulado"
-                # Generar movimiento de stock inverso
-                MovimientoStockController.create_movimiento_from_devolucion(instance)
+                res = VentaController.solicitar_sin_bloqueo(nota_credito, db.session)
+                # Registra la nota de crédito y anula la venta
+                FacturacionQueue.registrar(nota_credito, res)
                 db.session.commit()
                 return nota_credito.id, "Nota de crédito generada correctamente"
             case "Ticket":
@@ -199,5 +294,30 @@ class VentaController:
                 return instance.id, "Venta anulada correctamente"
             case "Orden":
                 raise Exception("No se puede anular una orden de venta")
+            case "Pendiente CAE":
+                raise Exception("No se puede anular una venta pendiente de CAE")
+            case "Error CAE":
+                # El último intento de facturación pudo haber sido autorizado por AFIP
+                # sin que se recibiera la respuesta: en ese caso se registra el CAE y
+                # la venta se anula como facturada, con una nota de crédito
+                db.session.commit()
+                res = FacturacionQueue.buscar_autorizado(instance, db.session)
+                restart_write(db.session)
+                if res is not None:
+                    FacturacionQueue.registrar(instance, res)
+                    db.session.flush()
+                    if instance.venta_asociada_id is not None:
+                        # Nota de crédito: su registro completa la anulación
+                        db.session.commit()
+                        return instance.id, "Nota de crédito generada correctamente"
+                    return VentaController.anular(instance)
+                instance.estado = "anulado"
+                if instance.venta_asociada_id is None:
+                    # Generar movimiento de stock inverso
+                    MovimientoStockController.create_movimiento_from_devolucion(
+                        instance
+                    )
+                db.session.commit()
+                return instance.id, "Venta anulada correctamente"
             case "Anulado":
                 raise Exception("La venta ya fue anulada")
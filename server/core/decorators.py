@@ -1,8 +1,9 @@
 from functools import wraps
-from flask import jsonify
+from flask import jsonify, request
 from marshmallow import ValidationError
 
 from server.config import db
+from server.utils.database import begin_write
 
 
 def error_handler(session_rollback=False):
@@ -27,3 +28,20 @@ def error_handler(session_rollback=False):
         return decorated_function
 
     return decorator
+
+
+def write_transaction(f):
+    """
+    Las peticiones de la ruta que modifican datos (POST, PUT, PATCH y DELETE) reservan
+    el bloqueo de escritura al iniciar su transacción (ver begin_write). Debe
+    aplicarse antes que los decoradores que consultan la base de datos, como
+    jwt_required.
+    """
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.method in ("POST", "PUT", "PATCH", "DELETE"):
+            begin_write(db.session)
+        return f(*args, **kwargs)
+
+    return decorated_function
@@ -4,6 +4,7 @@ from .venta_item import VentaItem
 from .compra import Compra, EstadoCompra
 from .compra_item import CompraItem
 from .articulo import Articulo
+from .articulo_codigo import ArticuloCodigo
 from .tributo import Tributo
 from .comercio import Comercio, PuntoVenta
 from .parametros import *
@@ -11,3 +12,10 @@ from .association_table import *
 from .movimiento_stock import MovimientoStock
 from .movimiento_stock_item import MovimientoStockItem
 from .proveedor import Proveedor
+from .tarea_facturacion import TareaFacturacion, EstadoTareaFacturacion
+from .padron_persona import PadronPersona
+from .stock_snapshot import StockSnapshot
+from .venta_resumen import (
+    VentaResumenArticulo,
+    VentaResumenComprobante,
+)
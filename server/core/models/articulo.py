@@ -4,13 +4,27 @@ from sqlalchemy import (
     Integer,
     String,
     Numeric,
-    PickleType,
+    DDL,
+    event,
 )
-from sqlalchemy.orm import relationship
-from sqlalchemy.ext.mutable import MutableList
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import relationship, validates
 from server.config import db
+from server.core.models.articulo_codigo import ArticuloCodigo
+from server.core.models.enums import TipoCodigoArticulo
 from server.utils.utils import AuditMixin, SoftDeleteMixin, QueryWithSoftDelete
 
+ARTICULO_FTS_TABLE = "articulo_fts"
+
+# Prioridad de cada tipo de código; los adicionales se ordenan a continuación
+PRIORIDAD_CODIGO = {
+    TipoCodigoArticulo.principal: 0,
+    TipoCodigoArticulo.secundario: 1,
+    TipoCodigoArticulo.terciario: 2,
+    TipoCodigoArticulo.cuaternario: 3,
+    TipoCodigoArticulo.adicional: 4,
+}
+
 
 class Articulo(AuditMixin, SoftDeleteMixin, db.Model):
     """
@@ -18,6 +32,10 @@ class Articulo(AuditMixin, SoftDeleteMixin, db.Model):
 
     Esta clase representa un artículo en la base de datos. Incluye campos para los datos principales del artículo,
     los datos de auditoría y las relaciones con otras tablas.
+
+    Los códigos de barras se almacenan en la tabla `articulo_codigo` (ver ArticuloCodigo). El código
+    principal se conserva además como columna del artículo; los códigos secundario, terciario,
+    cuaternario y adicionales se exponen como propiedades sobre la relación `codigos`.
     """
 
     __tablename__ = "articulo"
@@ -25,11 +43,7 @@ class Articulo(AuditMixin, SoftDeleteMixin, db.Model):
     query_class = QueryWithSoftDelete
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    codigo_principal = Column(String, nullable=False)
-    codigo_secundario = Column(String, nullable=True)
-    codigo_terciario = Column(String, nullable=True)
-    codigo_cuaternario = Column(String, nullable=True)
-    codigo_adicional = Column(MutableList.as_mutable(PickleType), nullable=True)
+    codigo_principal = Column(String, nullable=False, index=True)
     descripcion = Column(String, nullable=False)
     linea_factura = Column(String(30), nullable=False)
     stock_actual = Column(Numeric(precision=10, scale=2), default=0, nullable=False)
@@ -50,6 +64,99 @@ class Articulo(AuditMixin, SoftDeleteMixin, db.Model):
         Integer, ForeignKey("alicuota_iva.id"), default=1, nullable=False
     )
     alicuota_iva = relationship("AlicuotaIVA", backref="articulo")
+    codigos = relationship(
+        "ArticuloCodigo",
+        back_populates="articulo",
+        cascade="all, delete-orphan",
+        order_by=(ArticuloCodigo.prioridad, ArticuloCodigo.id),
+        lazy="selectin",
+    )
+
+    @validates("codigo_principal")
+    def validate_codigo_principal(self, key, value):
+        self._set_codigos(TipoCodigoArticulo.principal, [value])
+        return value
+
+    @property
+    def codigo_secundario(self):
+        return next(iter(self._get_codigos(TipoCodigoArticulo.secundario)), None)
+
+    @codigo_secundario.setter
+    def codigo_secundario(self, value):
+        self._set_codigos(TipoCodigoArticulo.secundario, [value])
+
+    @property
+    def codigo_terciario(self):
+        return next(iter(self._get_codigos(TipoCodigoArticulo.terciario)), None)
+
+    @codigo_terciario.setter
+    def codigo_terciario(self, value):
+        self._set_codigos(TipoCodigoArticulo.terciario, [value])
+
+    @property
+    def codigo_cuaternario(self):
+        return next(iter(self._get_codigos(TipoCodigoArticulo.cuaternario)), None)
+
+    @codigo_cuaternario.setter
+    def codigo_cuaternario(self, value):
+        self._set_codigos(TipoCodigoArticulo.cuaternario, [value])
+
+    @property
+    def codigo_adicional(self):
+        return self._get_codigos(TipoCodigoArticulo.adicional)
+
+    @codigo_adicional.setter
+    def codigo_adicional(self, value):
+        self._set_codigos(TipoCodigoArticulo.adicional, value)
+
+    def _get_codigos(self, tipo: TipoCodigoArticulo) -> list:
+        """
+        Devuelve los códigos del tipo indicado, ordenados por prioridad.
+        """
+        codigos = sorted(self.codigos, key=lambda c: c.prioridad)
+        return [c.codigo for c in codigos if c.tipo == tipo]
+
+    def _set_codigos(self, tipo: TipoCodigoArticulo, valores: list):
+        """
+        Reemplaza los códigos del tipo indicado y recalcula las filas de `codigos`.
+
+        Un mismo código no puede repetirse en un artículo: se asigna al tipo de mayor
+        prioridad que lo solicite, sin importar el orden en que se asignen los campos.
+        Las filas existentes se reutilizan por código, de modo que intercambiar códigos
+        entre tipos no genera inserciones que violen el índice único.
+        """
+        solicitados = self.__dict__.get("_codigos_solicitados")
+        if solicitados is None:
+            solicitados = {t: self._get_codigos(t) for t in TipoCodigoArticulo}
+            self.__dict__["_codigos_solicitados"] = solicitados
+        solicitados[tipo] = [valor for valor in (valores or []) if valor]
+
+        asignados = {}
+        for t in sorted(TipoCodigoArticulo, key=PRIORIDAD_CODIGO.get):
+            prioridad = PRIORIDAD_CODIGO[t]
+            for valor in solicitados[t]:
+                if valor not in asignados:
+                    asignados[valor] = (t, prioridad)
+                    prioridad += 1
+
+        retirados = self.__dict__.setdefault("_codigos_retirados", {})
+        for codigo in list(self.codigos):
+            if codigo.codigo not in asignados:
+                self.codigos.remove(codigo)
+                retirados[codigo.codigo] = codigo
+
+        existentes = {c.codigo: c for c in self.codigos}
+        for valor, (t, prioridad) in asignados.items():
+            codigo = existentes.get(valor)
+            if codigo is None:
+                codigo = retirados.pop(valor, None)
+                if codigo is None or sa_inspect(codigo).was_deleted:
+                    codigo = ArticuloCodigo(codigo=valor)
+                self.codigos.append(codigo)
+            if codigo.tipo != t:
+                codigo.tipo = t
+            if codigo.prioridad != prioridad:
+                codigo.prioridad = prioridad
 
     def to_json_min(self):
         """
@@ -137,3 +244,33 @@ class Articulo(AuditMixin, SoftDeleteMixin, db.Model):
 
     def __str__(self):
         return f"{self.descripcion}"
+
+
+@event.listens_for(Articulo, "expire")
+def _reset_codigos_solicitados(target, attrs):
+    """
+    Descarta los códigos solicitados en memoria cuando se expira el artículo,
+    para que vuelvan a calcularse a partir de la base de datos.
+    """
+    if target is None:
+        # El artículo ya fue liberado y sólo queda su estado en la sesión
+        return
+    target.__dict__.pop("_codigos_solicitados", None)
+    target.__dict__.pop("_codigos_retirados", None)
+
+
+# Índice de búsqueda de texto completo (ver ArticuloSearchService). Se crea junto con
+# la tabla en SQLite; en bases existentes puede crearse con `flask rebuild_search_index`.
+event.listen(
+    Articulo.__table__,
+    "after_create",
+    DDL(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {ARTICULO_FTS_TABLE} "
+        "USING fts5(descripcion, codigos, tokenize='trigram')"
+    ).execute_if(dialect="sqlite"),
+)
+event.listen(
+    Articulo.__table__,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {ARTICULO_FTS_TABLE}").execute_if(dialect="sqlite"),
+)
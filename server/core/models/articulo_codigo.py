@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, Index
+from sqlalchemy.orm import relationship
+
+from server.config import db
+from server.core.models.enums import TipoCodigoArticulo
+
+
+class ArticuloCodigo(db.Model):
+    """
+    Modelo de datos para los códigos de barras de los artículos.
+
+    Cada fila representa un código de barras asociado a un artículo. El tipo indica
+    el rol del código (principal, secundario, etc.) y la prioridad define el orden
+    en que se presentan los códigos del artículo.
+    """
+
+    __tablename__ = "articulo_codigo"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    codigo = Column(String, nullable=False)
+    tipo = Column(Enum(TipoCodigoArticulo), nullable=False)
+    prioridad = Column(Integer, default=0, nullable=False)
+
+    # Relaciones con otras tablas
+    articulo_id = Column(
+        Integer, ForeignKey("articulo.id", ondelete="CASCADE"), nullable=False
+    )
+    articulo = relationship("Articulo", back_populates="codigos")
+
+    __table_args__ = (
+        Index("ix_articulo_codigo_codigo", "codigo", "articulo_id", unique=True),
+        Index("ix_articulo_codigo_articulo_id", "articulo_id"),
+    )
+
+    def __repr__(self):
+        return f"<ArticuloCodigo {self.codigo} - {self.tipo.name}>"
@@ -6,11 +6,16 @@ from sqlalchemy import (
     Numeric,
     Boolean,
     Date,
+    Index,
+    DDL,
+    event,
 )
 from sqlalchemy.orm import relationship
 from server.utils.utils import AuditMixin
 from server.config import db
 
+CLIENTE_FTS_TABLE = "cliente_fts"
+
 
 class Cliente(AuditMixin, db.Model):
     """
@@ -61,6 +66,13 @@ class Cliente(AuditMixin, db.Model):
     genero = relationship("Genero", backref="clientes")
     observacion = Column(String, nullable=True)
 
+    __table_args__ = (
+        # Búsqueda por prefijo del número de documento
+        Index("ix_cliente_nro_documento", "nro_documento"),
+        # Paginación por clave (razon_social, id)
+        Index("ix_cliente_razon_social_id", "razon_social", "id"),
+    )
+
     def __repr__(self):
         return f"<Cliente {self.razon_social} ({self.nro_documento})>"
 
@@ -129,3 +141,20 @@ class Cliente(AuditMixin, db.Model):
             "tributos": tributos,
             **self.get_audit_fields(),
         }
+
+
+# Índice de búsqueda de texto completo (ver ClienteSearchService). Se crea junto con
+# la tabla en SQLite; en bases existentes puede crearse con `flask rebuild_search_index`.
+event.listen(
+    Cliente.__table__,
+    "after_create",
+    DDL(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {CLIENTE_FTS_TABLE} "
+        "USING fts5(razon_social, nro_documento, tokenize='unicode61 remove_diacritics 2')"
+    ).execute_if(dialect="sqlite"),
+)
+event.listen(
+    Cliente.__table__,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {CLIENTE_FTS_TABLE}").execute_if(dialect="sqlite"),
+)
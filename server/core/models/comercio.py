@@ -10,6 +10,7 @@ from sqlalchemy import (
 from sqlalchemy.orm import relationship
 from server.utils.utils import AuditMixin
 from server.config import db
+from server.utils.reference_data import ReferenceDataMixin
 
 
 class Comercio(AuditMixin, db.Model):
@@ -62,7 +63,7 @@ class Comercio(AuditMixin, db.Model):
             **self.get_audit_fields(),
         }
 
-class PuntoVenta(db.Model):
+class PuntoVenta(ReferenceDataMixin, db.Model):
     """
     Modelo de datos para los puntos de venta.
     """
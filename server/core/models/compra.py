@@ -8,6 +8,7 @@ from sqlalchemy import (
     DateTime,
     func,
     Enum,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from server.utils.utils import AuditMixin, SoftDeleteMixin, QueryWithSoftDelete
@@ -60,6 +61,19 @@ class Compra(AuditMixin, SoftDeleteMixin, db.Model):
     )
     tipo_pago = relationship("TipoPago", backref="compras")
 
+    __table_args__ = (
+        # Listados paginados por clave (fecha_hora, id), filtrados por baja lógica
+        Index("ix_compra_deleted_fecha_hora_id", "deleted", "fecha_hora", "id"),
+        # Listados de órdenes
+        Index(
+            "ix_compra_estado_deleted_fecha_hora_id",
+            "estado",
+            "deleted",
+            "fecha_hora",
+            "id",
+        ),
+    )
+
     def nro_comprobante(self):
         """
         Devuelve el número de documento en formato 0000-00000000.
@@ -89,10 +103,9 @@ class Compra(AuditMixin, SoftDeleteMixin, db.Model):
         """
         iva_alicuotas = []
         for item in self.items:
-            alicuota = AlicuotaIVA.query.filter_by(porcentaje=item.alicuota_iva).first()
             iva_alicuotas.append(
                 {
-                    "Id": alicuota.codigo_afip,
+                    "Id": AlicuotaIVA.get_codigo_afip(item.alicuota_iva),
                     "BaseImp": item.subtotal_gravado,
                     "Importe": item.subtotal_iva,
                 }
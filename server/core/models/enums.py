@@ -12,6 +12,8 @@ class EstadoVenta(enum.Enum):
     facturado = "Facturado"
     anulado = "Anulado"
     ticket_mecanico = "Ticket Mecánico"
+    pendiente_cae = "Pendiente CAE"
+    error_cae = "Error CAE"
 
 
 class EstadoCompra(enum.Enum):
@@ -21,4 +23,27 @@ class EstadoCompra(enum.Enum):
 
     orden = "Orden"
     confirmada = "Confirmada"
-    anulada = "Anulada"
\ No newline at end of file
+    anulada = "Anulada"
+
+
+class EstadoTareaFacturacion(enum.Enum):
+    """
+    Enumeración para los estados de una tarea de la cola de facturación.
+    """
+
+    pendiente = "Pendiente"
+    en_proceso = "En proceso"
+    completada = "Completada"
+    error = "Error"
+
+
+class TipoCodigoArticulo(enum.Enum):
+    """
+    Enumeración para los tipos de código de barras de un artículo.
+    """
+
+    principal = "Principal"
+    secundario = "Secundario"
+    terciario = "Terciario"
+    cuaternario = "Cuaternario"
+    adicional = "Adicional"
@@ -7,6 +7,7 @@ from sqlalchemy import (
     String,
     DateTime,
     Enum,
+    Index,
     func,
 )
 from sqlalchemy.orm import relationship
@@ -51,6 +52,11 @@ class MovimientoStock(AuditMixin, db.Model):
     fecha_hora = Column(DateTime, default=func.now(), nullable=False)
     observacion = Column(String, nullable=True)
 
+    __table_args__ = (
+        # Listados paginados por clave (fecha_hora, id) y consultas por rango de fechas
+        Index("ix_movimiento_stock_fecha_hora_id", "fecha_hora", "id"),
+    )
+
     def to_json(self):
         return {
             "id": self.id,
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Numeric
+from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, Index
 from sqlalchemy.orm import relationship
 from server.config import db
 
@@ -24,6 +24,17 @@ class MovimientoStockItem(db.Model):
     )
     movimiento_stock = relationship("MovimientoStock", backref="items")
 
+    __table_args__ = (
+        # Historial de movimientos de un artículo
+        Index(
+            "ix_movimiento_stock_item_articulo_id_movimiento_stock_id",
+            "articulo_id",
+            "movimiento_stock_id",
+        ),
+        # Renglones de un movimiento
+        Index("ix_movimiento_stock_item_movimiento_stock_id", "movimiento_stock_id"),
+    )
+
     def to_json(self):
         return {
             "id": self.id,
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, Boolean, DateTime, JSON
+
+from server.config import db
+
+
+class PadronPersona(db.Model):
+    """
+    Modelo de datos para la cache de consultas al padrón A13 de AFIP.
+
+    Cada fila guarda el resultado de la última consulta de un CUIT: los datos de la
+    persona, o la indicación de que AFIP no la encontró (`encontrada` en falso). Las filas
+    se consideran vigentes durante un tiempo (ver PadronCache) a partir de `consultado_at`.
+    """
+
+    __tablename__ = "padron_persona"
+
+    cuit = Column(String, primary_key=True)
+    encontrada = Column(Boolean, nullable=False)
+    datos = Column(JSON, nullable=True)  # Ver AfipService.get_persona
+    error = Column(String, nullable=True)  # Mensaje de AFIP si no se encontró la persona
+    consultado_at = Column(DateTime, nullable=False)  # UTC
+
+    def __repr__(self):
+        return f"<PadronPersona {self.cuit}>"
@@ -1,11 +1,13 @@
+from decimal import Decimal
 from sqlalchemy import Column, Integer, String, Numeric, Boolean, Enum
 from sqlalchemy.orm import relationship
 from server.core.models.enums import EstadoVenta, EstadoCompra
+from server.utils.reference_data import ReferenceDataMixin, reference_data
 
 from server.config import db
 
 
-class Provincia(db.Model):
+class Provincia(ReferenceDataMixin, db.Model):
     __tablename__ = "provincia"
     __pluralname__ = "provincia"
 
@@ -20,7 +22,7 @@ class Provincia(db.Model):
         return {"value": self.id, "label": self.nombre}
 
 
-class Genero(db.Model):
+class Genero(ReferenceDataMixin, db.Model):
     __tablename__ = "genero"
     __pluralname__ = "genero"
 
@@ -34,7 +36,7 @@ class Genero(db.Model):
         return {"value": self.id, "label": self.nombre}
 
 
-class TipoDocumento(db.Model):
+class TipoDocumento(ReferenceDataMixin, db.Model):
     """
     Modelo de datos para los tipos de documentos.
 
@@ -60,7 +62,7 @@ class TipoDocumento(db.Model):
         return {"value": self.id, "label": self.descripcion}
 
 
-class TipoResponsable(db.Model):
+class TipoResponsable(ReferenceDataMixin, db.Model):
     """Tipo de responsable de IVA"""
 
     __tablename__ = "tipo_responsable"
@@ -93,7 +95,7 @@ class TipoResponsable(db.Model):
         return {"value": self.id, "label": self.descripcion}
 
 
-class TipoComprobante(db.Model):
+class TipoComprobante(ReferenceDataMixin, db.Model):
     """
     Modelo de datos para los tipos de comprobantes.
 
@@ -157,7 +159,7 @@ class TipoComprobante(db.Model):
         }
 
 
-class TipoConcepto(db.Model):
+class TipoConcepto(ReferenceDataMixin, db.Model):
     """
     Modelo de datos para los tipos de conceptos de comprobantes.
     Concepto del comprobante: 1 - Productos, 2 - Servicios, 3 - Productos y Servicios
@@ -184,7 +186,7 @@ class TipoConcepto(db.Model):
         return {"value": self.id, "label": self.descripcion}
 
 
-class TipoTributo(db.Model):
+class TipoTributo(ReferenceDataMixin, db.Model):
     """
     Modelo de datos para los tipos de tributos.
 
@@ -210,7 +212,7 @@ class TipoTributo(db.Model):
         return {"value": self.id, "label": self.descripcion}
 
 
-class TipoPago(db.Model):
+class TipoPago(ReferenceDataMixin, db.Model):
     __tablename__ = "tipo_pago"
     __pluralname__ = "tipo_pago"
 
@@ -235,7 +237,7 @@ class TipoPago(db.Model):
         return {"value": self.id, "label": self.nombre}
 
 
-class Moneda(db.Model):
+class Moneda(ReferenceDataMixin, db.Model):
     __tablename__ = "moneda"
     __pluralname__ = "moneda"
 
@@ -258,7 +260,7 @@ class Moneda(db.Model):
         return {"value": self.id, "label": self.nombre}
 
 
-class AlicuotaIVA(db.Model):
+class AlicuotaIVA(ReferenceDataMixin, db.Model):
     __tablename__ = "alicuota_iva"
     __pluralname__ = "alicuota_iva"
 
@@ -269,6 +271,34 @@ class AlicuotaIVA(db.Model):
     )  # Nombre de la alícuota ("21%", "10.5%", etc)
     porcentaje = Column(Numeric(precision=5, scale=2), nullable=False, unique=True)
 
+    # Mapa en memoria porcentaje -> código AFIP y versión del registro con la que se cargó
+    _codigos_afip = None
+    _codigos_afip_version = None
+
+    @classmethod
+    def get_codigo_afip(cls, porcentaje) -> int:
+        """
+        Devuelve el código AFIP de la alícuota con el porcentaje indicado.
+
+        Los códigos se resuelven desde un mapa en memoria que se carga con una única
+        consulta y se vuelve a cargar si cambió la versión del registro de datos de
+        referencia o si el porcentaje no se encuentra en él.
+        """
+        porcentaje = Decimal(str(porcentaje)).quantize(Decimal("0.01"))
+        if (
+            cls._codigos_afip is None
+            or cls._codigos_afip_version != reference_data.version
+            or porcentaje not in cls._codigos_afip
+        ):
+            cls._codigos_afip_version = reference_data.version
+            cls._codigos_afip = {
+                Decimal(str(p)).quantize(Decimal("0.01")): codigo_afip
+                for p, codigo_afip in db.session.query(cls.porcentaje, cls.codigo_afip)
+            }
+        if porcentaje not in cls._codigos_afip:
+            raise ValueError(f"No existe la alícuota de IVA del {porcentaje}%")
+        return cls._codigos_afip[porcentaje]
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -281,7 +311,7 @@ class AlicuotaIVA(db.Model):
         return {"value": self.porcentaje, "label": self.porcentaje}
 
 
-class TipoArticulo(db.Model):
+class TipoArticulo(ReferenceDataMixin, db.Model):
     __tablename__ = "tipo_articulo"
     __pluralname__ = "tipo_articulo"
 
@@ -295,7 +325,7 @@ class TipoArticulo(db.Model):
         return {"value": self.id, "label": self.nombre}
 
 
-class TipoUnidad(db.Model):
+class TipoUnidad(ReferenceDataMixin, db.Model):
     __tablename__ = "tipo_unidad"
     __pluralname__ = "tipo_unidad"
 
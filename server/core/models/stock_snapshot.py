@@ -0,0 +1,48 @@
+from sqlalchemy import Column, Integer, Numeric, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+
+from server.config import db
+
+
+class StockSnapshot(db.Model):
+    """
+    Modelo de datos para las fotos periódicas del stock de los artículos.
+
+    Cada fila guarda el stock de un artículo a la fecha y hora de corte `fecha_hora`
+    (hora local, como MovimientoStock.fecha_hora). El stock a una fecha se obtiene a partir
+    de la última foto anterior más los movimientos posteriores a ella (ver StockLedger),
+    sin recorrer el historial completo de movimientos del artículo.
+    """
+
+    __tablename__ = "stock_snapshot"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    fecha_hora = Column(DateTime, nullable=False)
+    stock = Column(Numeric(precision=10, scale=2), nullable=False)
+
+    # Relaciones con otras tablas
+    articulo_id = Column(
+        Integer, ForeignKey("articulo.id", ondelete="CASCADE"), nullable=False
+    )
+    articulo = relationship("Articulo")
+
+    __table_args__ = (
+        # Última foto de un artículo anterior a una fecha
+        Index(
+            "ix_stock_snapshot_articulo_id_fecha_hora",
+            "articulo_id",
+            "fecha_hora",
+            unique=True,
+        ),
+        Index("ix_stock_snapshot_fecha_hora", "fecha_hora"),
+    )
+
+    def to_json(self):
+        return {
+            "articulo_id": self.articulo_id,
+            "fecha_hora": self.fecha_hora.isoformat(),
+            "stock": float(self.stock),
+        }
+
+    def __repr__(self):
+        return f"<StockSnapshot {self.articulo_id} - {self.fecha_hora}>"
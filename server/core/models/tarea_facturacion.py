@@ -0,0 +1,55 @@
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, DateTime, Index, func
+from sqlalchemy.orm import relationship
+
+from server.config import db
+from server.core.models.enums import EstadoTareaFacturacion
+
+
+class TareaFacturacion(db.Model):
+    """
+    Modelo de datos para las tareas de la cola de facturación.
+
+    Cada fila representa la solicitud del CAE de una venta registrada como pendiente
+    de CAE. La tarea se procesa en segundo plano (ver FacturacionQueue) a partir de
+    `proximo_intento`, que se posterga ante cada intento fallido.
+    """
+
+    __tablename__ = "tarea_facturacion"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    estado = Column(
+        Enum(EstadoTareaFacturacion),
+        default=EstadoTareaFacturacion.pendiente,
+        nullable=False,
+    )
+    intentos = Column(Integer, default=0, nullable=False)
+    proximo_intento = Column(DateTime, nullable=False)  # UTC
+    error = Column(String, nullable=True)  # Último error obtenido
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+    updated_at = Column(
+        DateTime, default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    # Relaciones con otras tablas
+    venta_id = Column(
+        Integer, ForeignKey("venta.id", ondelete="CASCADE"), nullable=False, unique=True
+    )
+    venta = relationship("Venta")
+
+    __table_args__ = (
+        Index(
+            "ix_tarea_facturacion_estado_proximo_intento", "estado", "proximo_intento"
+        ),
+    )
+
+    def to_json(self):
+        return {
+            "venta_id": self.venta_id,
+            "estado": self.estado.value,
+            "intentos": self.intentos,
+            "proximo_intento": self.proximo_intento.isoformat(),
+            "error": self.error,
+        }
+
+    def __repr__(self):
+        return f"<TareaFacturacion {self.venta_id} - {self.estado.name}>"
@@ -3,6 +3,7 @@ from sqlalchemy import Column, String, Integer, Numeric, ForeignKey, Enum
 from sqlalchemy.orm import relationship
 
 from server.config import db
+from server.utils.reference_data import ReferenceDataMixin
 
 
 class BaseCalculo(enum.Enum):
@@ -14,7 +15,7 @@ class BaseCalculo(enum.Enum):
     bruto = "Bruto"
 
 
-class Tributo(db.Model):
+class Tributo(ReferenceDataMixin, db.Model):
     """
     Modelo de datos para los tributos adicionales al IVA.
 
@@ -8,6 +8,7 @@ from sqlalchemy import (
     DateTime,
     func,
     Enum,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from server.utils.utils import AuditMixin, SoftDeleteMixin, QueryWithSoftDelete
@@ -71,6 +72,21 @@ class Venta(AuditMixin, SoftDeleteMixin, db.Model):
         "Tributo", secondary="tributo_venta", back_populates="ventas"
     )
 
+    __table_args__ = (
+        # Listados paginados por clave (fecha_hora, id), filtrados por baja lógica
+        Index("ix_venta_deleted_fecha_hora_id", "deleted", "fecha_hora", "id"),
+        # Listados de órdenes
+        Index(
+            "ix_venta_estado_deleted_fecha_hora_id",
+            "estado",
+            "deleted",
+            "fecha_hora",
+            "id",
+        ),
+        # Reportes de ventas por vendedor
+        Index("ix_venta_created_by_fecha_hora", "created_by", "fecha_hora"),
+    )
+
     def nro_comprobante(self):
         """
         Devuelve el número de documento en formato 0000-00000000.
@@ -126,10 +142,9 @@ class Venta(AuditMixin, SoftDeleteMixin, db.Model):
         """
         iva_alicuotas = []
         for item in self.items:
-            alicuota = AlicuotaIVA.query.filter_by(porcentaje=item.alicuota_iva).first()
             iva_alicuotas.append(
                 {
-                    "Id": alicuota.codigo_afip,
+                    "Id": AlicuotaIVA.get_codigo_afip(item.alicuota_iva),
                     "BaseImp": item.subtotal_gravado,
                     "Importe": item.subtotal_iva,
                 }
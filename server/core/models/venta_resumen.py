@@ -0,0 +1,43 @@
+from sqlalchemy import Column, Date, Integer, Numeric, ForeignKey
+
+from server.config import db
+
+
+class VentaResumenArticulo(db.Model):
+    """
+    Modelo de datos para el resumen diario de las ventas de cada artículo.
+
+    Cada fila acumula la cantidad vendida y el subtotal de los renglones de las ventas
+    de un día (fecha local de Venta.fecha_hora). Sólo se consideran las ventas
+    confirmadas, no anuladas ni eliminadas (ver ResumenVentas).
+    """
+
+    __tablename__ = "venta_resumen_articulo"
+
+    fecha = Column(Date, primary_key=True)
+    articulo_id = Column(
+        Integer, ForeignKey("articulo.id", ondelete="CASCADE"), primary_key=True
+    )
+    cantidad = Column(Numeric(precision=12, scale=2), default=0, nullable=False)
+    total = Column(Numeric(precision=14, scale=2), default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<VentaResumenArticulo {self.fecha} - {self.articulo_id}>"
+
+
+class VentaResumenComprobante(db.Model):
+    """
+    Modelo de datos para el resumen diario de las ventas de cada tipo de comprobante.
+    """
+
+    __tablename__ = "venta_resumen_comprobante"
+
+    fecha = Column(Date, primary_key=True)
+    tipo_comprobante_id = Column(
+        Integer, ForeignKey("tipo_comprobante.id"), primary_key=True
+    )
+    ventas = Column(Integer, default=0, nullable=False)
+    total = Column(Numeric(precision=14, scale=2), default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<VentaResumenComprobante {self.fecha} - {self.tipo_comprobante_id}>"
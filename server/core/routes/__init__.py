@@ -6,3 +6,4 @@ from .comercio_route import comercio_bp
 from .movimiento_stock_route import movimiento_stock_bp
 from .proveedor_route import proveedor_bp
 from .venta_reports_route import venta_reports_bp
+from .monitoring_route import monitoring_bp
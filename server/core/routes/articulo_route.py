@@ -1,6 +1,14 @@
-from flask import Blueprint, jsonify, request, abort
+from datetime import datetime
+from flask import (
+    Blueprint,
+    Response,
+    jsonify,
+    request,
+    abort,
+    stream_with_context,
+)
 from flask_jwt_extended import jwt_required, current_user
-from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
 
 from server.config import db
 from server.core.models import (
@@ -12,13 +20,15 @@ from server.core.models import (
 )
 from server.auth.decorators import permission_required
 from server.core.controllers import ArticuloController
-from server.utils.utils import get_select_options
+from server.core.services import ArticuloSearchService, StockLedger
+from server.utils.utils import get_select_options, get_options_response
 from server.core.schemas import (
     ArticuloIndexSchema,
     ArticuloFormSchema,
     ArticuloDetailSchema,
 )
-from server.core.decorators import error_handler
+from server.core.decorators import error_handler, write_transaction
+from server.utils.pagination import KeysetPagination
 
 articulo_bp = Blueprint("articulo_bp", __name__)
 articulo_index_schema = ArticuloIndexSchema()
@@ -31,52 +41,58 @@ articulo_detail_schema = ArticuloDetailSchema()
 @permission_required(["articulo.view_all"])
 @error_handler()
 def index():
+    return _search_response()
+
+
+def _search_response():
+    "Página de la búsqueda de artículos indicada por `query`, `page` y `pageSize`"
     query = request.args.get("query", None, type=str)
-    articulos = []
-    if query:
-        search_terms = query.split()
-        conditions = []
-        for term in search_terms:
-            conditions.append(
-                or_(
-                    Articulo.codigo_principal.ilike(f"%{term}%"),
-                    Articulo.codigo_secundario.ilike(f"%{term}%"),
-                    Articulo.codigo_terciario.ilike(f"%{term}%"),
-                    Articulo.codigo_cuaternario.ilike(f"%{term}%"),
-                    Articulo.codigo_adicional.ilike(f"%{term}%"),
-                    Articulo.descripcion.ilike(f"%{term}%"),
-                )
-            )
+    page = request.args.get("page", 1, type=int)
+    page_size = request.args.get("pageSize", None, type=int)
 
-        if conditions:
-            articulos = (
-                Articulo.query.filter(and_(*conditions))
-                .order_by(Articulo.id.desc())
-                .all()
-            )
+    result = ArticuloSearchService.search(query, page=page, page_size=page_size)
 
     return (
-        jsonify({"articulos": articulo_index_schema.dump(articulos, many=True)}),
+        jsonify(
+            {
+                "articulos": articulo_index_schema.dump(result["articulos"], many=True),
+                "page": result["page"],
+                "page_size": result["page_size"],
+                "has_next": result["has_next"],
+            }
+        ),
         200,
     )
 
 
+@articulo_bp.route("/articulos/codigo/<string:codigo>", methods=["GET"])
+@jwt_required()
+@permission_required(["articulo.view_all"])
+@error_handler()
+def resolve_codigo(codigo):
+    articulos = ArticuloSearchService.find_by_codigo(codigo)
+    if not articulos:
+        return jsonify({"error": "Artículo no encontrado"}), 404
+    return jsonify({"articulos": articulo_index_schema.dump(articulos, many=True)}), 200
+
+
 @articulo_bp.route("/articulos/selector", methods=["GET"])
 @jwt_required()
 @permission_required(["articulo.view_all"])
 @error_handler()
 def selector():
-    articulos = Articulo.query.all()
-    return jsonify(articulo_index_schema.dump(articulos, many=True)), 200
+    # Selector de artículos del formulario de venta: misma búsqueda paginada del listado
+    return _search_response()
 
 
 @articulo_bp.route("/articulos/create", methods=["GET", "POST"])
+@write_transaction
 @jwt_required()
 @permission_required(["articulo.create"])
 @error_handler(session_rollback=True)
 def create():
     if request.method == "GET":
-        return jsonify(get_select_options([TipoArticulo, TipoUnidad])), 200
+        return get_options_response([TipoArticulo, TipoUnidad])
     if request.method == "POST":
         data = request.json
         data["created_by"] = current_user.id
@@ -86,6 +102,7 @@ def create():
 
 
 @articulo_bp.route("/articulos/<int:pk>/update", methods=["GET", "PUT"])
+@write_transaction
 @jwt_required()
 @permission_required(["articulo.update"])
 @error_handler(session_rollback=True)
@@ -116,7 +133,11 @@ def update(pk):
 def detail(pk):
     articulo: Articulo = Articulo.query.get_or_404(pk, "Artículo no encontrado")
     movimientos = (
-        MovimientoStock.query.join(MovimientoStockItem)
+        MovimientoStock.query.options(
+            joinedload(MovimientoStock.created_by_user),
+            joinedload(MovimientoStock.updated_by_user),
+        )
+        .join(MovimientoStockItem)
         .filter(MovimientoStockItem.articulo_id == pk)
         .order_by(MovimientoStock.fecha_hora.desc())
         .limit(20)
@@ -135,7 +156,99 @@ def detail(pk):
     )
 
 
+@articulo_bp.route("/articulos/<int:pk>/movimientos", methods=["GET"])
+@jwt_required()
+@permission_required(["articulo.view"])
+@error_handler()
+def movimientos(pk):
+    """
+    Historial de movimientos de stock del artículo, del más reciente al más antiguo,
+    paginado por clave sobre el índice (articulo_id, movimiento_stock_id).
+    """
+    Articulo.query.get_or_404(pk, "Artículo no encontrado")
+    cursor = request.args.get("cursor", None, type=str)
+    page_size = request.args.get("pageSize", 25, type=int)
+    total = request.args.get("total", None, type=str)
+
+    query = MovimientoStockItem.query.options(
+        joinedload(MovimientoStockItem.movimiento_stock)
+    ).filter(MovimientoStockItem.articulo_id == pk)
+    renglones = KeysetPagination(
+        query,
+        order_by=(MovimientoStockItem.movimiento_stock_id, MovimientoStockItem.id),
+        cursor=cursor,
+        per_page=page_size,
+        total=total,
+    )
+    return (
+        jsonify(
+            {
+                "movimientos": [
+                    {
+                        "movimiento_stock_id": x.movimiento_stock_id,
+                        "fecha_hora": x.movimiento_stock.fecha_hora.isoformat(),
+                        "tipo_movimiento": x.movimiento_stock.tipo_movimiento.name,
+                        "origen": x.movimiento_stock.origen.name,
+                        "observacion": x.movimiento_stock.observacion,
+                        "cantidad": float(x.cantidad),
+                        "stock_posterior": float(x.stock_posterior),
+                    }
+                    for x in renglones.items
+                ],
+                "total": renglones.total,
+                "next_cursor": renglones.next_cursor,
+            }
+        ),
+        200,
+    )
+
+
+@articulo_bp.route("/articulos/stock", methods=["GET"])
+@jwt_required()
+@permission_required(["articulo.view_all"])
+@error_handler()
+def stock_catalogo_al():
+    """
+    Stock de todos los artículos a la fecha indicada en el parámetro `fecha` (ISO 8601),
+    en formato CSV o JSON según el parámetro `formato` (por defecto, csv). La respuesta
+    se envía a medida que se calcula.
+    """
+    fecha = datetime.fromisoformat(request.args["fecha"])
+    formato = request.args.get("formato", "csv")
+    if formato not in StockLedger.FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato de exportación inválido: {formato}")
+    mimetype = "text/csv" if formato == "csv" else "application/json"
+    contenido = StockLedger.exportar_catalogo(db.session, fecha, formato)
+    return Response(
+        stream_with_context(contenido),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": (
+                f"attachment; filename=stock_{fecha.date().isoformat()}.{formato}"
+            )
+        },
+    )
+
+
+@articulo_bp.route("/articulos/<int:pk>/stock", methods=["GET"])
+@jwt_required()
+@permission_required(["articulo.view"])
+@error_handler()
+def stock_al(pk):
+    """
+    Stock del artículo a la fecha indicada en el parámetro `fecha` (ISO 8601).
+    """
+    Articulo.query.get_or_404(pk, "Artículo no encontrado")
+    fecha = datetime.fromisoformat(request.args["fecha"])
+    stock = StockLedger.stock_al(db.session, pk, fecha)
+    return (
+        jsonify({"articulo_id": pk, "fecha": fecha.isoformat(), "stock": float(stock)}),
+        200,
+    )
+
+
 @articulo_bp.route("/articulos/<int:pk>/delete", methods=["DELETE"])
+@write_transaction
 @jwt_required()
 @permission_required(["articulo.delete"])
 @error_handler(session_rollback=True)
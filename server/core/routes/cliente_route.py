@@ -13,10 +13,14 @@ from server.core.models import (
     Tributo,
 )
 from server.auth.decorators import permission_required
-from server.core.services import AfipService
-from server.utils.utils import get_select_options, get_datagrid_options
+from server.core.services import PadronCache, ClienteSearchService
+from server.utils.utils import (
+    get_select_options,
+    get_datagrid_options,
+    get_options_response,
+)
 from server.core.schemas import ClienteIndexSchema, ClienteFormSchema
-from server.core.decorators import error_handler
+from server.core.decorators import error_handler, write_transaction
 
 cliente_bp = Blueprint("cliente_bp", __name__)
 cliente_index_schema = ClienteIndexSchema()
@@ -29,13 +33,50 @@ cliente_form_schema = ClienteFormSchema()
 @error_handler()
 def index():
     """
-    Devuelve la lista de clientes.
+    Devuelve una página de clientes ordenada por razón social.
+
+    Query params:
+    - query: Texto a buscar en la razón social o el número de documento.
+    - cursor: Id del último cliente de la página anterior (ver `next_cursor`).
+    - pageSize: Cantidad de clientes por página.
+    """
+    result = ClienteSearchService.search(
+        request.args.get("query"),
+        cursor=request.args.get("cursor", type=int),
+        page_size=request.args.get("pageSize", type=int),
+    )
+    return (
+        jsonify(
+            {
+                "clientes": cliente_index_schema.dump(result["clientes"], many=True),
+                "next_cursor": result["next_cursor"],
+            }
+        ),
+        200,
+    )
+
+
+@cliente_bp.route("/clientes/typeahead", methods=["GET"])
+@jwt_required()
+@permission_required(["venta.create", "venta.update", "cliente.view_all"])
+@error_handler()
+def typeahead():
+    """
+    Devuelve las opciones de select de los clientes que coinciden con el texto
+    ingresado, para los formularios de comprobantes.
+
+    Query params:
+    - q: Texto a buscar en la razón social o el número de documento.
+    - limit: Cantidad máxima de opciones.
     """
-    clientes = Cliente.query.all()
-    return jsonify({"clientes": cliente_index_schema.dump(clientes, many=True)}), 200
+    clientes = ClienteSearchService.typeahead(
+        request.args.get("q"), limit=request.args.get("limit", type=int)
+    )
+    return jsonify({"clientes": clientes}), 200
 
 
 @cliente_bp.route("/clientes/create", methods=["GET", "POST"])
+@write_transaction
 @jwt_required()
 @permission_required(["cliente.create"])
 @error_handler(session_rollback=True)
@@ -48,23 +89,9 @@ def create():
     POST: Crea un nuevo cliente.
     """
     if request.method == "GET":
-        return (
-            jsonify(
-                {
-                    **get_select_options(
-                        [
-                            TipoDocumento,
-                            TipoResponsable,
-                            Genero,
-                            Provincia,
-                            TipoPago,
-                            Moneda,
-                        ]
-                    ),
-                    **get_datagrid_options([Tributo]),
-                }
-            ),
-            200,
+        return get_options_response(
+            [TipoDocumento, TipoResponsable, Genero, Provincia, TipoPago, Moneda],
+            [Tributo],
         )
     if request.method == "POST":
         data = request.json
@@ -77,6 +104,7 @@ def create():
 
 
 @cliente_bp.route("/clientes/<int:pk>/update", methods=["GET", "PUT"])
+@write_transaction
 @jwt_required()
 @permission_required(["cliente.update"])
 @error_handler(session_rollback=True)
@@ -129,8 +157,7 @@ def get_afip_data():
     """
 
     nro_documento: int = int(request.args.get("nro_documento"))
-    afip = AfipService()
-    res = afip.get_persona(nro_documento)
+    res = PadronCache.get_persona(db.session, nro_documento)
 
     return (
         jsonify(
@@ -4,9 +4,9 @@ from flask_jwt_extended import jwt_required, current_user
 from server.config import db
 from server.core.models import Comercio, TipoResponsable, Provincia
 from server.auth.decorators import permission_required
-from server.utils.utils import get_select_options
+from server.utils.utils import get_select_options, get_options_response
 from server.core.schemas import ComercioFormSchema, ComercioReadSchema
-from server.core.decorators import error_handler
+from server.core.decorators import error_handler, write_transaction
 
 comercio_bp = Blueprint("comercio_bp", __name__)
 comercio_schema = ComercioReadSchema()
@@ -24,12 +24,13 @@ def index():
 
 
 @comercio_bp.route("/comercios/create", methods=["GET", "POST"])
+@write_transaction
 @jwt_required()
 @permission_required("comercio.create")
 @error_handler(session_rollback=True)
 def create():
     if request.method == "GET":
-        return jsonify(get_select_options([TipoResponsable, Provincia])), 200
+        return get_options_response([TipoResponsable, Provincia])
     if request.method == "POST":
         data = request.json
         data["created_by"] = current_user.id
@@ -41,6 +42,7 @@ def create():
 
 
 @comercio_bp.route("/comercios/<int:pk>/update", methods=["GET", "PUT"])
+@write_transaction
 @jwt_required()
 @permission_required("comercio.update")
 @error_handler(session_rollback=True)
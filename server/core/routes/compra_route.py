@@ -2,8 +2,6 @@ from io import BytesIO
 from datetime import datetime, timedelta
 from flask import Blueprint, jsonify, request, send_file
 from flask_jwt_extended import jwt_required, current_user
-from flask_sqlalchemy.query import Query
-from flask_sqlalchemy.pagination import Pagination
 
 from server.core.models import (
     Compra,
@@ -17,7 +15,8 @@ from server.core.models import (
     CompraItem,
 )
 from server.config import db
-from server.utils.utils import get_select_options, get_datagrid_options
+from server.utils.pagination import KeysetPagination
+from server.utils.utils import get_options_response
 from server.auth.decorators import permission_required
 from server.core.controllers import CompraController
 from server.core.schemas import (
@@ -26,7 +25,8 @@ from server.core.schemas import (
     CompraDetailSchema,
     CompraItemSchema,
 )
-from server.core.decorators import error_handler
+from server.core.decorators import error_handler, write_transaction
+from server.utils.database import restart_write
 
 compra_bp = Blueprint("compra_bp", __name__)
 compra_index_schema = CompraIndexSchema()
@@ -42,8 +42,10 @@ compra_item_schema = CompraItemSchema()
 def index():
     fecha_desde = request.args.get("desde", None, type=str)
     fecha_hasta = request.args.get("hasta", None, type=str)
-    page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor", None, type=str)
+    page = request.args.get("page", None, type=int)
     page_size = request.args.get("pageSize", 25, type=int)
+    total = request.args.get("total", "cached", type=str)
 
     query = Compra.query
 
@@ -62,15 +64,20 @@ def index():
             <= datetime.fromisoformat(fecha_hasta) + timedelta(days=1, seconds=-1)
         )
 
-    query = query.order_by(Compra.fecha_hora.desc())
-
-    compras: Pagination = query.paginate(page=page, per_page=page_size)
+    compras: KeysetPagination = query.keyset_paginate(
+        order_by=(Compra.fecha_hora, Compra.id),
+        cursor=cursor,
+        per_page=page_size,
+        total=total,
+        page=page,
+    )
 
     return (
         jsonify(
             {
                 "compras": compra_index_schema.dump(compras.items, many=True),
                 "total": compras.total,
+                "next_cursor": compras.next_cursor,
             }
         ),
         200,
@@ -78,27 +85,14 @@ def index():
 
 
 @compra_bp.route("/compras/create", methods=["GET", "POST"])
+@write_transaction
 @jwt_required()
 @permission_required("compra.create")
 @error_handler(session_rollback=True)
 def create():
     if request.method == "GET":
-        return (
-            jsonify(
-                {
-                    **get_select_options(
-                        [
-                            Proveedor,
-                            Moneda,
-                            PuntoVenta,
-                            TipoComprobante,
-                            TipoPago,
-                            AlicuotaIVA,
-                        ]
-                    ),
-                }
-            ),
-            200,
+        return get_options_response(
+            [Proveedor, Moneda, PuntoVenta, TipoComprobante, TipoPago, AlicuotaIVA]
         )
     if request.method == "POST":
         data = request.json
@@ -109,29 +103,16 @@ def create():
 
 
 @compra_bp.route("/compras/<int:pk>/update", methods=["GET", "PUT"])
+@write_transaction
 @jwt_required()
 @permission_required("compra.update")
 @error_handler(session_rollback=True)
 def update(pk):
     compra: Compra = db.session.query(Compra).get_or_404(pk, "Compra no encontrada")
     if request.method == "GET":
-        return (
-            jsonify(
-                {
-                    **get_select_options(
-                        [
-                            Proveedor,
-                            Moneda,
-                            PuntoVenta,
-                            TipoComprobante,
-                            TipoPago,
-                            AlicuotaIVA,
-                        ]
-                    ),
-                    "compra": compra_form_schema.dump(compra),
-                }
-            ),
-            200,
+        return get_options_response(
+            [Proveedor, Moneda, PuntoVenta, TipoComprobante, TipoPago, AlicuotaIVA],
+            extra={"compra": compra_form_schema.dump(compra)},
         )
     if request.method == "PUT":
         data = request.json
@@ -160,10 +141,12 @@ def detail(pk):
         data = request.json
         match data["action"]:
             case "anular":
+                restart_write(db.session)
                 compra.updated_by = current_user.id
                 compra_id, message = CompraController.anular(compra)
                 return jsonify({"compra_id": compra_id, "message": message}), 200
     if request.method == "DELETE":
+        restart_write(db.session)
         if compra.is_deleted():
             return jsonify({"error": "La compra ya fue eliminada"}), 400
         compra.delete()
@@ -177,8 +160,10 @@ def detail(pk):
 def index_orden():
     fecha_desde = request.args.get("desde")
     fecha_hasta = request.args.get("hasta")
-    page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor", None, type=str)
+    page = request.args.get("page", None, type=int)
     page_size = request.args.get("pageSize", 25, type=int)
+    total = request.args.get("total", "cached", type=str)
 
     query = Compra.query.filter_by(estado="orden")
 
@@ -197,15 +182,20 @@ def index_orden():
             <= datetime.fromisoformat(fecha_hasta) + timedelta(days=1, seconds=-1)
         )
 
-    query = query.order_by(Compra.fecha_hora.desc())
-
-    compras: Pagination = query.paginate(page=page, per_page=page_size)
+    compras: KeysetPagination = query.keyset_paginate(
+        order_by=(Compra.fecha_hora, Compra.id),
+        cursor=cursor,
+        per_page=page_size,
+        total=total,
+        page=page,
+    )
 
     return (
         jsonify(
             {
                 "compras": compra_index_schema.dump(compras.items, many=True),
                 "total": compras.total,
+                "next_cursor": compras.next_cursor,
             }
         ),
         200,
@@ -213,26 +203,13 @@ def index_orden():
 
 
 @compra_bp.route("/compras-orden/create", methods=["GET", "POST"])
+@write_transaction
 @jwt_required()
 @error_handler(session_rollback=True)
 def create_orden():
     if request.method == "GET":
-        return (
-            jsonify(
-                {
-                    **get_select_options(
-                        [
-                            Proveedor,
-                            Moneda,
-                            PuntoVenta,
-                            TipoComprobante,
-                            TipoPago,
-                            AlicuotaIVA,
-                        ]
-                    ),
-                }
-            ),
-            200,
+        return get_options_response(
+            [Proveedor, Moneda, PuntoVenta, TipoComprobante, TipoPago, AlicuotaIVA]
         )
     if request.method == "POST":
         data = request.json
@@ -243,6 +220,7 @@ def create_orden():
 
 
 @compra_bp.route("/compras-orden/<int:pk>/update", methods=["GET", "PUT"])
+@write_transaction
 @jwt_required()
 @error_handler(session_rollback=True)
 def update_orden(pk):
@@ -250,23 +228,9 @@ def update_orden(pk):
     if compra.estado != EstadoCompra.orden:
         return jsonify({"error": "Solo se pueden editar órdenes de compra"}), 400
     if request.method == "GET":
-        return (
-            jsonify(
-                {
-                    **get_select_options(
-                        [
-                            Proveedor,
-                            Moneda,
-                            PuntoVenta,
-                            TipoComprobante,
-                            TipoPago,
-                            AlicuotaIVA,
-                        ]
-                    ),
-                    "compra": compra_form_schema.dump(compra),
-                }
-            ),
-            200,
+        return get_options_response(
+            [Proveedor, Moneda, PuntoVenta, TipoComprobante, TipoPago, AlicuotaIVA],
+            extra={"compra": compra_form_schema.dump(compra)},
         )
     if request.method == "PUT":
         data = request.json
@@ -277,6 +241,7 @@ def update_orden(pk):
 
 
 @compra_bp.route("/compras-orden/<int:pk>/delete", methods=["DELETE"])
+@write_transaction
 @jwt_required()
 @error_handler(session_rollback=True)
 def delete_orden(pk):
@@ -0,0 +1,18 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+
+from server.auth.decorators import permission_required
+from server.utils.reference_data import reference_data
+
+monitoring_bp = Blueprint("monitoring_bp", __name__)
+
+
+@monitoring_bp.route("/monitoring/cache", methods=["GET"])
+@jwt_required()
+@permission_required([])  # Sólo superusuarios
+def cache():
+    """
+    Devuelve el estado del registro de datos de referencia: versión, cantidad de
+    entradas y contadores de aciertos y fallos.
+    """
+    return jsonify({"reference_data": reference_data.stats()}), 200
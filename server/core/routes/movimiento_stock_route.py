@@ -1,11 +1,14 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, current_user
+from sqlalchemy.orm import joinedload
 
 from server.core.models import MovimientoStock, MovimientoStockItem
 from server.core.models.movimiento_stock import TipoMovimiento, OrigenMovimiento
 from server.auth.models import Usuario
 from server.auth.decorators import permission_required
 from server.core.controllers import MovimientoStockController
+from server.core.decorators import error_handler, write_transaction
+from server.utils.pagination import KeysetPagination
 
 movimiento_stock_bp = Blueprint("movimiento_stock_bp", __name__)
 
@@ -22,13 +25,39 @@ def get_select_options():
 @movimiento_stock_bp.route("/movimientos-stock", methods=["GET"])
 @jwt_required()
 @permission_required(["movimiento_stock.view_all"])
+@error_handler()
 def index():
-    movimientos = MovimientoStock.query.all()
-    movimientos_json = list(map(lambda x: x.to_json(), movimientos))
-    return jsonify({"movimientos": movimientos_json}), 200
+    cursor = request.args.get("cursor", None, type=str)
+    page = request.args.get("page", None, type=int)
+    page_size = request.args.get("pageSize", 25, type=int)
+    total = request.args.get("total", "cached", type=str)
+
+    query = MovimientoStock.query.options(
+        joinedload(MovimientoStock.created_by_user),
+        joinedload(MovimientoStock.updated_by_user),
+    )
+    movimientos = KeysetPagination(
+        query,
+        order_by=(MovimientoStock.fecha_hora, MovimientoStock.id),
+        cursor=cursor,
+        per_page=page_size,
+        total=total,
+        page=page,
+    )
+    return (
+        jsonify(
+            {
+                "movimientos": [x.to_json() for x in movimientos.items],
+                "total": movimientos.total,
+                "next_cursor": movimientos.next_cursor,
+            }
+        ),
+        200,
+    )
 
 
 @movimiento_stock_bp.route("/movimientos-stock/create", methods=["GET", "POST"])
+@write_transaction
 @jwt_required()
 @permission_required(["movimiento_stock.create"])
 def create():
@@ -42,13 +71,18 @@ def create():
 
 
 @movimiento_stock_bp.route("/movimientos-stock/<int:pk>", methods=["GET", "DELETE"])
+@write_transaction
 @jwt_required()
 @permission_required(["movimiento_stock.view"])
 def detail(pk):
     movimiento = MovimientoStock.query.get_or_404(
         pk, "No se encontró el movimiento de stock solicitado."
     )
-    movimiento_items = MovimientoStockItem.query.filter_by(movimiento_stock_id=pk).all()
+    movimiento_items = (
+        MovimientoStockItem.query.options(joinedload(MovimientoStockItem.articulo))
+        .filter_by(movimiento_stock_id=pk)
+        .all()
+    )
     if request.method == "GET":
         return (
             jsonify(
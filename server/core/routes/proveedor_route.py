@@ -4,8 +4,9 @@ from flask_jwt_extended import jwt_required, current_user
 from server.config import db
 from server.core.models import Proveedor, TipoDocumento, TipoResponsable, Provincia
 from server.auth.decorators import permission_required
-from server.core.services import AfipService
-from server.utils.utils import get_select_options
+from server.core.decorators import write_transaction
+from server.core.services import PadronCache
+from server.utils.utils import get_select_options, get_options_response
 from server.core.schemas import ProveedorSchema, ProveedorFormSchema
 
 proveedor_bp = Blueprint("proveedor_bp", __name__)
@@ -26,6 +27,7 @@ def index():
 
 
 @proveedor_bp.route("/proveedores/create", methods=["GET", "POST"])
+@write_transaction
 @jwt_required()
 @permission_required("proveedor.create")
 def create():
@@ -37,10 +39,7 @@ def create():
     POST: Crea un nuevo proveedor.
     """
     if request.method == "GET":
-        return (
-            jsonify(get_select_options([TipoDocumento, TipoResponsable, Provincia])),
-            200,
-        )
+        return get_options_response([TipoDocumento, TipoResponsable, Provincia])
     if request.method == "POST":
         data = request.json
         try:
@@ -59,6 +58,7 @@ def create():
 
 
 @proveedor_bp.route("/proveedores/<int:pk>/update", methods=["GET", "PUT"])
+@write_transaction
 @jwt_required()
 @permission_required("proveedor.update")
 def update(pk):
@@ -107,6 +107,7 @@ def detail(pk):
 
 
 @proveedor_bp.route("/proveedores/<int:pk>/delete", methods=["DELETE"])
+@write_transaction
 @jwt_required()
 @permission_required("proveedor.delete")
 def delete(pk):
@@ -137,8 +138,7 @@ def get_afip_data():
     """
     try:
         nro_documento: int = int(request.args.get("nro_documento"))
-        afip = AfipService()
-        res = afip.get_persona(nro_documento)
+        res = PadronCache.get_persona(db.session, nro_documento)
 
         return (
             jsonify(
@@ -1,17 +1,39 @@
-from datetime import datetime, timedelta
+import pytz
+from datetime import date, datetime
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required
-from sqlalchemy import func
 
-from server.core.models import Venta, VentaItem, Articulo
+from server.config import db
+from server.core.models import Venta
 from server.auth.decorators import permission_required
 from server.core.schemas import (
     VentaIndexSchema,
 )
 from server.core.decorators import error_handler
+from server.core.services import ResumenVentas
+from server.utils.pagination import KeysetPagination
 
 venta_reports_bp = Blueprint("venta_reports_bp", __name__)
 venta_index_schema = VentaIndexSchema()
+local_tz = pytz.timezone("America/Argentina/Buenos_Aires")
+
+
+def _fecha(valor: str) -> date | None:
+    "Fecha local de un valor ISO 8601, que puede incluir la zona horaria"
+    if not valor:
+        return None
+    fecha = datetime.fromisoformat(valor)
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(local_tz)
+    return fecha.date()
+
+
+def _fechas(args) -> tuple:
+    """
+    Devuelve las fechas de los parámetros `desde` y `hasta` (ISO 8601), o None si no
+    se indican.
+    """
+    return _fecha(args.get("desde", None)), _fecha(args.get("hasta", None))
 
 
 @venta_reports_bp.route("/ventas/reporte-ventas/por-vendedor", methods=["POST"])
@@ -19,38 +41,43 @@ venta_index_schema = VentaIndexSchema()
 @permission_required("venta.view_all")
 @error_handler()
 def reporte_ventas_por_vendedor():
+    """
+    Totales de las ventas de uno o varios vendedores (`usuario_ids`, o `usuario_id`),
+    calculados en la base de datos: en total, por vendedor, por período (`agrupacion`:
+    dia, semana o mes), por tipo de comprobante y por estado. Con `detalle`, incluye
+    además una página de las ventas (parámetros `cursor` y `pageSize`).
+    """
     data = request.get_json()
-    fecha_desde = data.get("desde", None)
-    fecha_hasta = data.get("hasta", None)
-    usuario_id = data.get("usuario_id")
-    tipo_comprobante_ids: list[int] = data.get("tipo_comprobante_ids")
-
-    query = Venta.query
-
-    if fecha_desde and fecha_hasta:
-        query = query.filter(
-            Venta.fecha_hora.between(
-                datetime.fromisoformat(fecha_desde),
-                datetime.fromisoformat(fecha_hasta) + timedelta(days=1, seconds=-1),
+    desde, hasta = _fechas(data)
+    usuario_ids = data.get("usuario_ids") or [data.get("usuario_id")]
+    filtros = {
+        "desde": desde,
+        "hasta": hasta,
+        "tipo_comprobante_ids": data.get("tipo_comprobante_ids"),
+        "estados": data.get("estados"),
+    }
+
+    res = ResumenVentas.por_vendedor(
+        db.session, usuario_ids, data.get("agrupacion", "dia"), **filtros
+    )
+    if not res["resumen"]["ventas"]:
+        return jsonify({"error": "No se encontraron ventas"}), 404
+
+    if data.get("detalle"):
+        ventas: KeysetPagination = (
+            Venta.query.options(*VentaIndexSchema.load_options)
+            .filter(*ResumenVentas.filtros_vendedor(usuario_ids, **filtros))
+            .keyset_paginate(
+                order_by=(Venta.fecha_hora, Venta.id),
+                cursor=data.get("cursor"),
+                per_page=data.get("pageSize", 100),
+                total=None,
             )
         )
-    elif fecha_desde:
-        query = query.filter(Venta.fecha_hora >= datetime.fromisoformat(fecha_desde))
-    elif fecha_hasta:
-        query = query.filter(
-            Venta.fecha_hora
-            <= datetime.fromisoformat(fecha_hasta) + timedelta(days=1, seconds=-1)
-        )
+        res["ventas"] = venta_index_schema.dump(ventas.items, many=True)
+        res["next_cursor"] = ventas.next_cursor
 
-    ventas = query.filter(
-        Venta.created_by == usuario_id,
-        Venta.tipo_comprobante_id.in_(tipo_comprobante_ids),
-    ).all()
-
-    if not ventas:
-        return jsonify({"error": "No se encontraron ventas"}), 404
-
-    return jsonify({"ventas": venta_index_schema.dump(ventas, many=True)})
+    return jsonify(res)
 
 
 @venta_reports_bp.route("/ventas/reporte-ventas/articulos-mas-vendidos", methods=["GET"])
@@ -58,43 +85,11 @@ def reporte_ventas_por_vendedor():
 @permission_required("venta.view_all")
 @error_handler()
 def articulos_mas_vendidos():
-    fecha_desde = request.args.get("desde", None)
-    fecha_hasta = request.args.get("hasta", None)
+    desde, hasta = _fechas(request.args)
     limite = request.args.get("limite", 10, type=int)
 
-    # Query base que agrupa por artículo y suma cantidades
-    query = (
-        VentaItem.query
-        .join(Venta)
-        .join(Articulo)
-        .with_entities(
-            Articulo.id,
-            Articulo.codigo_principal,
-            Articulo.descripcion,
-            func.sum(VentaItem.cantidad).label("cantidad_total"),
-            func.sum(VentaItem.subtotal).label("total_vendido")
-        )
-        .group_by(Articulo.id, Articulo.codigo_principal, Articulo.descripcion)
-    )
-
-    # Aplicar filtros de fecha
-    if fecha_desde and fecha_hasta:
-        query = query.filter(
-            Venta.fecha_hora.between(
-                datetime.fromisoformat(fecha_desde),
-                datetime.fromisoformat(fecha_hasta) + timedelta(days=1, seconds=-1),
-            )
-        )
-    elif fecha_desde:
-        query = query.filter(Venta.fecha_hora >= datetime.fromisoformat(fecha_desde))
-    elif fecha_hasta:
-        query = query.filter(
-            Venta.fecha_hora
-            <= datetime.fromisoformat(fecha_hasta) + timedelta(days=1, seconds=-1)
-        )
-
-    # Ordenar por cantidad vendida y aplicar límite
-    resultados = query.order_by(func.sum(VentaItem.cantidad).desc()).limit(limite).all()
+    # Los días cerrados se leen de los resúmenes diarios (ver ResumenVentas)
+    resultados = ResumenVentas.articulos_mas_vendidos(db.session, desde, hasta, limite)
 
     # Formatear resultados
     articulos = [
@@ -113,3 +108,26 @@ def articulos_mas_vendidos():
         "total": len(articulos),
         "limite": limite
     })
+
+
+@venta_reports_bp.route("/ventas/reporte-ventas/por-comprobante", methods=["GET"])
+@jwt_required()
+@permission_required("venta.view_all")
+@error_handler()
+def reporte_ventas_por_comprobante():
+    desde, hasta = _fechas(request.args)
+    resultados = ResumenVentas.por_comprobante(db.session, desde, hasta)
+    comprobantes = [
+        {
+            "tipo_comprobante_id": r.id,
+            "descripcion": r.descripcion,
+            "ventas": int(r.ventas),
+            "total": float(r.total),
+        }
+        for r in resultados
+    ]
+    return jsonify({
+        "comprobantes": comprobantes,
+        "ventas": sum(c["ventas"] for c in comprobantes),
+        "total": sum(c["total"] for c in comprobantes),
+    })
@@ -1,9 +1,14 @@
 from io import BytesIO
-from datetime import datetime, timedelta
-from flask import Blueprint, jsonify, request, send_file
+from datetime import date, datetime, timedelta
+from flask import (
+    Blueprint,
+    Response,
+    jsonify,
+    request,
+    send_file,
+    stream_with_context,
+)
 from flask_jwt_extended import jwt_required, current_user
-from flask_sqlalchemy.query import Query
-from flask_sqlalchemy.pagination import Pagination
 
 from server.core.models import (
     Venta,
@@ -18,8 +23,14 @@ from server.core.models import (
     VentaItem,
 )
 from server.config import db
-from server.utils.utils import get_select_options, get_datagrid_options
-from server.core.services import A4PDFGenerator, TicketPDFGenerator
+from server.utils.pagination import KeysetPagination
+from server.utils.utils import get_options_response
+from server.core.services import (
+    ExportacionPDF,
+    FacturacionQueue,
+    PDFCache,
+    TicketEscPosGenerator,
+)
 from server.auth.decorators import permission_required
 from server.core.controllers import VentaController
 from server.core.schemas import (
@@ -28,7 +39,8 @@ from server.core.schemas import (
     VentaDetailSchema,
     VentaItemSchema,
 )
-from server.core.decorators import error_handler
+from server.core.decorators import error_handler, write_transaction
+from server.utils.database import restart_write
 
 venta_bp = Blueprint("venta_bp", __name__)
 venta_index_schema = VentaIndexSchema()
@@ -37,6 +49,45 @@ venta_detail_schema = VentaDetailSchema()
 venta_item_schema = VentaItemSchema()
 
 
+def _cliente_options(venta: Venta = None) -> list:
+    """
+    Opciones iniciales del select de clientes de los formularios de venta: el cliente de
+    la venta o, en una venta nueva, el primer cliente registrado (consumidor final). Las
+    demás opciones se buscan a medida que se escribe (ver /clientes/typeahead).
+    """
+    cliente = venta.cliente if venta else Cliente.query.order_by(Cliente.id).first()
+    return [cliente.to_select_dict()] if cliente else []
+
+
+def _send_pdf(venta: Venta, size: str):
+    """
+    Envía el comprobante de la venta (ver PDFCache), con las cabeceras ETag y
+    Last-Modified para que el cliente pueda reutilizar una copia ya descargada.
+    """
+    pdf, etag, modificado = PDFCache.get_pdf(venta, size)
+    return send_file(
+        BytesIO(pdf) if isinstance(pdf, bytes) else pdf,
+        as_attachment=True,
+        download_name=f"venta_{venta.numero}.pdf",
+        mimetype="application/pdf",
+        etag=etag,
+        last_modified=modificado,
+    )
+
+
+def _send_escpos(venta: Venta):
+    "Envía el ticket de la venta en comandos ESC/POS, para impresoras térmicas"
+    buffer = BytesIO()
+    TicketEscPosGenerator(buffer).generate(venta)
+    buffer.seek(0)
+    return send_file(
+        buffer,
+        as_attachment=True,
+        download_name=f"venta_{venta.numero}.bin",
+        mimetype=TicketEscPosGenerator.MIMETYPE,
+    )
+
+
 @venta_bp.route("/ventas", methods=["GET"])
 @jwt_required()
 @permission_required("venta.view_all")
@@ -44,10 +95,12 @@ venta_item_schema = VentaItemSchema()
 def index():
     fecha_desde = request.args.get("desde", None, type=str)
     fecha_hasta = request.args.get("hasta", None, type=str)
-    page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor", None, type=str)
+    page = request.args.get("page", None, type=int)
     page_size = request.args.get("pageSize", 25, type=int)
+    total = request.args.get("total", "cached", type=str)
 
-    query = Venta.query
+    query = Venta.query.options(*VentaIndexSchema.load_options)
 
     if fecha_desde and fecha_hasta:
         query = query.filter(
@@ -64,9 +117,13 @@ def index():
             <= datetime.fromisoformat(fecha_hasta) + timedelta(days=1, seconds=-1)
         )
 
-    query = query.order_by(Venta.fecha_hora.desc())
-
-    ventas: Pagination = query.paginate(page=page, per_page=page_size)
+    ventas: KeysetPagination = query.keyset_paginate(
+        order_by=(Venta.fecha_hora, Venta.id),
+        cursor=cursor,
+        per_page=page_size,
+        total=total,
+        page=page,
+    )
 
     if not ventas.items:
         return jsonify({"error": "No se encontraron ventas"}), 404
@@ -76,6 +133,7 @@ def index():
             {
                 "ventas": venta_index_schema.dump(ventas.items, many=True),
                 "total": ventas.total,
+                "next_cursor": ventas.next_cursor,
             }
         ),
         200,
@@ -83,28 +141,16 @@ def index():
 
 
 @venta_bp.route("/ventas/create", methods=["GET", "POST"])
+@write_transaction
 @jwt_required()
 @permission_required("venta.create")
 @error_handler(session_rollback=True)
 def create():
     if request.method == "GET":
-        return (
-            jsonify(
-                {
-                    **get_select_options(
-                        [
-                            Cliente,
-                            Moneda,
-                            PuntoVenta,
-                            TipoComprobante,
-                            TipoPago,
-                            AlicuotaIVA,
-                        ]
-                    ),
-                    **get_datagrid_options([Tributo]),
-                }
-            ),
-            200,
+        return get_options_response(
+            [Moneda, PuntoVenta, TipoComprobante, TipoPago, AlicuotaIVA],
+            [Tributo],
+            extra={"clientes": _cliente_options()},
         )
     if request.method == "POST":
         data = request.json
@@ -115,30 +161,20 @@ def create():
 
 
 @venta_bp.route("/ventas/<int:pk>/update", methods=["GET", "PUT"])
+@write_transaction
 @jwt_required()
 @permission_required("venta.update")
 @error_handler(session_rollback=True)
 def update(pk):
     venta: Venta = db.session.query(Venta).get_or_404(pk, "Venta no encontrada")
     if request.method == "GET":
-        return (
-            jsonify(
-                {
-                    **get_select_options(
-                        [
-                            Cliente,
-                            Moneda,
-                            PuntoVenta,
-                            TipoComprobante,
-                            TipoPago,
-                            AlicuotaIVA,
-                        ]
-                    ),
-                    **get_datagrid_options([Tributo]),
-                    "venta": venta_form_schema.dump(venta),
-                }
-            ),
-            200,
+        return get_options_response(
+            [Moneda, PuntoVenta, TipoComprobante, TipoPago, AlicuotaIVA],
+            [Tributo],
+            extra={
+                "clientes": _cliente_options(venta),
+                "venta": venta_form_schema.dump(venta),
+            },
         )
     if request.method == "PUT":
         data = request.json
@@ -153,7 +189,11 @@ def update(pk):
 @permission_required("venta.view")
 @error_handler()
 def detail(pk):
-    venta: Venta = db.session.query(Venta).get_or_404(pk, "Venta no encontrada")
+    venta: Venta = (
+        db.session.query(Venta)
+        .options(*VentaDetailSchema.load_options)
+        .get_or_404(pk, "Venta no encontrada")
+    )
     if request.method == "GET":
         return (
             jsonify(
@@ -167,26 +207,90 @@ def detail(pk):
         data = request.json
         match data["action"]:
             case "print":
-                size = data["size"]
-                buffer = BytesIO()
-                if size == "A4":
-                    c = A4PDFGenerator(buffer)
-                    c.generate_pdf(venta)
-                    buffer.seek(0)
-                else:
-                    c = TicketPDFGenerator(buffer)
-                    c.generate_pdf(venta)
-                    buffer.seek(0)
-                return send_file(
-                    buffer,
-                    as_attachment=True,
-                    download_name=f"venta_{venta.numero}.pdf",
-                    mimetype="application/pdf",
-                )
+                if data["size"] == TicketEscPosGenerator.SIZE:
+                    return _send_escpos(venta)
+                return _send_pdf(venta, data["size"])
             case "anular":
+                # La impresión no escribe: el bloqueo se reserva sólo para anular
+                restart_write(db.session)
                 venta.updated_by = current_user.id
                 venta_id, message = VentaController.anular(venta)
                 return jsonify({"venta_id": venta_id, "message": message}), 201
+            case "reencolar":
+                restart_write(db.session)
+                venta.updated_by = current_user.id
+                FacturacionQueue.reencolar(venta, db.session)
+                db.session.commit()
+                FacturacionQueue.notificar()
+                return jsonify(FacturacionQueue.estado(venta)), 200
+
+
+@venta_bp.route("/ventas/<int:pk>/pdf", methods=["GET"])
+@jwt_required()
+@permission_required("venta.view")
+@error_handler()
+def pdf(pk):
+    """
+    Comprobante de la venta en el tamaño indicado en el parámetro `size` (A4 o
+    ticket). Responde 304 si el comprobante no cambió desde la copia del cliente
+    (If-None-Match o If-Modified-Since).
+    """
+    venta: Venta = (
+        db.session.query(Venta)
+        .options(*VentaDetailSchema.load_options)
+        .get_or_404(pk, "Venta no encontrada")
+    )
+    return _send_pdf(venta, request.args.get("size", "A4"))
+
+
+@venta_bp.route("/ventas/comprobantes", methods=["GET"])
+@jwt_required()
+@permission_required("venta.view_all")
+@error_handler()
+def exportar_comprobantes():
+    """
+    Comprobantes de las ventas entre las fechas `desde` y `hasta` (inclusive), en un
+    único PDF o en un archivo ZIP con un PDF por venta según el parámetro `formato`
+    (por defecto, pdf). Opcionalmente se filtran por `tipo_comprobante_id`,
+    `punto_venta_id` y `estado` (repetibles). La respuesta se envía a medida que se
+    generan los comprobantes (ver ExportacionPDF).
+    """
+    desde = date.fromisoformat(request.args["desde"])
+    hasta = date.fromisoformat(request.args["hasta"])
+    formato = request.args.get("formato", "pdf")
+    contenido = ExportacionPDF.exportar(
+        db.session,
+        formato,
+        request.args.get("size", "A4"),
+        desde=desde,
+        hasta=hasta,
+        tipo_comprobante_ids=request.args.getlist("tipo_comprobante_id", type=int),
+        punto_venta_ids=request.args.getlist("punto_venta_id", type=int),
+        estados=request.args.getlist("estado") or None,
+    )
+    return Response(
+        stream_with_context(contenido),
+        mimetype="application/pdf" if formato == "pdf" else "application/zip",
+        headers={
+            "Content-Disposition": (
+                f"attachment; filename=comprobantes_{desde.isoformat()}_"
+                f"{hasta.isoformat()}.{formato}"
+            )
+        },
+    )
+
+
+@venta_bp.route("/ventas/<int:pk>/facturacion", methods=["GET"])
+@jwt_required()
+@permission_required("venta.view")
+@error_handler()
+def facturacion(pk):
+    """
+    Estado de la facturación de la venta. Los clientes consultan este endpoint mientras
+    la venta se encuentra pendiente de CAE (ver FacturacionQueue).
+    """
+    venta: Venta = db.session.query(Venta).get_or_404(pk, "Venta no encontrada")
+    return jsonify(FacturacionQueue.estado(venta)), 200
 
 
 @venta_bp.route("/ventas-orden", methods=["GET"])
@@ -195,10 +299,14 @@ def detail(pk):
 def index_orden():
     fecha_desde = request.args.get("desde")
     fecha_hasta = request.args.get("hasta")
-    page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor", None, type=str)
+    page = request.args.get("page", None, type=int)
     page_size = request.args.get("pageSize", 25, type=int)
+    total = request.args.get("total", "cached", type=str)
 
-    query = Venta.query.filter_by(estado="orden")
+    query = Venta.query.options(*VentaIndexSchema.load_options).filter_by(
+        estado="orden"
+    )
 
     if fecha_desde and fecha_hasta:
         query = query.filter(
@@ -215,9 +323,13 @@ def index_orden():
             <= datetime.fromisoformat(fecha_hasta) + timedelta(days=1, seconds=-1)
         )
 
-    query = query.order_by(Venta.fecha_hora.desc())
-
-    ventas: Pagination = query.paginate(page=page, per_page=page_size)
+    ventas: KeysetPagination = query.keyset_paginate(
+        order_by=(Venta.fecha_hora, Venta.id),
+        cursor=cursor,
+        per_page=page_size,
+        total=total,
+        page=page,
+    )
 
     if not ventas.items:
         return jsonify({"error": "No se encontraron ordenes"}), 404
@@ -227,6 +339,7 @@ def index_orden():
             {
                 "ventas": venta_index_schema.dump(ventas.items, many=True),
                 "total": ventas.total,
+                "next_cursor": ventas.next_cursor,
             }
         ),
         200,
@@ -234,18 +347,13 @@ def index_orden():
 
 
 @venta_bp.route("/ventas-orden/create", methods=["GET", "POST"])
+@write_transaction
 @jwt_required()
 @error_handler(session_rollback=True)
 def create_orden():
     if request.method == "GET":
-        return (
-            jsonify(
-                {
-                    **get_select_options([Cliente, AlicuotaIVA]),
-                    **get_datagrid_options([Tributo]),
-                }
-            ),
-            200,
+        return get_options_response(
+            [AlicuotaIVA], [Tributo], extra={"clientes": _cliente_options()}
         )
     if request.method == "POST":
         data = request.json
@@ -258,6 +366,7 @@ def create_orden():
 
 
 @venta_bp.route("/ventas-orden/<int:pk>/update", methods=["GET", "PUT"])
+@write_transaction
 @jwt_required()
 @error_handler(session_rollback=True)
 def update_orden(pk):
@@ -265,15 +374,13 @@ def update_orden(pk):
     if venta.estado != EstadoVenta.orden:
         return jsonify({"error": "La venta no está en estado orden"}), 400
     if request.method == "GET":
-        return (
-            jsonify(
-                {
-                    **get_select_options([Cliente, AlicuotaIVA]),
-                    **get_datagrid_options([Tributo]),
-                    "venta": venta_form_schema.dump(venta),
-                }
-            ),
-            200,
+        return get_options_response(
+            [AlicuotaIVA],
+            [Tributo],
+            extra={
+                "clientes": _cliente_options(venta),
+                "venta": venta_form_schema.dump(venta),
+            },
         )
     if request.method == "PUT":
         data = request.json
@@ -286,6 +393,7 @@ def update_orden(pk):
 
 
 @venta_bp.route("/ventas-orden/<int:pk>/delete", methods=["DELETE"])
+@write_transaction
 @jwt_required()
 @error_handler(session_rollback=True)
 def delete_orden(pk):
@@ -26,6 +26,10 @@ class ArticuloIndexSchema(SQLAlchemyAutoSchema):
             "alicuota_iva",
         )
 
+    codigo_secundario = fields.fields.String(allow_none=True)
+    codigo_terciario = fields.fields.String(allow_none=True)
+    codigo_cuaternario = fields.fields.String(allow_none=True)
+    codigo_adicional = fields.fields.List(fields.fields.String())
     alicuota_iva = fields.Nested(
         AlicuotaIvaSchema, only=("id", "descripcion", "porcentaje")
     )
@@ -36,7 +40,11 @@ class ArticuloDetailSchema(SQLAlchemyAutoSchema):
         model = Articulo
         include_relationships = True
         load_instance = True
+        exclude = ("codigos",)
 
+    codigo_secundario = fields.fields.String(allow_none=True)
+    codigo_terciario = fields.fields.String(allow_none=True)
+    codigo_cuaternario = fields.fields.String(allow_none=True)
     codigo_adicional = fields.fields.List(
         fields.fields.String(), missing=[], allow_none=True
     )
@@ -57,6 +65,9 @@ class ArticuloFormSchema(SQLAlchemyAutoSchema):
         include_fk = True
         load_instance = True
 
+    codigo_secundario = fields.fields.String(allow_none=True)
+    codigo_terciario = fields.fields.String(allow_none=True)
+    codigo_cuaternario = fields.fields.String(allow_none=True)
     codigo_adicional = fields.fields.List(
         fields.fields.String(), missing=[], allow_none=True
     )
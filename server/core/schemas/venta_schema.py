@@ -10,8 +10,9 @@ from marshmallow import (
     validates_schema,
     ValidationError,
 )
-from server.core.models import Venta, VentaItem, Cliente
+from server.core.models import Venta, VentaItem, Cliente, Articulo
 from sqlalchemy.sql import func
+from sqlalchemy.orm import joinedload, selectinload, lazyload
 from server.auth.schemas import UsuarioSchema
 from server.core.schemas import ClienteDetailSchema
 from server.core.schemas.parametros_schema import TipoComprobanteSchema
@@ -89,6 +90,13 @@ class VentaIndexSchema(SQLAlchemyAutoSchema):
         lambda obj: f"{obj.punto_venta.numero:04d}-{obj.numero:08d}"
     )
 
+    # Opciones de carga de las relaciones que serializa el esquema, para aplicar a la
+    # consulta del listado: Venta.query.options(*VentaIndexSchema.load_options)
+    load_options = (
+        joinedload(Venta.tipo_comprobante),
+        joinedload(Venta.punto_venta),
+    )
+
 
 class VentaDetailSchema(SQLAlchemyAutoSchema):
     class Meta:
@@ -105,6 +113,28 @@ class VentaDetailSchema(SQLAlchemyAutoSchema):
     created_by_user = fields.Nested(UsuarioSchema, only=("id", "username"))
     updated_by_user = fields.Nested(UsuarioSchema, only=("id", "username"))
 
+    # Opciones de carga de las relaciones que serializa el esquema. Las relaciones de
+    # muchos a uno se cargan en la misma consulta y las colecciones con un SELECT cada una.
+    load_options = (
+        joinedload(Venta.tipo_comprobante),
+        joinedload(Venta.punto_venta),
+        joinedload(Venta.cliente).options(
+            joinedload(Cliente.tipo_documento),
+            joinedload(Cliente.tipo_responsable),
+            joinedload(Cliente.provincia),
+        ),
+        joinedload(Venta.moneda),
+        joinedload(Venta.tipo_pago),
+        joinedload(Venta.venta_asociada),
+        joinedload(Venta.created_by_user),
+        joinedload(Venta.updated_by_user),
+        selectinload(Venta.tributos),
+        selectinload(Venta.ventas_asociadas),
+        selectinload(Venta.items)
+        .joinedload(VentaItem.articulo)
+        .lazyload(Articulo.codigos),
+    )
+
 
 class VentaFormSchema(SQLAlchemyAutoSchema):
     class Meta:
@@ -1,2 +1,11 @@
 from .afip_service import AfipService
 from .pdf_generator import A4PDFGenerator, TicketPDFGenerator
+from .escpos_generator import TicketEscPosGenerator
+from .articulo_search import ArticuloSearchService
+from .cliente_search import ClienteSearchService
+from .facturacion_queue import FacturacionQueue, FacturacionWorker
+from .padron_cache import PadronCache
+from .stock_ledger import StockLedger
+from .resumen_ventas import ResumenVentas
+from .pdf_cache import PDFCache
+from .pdf_export import ExportacionPDF
@@ -3,7 +3,7 @@ import os
 
 from server import BASE_DIR
 from server.core.models import Venta
-from server.afipws import WSFEv1, WSSrPadronA13
+from server.afipws import WSFEv1, WSSrPadronA13, get_pool
 
 
 class AfipServiceError(Exception):
@@ -14,6 +14,10 @@ class AfipServiceError(Exception):
         self.original_exception = original_exception
 
 
+class PersonaNoEncontradaError(AfipServiceError):
+    "El padrón de AFIP no registra una persona con el identificador consultado."
+
+
 class AfipService:
     """
     Servicio para interactuar con los servicios web de AFIP y los modelos de la base de datos.
@@ -29,10 +33,17 @@ class AfipService:
     - KEY: Ruta a la clave privada.
     - PASSPHRASE: Frase de contraseña para la clave privada.
     - PRODUCTION: Indicador de si se está en modo producción o homologación.
+    - STANDIN_URL: URL del servidor local que reemplaza a AFIP en las pruebas de carga
+      (variable de entorno AFIP_STANDIN_URL, ver afipws.standin).
+    - POOL_SIZE: Cantidad máxima de clientes de cada servicio web que se mantienen abiertos
+      en el proceso (ver WSPool).
+    - CAE_LOTE_SIZE: Cantidad de comprobantes enviados por solicitud en obtener_cae_lote.
 
     Métodos:
     - obtener_cae: Solicita el CAE para una venta.
+    - obtener_cae_lote: Solicita el CAE para varias ventas, agrupadas en lotes.
     - anular_cae: Anula el CAE de una venta mediante una Nota de Crédito.
+    - buscar_cae: Busca el comprobante de una venta entre los últimos autorizados.
     - get_persona: Obtiene los datos de una persona a partir de su identificador (CUIT).
     """
 
@@ -41,6 +52,15 @@ class AfipService:
     KEY = os.path.join(BASE_DIR, "instance", "afipws_test.key")
     PASSPHRASE = ""
     PRODUCTION = False
+    STANDIN_URL = os.environ.get("AFIP_STANDIN_URL")
+    POOL_SIZE = 4
+    CAE_LOTE_SIZE = 50
+    # Cantidad máxima de comprobantes consultados por buscar_cae
+    BUSQUEDA_CAE_MAX = 50
+    # Código de FECompConsultar para un comprobante inexistente
+    COMPROBANTE_INEXISTENTE = 602
+    # Mensajes del padrón A13 que indican que la persona consultada no existe
+    PERSONA_NO_ENCONTRADA = ("No existe persona",)
     AFIP_CONDICION_IVA_POR_ABREVIATURA = {
         "I": 1,   # IVA Responsable Inscripto
         "R": 2,   # IVA Responsable no Inscripto
@@ -58,11 +78,6 @@ class AfipService:
         "U": 14,  # Pequeno Contribuyente Eventual Social
     }
 
-    def __init__(self):
-        "Inicializar los servicios de AFIP."
-        self.wsfev1 = None
-        self.ws_sr_padron_a13 = None
-
     def _get_condicion_iva_receptor_id(self, venta: Venta) -> int:
         """
         Obtiene el identificador de CondicionIVAReceptor para WSFEv1.
@@ -79,115 +94,99 @@ class AfipService:
             return self.AFIP_CONDICION_IVA_POR_ABREVIATURA[abreviatura]
         return int(venta.cliente.tipo_responsable.id)
 
-    def _initialize_wsfev1(self):
-        """Inicializar el servicio WSFEv1 si no está ya inicializado."""
-        try:
-            if self.wsfev1 is None:
-                self.wsfev1 = WSFEv1(
+    def _get_pool(self, ws_class):
+        """
+        Devuelve el pool de clientes del servicio web indicado. Los clientes se crean
+        la primera vez que se utilizan y se reutilizan en las siguientes llamadas.
+        """
+        return get_pool(
+            ws_class,
+            {
+                "CUIT": self.CUIT,
+                "cert": self.CERT,
+                "key": self.KEY,
+                "passphrase": self.PASSPHRASE,
+                "production": self.PRODUCTION,
+                "standin_url": self.STANDIN_URL,
+            },
+            maxsize=self.POOL_SIZE,
+        )
+
+    def _get_cae_data(self, venta: Venta) -> dict:
+        "Arma los datos del comprobante de una venta para solicitar su CAE."
+        condicion_iva_receptor_id = self._get_condicion_iva_receptor_id(venta)
+        iva_alicuotas = venta.get_iva_alicuota()
+        data = {
+            "CantReg": 1,  # Cantidad de facturas a registrar
+            "PtoVta": venta.punto_venta.numero,  # Punto de venta
+            # Tipo de comprobante (ver tipos disponibles)
+            "CbteTipo": venta.tipo_comprobante.codigo_afip,
+            # Concepto del Comprobante: (1)Productos, (2)Servicios, (3)Productos y Servicios
+            "Concepto": 1,
+            # Tipo de documento del comprador (ver tipos disponibles)
+            "DocTipo": venta.cliente.tipo_documento.codigo_afip,
+            "DocNro": venta.cliente.nro_documento,  # Numero de documento del comprador
+            # Numero de comprobante se obtiene con CompUltimoAutorizado
+            "CbteDesde": None,
+            "CbteHasta": None,
+            # Fecha del comprobante (yyyymmdd)
+            "CbteFch": venta.fecha_hora.strftime("%Y%m%d"),
+            # Fecha de servicio (yyyymmdd), obligatorio para Concepto 2 y 3
+            "FchServDesde": None,
+            "FchServHasta": None,
+            "FchVtoPago": None,
+            # Importe total del comprobante
+            "ImpTotal": float(
+                "{:.2f}".format(venta.gravado + venta.total_iva + venta.total_tributos)
+            ),
+            "ImpTotConc": 0,  # Importe neto no gravado
+            "ImpNeto": float("{:.2f}".format(venta.gravado)),  # Importe neto gravado
+            "ImpOpEx": 0,  # Importe exento de IVA
+            "ImpIVA": float("{:.2f}".format(venta.total_iva)),  # Importe total de IVA
+            # Importe total de tributos
+            "ImpTrib": float("{:.2f}".format(venta.total_tributos)),
+            # Tipo de moneda usada en el comprobante (ver tipos disponibles)('PES' para pesos argentinos)
+            "MonId": venta.moneda.codigo_afip,
+            # Cotización de la moneda usada (1 para pesos argentinos)
+            "MonCotiz": float(venta.moneda_cotizacion),
+            "CondicionIVAReceptorId": condicion_iva_receptor_id,
+            "Iva": (
+                [
                     {
-                        "CUIT": self.CUIT,
-                        "cert": self.CERT,
-                        "key": self.KEY,
-                        "passphrase": self.PASSPHRASE,
-                        "production": self.PRODUCTION,
+                        "Id": iva["Id"],
+                        "BaseImp": float("{:.2f}".format(iva["BaseImp"])),
+                        "Importe": float("{:.2f}".format(iva["Importe"])),
                     }
-                )
-        except Exception as e:
-            raise AfipServiceError(f"Error inicializando el servicio WSFEv1: {e}")
-
-    def _initialize_ws_sr_padron_a13(self):
-        """Inicializar el servicio WSSrPadronA13 si no está ya inicializado."""
-        try:
-            if self.ws_sr_padron_a13 is None:
-                self.ws_sr_padron_a13 = WSSrPadronA13(
+                    for iva in iva_alicuotas
+                ]
+                if iva_alicuotas
+                else None
+            ),
+            "Tributos": (
+                [
                     {
-                        "CUIT": self.CUIT,
-                        "cert": self.CERT,
-                        "key": self.KEY,
-                        "passphrase": self.PASSPHRASE,
-                        "production": self.PRODUCTION,
+                        "Id": tributo.tipo_tributo.codigo_afip,
+                        "Desc": tributo.descripcion,
+                        "BaseImp": float("{:.2f}".format(venta.gravado)),
+                        "Alic": float("{:.2f}".format(tributo.alicuota)),
+                        "Importe": float(
+                            "{:.2f}".format(venta.get_tributo_importe(tributo.id))
+                        ),
                     }
-                )
-        except Exception as e:
-            raise AfipServiceError(
-                f"Error inicializando el servicio WSSrPadronA13: {e}"
-            )
+                    for tributo in venta.tributos
+                ]
+                if venta.tributos
+                else None
+            ),
+        }
+        return data
 
     def obtener_cae(self, venta: Venta):
         "Obtener el CAE para una venta."
-        self._initialize_wsfev1()
         try:
-            condicion_iva_receptor_id = self._get_condicion_iva_receptor_id(venta)
-            data = {
-                "CantReg": 1,  # Cantidad de facturas a registrar
-                "PtoVta": venta.punto_venta.numero,  # Punto de venta
-                # Tipo de comprobante (ver tipos disponibles)
-                "CbteTipo": venta.tipo_comprobante.codigo_afip,
-                # Concepto del Comprobante: (1)Productos, (2)Servicios, (3)Productos y Servicios
-                "Concepto": 1,
-                # Tipo de documento del comprador (ver tipos disponibles)
-                "DocTipo": venta.cliente.tipo_documento.codigo_afip,
-                "DocNro": venta.cliente.nro_documento,  # Numero de documento del comprador
-                # Numero de comprobante se obtiene con CompUltimoAutorizado
-                "CbteDesde": None,
-                "CbteHasta": None,
-                # Fecha del comprobante (yyyymmdd)
-                "CbteFch": venta.fecha_hora.strftime("%Y%m%d"),
-                # Fecha de servicio (yyyymmdd), obligatorio para Concepto 2 y 3
-                "FchServDesde": None,
-                "FchServHasta": None,
-                "FchVtoPago": None,
-                # Importe total del comprobante
-                "ImpTotal": float(
-                    "{:.2f}".format(
-                        venta.gravado + venta.total_iva + venta.total_tributos
-                    )
-                ),
-                "ImpTotConc": 0,  # Importe neto no gravado
-                "ImpNeto": float(
-                    "{:.2f}".format(venta.gravado)
-                ),  # Importe neto gravado
-                "ImpOpEx": 0,  # Importe exento de IVA
-                "ImpIVA": float(
-                    "{:.2f}".format(venta.total_iva)
-                ),  # Importe total de IVA
-                # Importe total de tributos
-                "ImpTrib": float("{:.2f}".format(venta.total_tributos)),
-                # Tipo de moneda usada en el comprobante (ver tipos disponibles)('PES' para pesos argentinos)
-                "MonId": venta.moneda.codigo_afip,
-                # Cotización de la moneda usada (1 para pesos argentinos)
-                "MonCotiz": float(venta.moneda_cotizacion),
-                "CondicionIVAReceptorId": condicion_iva_receptor_id,
-                "Iva": (
-                    [
-                        {
-                            "Id": iva["Id"],
-                            "BaseImp": float("{:.2f}".format(iva["BaseImp"])),
-                            "Importe": float("{:.2f}".format(iva["Importe"])),
-                        }
-                        for iva in venta.get_iva_alicuota()
-                    ]
-                    if venta.get_iva_alicuota()
-                    else None
-                ),
-                "Tributos": (
-                    [
-                        {
-                            "Id": tributo.tipo_tributo.codigo_afip,
-                            "Desc": tributo.descripcion,
-                            "BaseImp": float("{:.2f}".format(venta.gravado)),
-                            "Alic": float("{:.2f}".format(tributo.alicuota)),
-                            "Importe": float(
-                                "{:.2f}".format(venta.get_tributo_importe(tributo.id))
-                            ),
-                        }
-                        for tributo in venta.tributos
-                    ]
-                    if venta.tributos
-                    else None
-                ),
-            }
-            res = self.wsfev1.CAESolicitar(data, fetch_last_cbte=True)
+            data = self._get_cae_data(venta)
+            with self._get_pool(WSFEv1).client() as wsfev1:
+                res = wsfev1.CAESolicitar(data, fetch_last_cbte=True)
             return {
                 "numero": res["NroCbte"],
                 "cae": res["CAE"],
@@ -196,11 +195,113 @@ class AfipService:
         except Exception as e:
             raise AfipServiceError(f"Error obteniendo CAE: {e}")
 
+    def obtener_cae_lote(self, ventas: list, chunk_size: int = None):
+        """
+        Obtener el CAE para varias ventas, enviando en cada solicitud hasta `chunk_size`
+        comprobantes del mismo punto de venta y tipo (CantReg > 1).
+
+        Devuelve un generador que, por cada solicitud, produce una lista de tuplas
+        (venta, resultado), de modo que los CAE obtenidos puedan registrarse antes de
+        enviar la siguiente. El resultado contiene el número, el CAE y su vencimiento si el
+        comprobante fue aprobado, o las observaciones de AFIP si fue rechazado.
+        """
+        chunk_size = min(chunk_size or self.CAE_LOTE_SIZE, WSFEv1.MAX_CANT_REG)
+        grupos = {}
+        for venta in sorted(ventas, key=lambda v: (v.fecha_hora, v.id)):
+            grupos.setdefault(
+                (venta.punto_venta.numero, venta.tipo_comprobante.codigo_afip), []
+            ).append(venta)
+
+        for grupo in grupos.values():
+            for inicio in range(0, len(grupo), chunk_size):
+                lote = []
+                resultados = []
+                for venta in grupo[inicio : inicio + chunk_size]:
+                    try:
+                        lote.append((venta, self._get_cae_data(venta)))
+                    except Exception as e:
+                        resultados.append((venta, {"observaciones": [str(e)]}))
+                if lote:
+                    try:
+                        with self._get_pool(WSFEv1).client() as wsfev1:
+                            res = wsfev1.CAESolicitarLote([data for _, data in lote])
+                    except Exception as e:
+                        raise AfipServiceError(f"Error obteniendo CAE: {e}")
+                    for (venta, _), det in zip(lote, res):
+                        if det["Resultado"] == "A":
+                            resultado = {
+                                "numero": det["NroCbte"],
+                                "cae": det["CAE"],
+                                "vencimiento_cae": self.formatDate(det["CAEFchVto"]),
+                            }
+                        else:
+                            resultado = {
+                                "observaciones": [
+                                    f"{obs['Code']}: {obs['Msg']}"
+                                    for obs in det["Observaciones"]
+                                ]
+                            }
+                        resultados.append((venta, resultado))
+                yield resultados
+
+    def buscar_cae(self, venta: Venta, registrado=None) -> dict | None:
+        """
+        Busca entre los últimos comprobantes autorizados del punto de venta y tipo de la
+        venta uno con su documento, fecha e importe total, para recuperar el CAE de una
+        solicitud cuya respuesta no se recibió (por ejemplo, por un timeout). Devuelve
+        el número, el CAE y su vencimiento, o None si el comprobante no fue autorizado.
+
+        Los comprobantes se consultan (FECompConsultar) desde el último autorizado
+        (FECompUltimoAutorizado) hacia atrás, hasta uno de fecha anterior a la de la
+        venta (AFIP no autoriza comprobantes con fecha anterior al último) o hasta
+        consultar BUSQUEDA_CAE_MAX comprobantes. Se omiten los números para los que
+        `registrado(numero)` es verdadero, es decir, los de otras ventas.
+        """
+        try:
+            data = self._get_cae_data(venta)
+            with self._get_pool(WSFEv1).client() as wsfev1:
+                ultimo = int(
+                    wsfev1.CompUltimoAutorizado(data["PtoVta"], data["CbteTipo"])
+                )
+                primero = max(ultimo - self.BUSQUEDA_CAE_MAX, 0)
+                for numero in range(ultimo, primero, -1):
+                    if registrado is not None and registrado(numero):
+                        continue
+                    res = wsfev1.CompConsultar(
+                        {
+                            "CbteTipo": data["CbteTipo"],
+                            "PtoVta": data["PtoVta"],
+                            "CbteNro": numero,
+                        },
+                        return_response=True,
+                    )
+                    if "Errors" in res and res["Errors"] is not None:
+                        codigos = WSFEv1.response_codes(res)
+                        if codigos == {self.COMPROBANTE_INEXISTENTE}:
+                            continue
+                        raise Exception(res["Errors"])
+                    cbte = res["ResultGet"]
+                    if str(cbte["CbteFch"]) < data["CbteFch"]:
+                        break
+                    if (
+                        str(cbte["CbteFch"]) == data["CbteFch"]
+                        and int(cbte["DocNro"]) == int(data["DocNro"])
+                        and abs(float(cbte["ImpTotal"]) - data["ImpTotal"]) < 0.005
+                    ):
+                        return {
+                            "numero": int(cbte["CbteDesde"]),
+                            "cae": cbte["CodAutorizacion"],
+                            "vencimiento_cae": self.formatDate(cbte["FchVto"]),
+                        }
+            return None
+        except Exception as e:
+            raise AfipServiceError(f"Error consultando comprobantes: {e}")
+
     def anular_cae(self, venta: Venta):
         "Anular el CAE de una venta con una Nota de Crédito."
-        self._initialize_wsfev1()
         try:
             condicion_iva_receptor_id = self._get_condicion_iva_receptor_id(venta)
+            iva_alicuotas = venta.venta_asociada.get_iva_alicuota()
             data = {
                 "CantReg": 1,
                 "PtoVta": venta.punto_venta.numero,
@@ -247,9 +348,9 @@ class AfipService:
                             "BaseImp": float("{:.2f}".format(iva["BaseImp"])),
                             "Importe": float("{:.2f}".format(iva["Importe"])),
                         }
-                        for iva in venta.venta_asociada.get_iva_alicuota()
+                        for iva in iva_alicuotas
                     ]
-                    if venta.venta_asociada.get_iva_alicuota()
+                    if iva_alicuotas
                     else None
                 ),
                 "Tributos": (
@@ -271,7 +372,8 @@ class AfipService:
                     else None
                 ),
             }
-            res = self.wsfev1.CAESolicitar(data, fetch_last_cbte=True)
+            with self._get_pool(WSFEv1).client() as wsfev1:
+                res = wsfev1.CAESolicitar(data, fetch_last_cbte=True)
             return {
                 "numero": res["NroCbte"],
                 "cae": res["CAE"],
@@ -289,9 +391,14 @@ class AfipService:
 
     def get_persona(self, identifier: int):
         "Obtener los datos de una persona."
-        self._initialize_ws_sr_padron_a13()
         try:
-            res = self.ws_sr_padron_a13.GetPersona(identifier)
+            with self._get_pool(WSSrPadronA13).client() as ws_sr_padron_a13:
+                res = ws_sr_padron_a13.GetPersona(identifier)
+        except Exception as e:
+            if any(msg in str(e) for msg in self.PERSONA_NO_ENCONTRADA):
+                raise PersonaNoEncontradaError(f"Persona no encontrada: {e}")
+            raise AfipServiceError(f"Error obteniendo datos de la persona: {e}")
+        try:
             if "persona" in res:
                 res = res["persona"]
 
@@ -0,0 +1,310 @@
+import weakref
+from sqlalchemy import event, inspect, select, text, and_, or_
+from sqlalchemy.orm import Session, joinedload
+
+from server.config import db
+from server.utils.database import al_confirmar, pendiente_de_confirmar
+from server.core.models import Articulo, ArticuloCodigo
+from server.core.models.articulo import ARTICULO_FTS_TABLE
+
+
+class ArticuloSearchService:
+    """
+    Motor de búsqueda de artículos.
+
+    Utiliza un índice FTS5 (tokenizador trigram) sobre la descripción y los códigos
+    del artículo, mantenido en sincronía con las altas, modificaciones y bajas lógicas
+    de `Articulo`. Los códigos de barras exactos se resuelven por índice antes de
+    recurrir a la búsqueda de texto. Si el motor de base de datos no dispone de FTS5
+    se utiliza una búsqueda por `LIKE` con resultados acotados.
+
+    Métodos:
+    - search: Busca artículos y devuelve una página de resultados ordenada por relevancia.
+    - find_by_codigo: Devuelve los artículos cuyo código coincide exactamente.
+    - rebuild_index: Reconstruye el índice completo (útil luego de importaciones masivas).
+    - insert_entries: Agrega al índice artículos nuevos sin cargarlos con el ORM.
+    """
+
+    DEFAULT_PAGE_SIZE = 25
+    MAX_PAGE_SIZE = 100
+    MIN_TRIGRAM_LENGTH = 3
+    SEARCHABLE_FIELDS = ("descripcion", "codigo_principal", "codigos", "deleted")
+
+    # Motores en los que se verificó la existencia del índice
+    _engines_con_indice = weakref.WeakSet()
+
+    @staticmethod
+    def get_codigos(articulo: Articulo) -> list:
+        """
+        Devuelve la lista de códigos del artículo, comenzando por el principal.
+        """
+        codigos = [articulo.codigo_principal, *(c.codigo for c in articulo.codigos)]
+        return [codigo for codigo in dict.fromkeys(codigos) if codigo]
+
+    @classmethod
+    def indice_disponible(cls, connection) -> bool:
+        """
+        Indica si el índice de búsqueda existe en la base de datos de la conexión.
+        Sólo se memoriza el resultado positivo, para detectar un índice creado
+        posteriormente (por ejemplo, con el comando `rebuild_search_index`).
+        """
+        engine = connection.engine
+        if engine in cls._engines_con_indice:
+            return True
+        if connection.dialect.name != "sqlite":
+            return False
+        existe = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": ARTICULO_FTS_TABLE},
+        ).first()
+        # Un índice creado en la transacción en curso se memoriza al confirmarla
+        if existe and not pendiente_de_confirmar(connection, ARTICULO_FTS_TABLE):
+            cls._engines_con_indice.add(engine)
+        return existe is not None
+
+    @classmethod
+    def _memorizar_al_confirmar(cls, connection):
+        """
+        Memoriza el índice creado en la transacción en curso una vez confirmada: si la
+        transacción se revierte, la tabla del índice no existe.
+        """
+        engine = connection.engine
+        al_confirmar(
+            connection, ARTICULO_FTS_TABLE, lambda: cls._engines_con_indice.add(engine)
+        )
+
+    @classmethod
+    def sync(cls, connection, articulos: list):
+        """
+        Actualiza las entradas del índice correspondientes a los artículos indicados.
+        Los artículos eliminados (lógica o físicamente) se quitan del índice.
+        """
+        if not articulos:
+            return
+        connection.execute(
+            text(f"DELETE FROM {ARTICULO_FTS_TABLE} WHERE rowid = :id"),
+            [{"id": articulo.id} for articulo in articulos],
+        )
+        entradas = [
+            {
+                "id": articulo.id,
+                "descripcion": articulo.descripcion,
+                "codigos": " ".join(cls.get_codigos(articulo)),
+            }
+            for articulo in articulos
+            if not articulo.deleted
+        ]
+        cls.insert_entries(connection, entradas)
+
+    @staticmethod
+    def insert_entries(connection, entradas: list):
+        """
+        Agrega al índice las entradas indicadas: diccionarios con el `id`, la
+        `descripcion` y los `codigos` (separados por espacios) de artículos que no
+        están en el índice.
+        """
+        if entradas:
+            connection.execute(
+                text(
+                    f"INSERT INTO {ARTICULO_FTS_TABLE} (rowid, descripcion, codigos) "
+                    "VALUES (:id, :descripcion, :codigos)"
+                ),
+                entradas,
+            )
+
+    @classmethod
+    def create_index(cls, connection):
+        "Crea el índice de búsqueda, si no existe"
+        connection.execute(
+            text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {ARTICULO_FTS_TABLE} "
+                "USING fts5(descripcion, codigos, tokenize='trigram')"
+            )
+        )
+        cls._memorizar_al_confirmar(connection)
+
+    @classmethod
+    def rebuild_index(cls, session, batch_size: int = 5000) -> int:
+        """
+        Reconstruye el índice de búsqueda a partir de todos los artículos activos.
+        Devuelve la cantidad de artículos indexados.
+
+        Importante: el `session.commit()` debe realizarse dentro de la función
+        que llame a este método.
+        """
+        connection = session.connection()
+        cls.create_index(connection)
+        connection.execute(text(f"DELETE FROM {ARTICULO_FTS_TABLE}"))
+        total = 0
+        last_id = 0
+        while True:
+            batch = (
+                session.query(Articulo)
+                .filter(Articulo.deleted == False, Articulo.id > last_id)
+                .order_by(Articulo.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            cls.sync(connection, batch)
+            total += len(batch)
+            last_id = batch[-1].id
+        return total
+
+    @staticmethod
+    def find_by_codigo(codigo: str) -> list:
+        """
+        Devuelve los artículos activos que tienen asignado exactamente el código
+        indicado, resolviendo la búsqueda con el índice de `articulo_codigo`.
+        """
+        return (
+            Articulo.query.options(joinedload(Articulo.alicuota_iva))
+            .filter(
+                Articulo.id.in_(
+                    select(ArticuloCodigo.articulo_id).where(
+                        ArticuloCodigo.codigo == codigo
+                    )
+                )
+            )
+            .order_by(Articulo.id.desc())
+            .all()
+        )
+
+    @classmethod
+    def search(cls, query: str, page: int = 1, page_size: int = None) -> dict:
+        """
+        Busca artículos que contengan todos los términos de la consulta en su
+        descripción o en alguno de sus códigos.
+
+        Devuelve un diccionario con los artículos de la página solicitada, ordenados
+        por relevancia, y un indicador de si existen más resultados.
+        """
+        page = max(page or 1, 1)
+        page_size = min(max(page_size or cls.DEFAULT_PAGE_SIZE, 1), cls.MAX_PAGE_SIZE)
+        terms = (query or "").split()
+        result = {"articulos": [], "page": page, "page_size": page_size, "has_next": False}
+        if not terms:
+            return result
+
+        # Camino rápido: lectura exacta de un código de barras
+        if len(terms) == 1 and page == 1:
+            articulos = cls.find_by_codigo(terms[0])
+            if articulos:
+                result["articulos"] = articulos[:page_size]
+                result["has_next"] = len(articulos) > page_size
+                return result
+
+        offset = (page - 1) * page_size
+        connection = db.session.connection()
+        if cls.indice_disponible(connection) and any(
+            len(term) >= cls.MIN_TRIGRAM_LENGTH for term in terms
+        ):
+            ids = cls._search_ids_fts(connection, terms, page_size + 1, offset)
+            articulos_por_id = {
+                articulo.id: articulo
+                for articulo in Articulo.query.options(joinedload(Articulo.alicuota_iva))
+                .filter(Articulo.id.in_(ids))
+                .all()
+            }
+            articulos = [articulos_por_id[i] for i in ids if i in articulos_por_id]
+        else:
+            articulos = cls._search_like(terms, page_size + 1, offset)
+
+        result["articulos"] = articulos[:page_size]
+        result["has_next"] = len(articulos) > page_size
+        return result
+
+    @classmethod
+    def _search_ids_fts(cls, connection, terms: list, limit: int, offset: int) -> list:
+        """
+        Ejecuta la consulta sobre el índice FTS5 y devuelve los ids ordenados por relevancia.
+        Los términos de menos de tres caracteres no pueden resolverse con el índice
+        trigram, por lo que se filtran con `LIKE` sobre los candidatos.
+        """
+        params = {"limit": limit, "offset": offset}
+        match_terms = []
+        like_conditions = []
+        for i, term in enumerate(terms):
+            if len(term) >= cls.MIN_TRIGRAM_LENGTH:
+                match_terms.append('"{}"'.format(term.replace('"', '""')))
+            else:
+                params[f"like_{i}"] = f"%{term}%"
+                like_conditions.append(
+                    f"(descripcion LIKE :like_{i} OR codigos LIKE :like_{i})"
+                )
+        params["match"] = " AND ".join(match_terms)
+        where = f"{ARTICULO_FTS_TABLE} MATCH :match"
+        if like_conditions:
+            where += " AND " + " AND ".join(like_conditions)
+        rows = connection.execute(
+            text(
+                f"SELECT rowid FROM {ARTICULO_FTS_TABLE} WHERE {where} "
+                "ORDER BY rank LIMIT :limit OFFSET :offset"
+            ),
+            params,
+        )
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _search_like(terms: list, limit: int, offset: int) -> list:
+        """
+        Búsqueda alternativa por `LIKE` para motores sin FTS5, con resultados acotados.
+        """
+        conditions = []
+        for term in terms:
+            conditions.append(
+                or_(
+                    Articulo.descripcion.ilike(f"%{term}%"),
+                    Articulo.codigos.any(ArticuloCodigo.codigo.ilike(f"%{term}%")),
+                )
+            )
+        return (
+            Articulo.query.options(joinedload(Articulo.alicuota_iva))
+            .filter(Articulo.deleted == False, and_(*conditions))
+            .order_by(Articulo.id.desc())
+            .limit(limit)
+            .offset(offset)
+            .all()
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_articulo_search_index(session, flush_context):
+    """
+    Mantiene el índice de búsqueda sincronizado con los artículos creados,
+    modificados o eliminados en el flush. Los cambios que no afectan a los campos
+    indexados (por ejemplo, el stock) no generan escrituras en el índice.
+    """
+    articulos = [obj for obj in session.new if isinstance(obj, Articulo)]
+    articulos += [obj for obj in session.deleted if isinstance(obj, Articulo)]
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, ArticuloCodigo):
+            articulo = session.identity_map.get(
+                inspect(Articulo).identity_key_from_primary_key([obj.articulo_id])
+            )
+            if articulo is not None and articulo not in articulos:
+                articulos.append(articulo)
+    for obj in session.dirty:
+        if isinstance(obj, Articulo) and obj not in articulos:
+            state = inspect(obj)
+            if any(
+                state.attrs[field].history.has_changes()
+                for field in ArticuloSearchService.SEARCHABLE_FIELDS
+            ):
+                articulos.append(obj)
+    if not articulos:
+        return
+
+    connection = session.connection()
+    if not ArticuloSearchService.indice_disponible(connection):
+        return
+    eliminados = [obj for obj in articulos if obj in session.deleted]
+    if eliminados:
+        connection.execute(
+            text(f"DELETE FROM {ARTICULO_FTS_TABLE} WHERE rowid = :id"),
+            [{"id": obj.id} for obj in eliminados],
+        )
+    ArticuloSearchService.sync(
+        connection, [obj for obj in articulos if obj not in session.deleted]
+    )
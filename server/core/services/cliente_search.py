@@ -0,0 +1,230 @@
+import weakref
+from sqlalchemy import event, inspect, text, and_, or_, tuple_
+from sqlalchemy.orm import Session, joinedload
+
+from server.config import db
+from server.utils.database import al_confirmar, pendiente_de_confirmar
+from server.core.models import Cliente
+from server.core.models.cliente import CLIENTE_FTS_TABLE
+
+
+class ClienteSearchService:
+    """
+    Motor de búsqueda de clientes.
+
+    Los resultados se ordenan por razón social y se paginan por clave (razon_social, id):
+    el cursor de la página siguiente es el id del último cliente devuelto. Una consulta
+    numérica se resuelve como prefijo del número de documento sobre su índice; el resto
+    de las consultas utiliza un índice FTS5 sobre los términos de la razón social y el
+    número de documento, con búsqueda por prefijo de cada término. Si el motor de base de
+    datos no dispone de FTS5 se utiliza una búsqueda por `LIKE`.
+
+    Métodos:
+    - search: Devuelve una página de clientes que coinciden con la consulta.
+    - typeahead: Devuelve las opciones de select de los primeros clientes que coinciden.
+    - rebuild_index: Reconstruye el índice completo.
+    """
+
+    DEFAULT_PAGE_SIZE = 25
+    MAX_PAGE_SIZE = 100
+    TYPEAHEAD_LIMIT = 10
+    SEARCHABLE_FIELDS = ("razon_social", "nro_documento")
+
+    # Motores en los que se verificó la existencia del índice
+    _engines_con_indice = weakref.WeakSet()
+
+    @classmethod
+    def indice_disponible(cls, connection) -> bool:
+        """
+        Indica si el índice de búsqueda existe en la base de datos de la conexión.
+        Sólo se memoriza el resultado positivo.
+        """
+        engine = connection.engine
+        if engine in cls._engines_con_indice:
+            return True
+        if connection.dialect.name != "sqlite":
+            return False
+        existe = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": CLIENTE_FTS_TABLE},
+        ).first()
+        # Un índice creado en la transacción en curso se memoriza al confirmarla
+        if existe and not pendiente_de_confirmar(connection, CLIENTE_FTS_TABLE):
+            cls._engines_con_indice.add(engine)
+        return existe is not None
+
+    @classmethod
+    def _memorizar_al_confirmar(cls, connection):
+        """
+        Memoriza el índice creado en la transacción en curso una vez confirmada: si la
+        transacción se revierte, la tabla del índice no existe.
+        """
+        engine = connection.engine
+        al_confirmar(
+            connection, CLIENTE_FTS_TABLE, lambda: cls._engines_con_indice.add(engine)
+        )
+
+    @staticmethod
+    def sync(connection, clientes: list, eliminados: list = None):
+        """
+        Actualiza las entradas del índice correspondientes a los clientes indicados
+        y quita las de los clientes eliminados.
+        """
+        ids = [cliente.id for cliente in [*clientes, *(eliminados or [])]]
+        if not ids:
+            return
+        connection.execute(
+            text(f"DELETE FROM {CLIENTE_FTS_TABLE} WHERE rowid = :id"),
+            [{"id": id} for id in ids],
+        )
+        if clientes:
+            connection.execute(
+                text(
+                    f"INSERT INTO {CLIENTE_FTS_TABLE} (rowid, razon_social, nro_documento) "
+                    "VALUES (:id, :razon_social, :nro_documento)"
+                ),
+                [
+                    {
+                        "id": cliente.id,
+                        "razon_social": cliente.razon_social,
+                        "nro_documento": cliente.nro_documento,
+                    }
+                    for cliente in clientes
+                ],
+            )
+
+    @classmethod
+    def rebuild_index(cls, session) -> int:
+        """
+        Reconstruye el índice de búsqueda a partir de todos los clientes.
+        Devuelve la cantidad de clientes indexados.
+
+        Importante: el `session.commit()` debe realizarse dentro de la función
+        que llame a este método.
+        """
+        connection = session.connection()
+        connection.execute(
+            text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {CLIENTE_FTS_TABLE} "
+                "USING fts5(razon_social, nro_documento, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+        )
+        connection.execute(text(f"DELETE FROM {CLIENTE_FTS_TABLE}"))
+        result = connection.execute(
+            text(
+                f"INSERT INTO {CLIENTE_FTS_TABLE} (rowid, razon_social, nro_documento) "
+                "SELECT id, razon_social, nro_documento FROM cliente"
+            )
+        )
+        cls._memorizar_al_confirmar(connection)
+        return result.rowcount
+
+    @staticmethod
+    def _normalizar_documento(term: str) -> str:
+        """
+        Quita los separadores habituales de un número de documento (20-12345678-9).
+        """
+        return term.replace("-", "").replace(".", "")
+
+    @classmethod
+    def search(cls, query: str = None, cursor: int = None, page_size: int = None) -> dict:
+        """
+        Devuelve un diccionario con los clientes de la página, ordenados por razón social,
+        y el cursor de la página siguiente (None si no hay más resultados).
+        """
+        page_size = min(max(page_size or cls.DEFAULT_PAGE_SIZE, 1), cls.MAX_PAGE_SIZE)
+        terms = (query or "").split()
+
+        q = db.session.query(Cliente).options(
+            joinedload(Cliente.tipo_documento), joinedload(Cliente.tipo_responsable)
+        )
+        if len(terms) == 1 and cls._normalizar_documento(terms[0]).isdigit():
+            q = q.filter(cls._documento_prefix(cls._normalizar_documento(terms[0])))
+        elif terms:
+            connection = db.session.connection()
+            if cls.indice_disponible(connection):
+                match = " AND ".join(
+                    '"{}"*'.format(term.replace('"', '""')) for term in terms
+                )
+                q = q.filter(
+                    Cliente.id.in_(
+                        text(
+                            f"SELECT rowid FROM {CLIENTE_FTS_TABLE} "
+                            f"WHERE {CLIENTE_FTS_TABLE} MATCH :match"
+                        ).bindparams(match=match)
+                    )
+                )
+            else:
+                q = q.filter(
+                    and_(
+                        *(
+                            or_(
+                                Cliente.razon_social.ilike(f"%{term}%"),
+                                Cliente.nro_documento.startswith(term),
+                            )
+                            for term in terms
+                        )
+                    )
+                )
+
+        if cursor:
+            ultimo = db.session.get(Cliente, cursor)
+            if ultimo is not None:
+                q = q.filter(
+                    tuple_(Cliente.razon_social, Cliente.id)
+                    > tuple_(ultimo.razon_social, ultimo.id)
+                )
+
+        clientes = (
+            q.order_by(Cliente.razon_social, Cliente.id).limit(page_size + 1).all()
+        )
+        has_next = len(clientes) > page_size
+        clientes = clientes[:page_size]
+        return {
+            "clientes": clientes,
+            "next_cursor": clientes[-1].id if has_next else None,
+        }
+
+    @classmethod
+    def typeahead(cls, query: str, limit: int = None) -> list:
+        """
+        Devuelve las opciones de select (ver Cliente.to_select_dict) de los primeros
+        clientes que coinciden con la consulta.
+        """
+        limit = min(limit or cls.TYPEAHEAD_LIMIT, cls.MAX_PAGE_SIZE)
+        clientes = cls.search(query, page_size=limit)["clientes"]
+        return [cliente.to_select_dict() for cliente in clientes]
+
+    @staticmethod
+    def _documento_prefix(prefix: str):
+        """
+        Condición de prefijo sobre el número de documento expresada como rango, de modo
+        que pueda resolverse con el índice en cualquier motor.
+        """
+        siguiente = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return and_(Cliente.nro_documento >= prefix, Cliente.nro_documento < siguiente)
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_cliente_search_index(session, flush_context):
+    """
+    Mantiene el índice de búsqueda sincronizado con los clientes creados, modificados
+    o eliminados en el flush.
+    """
+    clientes = [obj for obj in session.new if isinstance(obj, Cliente)]
+    for obj in session.dirty:
+        if isinstance(obj, Cliente):
+            state = inspect(obj)
+            if any(
+                state.attrs[field].history.has_changes()
+                for field in ClienteSearchService.SEARCHABLE_FIELDS
+            ):
+                clientes.append(obj)
+    eliminados = [obj for obj in session.deleted if isinstance(obj, Cliente)]
+    if not clientes and not eliminados:
+        return
+
+    connection = session.connection()
+    if ClienteSearchService.indice_disponible(connection):
+        ClienteSearchService.sync(connection, clientes, eliminados)
@@ -0,0 +1,161 @@
+from server.core.models import Venta, EstadoVenta
+from .pdf_generator import ComprobanteMixin
+
+ESC = b"\x1b"
+GS = b"\x1d"
+
+
+class TicketEscPosGenerator(ComprobanteMixin):
+    """
+    Ticket en comandos ESC/POS para impresoras térmicas, con los mismos datos que
+    TicketPDFGenerator. La impresora imprime el texto con sus fuentes y el código QR
+    de AFIP con su propio comando, sin rasterizar un PDF.
+
+    El ticket se escribe en el buffer indicado, que puede enviarse sin cambios a la
+    impresora (por ejemplo, al puerto USB o de red de la impresora).
+
+    Atributos:
+    - SIZE: Tamaño de impresión con el que se selecciona este formato.
+    - MIMETYPE: Tipo de contenido con el que se envía el ticket.
+    - COLUMNAS: Caracteres por línea (fuente A en papel de 80 mm).
+    - CODEPAGE: Tabla de caracteres de la impresora y su codificación.
+    - QR_MODULO: Tamaño en puntos de cada módulo del código QR.
+    """
+
+    SIZE = "escpos"
+    MIMETYPE = "application/octet-stream"
+    COLUMNAS = 48
+    # ESC t 19: PC858 (Multilingual Latin I + Euro), con acentos, ñ y °
+    CODEPAGE = (19, "cp858")
+    QR_MODULO = 5
+
+    def __init__(self, buffer, columnas: int = None):
+        self.buffer = buffer
+        self.columnas = columnas or self.COLUMNAS
+
+    def write(self, datos: bytes):
+        self.buffer.write(datos)
+
+    def text(self, texto: str = ""):
+        "Escribe una línea de texto"
+        self.write(texto.encode(self.CODEPAGE[1], errors="replace") + b"\n")
+
+    def line(self, izquierda: str, derecha: str = ""):
+        "Escribe una línea con un texto alineado a la izquierda y otro a la derecha"
+        ancho = self.columnas - len(derecha)
+        izquierda = self.truncate_text(izquierda, ancho - 1) if derecha else izquierda
+        self.text(izquierda.ljust(ancho) + derecha)
+
+    def separator(self):
+        self.text("-" * self.columnas)
+
+    def align(self, alineacion: int):
+        "ESC a: 0 izquierda, 1 centro, 2 derecha"
+        self.write(ESC + b"a" + bytes([alineacion]))
+
+    def bold(self, activado: bool):
+        self.write(ESC + b"E" + bytes([int(activado)]))
+
+    def double_size(self, activado: bool):
+        "GS !: doble ancho y doble alto"
+        self.write(GS + b"!" + (b"\x11" if activado else b"\x00"))
+
+    def qr_code(self, datos: str):
+        "Código QR modelo 2, con nivel de corrección M (GS ( k)"
+        datos = datos.encode("ascii")
+        largo = len(datos) + 3
+        self.write(GS + b"(k\x04\x001A2\x00")  # Modelo 2
+        self.write(GS + b"(k\x03\x001C" + bytes([self.QR_MODULO]))
+        self.write(GS + b"(k\x03\x001E1")  # Corrección de errores M
+        self.write(GS + b"(k" + bytes([largo % 256, largo // 256]) + b"1P0" + datos)
+        self.write(GS + b"(k\x03\x001Q0")  # Imprimir
+
+    @staticmethod
+    def importe(valor) -> str:
+        """
+        Importe con el formato de es_AR (1.234,50). No depende del locale del proceso,
+        de modo que el ticket es el mismo en cualquier servidor.
+        """
+        importe = f"{valor:,.2f}".translate(str.maketrans(",.", ".,"))
+        return f"$ {importe}"
+
+    def draw_header(self):
+        "Encabezado con el tipo y número de comprobante y el cliente"
+        self.write(ESC + b"@")  # Inicializar la impresora
+        self.write(ESC + b"t" + bytes([self.CODEPAGE[0]]))
+        self.align(1)
+        self.bold(True)
+        self.double_size(True)
+        self.text(
+            f"{self.venta.tipo_comprobante.nombre} {self.venta.tipo_comprobante.letra}"
+        )
+        self.double_size(False)
+        self.bold(False)
+        if self.venta.tipo_comprobante.codigo_afip:
+            self.text(f"COD. {self.venta.tipo_comprobante.codigo_afip:02d}")
+        self.align(0)
+        self.text(f"Nro. Comp: {self.venta.nro_comprobante()}")
+        self.text(
+            f"Fecha de Emisión: {self.venta.fecha_hora.strftime('%d/%m/%Y %H:%M:%S')}"
+        )
+        self.separator()
+        self.text(
+            self.truncate_text(
+                f"Cliente: {self.venta.cliente.razon_social}", self.columnas
+            )
+        )
+        self.separator()
+
+    def draw_item_table(self):
+        "Items: cantidad, precio unitario y subtotal; código y descripción"
+        self.bold(True)
+        self.line("CANT. x P. UNIT.", "SUBTOTAL")
+        self.text("CÓDIGO DESCRIPCIÓN")
+        self.bold(False)
+        for item in self.venta.items:
+            self.line(
+                f"{item.cantidad} x {self.importe(item.precio_unidad)}",
+                self.importe(item.subtotal),
+            )
+            self.text(
+                self.truncate_text(
+                    f"{item.articulo.codigo_principal} {item.descripcion}",
+                    self.columnas,
+                )
+            )
+        self.separator()
+
+    def draw_total(self):
+        "Totales"
+        if not self.is_remito():
+            self.line("Importe neto gravado:", self.importe(self.venta.gravado))
+            self.line("Importe IVA:", self.importe(self.venta.total_iva))
+            self.line(
+                "Importe otros tributos:", self.importe(self.venta.total_tributos)
+            )
+        self.bold(True)
+        self.line("TOTAL:", self.importe(self.venta.total))
+        self.bold(False)
+
+    def draw_CAE(self):
+        "CAE y código QR de AFIP"
+        self.separator()
+        self.text(f"CAE N°: {self.venta.cae}")
+        self.text(
+            f"Fecha Vto. CAE: {self.venta.vencimiento_cae.strftime('%d/%m/%Y')}"
+        )
+        self.align(1)
+        self.qr_code(self.qr_url())
+        self.bold(True)
+        self.text("Comprobante Autorizado")
+        self.bold(False)
+        self.align(0)
+
+    def generate(self, venta: Venta):
+        self.venta = venta
+        self.draw_header()
+        self.draw_item_table()
+        self.draw_total()
+        if self.venta.estado == EstadoVenta.facturado:
+            self.draw_CAE()
+        self.write(GS + b"VB\x03")  # Avanzar y cortar el papel
@@ -0,0 +1,333 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import update
+
+from server.config import db
+from server.core.models import (
+    Venta,
+    EstadoVenta,
+    TareaFacturacion,
+    EstadoTareaFacturacion,
+)
+from server.utils.database import begin_write
+from .afip_service import AfipService, AfipServiceError
+
+logger = logging.getLogger(__name__)
+
+
+def _ahora() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class FacturacionQueue:
+    """
+    Cola de facturación: desacopla la solicitud del CAE de la petición que registra la venta.
+
+    Con FACTURACION_ASINCRONA habilitado, la venta se confirma de inmediato con el estado
+    "Pendiente CAE" junto con una tarea (ver TareaFacturacion), que luego procesa en segundo
+    plano un FacturacionWorker. Los intentos fallidos se reintentan con espera exponencial
+    hasta MAX_INTENTOS; superado ese límite la tarea queda con estado "Error" y la venta con
+    estado "Error CAE", desde el que puede volver a encolarse (reencolar) o anularse.
+
+    Un intento fallido pudo haber sido autorizado por AFIP sin que se recibiera la
+    respuesta, por lo que antes de cada reintento se busca el comprobante de la venta entre
+    los últimos autorizados (ver AfipService.buscar_cae) y sólo si no se encuentra se
+    solicita un nuevo CAE.
+
+    Las tareas se reservan con una actualización condicional, por lo que pueden ejecutarse
+    varios workers en simultáneo (por ejemplo, en el servidor y con `flask facturacion_worker`).
+    Una tarea en proceso cuyo worker se interrumpe vuelve a procesarse luego de LEASE segundos.
+
+    Atributos:
+    - MAX_INTENTOS: Cantidad máxima de intentos de cada tarea.
+    - BACKOFF_BASE / BACKOFF_MAX: Segundos de espera luego del primer intento fallido, y
+      espera máxima entre intentos.
+    - LEASE: Segundos que una tarea en proceso queda reservada para el worker.
+    - POLL_INTERVAL: Segundos entre cada consulta de tareas pendientes del worker.
+
+    Métodos:
+    - habilitada: Indica si la facturación asincrónica está habilitada.
+    - encolar: Registra la venta como pendiente de CAE y crea su tarea.
+    - iniciar: Registra la venta como pendiente de CAE con su tarea en proceso, para
+      solicitar el CAE en la misma petición (facturación sincrónica).
+    - fallar: Registra el error de la tarea y deja la venta con estado "Error CAE".
+    - recuperar_interrumpida: Registra como error una tarea en proceso cuyo proceso se
+      interrumpió (vencido su LEASE).
+    - reencolar: Vuelve a encolar la facturación de una venta con error de CAE.
+    - buscar_autorizado: Busca el comprobante de la venta entre los autorizados por AFIP.
+    - registrar: Registra el CAE obtenido y el estado correspondiente de la venta.
+    - notificar: Despierta a los workers del proceso luego de encolar una tarea.
+    - procesar_pendientes: Procesa las tareas pendientes cuyo próximo intento ya venció.
+    - estado: Devuelve el estado de facturación de una venta.
+    """
+
+    MAX_INTENTOS = 8
+    BACKOFF_BASE = 5
+    BACKOFF_MAX = 15 * 60
+    LEASE = 5 * 60
+    POLL_INTERVAL = 2
+
+    _evento = threading.Event()
+
+    @staticmethod
+    def habilitada() -> bool:
+        return bool(current_app.config.get("FACTURACION_ASINCRONA"))
+
+    @staticmethod
+    def encolar(venta: Venta, session):
+        venta.estado = EstadoVenta.pendiente_cae
+        session.add(TareaFacturacion(venta=venta, proximo_intento=_ahora()))
+
+    @classmethod
+    def iniciar(cls, venta: Venta, session) -> TareaFacturacion:
+        """
+        La tarea se registra junto con la venta antes de solicitar el CAE, de modo que
+        si el proceso se interrumpe durante la solicitud, la venta no queda pendiente
+        indefinidamente: un worker retoma la tarea luego de LEASE segundos, buscando
+        antes el comprobante entre los autorizados.
+        """
+        venta.estado = EstadoVenta.pendiente_cae
+        tarea = TareaFacturacion(
+            venta=venta,
+            estado=EstadoTareaFacturacion.en_proceso,
+            intentos=1,
+            proximo_intento=_ahora() + timedelta(seconds=cls.LEASE),
+        )
+        session.add(tarea)
+        return tarea
+
+    @staticmethod
+    def fallar(tarea: TareaFacturacion, error: str):
+        tarea.estado = EstadoTareaFacturacion.error
+        tarea.error = error
+        tarea.venta.estado = EstadoVenta.error_cae
+
+    @classmethod
+    def recuperar_interrumpida(cls, venta: Venta, session):
+        if venta.estado != EstadoVenta.pendiente_cae:
+            return
+        tarea = session.query(TareaFacturacion).filter_by(venta_id=venta.id).first()
+        if (
+            tarea is not None
+            and tarea.estado == EstadoTareaFacturacion.en_proceso
+            and tarea.proximo_intento <= _ahora()
+        ):
+            cls.fallar(tarea, tarea.error or "Solicitud de CAE interrumpida")
+
+    @classmethod
+    def reencolar(cls, venta: Venta, session):
+        cls.recuperar_interrumpida(venta, session)
+        if venta.estado != EstadoVenta.error_cae:
+            raise Exception("La venta no tiene un error de facturación")
+        tarea = session.query(TareaFacturacion).filter_by(venta_id=venta.id).one()
+        venta.estado = EstadoVenta.pendiente_cae
+        # Se conserva el error para buscar el comprobante antes del próximo intento
+        tarea.estado = EstadoTareaFacturacion.pendiente
+        tarea.intentos = 0
+        tarea.proximo_intento = _ahora()
+
+    @staticmethod
+    def buscar_autorizado(venta: Venta, session) -> dict | None:
+        """
+        Busca el comprobante de la venta entre los últimos autorizados por AFIP, omitiendo
+        los números ya registrados en otras ventas.
+        """
+
+        def registrado(numero: int) -> bool:
+            return (
+                session.query(Venta.id)
+                .filter(
+                    Venta.punto_venta_id == venta.punto_venta_id,
+                    Venta.tipo_comprobante_id == venta.tipo_comprobante_id,
+                    Venta.numero == numero,
+                    Venta.cae.isnot(None),
+                    Venta.id != venta.id,
+                )
+                .first()
+                is not None
+            )
+
+        return AfipService().buscar_cae(venta, registrado)
+
+    @staticmethod
+    def solicitar(venta: Venta) -> dict:
+        "Solicita el CAE de la venta, o el de la nota de crédito de una anulación"
+        if venta.venta_asociada_id is not None:
+            return AfipService().anular_cae(venta)
+        return AfipService().obtener_cae(venta)
+
+    @staticmethod
+    def registrar(venta: Venta, res: dict):
+        """
+        Registra el CAE de la venta. Si se trata de la nota de crédito de una
+        anulación, completa la anulación de la venta asociada.
+        """
+        venta.numero = res["numero"]
+        venta.cae = res["cae"]
+        venta.vencimiento_cae = datetime.fromisoformat(res["vencimiento_cae"])
+        if venta.tipo_comprobante.estado_venta is None:
+            venta.estado = EstadoVenta.ticket
+        else:
+            venta.estado = venta.tipo_comprobante.estado_venta
+        if venta.venta_asociada_id is not None:
+            # Importado aquí: los controladores dependen de los servicios
+            from server.core.controllers import MovimientoStockController
+
+            venta.venta_asociada.estado = EstadoVenta.anulado
+            # Generar movimiento de stock inverso
+            MovimientoStockController.create_movimiento_from_devolucion(
+                venta.venta_asociada
+            )
+
+    @classmethod
+    def notificar(cls):
+        cls._evento.set()
+
+    @classmethod
+    def backoff(cls, intentos: int) -> int:
+        "Segundos de espera luego del intento fallido número `intentos`."
+        return min(cls.BACKOFF_BASE * 2 ** (intentos - 1), cls.BACKOFF_MAX)
+
+    @classmethod
+    def _reservar(cls, session) -> int | None:
+        """
+        Reserva la próxima tarea a procesar y devuelve su id, o None si no hay tareas
+        pendientes. La reserva posterga el próximo intento LEASE segundos.
+        """
+        while True:
+            ahora = _ahora()
+            candidata = (
+                session.query(TareaFacturacion.id, TareaFacturacion.proximo_intento)
+                .filter(
+                    TareaFacturacion.estado.in_(
+                        [
+                            EstadoTareaFacturacion.pendiente,
+                            EstadoTareaFacturacion.en_proceso,
+                        ]
+                    ),
+                    TareaFacturacion.proximo_intento <= ahora,
+                )
+                .order_by(TareaFacturacion.proximo_intento, TareaFacturacion.id)
+                .first()
+            )
+            session.commit()
+            if candidata is None:
+                return None
+            begin_write(session)
+            reservada = session.execute(
+                update(TareaFacturacion)
+                .where(
+                    TareaFacturacion.id == candidata.id,
+                    TareaFacturacion.proximo_intento == candidata.proximo_intento,
+                    TareaFacturacion.estado != EstadoTareaFacturacion.completada,
+                    TareaFacturacion.estado != EstadoTareaFacturacion.error,
+                )
+                .values(
+                    estado=EstadoTareaFacturacion.en_proceso,
+                    intentos=TareaFacturacion.intentos + 1,
+                    proximo_intento=ahora + timedelta(seconds=cls.LEASE),
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            session.commit()
+            if reservada:
+                return candidata.id
+
+    @classmethod
+    def _procesar(cls, session, tarea_id: int):
+        tarea = session.get(TareaFacturacion, tarea_id, populate_existing=True)
+        error = None
+        try:
+            res = None
+            # Un intento anterior, fallido o interrumpido, pudo haber sido autorizado
+            if tarea.error is not None or tarea.intentos > 1:
+                res = cls.buscar_autorizado(tarea.venta, session)
+            if res is None:
+                res = cls.solicitar(tarea.venta)
+        except AfipServiceError as e:
+            error = str(e)
+
+        # Finaliza la transacción de lectura para luego reservar el bloqueo de escritura
+        session.commit()
+        begin_write(session)
+        tarea = session.get(TareaFacturacion, tarea_id)
+        if error is None:
+            cls.registrar(tarea.venta, res)
+            tarea.estado = EstadoTareaFacturacion.completada
+            tarea.error = None
+        else:
+            logger.warning(
+                "Intento %s de facturación de la venta %s fallido: %s",
+                tarea.intentos,
+                tarea.venta_id,
+                error,
+            )
+            if tarea.intentos >= cls.MAX_INTENTOS:
+                cls.fallar(tarea, error)
+            else:
+                tarea.error = error
+                tarea.estado = EstadoTareaFacturacion.pendiente
+                tarea.proximo_intento = _ahora() + timedelta(
+                    seconds=cls.backoff(tarea.intentos)
+                )
+        session.commit()
+
+    @classmethod
+    def procesar_pendientes(cls, session, limite: int = None) -> int:
+        """
+        Procesa las tareas pendientes, de a una, hasta que no queden tareas vencidas o
+        hasta procesar `limite` tareas. Devuelve la cantidad de tareas procesadas.
+        """
+        procesadas = 0
+        while limite is None or procesadas < limite:
+            tarea_id = cls._reservar(session)
+            if tarea_id is None:
+                break
+            cls._procesar(session, tarea_id)
+            procesadas += 1
+        return procesadas
+
+    @staticmethod
+    def estado(venta: Venta) -> dict:
+        tarea = TareaFacturacion.query.filter_by(venta_id=venta.id).first()
+        return {
+            "venta_id": venta.id,
+            "estado": venta.estado.value,
+            "numero": venta.numero,
+            "cae": venta.cae,
+            "vencimiento_cae": (
+                venta.vencimiento_cae.isoformat() if venta.vencimiento_cae else None
+            ),
+            "tarea": tarea.to_json() if tarea else None,
+        }
+
+
+class FacturacionWorker(threading.Thread):
+    """
+    Hilo que procesa la cola de facturación. Procesa las tareas pendientes cada
+    POLL_INTERVAL segundos, o de inmediato al ser notificado de una nueva tarea.
+    """
+
+    def __init__(self, app):
+        super().__init__(name="facturacion-worker", daemon=True)
+        self.app = app
+        self._detener = threading.Event()
+
+    def run(self):
+        with self.app.app_context():
+            while not self._detener.is_set():
+                FacturacionQueue._evento.clear()
+                try:
+                    FacturacionQueue.procesar_pendientes(db.session)
+                except Exception:
+                    logger.exception("Error procesando la cola de facturación")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+                FacturacionQueue._evento.wait(FacturacionQueue.POLL_INTERVAL)
+
+    def stop(self):
+        self._detener.set()
+        FacturacionQueue.notificar()
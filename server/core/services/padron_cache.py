@@ -0,0 +1,219 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.exc import IntegrityError
+
+from server.core.models import Cliente, PadronPersona, Proveedor, TipoDocumento
+from server.utils.database import begin_write
+from .afip_service import AfipService, AfipServiceError, PersonaNoEncontradaError
+
+logger = logging.getLogger(__name__)
+
+
+def _ahora() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class _Consulta:
+    "Consulta al padrón en curso, compartida por los hilos que buscan el mismo CUIT"
+
+    def __init__(self):
+        self.terminada = threading.Event()
+        self.datos = None
+        self.error = None
+
+
+class PadronCache:
+    """
+    Cache de las consultas al padrón A13 de AFIP, utilizada para completar los datos de
+    clientes y proveedores a partir del CUIT.
+
+    Los resultados se guardan en la tabla padron_persona: los datos de la persona son
+    vigentes durante TTL segundos, y los CUIT que AFIP no encuentra durante
+    TTL_NO_ENCONTRADA segundos, de modo que un CUIT mal escrito no se consulta en cada
+    pulsación. Los errores de conexión con AFIP no se guardan; si el CUIT tiene datos
+    vencidos, se devuelven éstos.
+
+    Las consultas simultáneas de un mismo CUIT dentro del proceso se agrupan en una única
+    consulta a AFIP.
+
+    Atributos:
+    - TTL: Segundos de vigencia de los datos de una persona.
+    - TTL_NO_ENCONTRADA: Segundos de vigencia de una consulta sin resultados.
+    - PREFETCH_WORKERS: Consultas simultáneas a AFIP en `prefetch`.
+
+    Métodos:
+    - get_persona: Devuelve los datos de una persona, consultando a AFIP si no están
+      en la cache o están vencidos.
+    - prefetch: Consulta y guarda los datos de varios CUIT.
+    - cuits_registrados: Devuelve los CUIT y CUIL de los clientes y proveedores.
+    - vigente: Indica si una fila de la cache está vigente.
+    """
+
+    TTL = 30 * 24 * 60 * 60
+    TTL_NO_ENCONTRADA = 24 * 60 * 60
+    PREFETCH_WORKERS = 4
+    # Tipos de documento (código AFIP) registrados en el padrón: CUIT y CUIL
+    CODIGOS_DOCUMENTO = (80, 86)
+
+    _lock = threading.Lock()
+    _en_curso = {}
+
+    @classmethod
+    def vigente(cls, persona: PadronPersona, ahora: datetime = None) -> bool:
+        ttl = cls.TTL if persona.encontrada else cls.TTL_NO_ENCONTRADA
+        return persona.consultado_at + timedelta(seconds=ttl) > (ahora or _ahora())
+
+    @classmethod
+    def _consultar(cls, cuit: str) -> dict:
+        """
+        Consulta el CUIT en AFIP. Si otro hilo ya lo está consultando, espera su
+        resultado en lugar de realizar una nueva consulta.
+        """
+        with cls._lock:
+            consulta = cls._en_curso.get(cuit)
+            propia = consulta is None
+            if propia:
+                consulta = cls._en_curso[cuit] = _Consulta()
+        if not propia:
+            consulta.terminada.wait()
+        else:
+            try:
+                consulta.datos = AfipService().get_persona(int(cuit))
+            except AfipServiceError as e:
+                consulta.error = e
+            finally:
+                with cls._lock:
+                    del cls._en_curso[cuit]
+                consulta.terminada.set()
+        if consulta.error is not None:
+            raise consulta.error
+        return consulta.datos
+
+    @staticmethod
+    def _guardar(session, cuit: str, datos: dict = None, error: str = None):
+        "Guarda el resultado de una consulta. No confirma la transacción."
+        session.merge(
+            PadronPersona(
+                cuit=cuit,
+                encontrada=datos is not None,
+                datos=datos,
+                error=error,
+                consultado_at=_ahora(),
+            )
+        )
+
+    @classmethod
+    def _commit(cls, session):
+        try:
+            session.commit()
+        except IntegrityError:
+            # Otro proceso guardó el mismo CUIT en simultáneo; se conserva su resultado
+            session.rollback()
+
+    @classmethod
+    def get_persona(cls, session, cuit) -> dict:
+        cuit = str(cuit)
+        persona = session.get(PadronPersona, cuit)
+        if persona is not None and cls.vigente(persona):
+            if not persona.encontrada:
+                raise PersonaNoEncontradaError(persona.error)
+            return persona.datos
+
+        vencidos = None
+        if persona is not None and persona.encontrada:
+            vencidos = persona.datos
+        # Finaliza la transacción de lectura antes de consultar a AFIP
+        session.commit()
+        try:
+            datos = cls._consultar(cuit)
+        except PersonaNoEncontradaError as e:
+            begin_write(session)
+            cls._guardar(session, cuit, error=str(e.original_exception))
+            cls._commit(session)
+            raise
+        except AfipServiceError:
+            if vencidos is None:
+                raise
+            logger.warning("Padrón no disponible, se usan datos vencidos de %s", cuit)
+            return vencidos
+        begin_write(session)
+        cls._guardar(session, cuit, datos=datos)
+        cls._commit(session)
+        return datos
+
+    @classmethod
+    def prefetch(
+        cls, session, cuits, refresh: bool = False, workers: int = None
+    ) -> dict:
+        """
+        Consulta y guarda los datos de los CUIT indicados. Salvo con `refresh`, se omiten
+        los CUIT vigentes en la cache. Devuelve la cantidad de CUIT consultados,
+        encontrados, no encontrados y con error.
+        """
+        cuits = sorted({str(cuit) for cuit in cuits})
+        if not refresh:
+            ahora = _ahora()
+            vigentes = {
+                persona.cuit
+                for persona in session.query(PadronPersona).filter(
+                    PadronPersona.cuit.in_(cuits)
+                )
+                if cls.vigente(persona, ahora)
+            }
+            cuits = [cuit for cuit in cuits if cuit not in vigentes]
+        session.commit()
+
+        def consultar(cuit):
+            try:
+                return cuit, cls._consultar(cuit), None
+            except AfipServiceError as e:
+                return cuit, None, e
+
+        res = {
+            "consultados": len(cuits),
+            "encontrados": 0,
+            "no_encontrados": 0,
+            "errores": 0,
+        }
+        workers = workers or cls.PREFETCH_WORKERS
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for cuit, datos, error in executor.map(consultar, cuits):
+                if isinstance(error, PersonaNoEncontradaError):
+                    res["no_encontrados"] += 1
+                    begin_write(session)
+                    cls._guardar(session, cuit, error=str(error.original_exception))
+                elif error is not None:
+                    res["errores"] += 1
+                    logger.warning("Error consultando el CUIT %s: %s", cuit, error)
+                    continue
+                else:
+                    res["encontrados"] += 1
+                    begin_write(session)
+                    cls._guardar(session, cuit, datos=datos)
+                cls._commit(session)
+        return res
+
+    @classmethod
+    def cuits_registrados(cls, session) -> list:
+        """
+        Devuelve los CUIT y CUIL (11 dígitos, sin guiones) de los clientes y de los
+        proveedores no eliminados.
+        """
+        cuits = set()
+        for model, *filtros in (
+            (Cliente,),
+            (Proveedor, Proveedor.deleted == False),
+        ):
+            nros = (
+                session.query(model.nro_documento)
+                .join(TipoDocumento, model.tipo_documento_id == TipoDocumento.id)
+                .filter(TipoDocumento.codigo_afip.in_(cls.CODIGOS_DOCUMENTO), *filtros)
+                .distinct()
+            )
+            for (nro,) in nros:
+                cuit = "".join(c for c in nro if c.isdigit())
+                if len(cuit) == 11:
+                    cuits.add(cuit)
+        return sorted(cuits)
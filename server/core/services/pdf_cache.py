@@ -0,0 +1,274 @@
+import glob
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from server import BASE_DIR, STATIC_DIR
+from server.config import db
+from server.core.models import EstadoVenta, Venta
+from .pdf_generator import A4PDFGenerator, TicketPDFGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class PDFCache:
+    """
+    Cache en disco de los comprobantes de venta en PDF.
+
+    Cada archivo se identifica por la venta, el tamaño de impresión y un hash de todos
+    los datos que se imprimen (ver `huella`), por lo que una modificación de la venta,
+    del cliente o del comercio genera un archivo nuevo en lugar de devolver uno
+    desactualizado. Sólo se guardan las ventas en los ESTADOS cuyo contenido ya no
+    cambia; el resto se genera en cada impresión.
+
+    El tamaño total de la cache se limita a MAX_BYTES, eliminando los archivos usados
+    hace más tiempo (la fecha de acceso de cada archivo se actualiza al usarlo; la de
+    modificación es la de generación del comprobante).
+
+    Al confirmarse el CAE de una venta, su comprobante se genera en segundo plano en
+    los tamaños PRERENDER, de modo que la primera impresión ya lo encuentra en la cache.
+
+    Atributos:
+    - DIR: Directorio de la cache (PDF_CACHE_DIR).
+    - MAX_BYTES: Tamaño máximo de la cache (PDF_CACHE_MAX_MB, por defecto 256 MB).
+    - PRERENDER: Tamaños generados al obtener el CAE; vacío para deshabilitarlo
+      (PDF_PRERENDER, por defecto "A4").
+
+    Métodos:
+    - normalizar: Normaliza el tamaño de impresión solicitado.
+    - huella: Devuelve el hash de los datos impresos de una venta.
+    - get_pdf: Devuelve el comprobante de una venta, generándolo si no está en cache.
+    - contenido: Devuelve los bytes del comprobante de una venta.
+    - render: Genera el comprobante de una venta.
+    """
+
+    DIR = os.environ.get("PDF_CACHE_DIR", os.path.join(BASE_DIR, "instance", "pdf"))
+    MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_MB", 256)) * 1024 * 1024
+    PRERENDER = tuple(
+        s for s in os.environ.get("PDF_PRERENDER", "A4").split(",") if s.strip()
+    )
+    ESTADOS = (EstadoVenta.facturado, EstadoVenta.ticket, EstadoVenta.anulado)
+    # Se incrementa al modificar los generadores, para descartar los archivos generados
+    VERSION = 2
+    IMAGENES = ("logocabecerafactura.png", "arca-logo.jpg")
+
+    _lock = threading.Lock()
+    _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-prerender")
+
+    @staticmethod
+    def normalizar(size: str) -> str:
+        return "A4" if size == "A4" else "ticket"
+
+    @classmethod
+    def huella(cls, venta: Venta, size: str) -> str:
+        "Hash de los datos de la venta que se imprimen en el comprobante"
+        cliente = venta.cliente
+        comercio = venta.punto_venta.comercio
+        datos = {
+            "version": cls.VERSION,
+            "size": cls.normalizar(size),
+            "imagenes": [
+                os.stat(os.path.join(STATIC_DIR, "pdf_images", imagen)).st_mtime_ns
+                for imagen in cls.IMAGENES
+            ],
+            "venta": [
+                venta.numero,
+                venta.fecha_hora,
+                venta.estado.name,
+                venta.cae,
+                venta.vencimiento_cae,
+                venta.descuento,
+                venta.recargo,
+                venta.gravado,
+                venta.total_iva,
+                venta.total_tributos,
+                venta.total,
+                venta.moneda_cotizacion,
+            ],
+            "tipo_comprobante": [
+                venta.tipo_comprobante.nombre,
+                venta.tipo_comprobante.descripcion,
+                venta.tipo_comprobante.letra,
+                venta.tipo_comprobante.codigo_afip,
+            ],
+            "punto_venta": venta.punto_venta.numero,
+            "comercio": [
+                comercio.cuit,
+                comercio.ingresos_brutos,
+                comercio.inicio_actividades,
+            ],
+            "cliente": [
+                cliente.razon_social,
+                cliente.nro_documento,
+                cliente.direccion,
+                cliente.localidad,
+                cliente.tipo_documento.descripcion,
+                cliente.tipo_documento.codigo_afip,
+                cliente.tipo_responsable.descripcion,
+            ],
+            "moneda": [venta.moneda.nombre, venta.moneda.codigo_afip],
+            "tipo_pago": venta.tipo_pago.nombre,
+            "items": [
+                [
+                    item.articulo.codigo_principal,
+                    item.descripcion,
+                    item.cantidad,
+                    item.precio_unidad,
+                    item.alicuota_iva,
+                    item.subtotal,
+                ]
+                for item in venta.items
+            ],
+            "tributos": [
+                [
+                    tributo.descripcion,
+                    tributo.alicuota,
+                    venta.get_tributo_importe(tributo.id),
+                ]
+                for tributo in venta.tributos
+            ],
+        }
+        contenido = json.dumps(datos, default=str, sort_keys=True).encode()
+        return hashlib.sha256(contenido).hexdigest()[:32]
+
+    @staticmethod
+    def render(venta: Venta, size: str) -> bytes:
+        buffer = io.BytesIO()
+        if size == "A4":
+            A4PDFGenerator(buffer).generate_pdf(venta)
+        else:
+            TicketPDFGenerator(buffer).generate_pdf(venta)
+        return buffer.getvalue()
+
+    @classmethod
+    def _ruta(cls, venta_id: int, size: str, huella: str) -> str:
+        return os.path.join(cls.DIR, f"{venta_id}-{size}-{huella}.pdf")
+
+    @classmethod
+    def get_pdf(cls, venta: Venta, size: str) -> tuple:
+        """
+        Devuelve el comprobante de la venta en el tamaño indicado: (contenido, etag,
+        fecha de generación). El contenido es la ruta del archivo en cache o, si la
+        venta no se guarda en cache, los bytes del PDF.
+        """
+        size = cls.normalizar(size)
+        huella = cls.huella(venta, size)
+        if venta.estado not in cls.ESTADOS:
+            return cls.render(venta, size), huella, datetime.now(timezone.utc)
+
+        ruta = cls._ruta(venta.id, size, huella)
+        try:
+            stat = os.stat(ruta)
+            os.utime(ruta, ns=(time.time_ns(), stat.st_mtime_ns))
+        except FileNotFoundError:
+            cls._guardar(ruta, cls.render(venta, size))
+            stat = os.stat(ruta)
+        return ruta, huella, datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+
+    @classmethod
+    def contenido(cls, venta: Venta, size: str) -> bytes:
+        "Devuelve los bytes del comprobante de la venta (ver get_pdf)"
+        pdf, _, _ = cls.get_pdf(venta, size)
+        if isinstance(pdf, bytes):
+            return pdf
+        try:
+            with open(pdf, "rb") as archivo:
+                return archivo.read()
+        except FileNotFoundError:
+            # Eliminado de la cache por otro proceso
+            return cls.render(venta, cls.normalizar(size))
+
+    @classmethod
+    def _guardar(cls, ruta: str, pdf: bytes):
+        "Guarda el archivo, reemplazando las versiones anteriores de la misma venta"
+        os.makedirs(cls.DIR, exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "wb") as archivo:
+            archivo.write(pdf)
+        os.replace(temporal, ruta)
+        prefijo = os.path.basename(ruta).rsplit("-", 1)[0]
+        for anterior in glob.glob(os.path.join(cls.DIR, f"{prefijo}-*.pdf")):
+            if anterior != ruta:
+                cls._eliminar(anterior)
+        cls._limitar()
+
+    @staticmethod
+    def _eliminar(ruta: str):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            # Otro proceso lo eliminó
+            pass
+
+    @classmethod
+    def _limitar(cls):
+        "Elimina los archivos usados hace más tiempo hasta respetar MAX_BYTES"
+        with cls._lock:
+            archivos = []
+            for entrada in os.scandir(cls.DIR):
+                if entrada.name.endswith(".pdf"):
+                    try:
+                        stat = entrada.stat()
+                    except FileNotFoundError:
+                        continue
+                    archivos.append((stat.st_atime, stat.st_size, entrada.path))
+            total = sum(bytes_ for _, bytes_, _ in archivos)
+            for _, bytes_, ruta in sorted(archivos):
+                if total <= cls.MAX_BYTES:
+                    break
+                cls._eliminar(ruta)
+                total -= bytes_
+
+    @classmethod
+    def _prerender(cls, app, venta_id: int):
+        with app.app_context():
+            try:
+                venta = db.session.get(Venta, venta_id)
+                if venta is not None and venta.estado in cls.ESTADOS:
+                    for size in cls.PRERENDER:
+                        cls.get_pdf(venta, size)
+            except Exception:
+                logger.exception(
+                    "Error generando el comprobante de la venta %s", venta_id
+                )
+            finally:
+                db.session.remove()
+
+    @classmethod
+    def prerender(cls, venta_ids):
+        "Genera en segundo plano los comprobantes de las ventas indicadas"
+        if not cls.PRERENDER or not has_app_context() or current_app.testing:
+            return
+        app = current_app._get_current_object()
+        for venta_id in venta_ids:
+            cls._executor.submit(cls._prerender, app, venta_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _registrar_ventas_con_cae(session, flush_context):
+    "Registra las ventas cuyo CAE se guardó en el flush, para generar su comprobante"
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Venta) and obj.cae:
+            if inspect(obj).attrs.cae.history.has_changes():
+                session.info.setdefault("pdf_prerender", set()).add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _prerender_ventas_con_cae(session):
+    venta_ids = session.info.pop("pdf_prerender", None)
+    if venta_ids:
+        PDFCache.prerender(venta_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_ventas_con_cae(session):
+    session.info.pop("pdf_prerender", None)
@@ -0,0 +1,384 @@
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+import time as time_
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import select
+
+from server import create_app
+from server.config import db
+from server.core.models import EstadoVenta, Venta
+from .pdf_cache import PDFCache
+
+_OBJETO = re.compile(rb"(\d+) 0 obj\s")
+_REFERENCIA = re.compile(rb"(\d+) 0 R\b")
+# /Length directo ("/Length 120") o referencia a otro objeto ("/Length 7 0 R")
+_LENGTH = re.compile(rb"/Length (\d+)(?: (\d+) R)?")
+_TIPO = re.compile(rb"/Type /(\w+)")
+
+# Aplicación de cada proceso del pool (ver _iniciar_worker)
+_worker_app = None
+
+
+def _iniciar_worker(database_uri: str):
+    "Inicializa un proceso del pool con su propia conexión a la base de datos"
+    global _worker_app
+    _worker_app = create_app(database_uri=database_uri)
+    db.init_app(_worker_app)
+    _worker_app.app_context().push()
+
+
+def _comprobante_worker(venta_id: int, size: str) -> tuple:
+    try:
+        return ExportacionPDF.comprobante(db.session, venta_id, size)
+    finally:
+        db.session.remove()
+
+
+class _PDFUnido:
+    """
+    Une los comprobantes generados por ReportLab en un único PDF, escribiendo cada
+    uno a medida que se agrega: sólo se conservan la posición de cada objeto en el
+    archivo y las páginas, no el contenido de los comprobantes ya agregados.
+
+    Los objetos sin referencias a otros objetos que se repiten entre comprobantes
+    (imágenes y fuentes) se escriben una sola vez.
+    """
+
+    # Objetos 1 y 2: árbol de páginas y catálogo, escritos al cerrar el archivo
+    PAGINAS, CATALOGO = 1, 2
+
+    def __init__(self):
+        self.posiciones = [None, None]
+        self.paginas = []
+        self.escritos = 0
+        self.repetidos = {}
+
+    def _salida(self, datos: bytes) -> bytes:
+        self.escritos += len(datos)
+        return datos
+
+    def _objeto(self, numero: int, cuerpo: bytes) -> bytes:
+        self.posiciones[numero - 1] = self.escritos
+        return self._salida(b"%d 0 obj\n%sendobj\n" % (numero, cuerpo))
+
+    def inicio(self) -> bytes:
+        return self._salida(b"%PDF-1.4\n%\x93\x8c\x8b\x9e\n")
+
+    @staticmethod
+    def _longitud(pdf: bytes, diccionario: bytes) -> int:
+        "Longitud del stream según el /Length de su diccionario"
+        longitud = _LENGTH.search(diccionario)
+        if longitud is None:
+            raise ValueError("Stream sin /Length en el comprobante")
+        if longitud.group(2) is None:
+            return int(longitud.group(1))
+        # Referencia indirecta: el objeto referenciado contiene sólo el entero
+        referencia = re.search(
+            rb"(?<!\d)%s %s obj\s*(\d+)\s*endobj" % longitud.group(1, 2), pdf
+        )
+        if referencia is None:
+            raise ValueError("/Length indirecto no encontrado en el comprobante")
+        return int(referencia.group(1))
+
+    @classmethod
+    def _objetos(cls, pdf: bytes) -> dict:
+        "Objetos del PDF: número -> (diccionario, contenido del stream o b'')"
+        objetos = {}
+        posicion = 0
+        while (encontrado := _OBJETO.search(pdf, posicion)) is not None:
+            inicio = encontrado.end()
+            fin = pdf.index(b"endobj", inicio)
+            stream = pdf.find(b"stream", inicio, fin)
+            if stream == -1:
+                objetos[int(encontrado.group(1))] = (pdf[inicio:fin], b"")
+            else:
+                # El stream puede contener cualquier byte: se delimita por /Length
+                diccionario = pdf[inicio:stream]
+                datos = stream + len(b"stream")
+                datos += 2 if pdf[datos : datos + 2] == b"\r\n" else 1
+                datos += cls._longitud(pdf, diccionario)
+                fin = pdf.index(b"endobj", datos)
+                objetos[int(encontrado.group(1))] = (diccionario, pdf[stream:fin])
+            posicion = fin + len(b"endobj")
+        return objetos
+
+    def agregar(self, pdf: bytes) -> bytes:
+        "Agrega las páginas de un comprobante y devuelve los bytes a escribir"
+        objetos = self._objetos(pdf)
+        trailer = pdf[pdf.rindex(b"trailer") :]
+        raiz = int(re.search(rb"/Root (\d+) 0 R", trailer).group(1))
+        info = re.search(rb"/Info (\d+) 0 R", trailer)
+        omitidos = {raiz} | ({int(info.group(1))} if info else set())
+
+        # Los nodos del árbol de páginas se reemplazan por el árbol del PDF unido
+        numeros = {}
+        paginas = []
+        nodos = [int(re.search(rb"/Pages (\d+) 0 R", objetos[raiz][0]).group(1))]
+        while nodos:
+            nodo = nodos.pop(0)
+            diccionario = objetos[nodo][0]
+            if _TIPO.search(diccionario).group(1) == b"Pages":
+                omitidos.add(nodo)
+                numeros[nodo] = self.PAGINAS
+                kids = re.search(rb"/Kids \[(.*?)\]", diccionario, re.S).group(1)
+                nodos[:0] = [int(n) for n in _REFERENCIA.findall(kids)]
+            else:
+                paginas.append(nodo)
+
+        salida = []
+        for numero, (diccionario, stream) in objetos.items():
+            if numero in omitidos:
+                continue
+            if _REFERENCIA.search(diccionario) is None:
+                huella = hashlib.sha1(diccionario + stream).digest()
+                if huella in self.repetidos:
+                    numeros[numero] = self.repetidos[huella]
+                    continue
+                self.repetidos[huella] = len(self.posiciones) + 1
+            self.posiciones.append(None)
+            numeros[numero] = len(self.posiciones)
+
+        for numero, (diccionario, stream) in objetos.items():
+            if numero in omitidos:
+                continue
+            nuevo = numeros[numero]
+            if self.posiciones[nuevo - 1] is not None:
+                # Objeto repetido, ya escrito
+                continue
+            diccionario = _REFERENCIA.sub(
+                lambda r: b"%d 0 R" % numeros[int(r.group(1))], diccionario
+            )
+            salida.append(self._objeto(nuevo, diccionario + stream))
+        self.paginas.extend(numeros[pagina] for pagina in paginas)
+        return b"".join(salida)
+
+    def fin(self) -> bytes:
+        "Escribe el árbol de páginas, el catálogo y la tabla de referencias"
+        kids = b" ".join(b"%d 0 R" % pagina for pagina in self.paginas)
+        salida = [
+            self._objeto(
+                self.PAGINAS,
+                b"<< /Type /Pages /Count %d /Kids [ %s ] >>\n"
+                % (len(self.paginas), kids),
+            ),
+            self._objeto(
+                self.CATALOGO, b"<< /Type /Catalog /Pages %d 0 R >>\n" % self.PAGINAS
+            ),
+        ]
+        xref = self.escritos
+        tamaño = len(self.posiciones) + 1
+        salida.append(b"xref\n0 %d\n0000000000 65535 f \n" % tamaño)
+        salida.extend(b"%010d 00000 n \n" % posicion for posicion in self.posiciones)
+        salida.append(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (tamaño, self.CATALOGO, xref)
+        )
+        return b"".join(salida)
+
+
+class _Salida:
+    "Archivo de sólo escritura que acumula los bytes hasta que se leen"
+
+    def __init__(self):
+        self.bloques = []
+
+    def write(self, datos) -> int:
+        self.bloques.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def leer(self) -> bytes:
+        datos = b"".join(self.bloques)
+        self.bloques.clear()
+        return datos
+
+
+class ExportacionPDF:
+    """
+    Exportación de los comprobantes de las ventas de un período en un único PDF o en
+    un archivo ZIP con un PDF por venta.
+
+    Los comprobantes se generan en WORKERS procesos, ya que la generación con ReportLab
+    no libera el GIL, y se envían en el orden de las ventas a medida que se generan.
+    Los procesos se inician con la primera exportación y se reutilizan en las
+    siguientes.
+    Sólo se mantienen en memoria los comprobantes en proceso (dos por worker), por lo
+    que la memoria utilizada no depende de la cantidad de ventas. Los comprobantes se
+    obtienen de PDFCache, por lo que la exportación también completa la cache.
+
+    Con una base de datos en memoria (o WORKERS = 0) los comprobantes se generan en el
+    proceso actual.
+
+    Atributos:
+    - FORMATOS: Formatos de exportación.
+    - ESTADOS: Estados de las ventas exportadas, si no se indican otros.
+    - WORKERS: Procesos utilizados (PDF_EXPORT_WORKERS, por defecto uno por CPU).
+
+    Métodos:
+    - filtros: Devuelve las condiciones de las ventas a exportar.
+    - comprobante: Devuelve el nombre de archivo y el contenido del comprobante.
+    - comprobantes: Genera los comprobantes de las ventas que cumplen los filtros.
+    - exportar: Genera el archivo de exportación, en bloques.
+    """
+
+    FORMATOS = ("pdf", "zip")
+    ESTADOS = PDFCache.ESTADOS
+    WORKERS = int(os.environ.get("PDF_EXPORT_WORKERS", os.cpu_count() or 1))
+    # Comprobantes en proceso por cada worker
+    PENDIENTES_POR_WORKER = 2
+
+    _lock = threading.Lock()
+    _pools = {}
+
+    @staticmethod
+    def filtros(
+        desde: date = None,
+        hasta: date = None,
+        tipo_comprobante_ids: list = None,
+        punto_venta_ids: list = None,
+        estados: list = None,
+    ) -> list:
+        """
+        Condiciones de las ventas no eliminadas entre las fechas indicadas (inclusive),
+        opcionalmente de ciertos tipos de comprobante, puntos de venta y estados.
+        """
+        filtros = [Venta.deleted == False]
+        if desde is not None:
+            filtros.append(Venta.fecha_hora >= datetime.combine(desde, time()))
+        if hasta is not None:
+            filtros.append(
+                Venta.fecha_hora < datetime.combine(hasta + timedelta(days=1), time())
+            )
+        if tipo_comprobante_ids:
+            filtros.append(Venta.tipo_comprobante_id.in_(tipo_comprobante_ids))
+        if punto_venta_ids:
+            filtros.append(Venta.punto_venta_id.in_(punto_venta_ids))
+        estados = [
+            e if isinstance(e, EstadoVenta) else EstadoVenta[e]
+            for e in estados or ExportacionPDF.ESTADOS
+        ]
+        filtros.append(Venta.estado.in_(estados))
+        return filtros
+
+    @staticmethod
+    def comprobante(session, venta_id: int, size: str) -> tuple:
+        "Nombre de archivo y contenido del comprobante de la venta"
+        venta = session.get(Venta, venta_id)
+        tipo = re.sub(r"\W+", "_", venta.tipo_comprobante.nombre).strip("_")
+        nombre = f"{tipo}_{venta.nro_comprobante()}.pdf"
+        return nombre, PDFCache.contenido(venta, size)
+
+    @classmethod
+    def _workers(cls, session, workers: int = None) -> int:
+        workers = cls.WORKERS if workers is None else workers
+        if session.get_bind().url.database in (None, "", ":memory:"):
+            # Los procesos no pueden acceder a una base de datos en memoria
+            return 0
+        return workers
+
+    @classmethod
+    def _pool(cls, database_uri: str, workers: int) -> ProcessPoolExecutor:
+        """
+        Pool de procesos de la base de datos, creado con la primera exportación y
+        reutilizado por las siguientes, ya que iniciar cada proceso lleva más tiempo
+        que generar varios comprobantes.
+        """
+        with cls._lock:
+            executor = cls._pools.get((database_uri, workers))
+            if executor is None:
+                executor = cls._pools[(database_uri, workers)] = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_iniciar_worker,
+                    initargs=(database_uri,),
+                )
+            return executor
+
+    @classmethod
+    def comprobantes(cls, session, filtros: list, size: str, workers: int = None):
+        """
+        Genera el nombre de archivo y el contenido del comprobante de cada venta que
+        cumple los filtros, ordenadas por fecha.
+        """
+        venta_ids = session.scalars(
+            select(Venta.id).where(*filtros).order_by(Venta.fecha_hora, Venta.id)
+        ).yield_per(1000)
+        workers = cls._workers(session, workers)
+        if not workers:
+            for venta_id in venta_ids:
+                yield cls.comprobante(session, venta_id, size)
+                session.expunge_all()
+            return
+
+        database_uri = session.get_bind().url.render_as_string(hide_password=False)
+        executor = cls._pool(database_uri, workers)
+        pendientes = deque()
+        try:
+            for venta_id in venta_ids:
+                pendientes.append(
+                    executor.submit(_comprobante_worker, venta_id, size)
+                )
+                if len(pendientes) >= workers * cls.PENDIENTES_POR_WORKER:
+                    yield pendientes.popleft().result()
+            while pendientes:
+                yield pendientes.popleft().result()
+        except BrokenProcessPool:
+            with cls._lock:
+                cls._pools.pop((database_uri, workers), None)
+            raise
+        finally:
+            # Exportación interrumpida (por ejemplo, el cliente cerró la conexión)
+            for pendiente in pendientes:
+                pendiente.cancel()
+
+    @classmethod
+    def exportar(
+        cls,
+        session,
+        formato: str = "pdf",
+        size: str = "A4",
+        workers: int = None,
+        **filtros,
+    ):
+        """
+        Devuelve un generador de los bloques de bytes de un PDF con los comprobantes de
+        las ventas que cumplen los filtros (ver `filtros`) o de un archivo ZIP con un
+        PDF por venta.
+        """
+        if formato not in cls.FORMATOS:
+            raise ValueError(f"Formato de exportación inválido: {formato}")
+        comprobantes = cls.comprobantes(
+            session, cls.filtros(**filtros), size, workers
+        )
+        if formato == "pdf":
+            return cls._pdf(comprobantes)
+        return cls._zip(comprobantes)
+
+    @staticmethod
+    def _pdf(comprobantes):
+        pdf = _PDFUnido()
+        yield pdf.inicio()
+        for _, contenido in comprobantes:
+            yield pdf.agregar(contenido)
+        yield pdf.fin()
+
+    @staticmethod
+    def _zip(comprobantes):
+        salida = _Salida()
+        fecha = time_.localtime()[:6]
+        with zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as archivo:
+            for nombre, contenido in comprobantes:
+                archivo.writestr(
+                    zipfile.ZipInfo(nombre, fecha), contenido, zipfile.ZIP_DEFLATED
+                )
+                yield salida.leer()
+        yield salida.leer()
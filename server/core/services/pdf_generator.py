@@ -1,10 +1,14 @@
 import segno
 import base64
+import copy
 import json
 import io
 import locale
 import os
+import threading
+import reportlab
 from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfdoc
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm, inch
 from reportlab.platypus import Table, TableStyle
@@ -16,6 +20,10 @@ from server import STATIC_DIR
 from server.core.models import Venta, EstadoVenta
 
 
+# Versión de ReportLab (ver requirements.txt) cuyos detalles internos se utilizan para
+# reutilizar las imágenes entre comprobantes (ver BasePDFGenerator._registrar_imagen)
+REPORTLAB_VERSION_IMAGENES = "4.2.2"
+
 locale.setlocale(locale.LC_ALL, "es_AR.UTF-8")
 """
 Run following commands if locale not working:
@@ -28,21 +36,17 @@ Then run `locale -a` to check if locale is installed
 """
 
 
-class BasePDFGenerator(canvas.Canvas):
-    def __init__(self, *args, **kwargs):
-        canvas.Canvas.__init__(self, *args, **kwargs)
-        self._saved_page_states = []
-        self.header_image = os.path.join(
-            STATIC_DIR, "pdf_images", "logocabecerafactura.png"
-        )
-        self.afip_logo = os.path.join(STATIC_DIR, "pdf_images", "arca-logo.jpg")
+class ComprobanteMixin:
+    """
+    Datos de la venta (self.venta) comunes a los distintos formatos de comprobante.
+    """
 
     def truncate_text(self, text, max_length):
         if len(text) > max_length:
             return text[: max_length - 3] + "..."
         return text
 
-    def generate_qr_code(self):
+    def qr_url(self):
         """
         El código QR deberá codificar el siguiente texto:
         {URL}?p={DATOS_CMP_BASE_64}
@@ -71,42 +75,99 @@ class BasePDFGenerator(canvas.Canvas):
         }
         data_json = json.dumps(data)
         data_base64 = base64.b64encode(data_json.encode()).decode()
-        qr_code = segno.make(f"{url}?p={data_base64}")
-        qr_code_io = io.BytesIO()
-        qr_code.save(qr_code_io, kind="png", scale=3)
-        qr_code_io.seek(0)
-        return qr_code_io
+        return f"{url}?p={data_base64}"
 
     def is_remito(self):
         tipo_nombre = (self.venta.tipo_comprobante.nombre or "").lower()
         return "remito" in tipo_nombre
 
 
+class BasePDFGenerator(ComprobanteMixin, canvas.Canvas):
+    # Imágenes ya codificadas para el PDF, compartidas por todos los comprobantes que
+    # genera el proceso: ruta -> (st_mtime_ns, PDFImageXObject)
+    _imagenes = {}
+    _imagenes_lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        canvas.Canvas.__init__(self, *args, **kwargs)
+        self.header_image = os.path.join(
+            STATIC_DIR, "pdf_images", "logocabecerafactura.png"
+        )
+        self.afip_logo = os.path.join(STATIC_DIR, "pdf_images", "arca-logo.jpg")
+
+    def _registrar_imagen(self, ruta: str):
+        """
+        Registra en el documento la imagen del archivo ya codificada por el proceso,
+        que se lee y codifica sólo la primera vez o si fue modificado. drawImage la
+        encuentra registrada con el nombre que le asigna y no vuelve a codificarla.
+
+        Depende de detalles internos de ReportLab (el nombre de la imagen y el registro
+        de objetos del documento), por lo que sólo se aplica con la versión
+        REPORTLAB_VERSION_IMAGENES: con otra, drawImage codifica la imagen.
+        """
+        if reportlab.Version != REPORTLAB_VERSION_IMAGENES:
+            return
+        from reportlab.pdfgen.canvas import _digester
+
+        modificado = os.stat(ruta).st_mtime_ns
+        imagen = self._imagenes.get(ruta)
+        if imagen is None or imagen[0] != modificado:
+            with self._imagenes_lock:
+                imagen = self._imagenes.get(ruta)
+                if imagen is None or imagen[0] != modificado:
+                    # Mismo nombre que asigna drawImage a la imagen de un archivo
+                    xobject = pdfdoc.PDFImageXObject(
+                        _digester(f"{ruta}None".encode()), ImageReader(ruta)
+                    )
+                    imagen = self._imagenes[ruta] = (modificado, xobject)
+        xobject = imagen[1]
+        nombre = self._doc.getXObjectName(xobject.name)
+        if nombre not in self._doc.idToObject:
+            # El documento registra el objeto que recibe, por lo que se le entrega
+            # una copia que comparte los datos ya codificados
+            xobject = copy.copy(xobject)
+            self._doc.Reference(xobject, nombre)
+            self._doc.addForm(xobject.name, xobject)
+
+    def drawImage(self, image, *args, **kwargs):
+        "Reutiliza las imágenes de archivos ya codificadas por el proceso"
+        if isinstance(image, str) and kwargs.get("mask") is None:
+            self._registrar_imagen(image)
+        return canvas.Canvas.drawImage(self, image, *args, **kwargs)
+
+    def generate_qr_code(self):
+        "Imagen PNG del código QR de AFIP (ver qr_url)"
+        qr_code = segno.make(self.qr_url())
+        qr_code_io = io.BytesIO()
+        qr_code.save(qr_code_io, kind="png", scale=3)
+        qr_code_io.seek(0)
+        return qr_code_io
+
+
 class A4PDFGenerator(BasePDFGenerator):
     def __init__(self, *args, **kwargs):
         BasePDFGenerator.__init__(self, *args, **kwargs)
         self.setPageSize(A4)
 
     def showPage(self):
-        "Add a page, then start a new page"
-        self._saved_page_states.append(dict(self.__dict__))
-        self._startPage()
+        "Add the page number, then start a new page"
+        # El total de páginas se conoce al guardar, donde se define el formulario
+        self.doForm(f"numero_pagina_{self._pageNumber}")
+        canvas.Canvas.showPage(self)
 
     def save(self):
-        """Add page numbers to each page and save the PDF"""
-        num_pages = len(self._saved_page_states)
-        for state in self._saved_page_states:
-            self.__dict__.update(state)
-            self.draw_page_number(num_pages)
-            canvas.Canvas.showPage(self)
+        """Define the page number of each page and save the PDF"""
+        num_pages = self._pageNumber - 1
+        for page in range(1, num_pages + 1):
+            self.beginForm(f"numero_pagina_{page}")
+            self.draw_page_number(page, num_pages)
+            self.endForm()
         canvas.Canvas.save(self)
 
-    def draw_page_number(self, page_count):
+    def draw_page_number(self, page, page_count):
         "Draw page number at the bottom of each page"
         self.setFont("Helvetica", 10)
-        self.drawRightString(
-            200 * mm, 10 * mm, "Pág. %d / %d" % (self._pageNumber, page_count)
-        )
+        self.drawRightString(200 * mm, 10 * mm, "Pág. %d / %d" % (page, page_count))
 
     def draw_header(self):
         "Draw a header at the top of the page"
@@ -358,25 +419,20 @@ class A4PDFGenerator(BasePDFGenerator):
         self.setTitle(
             f"A4 {self.venta.tipo_comprobante.nombre}, N° {self.venta.nro_comprobante()}"
         )
-        if len(self.venta_items) > 20:
-            "If the sale has more than 20 items, create multiple pages"
-            for i in range(0, len(self.venta_items), 20):
-                self.items = self.venta_items[i : i + 20]
-                self.draw_header()
-                self.draw_customer_data()
-                self.draw_item_table()
-                self.draw_total()
-                if self.venta.estado == EstadoVenta.facturado:
-                    self.draw_CAE()
-                self.showPage()
-        else:
-            self.items = self.venta_items
-            self.draw_header()
-            self.draw_customer_data()
+        # Las partes de la página que no dependen de los items se dibujan una sola vez,
+        # en un formulario que se repite en cada página
+        self.beginForm("pagina")
+        self.draw_header()
+        self.draw_customer_data()
+        self.draw_total()
+        if self.venta.estado == EstadoVenta.facturado:
+            self.draw_CAE()
+        self.endForm()
+        "If the sale has more than 20 items, create multiple pages"
+        for i in range(0, len(self.venta_items) or 1, 20):
+            self.items = self.venta_items[i : i + 20]
+            self.doForm("pagina")
             self.draw_item_table()
-            self.draw_total()
-            if self.venta.estado == EstadoVenta.facturado:
-                self.draw_CAE()
             self.showPage()
         self.save()
 
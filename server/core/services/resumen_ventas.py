@@ -0,0 +1,492 @@
+import pytz
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import Date, and_, delete, event, func, inspect, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from server.auth.models import Usuario
+from server.core.models import (
+    Articulo,
+    EstadoVenta,
+    TipoComprobante,
+    Venta,
+    VentaItem,
+    VentaResumenArticulo,
+    VentaResumenComprobante,
+)
+
+local_tz = pytz.timezone("America/Argentina/Buenos_Aires")
+
+# Campos que determinan el aporte de una venta o de un renglón a los resúmenes
+CAMPOS_VENTA = (
+    "estado",
+    "deleted",
+    "fecha_hora",
+    "tipo_comprobante_id",
+    "venta_asociada_id",
+    "total",
+)
+CAMPOS_ITEM = ("articulo_id", "venta_id", "cantidad", "subtotal")
+
+
+def _hoy() -> date:
+    return datetime.now(tz=local_tz).date()
+
+
+def _estado(valor) -> EstadoVenta | None:
+    "El estado de una venta puede asignarse por nombre (ej. 'ticket') antes del flush"
+    if valor is None or isinstance(valor, EstadoVenta):
+        return valor
+    try:
+        return EstadoVenta[valor]
+    except KeyError:
+        return EstadoVenta(valor)
+
+
+def _anterior(obj, campo: str):
+    "Valor del campo antes de las modificaciones pendientes de la sesión"
+    history = inspect(obj).attrs[campo].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, campo)
+
+
+class ResumenVentas:
+    """
+    Resúmenes diarios de las ventas, por artículo y por tipo de comprobante (ver
+    VentaResumenArticulo y VentaResumenComprobante), utilizados por los reportes de
+    ventas.
+
+    Se consideran las ventas confirmadas (ESTADOS) no eliminadas; las ventas anuladas
+    y las notas de crédito que las anulan (ventas con venta asociada) no se
+    consideran. Los resúmenes se actualizan en la misma transacción en la que se
+    confirma, anula o modifica una venta: antes de cada flush se descuenta de los
+    resúmenes el aporte de las ventas afectadas, tal como está guardado, y luego del
+    flush se suma su nuevo aporte.
+
+    Los reportes leen los resúmenes de los días cerrados y agregan las ventas del día
+    actual a partir de los renglones.
+
+    Métodos:
+    - computable: Indica si una venta se considera en los resúmenes.
+    - reconstruir: Recalcula los resúmenes de un rango de fechas.
+    - articulos_mas_vendidos: Devuelve los artículos más vendidos en un rango de fechas.
+    - por_comprobante: Devuelve los totales por tipo de comprobante.
+    - por_vendedor: Devuelve los totales de uno o varios vendedores.
+    """
+
+    ESTADOS = (
+        EstadoVenta.facturado,
+        EstadoVenta.ticket,
+        EstadoVenta.ticket_mecanico,
+        EstadoVenta.pendiente_cae,
+        EstadoVenta.error_cae,
+    )
+    AGRUPACIONES = ("dia", "semana", "mes")
+
+    @classmethod
+    def computable(cls, venta: Venta, anterior: bool = False) -> bool:
+        """
+        Indica si la venta se considera en los resúmenes; con `anterior`, según los
+        valores previos a las modificaciones pendientes de la sesión.
+        """
+        valor = _anterior if anterior else getattr
+        return (
+            _estado(valor(venta, "estado")) in cls.ESTADOS
+            and not valor(venta, "deleted")
+            and valor(venta, "venta_asociada_id") is None
+        )
+
+    @classmethod
+    def _condicion(cls):
+        return and_(
+            Venta.estado.in_(cls.ESTADOS),
+            Venta.deleted == False,
+            Venta.venta_asociada_id.is_(None),
+        )
+
+    @staticmethod
+    def _fecha():
+        return func.date(Venta.fecha_hora, type_=Date)
+
+    @staticmethod
+    def _insert(connection, model):
+        if connection.dialect.name == "postgresql":
+            return postgresql.insert(model)
+        return sqlite.insert(model)
+
+    @classmethod
+    def _aplicar(cls, connection, condicion, signo: int = 1):
+        """
+        Suma (o resta, con signo -1) a los resúmenes el aporte de las ventas que
+        cumplen la condición, con una sentencia INSERT ... ON CONFLICT DO UPDATE por
+        resumen.
+        """
+        fecha = cls._fecha().label("fecha")
+        consultas = {
+            VentaResumenArticulo: select(
+                fecha,
+                VentaItem.articulo_id,
+                (signo * func.sum(VentaItem.cantidad)).label("cantidad"),
+                (signo * func.sum(VentaItem.subtotal)).label("total"),
+            )
+            .join(Venta, VentaItem.venta_id == Venta.id)
+            .group_by(fecha, VentaItem.articulo_id),
+            VentaResumenComprobante: select(
+                fecha,
+                Venta.tipo_comprobante_id,
+                (signo * func.count(Venta.id)).label("ventas"),
+                (signo * func.sum(Venta.total)).label("total"),
+            ).group_by(fecha, Venta.tipo_comprobante_id),
+        }
+        for model, consulta in consultas.items():
+            consulta = consulta.where(condicion, cls._condicion())
+            columnas = [c.name for c in consulta.selected_columns]
+            insert = cls._insert(connection, model).from_select(columnas, consulta)
+            claves = [c.name for c in model.__table__.primary_key]
+            connection.execute(
+                insert.on_conflict_do_update(
+                    index_elements=claves,
+                    set_={
+                        columna: model.__table__.c[columna] + insert.excluded[columna]
+                        for columna in columnas
+                        if columna not in claves
+                    },
+                )
+            )
+
+    @classmethod
+    def reconstruir(cls, session, desde: date = None, hasta: date = None):
+        """
+        Recalcula los resúmenes de las ventas entre las fechas indicadas (por defecto,
+        todas) a partir de las ventas guardadas. No confirma la transacción.
+        """
+        connection = session.connection()
+        for model in (VentaResumenArticulo, VentaResumenComprobante):
+            borrar = delete(model)
+            if desde is not None:
+                borrar = borrar.where(model.fecha >= desde)
+            if hasta is not None:
+                borrar = borrar.where(model.fecha <= hasta)
+            connection.execute(borrar)
+        condicion = and_(
+            Venta.fecha_hora >= datetime.combine(desde or date.min, time()),
+            Venta.fecha_hora <= datetime.combine(hasta or date.max, time.max),
+        )
+        cls._aplicar(connection, condicion)
+
+    @staticmethod
+    def _rango(desde: date = None, hasta: date = None) -> tuple:
+        """
+        Divide el rango de fechas en los días cerrados, que se leen de los resúmenes,
+        y el tramo desde el inicio del día actual, que se agrega desde las ventas.
+        Devuelve las condiciones (resumen, ventas) correspondientes; None si el rango
+        no incluye días de ese tramo.
+        """
+        hoy = _hoy()
+        cerrados = None
+        if desde is None or desde < hoy:
+            cerrados = [lambda model: model.fecha < hoy]
+            if desde is not None:
+                cerrados.append(lambda model: model.fecha >= desde)
+            if hasta is not None:
+                cerrados.append(lambda model: model.fecha <= hasta)
+        actuales = None
+        if hasta is None or hasta >= hoy:
+            inicio = datetime.combine(max(desde or hoy, hoy), time())
+            actuales = [Venta.fecha_hora >= inicio]
+            if hasta is not None:
+                actuales.append(
+                    Venta.fecha_hora < datetime.combine(hasta + timedelta(days=1), time())
+                )
+        return cerrados, actuales
+
+    @classmethod
+    def articulos_mas_vendidos(
+        cls, session, desde: date = None, hasta: date = None, limite: int = 10
+    ) -> list:
+        """
+        Devuelve los artículos más vendidos entre las fechas indicadas (inclusive):
+        filas (id, codigo_principal, descripcion, cantidad_total, total_vendido),
+        ordenadas por cantidad vendida.
+        """
+        cerrados, actuales = cls._rango(desde, hasta)
+        partes = []
+        if cerrados is not None:
+            partes.append(
+                select(
+                    VentaResumenArticulo.articulo_id,
+                    VentaResumenArticulo.cantidad,
+                    VentaResumenArticulo.total,
+                ).where(*(f(VentaResumenArticulo) for f in cerrados))
+            )
+        if actuales is not None:
+            partes.append(
+                select(
+                    VentaItem.articulo_id,
+                    VentaItem.cantidad,
+                    VentaItem.subtotal.label("total"),
+                )
+                .join(Venta, VentaItem.venta_id == Venta.id)
+                .where(cls._condicion(), *actuales)
+            )
+        if not partes:
+            return []
+        ventas = union_all(*partes).subquery()
+        cantidad = func.sum(ventas.c.cantidad)
+        return session.execute(
+            select(
+                Articulo.id,
+                Articulo.codigo_principal,
+                Articulo.descripcion,
+                cantidad.label("cantidad_total"),
+                func.sum(ventas.c.total).label("total_vendido"),
+            )
+            .join(ventas, ventas.c.articulo_id == Articulo.id)
+            .group_by(Articulo.id, Articulo.codigo_principal, Articulo.descripcion)
+            .having(cantidad != 0)
+            .order_by(cantidad.desc(), Articulo.id)
+            .limit(limite)
+        ).all()
+
+    @classmethod
+    def por_comprobante(cls, session, desde: date = None, hasta: date = None) -> list:
+        """
+        Devuelve la cantidad de ventas y el total vendido entre las fechas indicadas
+        (inclusive), por tipo de comprobante: filas (id, descripcion, ventas, total).
+        """
+        cerrados, actuales = cls._rango(desde, hasta)
+        partes = []
+        if cerrados is not None:
+            partes.append(
+                select(
+                    VentaResumenComprobante.tipo_comprobante_id,
+                    VentaResumenComprobante.ventas,
+                    VentaResumenComprobante.total,
+                ).where(*(f(VentaResumenComprobante) for f in cerrados))
+            )
+        if actuales is not None:
+            partes.append(
+                select(
+                    Venta.tipo_comprobante_id,
+                    func.count(Venta.id).label("ventas"),
+                    func.sum(Venta.total).label("total"),
+                )
+                .where(cls._condicion(), *actuales)
+                .group_by(Venta.tipo_comprobante_id)
+            )
+        if not partes:
+            return []
+        ventas = union_all(*partes).subquery()
+        cantidad = func.sum(ventas.c.ventas)
+        return session.execute(
+            select(
+                TipoComprobante.id,
+                TipoComprobante.descripcion,
+                cantidad.label("ventas"),
+                func.sum(ventas.c.total).label("total"),
+            )
+            .join(ventas, ventas.c.tipo_comprobante_id == TipoComprobante.id)
+            .group_by(TipoComprobante.id, TipoComprobante.descripcion)
+            .having(cantidad != 0)
+            .order_by(TipoComprobante.id)
+        ).all()
+
+    @staticmethod
+    def filtros_vendedor(
+        usuario_ids: list,
+        desde: date = None,
+        hasta: date = None,
+        tipo_comprobante_ids: list = None,
+        estados: list = None,
+    ) -> list:
+        """
+        Condiciones de las ventas no eliminadas de los vendedores indicados entre las
+        fechas indicadas (inclusive), opcionalmente de ciertos tipos de comprobante y
+        estados.
+        """
+        filtros = [Venta.deleted == False, Venta.created_by.in_(usuario_ids)]
+        if desde is not None:
+            filtros.append(Venta.fecha_hora >= datetime.combine(desde, time()))
+        if hasta is not None:
+            filtros.append(
+                Venta.fecha_hora < datetime.combine(hasta + timedelta(days=1), time())
+            )
+        if tipo_comprobante_ids is not None:
+            filtros.append(Venta.tipo_comprobante_id.in_(tipo_comprobante_ids))
+        if estados is not None:
+            filtros.append(Venta.estado.in_([_estado(e) for e in estados]))
+        return filtros
+
+    @staticmethod
+    def _periodo(dialecto: str, agrupacion: str):
+        "Expresión SQL de la fecha de inicio del día, semana (lunes) o mes de la venta"
+        if agrupacion not in ResumenVentas.AGRUPACIONES:
+            raise ValueError(f"Agrupación inválida: {agrupacion}")
+        if dialecto == "postgresql":
+            unidad = {"dia": "day", "semana": "week", "mes": "month"}[agrupacion]
+            return func.date(func.date_trunc(unidad, Venta.fecha_hora), type_=Date)
+        modificadores = {
+            "dia": (),
+            "semana": ("-6 days", "weekday 1"),
+            "mes": ("start of month",),
+        }[agrupacion]
+        return func.date(Venta.fecha_hora, *modificadores, type_=Date)
+
+    @classmethod
+    def por_vendedor(
+        cls, session, usuario_ids: list, agrupacion: str = "dia", **filtros
+    ) -> dict:
+        """
+        Devuelve la cantidad de ventas y el total vendido por los vendedores indicados
+        (ver `filtros_vendedor`): en total, por vendedor, por período (día, semana o
+        mes) y vendedor, por tipo de comprobante y por estado.
+
+        Los totales se calculan en la base de datos con una única consulta agrupada
+        por período, vendedor, tipo de comprobante y estado, cuyas filas se acumulan
+        luego en cada resumen.
+        """
+        periodo = cls._periodo(session.get_bind().dialect.name, agrupacion)
+        grupos = (periodo, Venta.created_by, Venta.tipo_comprobante_id, Venta.estado)
+        filas = session.execute(
+            select(
+                *grupos,
+                func.count(Venta.id).label("ventas"),
+                func.sum(Venta.total).label("total"),
+            )
+            .where(*cls.filtros_vendedor(usuario_ids, **filtros))
+            .group_by(*grupos)
+        ).all()
+
+        resumenes = {
+            "por_vendedor": {},
+            "por_periodo": {},
+            "por_tipo_comprobante": {},
+            "por_estado": {},
+        }
+        total = {"ventas": 0, "total": 0.0}
+        for fecha, usuario_id, tipo_comprobante_id, estado, ventas, importe in filas:
+            claves = {
+                "por_vendedor": (usuario_id,),
+                "por_periodo": (fecha, usuario_id),
+                "por_tipo_comprobante": (tipo_comprobante_id,),
+                "por_estado": (estado,),
+            }
+            for nombre, clave in claves.items():
+                acumulado = resumenes[nombre].setdefault(
+                    clave, {"ventas": 0, "total": 0.0}
+                )
+                acumulado["ventas"] += ventas
+                acumulado["total"] += float(importe or 0)
+            total["ventas"] += ventas
+            total["total"] += float(importe or 0)
+
+        usuarios = dict(
+            session.execute(
+                select(Usuario.id, Usuario.username).where(Usuario.id.in_(usuario_ids))
+            ).all()
+        )
+        tipos = dict(
+            session.execute(
+                select(TipoComprobante.id, TipoComprobante.descripcion).where(
+                    TipoComprobante.id.in_(
+                        [c[0] for c in resumenes["por_tipo_comprobante"]]
+                    )
+                )
+            ).all()
+        )
+        return {
+            "resumen": total,
+            "por_vendedor": [
+                {"usuario_id": u, "username": usuarios.get(u), **v}
+                for (u,), v in sorted(resumenes["por_vendedor"].items())
+            ],
+            "por_periodo": [
+                {"periodo": f.isoformat(), "usuario_id": u, **v}
+                for (f, u), v in sorted(resumenes["por_periodo"].items())
+            ],
+            "por_tipo_comprobante": [
+                {"tipo_comprobante_id": t, "descripcion": tipos.get(t), **v}
+                for (t,), v in sorted(resumenes["por_tipo_comprobante"].items())
+            ],
+            "por_estado": [
+                {"estado": e.name, **v}
+                for (e,), v in sorted(
+                    resumenes["por_estado"].items(), key=lambda i: i[0][0].name
+                )
+            ],
+        }
+
+
+def _modificado(obj, campos) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[campo].history.has_changes() for campo in campos)
+
+
+def _venta_en_sesion(session, venta_id: int) -> Venta | None:
+    return session.identity_map.get(
+        inspect(Venta).identity_key_from_primary_key([venta_id])
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _descontar_resumen_ventas(session, flush_context, instances):
+    """
+    Descuenta de los resúmenes el aporte guardado de las ventas cuyos datos o renglones
+    se modifican en el flush, y registra las ventas a sumar luego del flush.
+    """
+    afectadas = set()
+    nuevas = set()
+    for obj in session.new:
+        if isinstance(obj, Venta):
+            nuevas.add(obj)
+        elif isinstance(obj, VentaItem):
+            if obj.venta_id is not None:
+                afectadas.add(obj.venta_id)
+            elif obj.venta is not None:
+                if obj.venta.id is None:
+                    nuevas.add(obj.venta)
+                else:
+                    afectadas.add(obj.venta.id)
+    eliminadas = set()
+    for obj in (*session.dirty, *session.deleted):
+        eliminado = obj in session.deleted
+        if isinstance(obj, Venta):
+            if eliminado:
+                eliminadas.add(obj.id)
+            if eliminado or _modificado(obj, CAMPOS_VENTA):
+                afectadas.add(obj.id)
+        elif isinstance(obj, VentaItem):
+            if eliminado or _modificado(obj, CAMPOS_ITEM):
+                afectadas.update((_anterior(obj, "venta_id"), obj.venta_id))
+    afectadas.discard(None)
+    if not afectadas and not nuevas:
+        session.info.pop("resumen_ventas", None)
+        return
+
+    # Las ventas de la sesión se filtran según su estado, sin consultar los resúmenes
+    ventas = {venta_id: _venta_en_sesion(session, venta_id) for venta_id in afectadas}
+    descontar = [
+        venta_id
+        for venta_id, venta in ventas.items()
+        if venta is None or ResumenVentas.computable(venta, anterior=True)
+    ]
+    if descontar:
+        ResumenVentas._aplicar(session.connection(), Venta.id.in_(descontar), -1)
+    session.info["resumen_ventas"] = (ventas, nuevas, eliminadas)
+
+
+@event.listens_for(Session, "after_flush")
+def _sumar_resumen_ventas(session, flush_context):
+    pendientes = session.info.pop("resumen_ventas", None)
+    if pendientes is None:
+        return
+    ventas, nuevas, eliminadas = pendientes
+    sumar = [venta.id for venta in nuevas if ResumenVentas.computable(venta)]
+    for venta_id, venta in ventas.items():
+        if venta_id in eliminadas:
+            continue
+        if venta is None or ResumenVentas.computable(venta):
+            sumar.append(venta_id)
+    if sumar:
+        ResumenVentas._aplicar(session.connection(), Venta.id.in_(sumar))
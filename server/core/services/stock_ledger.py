@@ -0,0 +1,392 @@
+import csv
+import io
+import json
+import pytz
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import (
+    and_,
+    case,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.orm.attributes import set_committed_value
+
+from server.core.models import (
+    Articulo,
+    MovimientoStock,
+    MovimientoStockItem,
+    StockSnapshot,
+)
+from server.core.models.movimiento_stock import TipoMovimiento
+
+local_tz = pytz.timezone("America/Argentina/Buenos_Aires")
+CENTESIMOS = Decimal("0.01")
+
+
+def _ahora() -> datetime:
+    "Fecha y hora local, sin zona horaria, como se guarda MovimientoStock.fecha_hora"
+    return datetime.now(tz=local_tz).replace(tzinfo=None)
+
+
+def _local(fecha_hora: datetime) -> datetime:
+    if fecha_hora.tzinfo is not None:
+        fecha_hora = fecha_hora.astimezone(local_tz).replace(tzinfo=None)
+    return fecha_hora
+
+
+class StockLedger:
+    """
+    Registro de los movimientos de stock de los artículos.
+
+    El stock de todos los artículos de un movimiento se actualiza con una única sentencia
+    `UPDATE articulo SET stock_actual = stock_actual + ... RETURNING stock_actual`. La
+    base de datos aplica cada variación sobre el valor vigente de la fila, por lo que las
+    ventas y compras simultáneas de un mismo artículo no pierden actualizaciones, sin
+    necesidad de leer y bloquear previamente los artículos. El stock posterior de cada
+    renglón se calcula a partir del valor devuelto.
+
+    Periódicamente (con `flask snapshot_stock`) se guarda una foto del stock de todos los
+    artículos (ver StockSnapshot), de modo que el stock a una fecha se obtiene a partir de
+    la foto más cercana y de los movimientos entre ambas fechas, sobre el índice
+    (articulo_id, movimiento_stock_id) de los renglones.
+
+    Métodos:
+    - registrar: Registra los renglones de un movimiento y actualiza el stock.
+    - variacion: Expresión SQL de la variación de stock, con signo, de un renglón.
+    - crear_snapshots: Guarda la foto del stock de todos los artículos a una fecha.
+    - stock_al: Devuelve el stock de un artículo a una fecha.
+    - stock_catalogo_al: Devuelve el stock de todos los artículos a una fecha.
+    - exportar_catalogo: Exporta el stock de todos los artículos a una fecha en CSV o
+      JSON.
+    """
+
+    FORMATOS_EXPORTACION = ("csv", "json")
+
+    @staticmethod
+    def registrar(
+        session, movimiento: MovimientoStock, renglones: list, retroactivo: bool = False
+    ) -> list:
+        """
+        Registra los renglones del movimiento y actualiza el stock de sus artículos.
+        No confirma la transacción.
+
+        renglones: lista de (articulo_id, cantidad) en el orden del comprobante; la
+            cantidad es positiva, y se suma o resta según el tipo de movimiento.
+        retroactivo: indica que la fecha del movimiento puede ser anterior a la última
+            foto del stock, en cuyo caso se corrigen las fotos posteriores.
+        return: renglones del movimiento (MovimientoStockItem) agregados a la sesión.
+        """
+        tipo = movimiento.tipo_movimiento
+        if isinstance(tipo, str):
+            tipo = TipoMovimiento[tipo]
+        signo = 1 if tipo == TipoMovimiento.ingreso else -1
+        variaciones = {}
+        for articulo_id, cantidad in renglones:
+            variacion = signo * Decimal(str(cantidad))
+            variaciones[articulo_id] = variaciones.get(articulo_id, 0) + variacion
+        if not variaciones:
+            return []
+
+        resultado = session.execute(
+            update(Articulo)
+            .where(Articulo.id.in_(variaciones))
+            .values(
+                stock_actual=Articulo.stock_actual
+                + case(variaciones, value=Articulo.id)
+            )
+            .returning(Articulo.id, Articulo.stock_actual, Articulo.codigo_principal)
+            .execution_options(synchronize_session=False)
+        ).all()
+        articulos = {row.id: row for row in resultado}
+        faltantes = set(variaciones) - set(articulos)
+        if faltantes:
+            raise Exception(f"Artículos inexistentes: {sorted(faltantes)}")
+
+        if retroactivo:
+            session.execute(
+                update(StockSnapshot)
+                .where(
+                    StockSnapshot.articulo_id.in_(variaciones),
+                    StockSnapshot.fecha_hora >= _local(movimiento.fecha_hora),
+                )
+                .values(
+                    stock=StockSnapshot.stock
+                    + case(variaciones, value=StockSnapshot.articulo_id)
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+        # Mantiene actualizados los artículos ya cargados en la sesión
+        for row in resultado:
+            articulo = session.identity_map.get(
+                session.identity_key(Articulo, row.id)
+            )
+            if articulo is not None:
+                set_committed_value(articulo, "stock_actual", row.stock_actual)
+
+        # Stock de cada artículo antes del movimiento, acumulado renglón por renglón
+        stock = {
+            articulo_id: articulos[articulo_id].stock_actual - variacion
+            for articulo_id, variacion in variaciones.items()
+        }
+        items = []
+        for articulo_id, cantidad in renglones:
+            stock[articulo_id] += signo * Decimal(str(cantidad))
+            item = MovimientoStockItem(
+                articulo_id=articulo_id,
+                movimiento_stock=movimiento,
+                codigo_principal=articulos[articulo_id].codigo_principal,
+                cantidad=cantidad,
+                stock_posterior=stock[articulo_id],
+            )
+            session.add(item)
+            items.append(item)
+        return items
+
+    @staticmethod
+    def variacion():
+        """
+        Variación de stock de un renglón (MovimientoStockItem join MovimientoStock):
+        positiva en los ingresos y negativa en los egresos. Los ajustes registran la
+        cantidad con signo, por lo que se utiliza su valor absoluto.
+        """
+        cantidad = func.abs(MovimientoStockItem.cantidad)
+        return case(
+            (MovimientoStock.tipo_movimiento == TipoMovimiento.egreso, -cantidad),
+            else_=cantidad,
+        )
+
+    @classmethod
+    def _variacion_entre(cls, articulo_id, desde: datetime = None, hasta=None):
+        """
+        Suma de las variaciones de stock del artículo con fecha en (desde, hasta].
+        `articulo_id` puede ser una columna, para utilizarla como subconsulta correlativa.
+        """
+        query = (
+            select(func.coalesce(func.sum(cls.variacion()), 0))
+            .select_from(MovimientoStockItem)
+            .join(MovimientoStock)
+            .where(MovimientoStockItem.articulo_id == articulo_id)
+        )
+        if desde is not None:
+            query = query.where(MovimientoStock.fecha_hora > desde)
+        if hasta is not None:
+            query = query.where(MovimientoStock.fecha_hora <= hasta)
+        return query
+
+    @staticmethod
+    def _fotos(condicion, ultima: bool = True):
+        """
+        Última (o primera) foto de cada artículo entre las que cumplen la condición:
+        subconsulta (articulo_id, fecha_hora, stock).
+        """
+        extremo = func.max if ultima else func.min
+        fechas = (
+            select(
+                StockSnapshot.articulo_id,
+                extremo(StockSnapshot.fecha_hora).label("fecha_hora"),
+            )
+            .where(condicion)
+            .group_by(StockSnapshot.articulo_id)
+            .subquery()
+        )
+        return (
+            select(
+                StockSnapshot.articulo_id,
+                StockSnapshot.fecha_hora,
+                StockSnapshot.stock,
+            )
+            .join(
+                fechas,
+                and_(
+                    StockSnapshot.articulo_id == fechas.c.articulo_id,
+                    StockSnapshot.fecha_hora == fechas.c.fecha_hora,
+                ),
+            )
+            .subquery()
+        )
+
+    @classmethod
+    def _stock_catalogo(cls, fecha_hora: datetime, incluida: bool = True):
+        """
+        Consulta del stock de todos los artículos no eliminados a la fecha indicada:
+        (articulo_id, stock), ordenada por articulo_id. Con `incluida`, se utilizan
+        las fotos tomadas a la misma fecha.
+
+        Igual que en `stock_al`, el stock de los artículos con una foto anterior es el
+        de la foto más los movimientos posteriores a ella, y el de los demás, el de la
+        foto siguiente o el stock actual menos los movimientos posteriores a la fecha.
+        Los movimientos se agregan en una única pasada, acotada por la foto anterior
+        más antigua sobre el índice de fechas de los movimientos.
+        """
+        if incluida:
+            anterior = cls._fotos(StockSnapshot.fecha_hora <= fecha_hora)
+        else:
+            anterior = cls._fotos(StockSnapshot.fecha_hora < fecha_hora)
+        siguiente = cls._fotos(StockSnapshot.fecha_hora > fecha_hora, ultima=False)
+        cota = select(
+            func.coalesce(func.min(anterior.c.fecha_hora), fecha_hora)
+        ).scalar_subquery()
+        sin_anterior = anterior.c.fecha_hora.is_(None)
+        hasta = case((sin_anterior, siguiente.c.fecha_hora), else_=fecha_hora)
+        variacion = cls.variacion()
+        tramo = (
+            select(
+                MovimientoStockItem.articulo_id,
+                func.sum(case((sin_anterior, -variacion), else_=variacion)).label(
+                    "variacion"
+                ),
+            )
+            .select_from(MovimientoStockItem)
+            .join(MovimientoStock)
+            .outerjoin(
+                anterior, anterior.c.articulo_id == MovimientoStockItem.articulo_id
+            )
+            .outerjoin(
+                siguiente, siguiente.c.articulo_id == MovimientoStockItem.articulo_id
+            )
+            .where(
+                MovimientoStock.fecha_hora > cota,
+                MovimientoStock.fecha_hora
+                > func.coalesce(anterior.c.fecha_hora, fecha_hora),
+                or_(hasta.is_(None), MovimientoStock.fecha_hora <= hasta),
+            )
+            .group_by(MovimientoStockItem.articulo_id)
+            .subquery()
+        )
+        stock = func.coalesce(
+            anterior.c.stock, siguiente.c.stock, Articulo.stock_actual
+        ) + func.coalesce(tramo.c.variacion, 0)
+        return (
+            select(Articulo.id.label("articulo_id"), stock.label("stock"))
+            .outerjoin(anterior, anterior.c.articulo_id == Articulo.id)
+            .outerjoin(siguiente, siguiente.c.articulo_id == Articulo.id)
+            .outerjoin(tramo, tramo.c.articulo_id == Articulo.id)
+            .where(Articulo.deleted == False)
+            .order_by(Articulo.id)
+        )
+
+    @classmethod
+    def crear_snapshots(cls, session, fecha_hora: datetime = None) -> int:
+        """
+        Guarda la foto del stock de todos los artículos a la fecha indicada (por defecto,
+        la actual), reemplazando la existente a esa misma fecha. El stock se calcula en
+        la base de datos, en una única sentencia, a partir de las fotos más cercanas de
+        cada artículo o, si no las tiene, del stock actual. No confirma la transacción.
+
+        return: cantidad de artículos registrados.
+        """
+        fecha_hora = _local(fecha_hora) if fecha_hora else _ahora()
+        if fecha_hora > _ahora():
+            raise ValueError("La fecha de la foto del stock no puede ser futura")
+
+        catalogo = cls._stock_catalogo(fecha_hora, incluida=False).subquery()
+        session.execute(
+            delete(StockSnapshot).where(StockSnapshot.fecha_hora == fecha_hora)
+        )
+        return session.execute(
+            insert(StockSnapshot).from_select(
+                ["articulo_id", "fecha_hora", "stock"],
+                select(catalogo.c.articulo_id, literal(fecha_hora), catalogo.c.stock),
+            )
+        ).rowcount
+
+    @classmethod
+    def stock_catalogo_al(cls, session, fecha_hora: datetime, yield_per: int = 2000):
+        """
+        Devuelve, a medida que se leen de la base de datos, las filas (articulo_id,
+        codigo_principal, descripcion, stock) con el stock de todos los artículos a la
+        fecha indicada, ordenadas por articulo_id. Se ejecuta una única consulta.
+        """
+        query = cls._stock_catalogo(_local(fecha_hora)).add_columns(
+            Articulo.codigo_principal, Articulo.descripcion
+        )
+        result = session.execute(query, execution_options={"yield_per": yield_per})
+        for row in result:
+            yield (
+                row.articulo_id,
+                row.codigo_principal,
+                row.descripcion,
+                Decimal(str(row.stock)).quantize(CENTESIMOS),
+            )
+
+    @classmethod
+    def exportar_catalogo(
+        cls, session, fecha_hora: datetime, formato: str = "csv", filas: int = 2000
+    ):
+        """
+        Devuelve en bloques de texto, para enviarse o escribirse a medida que se
+        generan, el stock de todos los artículos a la fecha indicada en formato CSV o
+        JSON (lista de objetos).
+        """
+        if formato not in cls.FORMATOS_EXPORTACION:
+            raise ValueError(f"Formato de exportación inválido: {formato}")
+        columnas = ("articulo_id", "codigo_principal", "descripcion", "stock")
+        catalogo = cls.stock_catalogo_al(session, fecha_hora, yield_per=filas)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if formato == "csv":
+            writer.writerow(columnas)
+        else:
+            buffer.write("[")
+        for i, fila in enumerate(catalogo):
+            if formato == "csv":
+                writer.writerow(fila)
+            else:
+                objeto = dict(zip(columnas, fila))
+                objeto["stock"] = float(objeto["stock"])
+                buffer.write(("," if i else "") + json.dumps(objeto))
+            if (i + 1) % filas == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if formato == "json":
+            buffer.write("]")
+        yield buffer.getvalue()
+
+    @classmethod
+    def stock_al(cls, session, articulo_id: int, fecha_hora: datetime) -> Decimal:
+        """
+        Devuelve el stock del artículo a la fecha indicada, a partir de la foto anterior
+        más cercana y los movimientos posteriores a ella; si no la hay, a partir de la
+        foto siguiente o del stock actual, descontando los movimientos posteriores.
+        """
+        fecha_hora = _local(fecha_hora)
+        fotos = session.query(StockSnapshot.fecha_hora, StockSnapshot.stock).filter(
+            StockSnapshot.articulo_id == articulo_id
+        )
+        anterior = (
+            fotos.filter(StockSnapshot.fecha_hora <= fecha_hora)
+            .order_by(StockSnapshot.fecha_hora.desc())
+            .first()
+        )
+        if anterior is not None:
+            variacion = session.execute(
+                cls._variacion_entre(articulo_id, anterior.fecha_hora, fecha_hora)
+            ).scalar()
+            return (anterior.stock + Decimal(str(variacion))).quantize(CENTESIMOS)
+
+        siguiente = (
+            fotos.filter(StockSnapshot.fecha_hora > fecha_hora)
+            .order_by(StockSnapshot.fecha_hora)
+            .first()
+        )
+        if siguiente is not None:
+            stock, hasta = siguiente.stock, siguiente.fecha_hora
+        else:
+            stock = session.execute(
+                select(Articulo.stock_actual).where(Articulo.id == articulo_id)
+            ).scalar()
+            if stock is None:
+                raise ValueError("Artículo no encontrado")
+            hasta = None
+        variacion = session.execute(
+            cls._variacion_entre(articulo_id, fecha_hora, hasta)
+        ).scalar()
+        return (stock - Decimal(str(variacion))).quantize(CENTESIMOS)
@@ -1,108 +1,202 @@
 import os
 import numpy as np
 import pandas as pd
-from server.config import db, app
-from server.core.models import Articulo
+from sqlalchemy import insert
+from server.config import db
+from server.core.models import Articulo, ArticuloCodigo
+from server.core.models.articulo import ARTICULO_FTS_TABLE, PRIORIDAD_CODIGO
+from server.core.models.enums import TipoCodigoArticulo
+from server.core.services import ArticuloSearchService
+from server.utils.database import begin_write
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+DUMP_DIR = os.path.join(basedir, "../../../dump")
+# Filas por cada INSERT (executemany)
+CHUNK_SIZE = 5000
+# Usuario al que se atribuyen los artículos importados
+USUARIO_ID = 1
+# Tipo de código según su posición entre los códigos del artículo (0: principal)
+TIPO_POR_PRIORIDAD = {prioridad: tipo for tipo, prioridad in PRIORIDAD_CODIGO.items()}
 
-def import_data():
-    print("Importing data for Articulo model...")
-    df = pd.read_json(os.path.join(basedir, "../../../dump/Producto.json"))
-    df_stock = pd.read_json(os.path.join(basedir, "../../../dump/Stock.json"))
-    df_codigos = pd.read_json(os.path.join(basedir, "../../../dump/ProdCod.json"))
-
-    # Limpiar los datos del DataFrame principal
-    df = df.map(lambda x: x.strip() if isinstance(x, str) else x)
-    # Renombrar las columnas del DataFrame principal
-    df = df.rename(columns={"PRO_CODIGO": "id", "PRO_CODBAR": "codigo_principal"})
-    # Crear una columna con la descripción del producto
-    df["descripcion"] = (
-        df["PRO_LINEA1"]
-        + " "
-        + df["PRO_LINEA2"]
-        + " "
-        + df["PRO_LINEA3"]
-        + " "
-        + df["PRO_LINEA4"]
+
+def leer_dump(dump_dir: str = DUMP_DIR) -> tuple:
+    """
+    Lee los archivos Producto.json, Stock.json y ProdCod.json del sistema anterior.
+    Los códigos de barras se leen como texto, para no perder los ceros iniciales.
+    """
+    df = pd.read_json(
+        os.path.join(dump_dir, "Producto.json"), dtype={"PRO_CODBAR": str}
     )
-    # Filtrar los productos dados de alta
-    df = df[df["PRO_BAJA"] == 0]
-    # Limpiar los datos del DataFrame principal nuevamente
-    df = df.map(lambda x: x.strip() if isinstance(x, str) else x)
-    df = df.replace({"": None})
-    df = df.replace({np.nan: None})
-    df = df.replace({"¥": "Ñ", "¤": "ñ"}, regex=True)
-
-    # Limpiar los datos del DataFrame de stock
-    df_stock = df_stock.replace({np.nan: None})
-    df_stock = df_stock.map(lambda x: x.strip() if isinstance(x, str) else x)
-    # Filtrar los productos en stock en el depósito 1
-    df_stock = df_stock[df_stock["STK_DEPOSITO"] == 1]
-    # Renombrar las columnas del DataFrame de stock
-    df_stock = df_stock.rename(
-        columns={
-            "STK_PRODUCTO": "articulo_id",
-            "STK_EXISTENCIA": "existencia",
+    df_stock = pd.read_json(os.path.join(dump_dir, "Stock.json"))
+    df_codigos = pd.read_json(
+        os.path.join(dump_dir, "ProdCod.json"), dtype={"PDC_CODBAR": str}
+    )
+    return df, df_stock, df_codigos
+
+
+def _limpiar(serie: pd.Series) -> pd.Series:
+    "Quita los espacios y corrige la Ñ del sistema anterior; los vacíos son nulos"
+    serie = serie.astype("string").str.strip()
+    serie = serie.str.replace("¥", "Ñ").str.replace("¤", "ñ")
+    return serie.replace("", pd.NA)
+
+
+def preparar(df: pd.DataFrame, df_stock: pd.DataFrame, df_codigos: pd.DataFrame):
+    """
+    Convierte el dump del sistema anterior en las filas de las tablas `articulo` y
+    `articulo_codigo`, sin recorrer los productos uno por uno: el stock del depósito 1
+    se agrega con un merge y la posición de cada código en su artículo se calcula con
+    un groupby.
+
+    El código principal ocupa la posición 0 y los códigos de ProdCod, en su orden y
+    sin repetir el principal, las siguientes: secundario, terciario, cuaternario y
+    adicionales (ver PRIORIDAD_CODIGO). Los productos dados de baja o sin código
+    principal no se importan.
+    """
+    descripcion = df["PRO_LINEA1"].astype("string").str.strip()
+    for linea in ("PRO_LINEA2", "PRO_LINEA3", "PRO_LINEA4"):
+        descripcion = descripcion + " " + df[linea].astype("string").str.strip()
+    articulos = pd.DataFrame(
+        {
+            "id": df["PRO_CODIGO"].astype(int),
+            "codigo_principal": _limpiar(df["PRO_CODBAR"]),
+            "descripcion": _limpiar(descripcion).fillna("Sin descripción"),
         }
     )
+    articulos = articulos[(df["PRO_BAJA"] == 0) & articulos["codigo_principal"].notna()]
+    articulos = articulos.assign(linea_factura=articulos["descripcion"].str[:30])
+
+    stock = df_stock.loc[
+        df_stock["STK_DEPOSITO"] == 1, ["STK_PRODUCTO", "STK_EXISTENCIA"]
+    ].rename(columns={"STK_PRODUCTO": "id", "STK_EXISTENCIA": "stock_actual"})
+    stock = stock.drop_duplicates("id").astype({"id": int})
+    articulos = articulos.merge(stock, on="id", how="left")
+    articulos["stock_actual"] = articulos["stock_actual"].fillna(0)
+    articulos["created_by"] = USUARIO_ID
+    articulos["updated_by"] = USUARIO_ID
 
-    # Limpiar los datos del DataFrame de códigos
-    df_codigos = df_codigos.map(lambda x: x.strip() if isinstance(x, str) else x)
-    df_codigos = df_codigos.replace({np.nan: None})
-    # Renombrar las columnas del DataFrame de códigos
-    df_codigos = df_codigos.rename(
-        columns={
-            "PDC_CODIGO": "articulo_id",
-            "PDC_CODBAR": "codigo",
+    secundarios = pd.DataFrame(
+        {
+            "articulo_id": df_codigos["PDC_CODIGO"].astype(int),
+            "codigo": _limpiar(df_codigos["PDC_CODBAR"]),
         }
+    ).dropna()
+    secundarios = secundarios[secundarios["articulo_id"].isin(articulos["id"])]
+    principales = articulos[["id", "codigo_principal"]].set_axis(
+        ["articulo_id", "codigo"], axis=1
+    )
+    # El principal va primero, de modo que sus repeticiones en ProdCod se descartan
+    codigos = pd.concat([principales, secundarios], ignore_index=True)
+    codigos = codigos.drop_duplicates(["articulo_id", "codigo"])
+    codigos["prioridad"] = codigos.groupby("articulo_id", sort=False).cumcount()
+    codigos["tipo"] = (
+        codigos["prioridad"]
+        .clip(upper=PRIORIDAD_CODIGO[TipoCodigoArticulo.adicional])
+        .map(TIPO_POR_PRIORIDAD)
+    )
+    return articulos, codigos
+
+
+def _filas(df: pd.DataFrame) -> list:
+    "Filas del DataFrame con tipos de Python, para el executemany del driver"
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def insertar(
+    connection,
+    articulos: pd.DataFrame,
+    codigos: pd.DataFrame,
+    chunk_size: int = CHUNK_SIZE,
+    progreso=None,
+):
+    """
+    Inserta los artículos, sus códigos y sus entradas del índice de búsqueda con
+    INSERT de a `chunk_size` filas, sin crear objetos del ORM. Después de cada lote se
+    llama a `progreso(tabla, insertadas, total)`, si se indica.
+    """
+    por_articulo = codigos.groupby("articulo_id", sort=False)["codigo"].agg(" ".join)
+    entradas = articulos[["id", "descripcion"]].assign(
+        codigos=articulos["id"].map(por_articulo)
     )
+    ArticuloSearchService.create_index(connection)
+    pasos = (
+        (Articulo.__tablename__, articulos, insert(Articulo.__table__)),
+        (ArticuloCodigo.__tablename__, codigos, insert(ArticuloCodigo.__table__)),
+        (ARTICULO_FTS_TABLE, entradas, None),
+    )
+    for tabla, df, statement in pasos:
+        for inicio in range(0, len(df), chunk_size):
+            lote = _filas(df.iloc[inicio : inicio + chunk_size])
+            if statement is None:
+                ArticuloSearchService.insert_entries(connection, lote)
+            else:
+                connection.execute(statement, lote)
+            if progreso:
+                progreso(tabla, inicio + len(lote), len(df))
+
 
-    articulo_list = []
-    for index, row in df.iterrows():
-        # Crear una instancia de Articulo
-        articulo = Articulo(
-            id=row["id"],
-            codigo_principal=row["codigo_principal"],
-            descripcion=row["descripcion"] if row["descripcion"] else "Sin descripción",
-            linea_factura=(
-                row["descripcion"][:30] if row["descripcion"] else "Sin descripción"
-            ),
+def dump_sintetico(productos: int, id_inicial: int = 1, seed: int = 0) -> tuple:
+    """
+    Genera un dump con el formato del sistema anterior, para medir la importación:
+    productos dados de baja, líneas de descripción vacías, stock en dos depósitos y
+    entre cero y seis códigos por producto, algunos repetidos o iguales al principal.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(id_inicial, id_inicial + productos)
+    codbar = pd.Series(rng.integers(10**12, 10**13, productos)).astype(str)
+    palabras = np.array(["ACEITE", "FILTRO", "BUJIA", "CORREA", "PASTILLA", "¥ANDU"])
+    lineas = {
+        f"PRO_LINEA{n}": pd.Series(rng.choice(palabras, productos)).str.pad(
+            20, side="right"
         )
+        for n in range(1, 5)
+    }
+    lineas["PRO_LINEA4"] = lineas["PRO_LINEA4"].where(rng.random(productos) < 0.5, "")
+    df = pd.DataFrame(
+        {
+            "PRO_CODIGO": ids,
+            "PRO_CODBAR": codbar,
+            **lineas,
+            "PRO_BAJA": (rng.random(productos) < 0.05).astype(int),
+        }
+    )
 
-        # Obtener el stock actual del artículo y asignarlo a la instancia
-        stock = df_stock[df_stock["articulo_id"] == row["id"]]
-        if len(stock) > 0:
-            row["existencia"] = stock["existencia"].values[0]
-        else:
-            row["existencia"] = 0
-        articulo.stock_actual = row["existencia"]
-        
-        # Obtener los códigos asociados al artículo y asignarlos a la instancia
-        codigos = df_codigos[df_codigos["articulo_id"] == row["id"]]
-        # Quitar el código principal de la lista de códigos para evitar duplicados
-        codigos = codigos[codigos["codigo"] != row["codigo_principal"]]
-        if len(codigos) > 0:
-            articulo.codigo_secundario = codigos["codigo"].values[0]
-            articulo.codigo_terciario = (
-                codigos["codigo"].values[1] if len(codigos) > 1 else None
-            )
-            articulo.codigo_cuaternario = (
-                codigos["codigo"].values[2] if len(codigos) > 2 else None
-            )
-            if len(codigos) > 3:
-                codigos_adicionales = []
-                for cod in codigos["codigo"].values[3:]:
-                    codigos_adicionales.append(cod)
-                articulo.codigo_adicional = codigos_adicionales
-
-        articulo_list.append(articulo)
+    depositos = np.repeat([1, 2], productos)
+    df_stock = pd.DataFrame(
+        {
+            "STK_PRODUCTO": np.tile(ids, 2),
+            "STK_DEPOSITO": depositos,
+            "STK_EXISTENCIA": rng.integers(0, 500, 2 * productos).astype(float),
+        }
+    ).sample(frac=0.9, random_state=seed)
+
+    cantidades = rng.integers(0, 7, productos)
+    articulo_ids = np.repeat(ids, cantidades)
+    codigos = pd.Series(rng.integers(10**12, 10**13, len(articulo_ids))).astype(str)
+    # Algunos códigos repiten el principal del producto
+    repetidos = rng.random(len(articulo_ids)) < 0.1
+    codigos[repetidos] = codbar.to_numpy()[articulo_ids[repetidos] - id_inicial]
+    df_codigos = pd.DataFrame({"PDC_CODIGO": articulo_ids, "PDC_CODBAR": codigos})
+    return df, df_stock, df_codigos
+
+
+def import_data(dump_dir: str = DUMP_DIR):
+    print("Importing data for Articulo model...")
+    articulos, codigos = preparar(*leer_dump(dump_dir))
+
+    def progreso(tabla, insertadas, total):
+        print(f"  {tabla}: {insertadas}/{total}")
 
     try:
-        db.session.add_all(articulo_list)
+        begin_write(db.session)
+        insertar(db.session.connection(), articulos, codigos, progreso=progreso)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         print(str(e))
-    print("Data imported successfully!")
+        raise
+    print(
+        f"Data imported successfully! ({len(articulos)} articles, "
+        f"{len(codigos)} codes)"
+    )
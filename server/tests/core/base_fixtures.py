@@ -1,7 +1,9 @@
 import os
 import pytest
 import pandas as pd
+from contextlib import contextmanager
 from faker import Faker
+from sqlalchemy import event
 
 from server import BASE_DIR
 from server.core.models import (
@@ -22,9 +24,42 @@ from server.core.models import (
     TipoUnidad,
     TipoPago,
 )
+from server.config import db
 from server.tests.conftest import test_app, session
 
 
+@contextmanager
+def count_queries():
+    """
+    Registra las sentencias SQL ejecutadas dentro del bloque.
+    Devuelve la lista de sentencias, que se completa al salir del bloque.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def assert_num_queries(expected: int):
+    """
+    Verifica que dentro del bloque se ejecute exactamente la cantidad de sentencias
+    SQL indicada. Si no coincide, el error incluye las sentencias ejecutadas.
+    """
+    with count_queries() as statements:
+        yield statements
+    assert len(statements) == expected, (
+        f"Se esperaban {expected} sentencias y se ejecutaron {len(statements)}:\n"
+        + "\n".join(statements)
+    )
+
+
 @pytest.fixture
 def load_fixtures(session):
     """Load data from JSON files into the database."""
@@ -143,6 +178,6 @@ def faker_articulos(session):
             updated_by=1,
         )
         fake_articles.append(fake_article)
-    session.bulk_save_objects(fake_articles)
+    session.add_all(fake_articles)
     session.commit()
     return session
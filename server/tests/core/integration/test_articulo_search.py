@@ -0,0 +1,169 @@
+import pytest
+from server.core.controllers import ArticuloController
+from sqlalchemy import create_engine, text
+from server.core.models import Articulo, ArticuloCodigo
+from server.core.models.articulo import ARTICULO_FTS_TABLE
+from server.core.models.enums import TipoCodigoArticulo
+from server.core.services import ArticuloSearchService
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+
+
+def articulo_data(codigo, descripcion, **kwargs):
+    return {
+        "codigo_principal": codigo,
+        "descripcion": descripcion,
+        "linea_factura": descripcion[:30],
+        "stock_actual": 0,
+        "tipo_articulo_id": 1,
+        "tipo_unidad_id": 1,
+        "alicuota_iva_id": 1,
+        "created_by": 1,
+        "updated_by": 1,
+        **kwargs,
+    }
+
+
+@pytest.mark.usefixtures("load_fixtures")
+def test_search_articulo_sincronizado(test_app, session):
+    articulo_id = ArticuloController.create(
+        articulo_data(
+            "7790001112223",
+            "FILTRO DE ACEITE FIAT PALIO",
+            codigo_secundario="FA-3321",
+            codigo_adicional=["ALT-99887"],
+        ),
+        session,
+    )
+
+    # Búsqueda por palabras, en cualquier orden
+    result = ArticuloSearchService.search("palio aceite")
+    assert [a.id for a in result["articulos"]] == [articulo_id]
+    # Búsqueda por fragmento de código secundario y adicional
+    assert ArticuloSearchService.search("3321")["articulos"][0].id == articulo_id
+    assert ArticuloSearchService.search("99887")["articulos"][0].id == articulo_id
+    # Lectura exacta del código de barras
+    result = ArticuloSearchService.search("7790001112223")
+    assert [a.id for a in result["articulos"]] == [articulo_id]
+
+    # La modificación de la descripción se refleja en el índice
+    articulo = session.get(Articulo, articulo_id)
+    articulo.descripcion = "FILTRO DE AIRE FIAT PALIO"
+    session.commit()
+    assert ArticuloSearchService.search("aceite palio")["articulos"] == []
+    assert ArticuloSearchService.search("aire palio")["articulos"][0].id == articulo_id
+
+    # La baja lógica quita el artículo de los resultados
+    articulo.delete()
+    session.commit()
+    assert ArticuloSearchService.search("aire palio")["articulos"] == []
+
+
+@pytest.mark.usefixtures("load_fixtures")
+def test_search_articulo_paginado(test_app, session):
+    for i in range(30):
+        ArticuloController.create(
+            articulo_data(f"BUJ{i:04d}", f"BUJIA NGK MODELO {i}"), session
+        )
+
+    result = ArticuloSearchService.search("bujia ngk", page=1, page_size=10)
+    assert len(result["articulos"]) == 10
+    assert result["has_next"] is True
+
+    result = ArticuloSearchService.search("bujia ngk", page=3, page_size=10)
+    assert len(result["articulos"]) == 10
+    assert result["has_next"] is False
+
+    # El tamaño de página está acotado
+    result = ArticuloSearchService.search("bujia", page_size=10000)
+    assert result["page_size"] == ArticuloSearchService.MAX_PAGE_SIZE
+
+
+@pytest.mark.usefixtures("load_fixtures")
+def test_rebuild_index(test_app, session):
+    ArticuloController.create(
+        articulo_data(
+            "7790009998887",
+            "AMORTIGUADOR DELANTERO RENAULT CLIO",
+            codigo_terciario="AMD-5510",
+        ),
+        session,
+    )
+    # Se simula un índice desactualizado
+    session.execute(text(f"DELETE FROM {ARTICULO_FTS_TABLE}"))
+    assert ArticuloSearchService.search("5510")["articulos"] == []
+
+    total = ArticuloSearchService.rebuild_index(session)
+    assert total == session.query(Articulo).filter_by(deleted=False).count()
+
+    result = ArticuloSearchService.search("5510")
+    assert [a.codigo_principal for a in result["articulos"]] == ["7790009998887"]
+
+
+@pytest.mark.usefixtures("load_fixtures")
+def test_articulo_codigos(test_app, session):
+    articulo_id = ArticuloController.create(
+        articulo_data(
+            "7790001234567",
+            "BOMBA DE AGUA VW GOL",
+            codigo_secundario="BA-100",
+            codigo_adicional=["BA-101", "BA-102", "BA-100"],
+        ),
+        session,
+    )
+    articulo = session.get(Articulo, articulo_id)
+    assert articulo.codigo_secundario == "BA-100"
+    # Los códigos repetidos no se duplican
+    assert articulo.codigo_adicional == ["BA-101", "BA-102"]
+    assert [(c.tipo, c.codigo) for c in articulo.codigos] == [
+        (TipoCodigoArticulo.principal, "7790001234567"),
+        (TipoCodigoArticulo.secundario, "BA-100"),
+        (TipoCodigoArticulo.adicional, "BA-101"),
+        (TipoCodigoArticulo.adicional, "BA-102"),
+    ]
+    assert [a.id for a in ArticuloSearchService.find_by_codigo("BA-102")] == [
+        articulo_id
+    ]
+
+    # Intercambio de códigos entre tipos
+    ArticuloController.update(
+        articulo_data(
+            "BA-100",
+            "BOMBA DE AGUA VW GOL",
+            codigo_secundario="7790001234567",
+            codigo_adicional=["BA-102"],
+        ),
+        session,
+        articulo,
+    )
+    session.expire_all()
+    articulo = session.get(Articulo, articulo_id)
+    assert articulo.codigo_principal == "BA-100"
+    assert articulo.codigo_secundario == "7790001234567"
+    assert articulo.codigo_adicional == ["BA-102"]
+    assert session.query(ArticuloCodigo).filter_by(articulo_id=articulo_id).count() == 3
+    assert ArticuloSearchService.find_by_codigo("BA-101") == []
+    assert [a.id for a in ArticuloSearchService.search("BA-102")["articulos"]] == [
+        articulo_id
+    ]
+
+    articulo.delete()
+    session.commit()
+    assert ArticuloSearchService.find_by_codigo("BA-100") == []
+
+
+def test_indice_disponible_luego_de_confirmar(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'indice.db'}")
+    with engine.connect() as connection:
+        connection.begin()
+        ArticuloSearchService.create_index(connection)
+        assert ArticuloSearchService.indice_disponible(connection)
+        # Al revertir la transacción el índice no existe y no queda memorizado
+        connection.rollback()
+        assert not ArticuloSearchService.indice_disponible(connection)
+        assert engine not in ArticuloSearchService._engines_con_indice
+
+        ArticuloSearchService.create_index(connection)
+        connection.commit()
+        assert engine in ArticuloSearchService._engines_con_indice
+    engine.dispose()
@@ -0,0 +1,78 @@
+import pytest
+from server.core.models import Cliente
+from server.core.services import ClienteSearchService
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+
+
+def cliente_data(nro_documento, razon_social, **kwargs):
+    return {
+        "nro_documento": nro_documento,
+        "razon_social": razon_social,
+        "direccion": "Direccion",
+        "localidad": "Localidad",
+        "codigo_postal": "1234",
+        "tipo_documento_id": 1,
+        "tipo_responsable_id": 1,
+        "provincia_id": 1,
+        "created_by": 1,
+        "updated_by": 1,
+        **kwargs,
+    }
+
+
+@pytest.mark.usefixtures("load_fixtures")
+def test_search_cliente_sincronizado(test_app, session):
+    cliente = Cliente(**cliente_data("20304050607", "Lubricentro Núñez Hermanos"))
+    session.add(cliente)
+    session.commit()
+
+    # Búsqueda por prefijo de cada término, sin distinguir acentos
+    result = ClienteSearchService.search("nunez lubri")
+    assert [c.id for c in result["clientes"]] == [cliente.id]
+    # Búsqueda por prefijo del número de documento, con o sin separadores
+    assert ClienteSearchService.search("2030405")["clientes"] == [cliente]
+    assert ClienteSearchService.search("20-30405060-7")["clientes"] == [cliente]
+    assert ClienteSearchService.search("3040")["clientes"] == []
+
+    # La modificación de la razón social se refleja en el índice
+    cliente.razon_social = "Repuestos del Sur SRL"
+    session.commit()
+    assert ClienteSearchService.search("nunez")["clientes"] == []
+    assert ClienteSearchService.search("repuestos sur")["clientes"] == [cliente]
+
+    # La baja quita el cliente del índice
+    session.delete(cliente)
+    session.commit()
+    assert ClienteSearchService.search("repuestos")["clientes"] == []
+
+
+@pytest.mark.usefixtures("load_fixtures")
+def test_search_cliente_paginado(test_app, session):
+    session.add_all(
+        [
+            Cliente(**cliente_data(f"2710000{i:04d}", f"Taller Mecanico {i % 5}"))
+            for i in range(23)
+        ]
+    )
+    session.commit()
+
+    ids = []
+    cursor = None
+    while True:
+        result = ClienteSearchService.search("taller", cursor=cursor, page_size=10)
+        ids += [c.id for c in result["clientes"]]
+        cursor = result["next_cursor"]
+        if cursor is None:
+            break
+    assert len(ids) == 23
+    assert len(set(ids)) == 23
+
+    # Las páginas respetan el orden por (razon_social, id)
+    clientes = session.query(Cliente).filter(Cliente.id.in_(ids)).all()
+    esperado = [c.id for c in sorted(clientes, key=lambda c: (c.razon_social, c.id))]
+    assert ids == esperado
+
+    opciones = ClienteSearchService.typeahead("taller mecanico 3", limit=3)
+    assert len(opciones) == 3
+    assert all(o["label"].startswith("Taller Mecanico 3") for o in opciones)
@@ -0,0 +1,101 @@
+import json
+import pytest
+from server.core.models import Articulo
+from server.core.services import ArticuloSearchService
+from server.imports.articulo import dump_sintetico, import_data, preparar
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+
+
+def escribir_dump(directorio, productos, stock, codigos):
+    for nombre, filas in (
+        ("Producto", productos),
+        ("Stock", stock),
+        ("ProdCod", codigos),
+    ):
+        with open(directorio / f"{nombre}.json", "w", encoding="utf-8") as archivo:
+            json.dump(filas, archivo)
+
+
+def producto(id, codbar, lineas, baja=0):
+    return {
+        "PRO_CODIGO": id,
+        "PRO_CODBAR": codbar,
+        **{f"PRO_LINEA{n}": linea for n, linea in enumerate(lineas, start=1)},
+        "PRO_BAJA": baja,
+    }
+
+
+@pytest.mark.usefixtures("load_fixtures")
+def test_import_articulo(test_app, session, tmp_path):
+    escribir_dump(
+        tmp_path,
+        [
+            producto(2001, " 0779001 ", ["ACEITE ", "¥ANDU", "", ""]),
+            producto(2002, "0779002", ["BAJA", "", "", ""], baja=1),
+            producto(2003, "0779003", [None, None, None, None]),
+            producto(2004, "", ["SIN CODIGO", "", "", ""]),
+        ],
+        [
+            {"STK_PRODUCTO": 2001, "STK_DEPOSITO": 2, "STK_EXISTENCIA": 99},
+            {"STK_PRODUCTO": 2001, "STK_DEPOSITO": 1, "STK_EXISTENCIA": 7},
+        ],
+        [
+            {"PDC_CODIGO": 2001, "PDC_CODBAR": codigo}
+            for codigo in ("0779001", "A1", "A2", "A1", "A3", "A4", "A5")
+        ]
+        + [{"PDC_CODIGO": 2002, "PDC_CODBAR": "X1"}],
+    )
+    import_data(str(tmp_path))
+
+    articulo = session.get(Articulo, 2001)
+    assert (articulo.codigo_principal, articulo.descripcion) == (
+        "0779001",
+        "ACEITE ÑANDU",
+    )
+    assert float(articulo.stock_actual) == 7
+    # Los códigos repetidos se descartan y el resto conserva su orden
+    assert [
+        articulo.codigo_secundario,
+        articulo.codigo_terciario,
+        articulo.codigo_cuaternario,
+        articulo.codigo_adicional,
+    ] == ["A1", "A2", "A3", ["A4", "A5"]]
+    articulo = session.get(Articulo, 2003)
+    assert (articulo.descripcion, float(articulo.stock_actual)) == (
+        "Sin descripción",
+        0,
+    )
+    # Los productos dados de baja o sin código no se importan
+    assert session.get(Articulo, 2002) is None
+    assert session.get(Articulo, 2004) is None
+
+    # Los artículos importados se agregan al índice de búsqueda
+    assert [a.id for a in ArticuloSearchService.search("ñandu")["articulos"]] == [2001]
+    assert [a.id for a in ArticuloSearchService.search("A5")["articulos"]] == [2001]
+
+
+def test_preparar_dump_sintetico():
+    articulos, codigos = preparar(*dump_sintetico(500))
+    assert articulos["id"].is_unique
+    assert not codigos.duplicated(["articulo_id", "codigo"]).any()
+    principales = codigos[codigos["prioridad"] == 0]
+    assert principales["articulo_id"].tolist() == articulos["id"].tolist()
+    assert principales["codigo"].tolist() == articulos["codigo_principal"].tolist()
+
+
+def test_import_articulo_error(test_app, session, tmp_path, monkeypatch):
+    escribir_dump(
+        tmp_path,
+        [producto(2001, "0779001", ["ACEITE", "", "", ""])],
+        [{"STK_PRODUCTO": 2001, "STK_DEPOSITO": 1, "STK_EXISTENCIA": 7}],
+        [{"PDC_CODIGO": 2001, "PDC_CODBAR": "A1"}],
+    )
+
+    def insertar(*args, **kwargs):
+        raise RuntimeError("Lote inválido")
+
+    monkeypatch.setattr("server.imports.articulo.insertar", insertar)
+    # El error se propaga, para que el comando termine con un código distinto de 0
+    with pytest.raises(RuntimeError, match="Lote inválido"):
+        import_data(str(tmp_path))
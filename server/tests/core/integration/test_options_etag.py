@@ -0,0 +1,89 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from server.auth.models import Usuario
+from server.auth.routes import auth_bp
+from server.config import jwt
+from server.core.models import Cliente, Proveedor
+from server.core.routes import compra_bp, venta_bp
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+
+
+@pytest.fixture(scope="module")
+def api(test_app):
+    "Cliente HTTP de la aplicación de prueba con las rutas de ventas y compras"
+    # Las funciones de identidad del token se registran en auth_route
+    test_app.register_blueprint(auth_bp)
+    test_app.register_blueprint(venta_bp)
+    test_app.register_blueprint(compra_bp)
+    jwt.init_app(test_app)
+    return test_app.test_client()
+
+
+@pytest.fixture
+def headers(session):
+    usuario = session.query(Usuario).filter_by(username="admin").one_or_none()
+    if usuario is None:
+        usuario = Usuario(
+            username="admin", email="admin@test.com", password="admin", is_superuser=True
+        )
+        session.add(usuario)
+        session.commit()
+    token = create_access_token(identity={"username": usuario.username})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def proveedor(razon_social, nro_documento):
+    return Proveedor(
+        razon_social=razon_social,
+        nro_documento=nro_documento,
+        direccion="CALLE 123",
+        localidad="LOCALIDAD",
+        codigo_postal="5000",
+        tipo_documento_id=1,
+        tipo_responsable_id=1,
+        provincia_id=1,
+        created_by=1,
+        updated_by=1,
+    )
+
+
+def get_condicional(api, url, headers):
+    "Solicita la URL y luego la vuelve a solicitar con el ETag recibido"
+    res = api.get(url, headers=headers)
+    assert res.status_code == 200 and res.headers["ETag"]
+    return res, api.get(url, headers={**headers, "If-None-Match": res.headers["ETag"]})
+
+
+@pytest.mark.usefixtures("load_fixtures", "new_punto_venta", "multiple_clientes")
+def test_venta_create_etag(api, session, headers):
+    res, res_304 = get_condicional(api, "/ventas/create", headers)
+    assert res_304.status_code == 304
+    cliente = session.query(Cliente).order_by(Cliente.id).first()
+    assert res.json["clientes"] == [cliente.to_select_dict()]
+
+    # Un cambio del cliente inicial genera un nuevo ETag
+    cliente.razon_social = f"{cliente.razon_social} SRL"
+    session.commit()
+    res_cambio = api.get(
+        "/ventas/create", headers={**headers, "If-None-Match": res.headers["ETag"]}
+    )
+    assert res_cambio.status_code == 200
+    assert res_cambio.headers["ETag"] != res.headers["ETag"]
+
+
+@pytest.mark.usefixtures("load_fixtures")
+def test_compra_create_etag(api, session, headers):
+    session.add(proveedor("PROVEEDOR SA", "30111111118"))
+    session.commit()
+    res, res_304 = get_condicional(api, "/compras/create", headers)
+    assert res_304.status_code == 304
+
+    # Un proveedor nuevo genera un nuevo ETag, sin cambiar la versión de referencia
+    session.add(proveedor("OTRO PROVEEDOR SA", "30222222226"))
+    session.commit()
+    res_cambio = api.get(
+        "/compras/create", headers={**headers, "If-None-Match": res.headers["ETag"]}
+    )
+    assert res_cambio.status_code == 200
+    assert len(res_cambio.json["proveedores"]) == len(res.json["proveedores"]) + 1
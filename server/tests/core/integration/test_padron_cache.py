@@ -0,0 +1,97 @@
+import threading
+import time
+import pytest
+from datetime import datetime
+from server.core.models import PadronPersona
+from server.core.services import AfipService, PadronCache
+from server.core.services.afip_service import AfipServiceError, PersonaNoEncontradaError
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+
+
+@pytest.fixture
+def padron(monkeypatch):
+    "Padrón de prueba: registra las consultas y sólo encuentra los CUIT terminados en 3"
+    consultas = []
+    estado = {"disponible": True}
+
+    def get_persona(self, identifier):
+        consultas.append(identifier)
+        time.sleep(0.1)
+        if not estado["disponible"]:
+            raise AfipServiceError("Error obteniendo datos de la persona: timeout")
+        if identifier % 10 != 3:
+            raise PersonaNoEncontradaError("No existe persona con ese Id")
+        return {
+            "tipo_responsable_id": 1,
+            "razon_social": f"Persona {identifier}",
+            "direccion": "Calle 123",
+            "provincia_id": 1,
+            "localidad": "Localidad",
+            "codigo_postal": "1234",
+        }
+
+    monkeypatch.setattr(AfipService, "get_persona", get_persona)
+    return consultas, estado
+
+
+def test_padron_cache(session, padron):
+    consultas, estado = padron
+
+    datos = PadronCache.get_persona(session, 20222222223)
+    assert datos["razon_social"] == "Persona 20222222223"
+    assert PadronCache.get_persona(session, "20222222223") == datos
+    assert consultas == [20222222223]
+
+    # Los CUIT inexistentes también se guardan
+    for _ in range(2):
+        with pytest.raises(PersonaNoEncontradaError):
+            PadronCache.get_persona(session, 20111111112)
+    assert consultas == [20222222223, 20111111112]
+    assert session.get(PadronPersona, "20111111112").encontrada is False
+
+    # Vencida la cache se vuelve a consultar; si AFIP no responde se usan los datos vencidos
+    session.get(PadronPersona, "20222222223").consultado_at = datetime(2000, 1, 1)
+    session.commit()
+    estado["disponible"] = False
+    assert PadronCache.get_persona(session, 20222222223) == datos
+    with pytest.raises(AfipServiceError):
+        PadronCache.get_persona(session, 20333333333)
+    assert session.get(PadronPersona, "20333333333") is None
+    assert len(consultas) == 4
+
+
+def test_padron_cache_consultas_simultaneas(test_app, padron):
+    consultas, _ = padron
+    resultados = []
+
+    def consultar():
+        resultados.append(PadronCache._consultar("20444444443"))
+
+    hilos = [threading.Thread(target=consultar) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert consultas == [20444444443]
+    assert len(resultados) == 8
+
+
+@pytest.mark.usefixtures("load_fixtures", "multiple_clientes")
+def test_padron_prefetch(session, padron):
+    consultas, _ = padron
+    cuits = PadronCache.cuits_registrados(session)
+    assert cuits == ["20222222223"]
+
+    res = PadronCache.prefetch(session, [*cuits, "20555555552"])
+    assert res == {
+        "consultados": 2,
+        "encontrados": 1,
+        "no_encontrados": 1,
+        "errores": 0,
+    }
+    # Los CUIT vigentes se omiten, salvo con refresh
+    assert PadronCache.prefetch(session, cuits)["consultados"] == 0
+    assert PadronCache.prefetch(session, cuits, refresh=True)["consultados"] == 1
+    PadronCache.get_persona(session, "20222222223")
+    assert len(consultas) == 3
@@ -0,0 +1,58 @@
+import os
+import pytest
+from datetime import datetime
+from server.core.controllers import VentaController
+from server.core.models import Cliente, Venta
+from server.core.services import PDFCache
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+from .test_resumen_ventas import venta_data
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_pdf_cache(test_app, session, tmp_path, monkeypatch):
+    monkeypatch.setattr(PDFCache, "DIR", str(tmp_path))
+    render = PDFCache.render
+    generados = []
+
+    def contar(venta, size):
+        generados.append(size)
+        return render(venta, size)
+
+    monkeypatch.setattr(PDFCache, "render", staticmethod(contar))
+    venta_id = VentaController.create(
+        venta_data(datetime(2020, 5, 4, 12), [(1, 2), (2, 1)]), session
+    )
+    venta = session.get(Venta, venta_id)
+
+    ruta, etag, modificado = PDFCache.get_pdf(venta, "A4")
+    with open(ruta, "rb") as archivo:
+        assert archivo.read(5) == b"%PDF-"
+    assert PDFCache.get_pdf(venta, "A4") == (ruta, etag, modificado)
+    assert generados == ["A4"]
+
+    # Un cambio en los datos impresos genera un nuevo comprobante
+    cliente = session.get(Cliente, venta.cliente_id)
+    cliente.razon_social = f"{cliente.razon_social} SRL"
+    session.commit()
+    nueva_ruta, nuevo_etag, _ = PDFCache.get_pdf(venta, "A4")
+    assert nuevo_etag != etag and generados == ["A4", "A4"]
+    assert os.listdir(tmp_path) == [os.path.basename(nueva_ruta)]
+
+    # Al superar el tamaño máximo se eliminan los archivos usados hace más tiempo
+    monkeypatch.setattr(PDFCache, "MAX_BYTES", os.path.getsize(nueva_ruta))
+    ticket, _, _ = PDFCache.get_pdf(venta, "80")
+    assert os.listdir(tmp_path) == [os.path.basename(ticket)]
+
+    # Las ventas que pueden modificarse no se guardan en cache
+    orden_id = VentaController.create(
+        venta_data(datetime(2020, 5, 4, 12), [(3, 1)]), session, orden=True
+    )
+    pdf, _, _ = PDFCache.get_pdf(session.get(Venta, orden_id), "A4")
+    assert pdf.startswith(b"%PDF-")
+    assert os.listdir(tmp_path) == [os.path.basename(ticket)]
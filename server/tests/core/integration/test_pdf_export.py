@@ -0,0 +1,70 @@
+import io
+import re
+import zipfile
+import pytest
+from datetime import date, datetime
+from server.core.controllers import VentaController
+from server.core.services import ExportacionPDF, PDFCache
+from server.core.services.pdf_export import _PDFUnido
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+from .test_resumen_ventas import venta_data
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_exportacion_pdf(test_app, session, tmp_path, monkeypatch):
+    monkeypatch.setattr(PDFCache, "DIR", str(tmp_path))
+    diez_items = [(i, 1) for i in range(1, 11)]
+    for dia, items in ((3, [(1, 1)]), (4, diez_items), (20, [(3, 1)])):
+        VentaController.create(venta_data(datetime(2020, 8, dia, 12), items), session)
+    orden = venta_data(datetime(2020, 8, 5, 12), [(4, 1)])
+    VentaController.create(orden, session, orden=True)
+    filtros = {"desde": date(2020, 8, 1), "hasta": date(2020, 8, 10)}
+
+    # Un único PDF con las páginas de todos los comprobantes
+    pdf = b"".join(ExportacionPDF.exportar(session, "pdf", "A4", **filtros))
+    assert pdf.startswith(b"%PDF-") and pdf.endswith(b"%%EOF\n")
+    assert re.search(rb"/Type /Pages /Count (\d+)", pdf).group(1) == b"2"
+    xref = int(re.search(rb"startxref\n(\d+)", pdf).group(1))
+    posiciones = re.findall(rb"(\d{10}) 00000 n", pdf[xref:])
+    for numero, posicion in enumerate(posiciones, start=1):
+        assert pdf[int(posicion) :].startswith(b"%d 0 obj" % numero)
+    # El logo, repetido en cada comprobante, se incluye una sola vez
+    assert pdf.count(b"/Subtype /Image") == 1
+
+    # Un archivo ZIP con un PDF por venta
+    contenido = b"".join(ExportacionPDF.exportar(session, "zip", "80", **filtros))
+    with zipfile.ZipFile(io.BytesIO(contenido)) as archivo:
+        nombres = archivo.namelist()
+        assert len(nombres) == 2 and len(set(nombres)) == 2
+        assert all(archivo.read(n).startswith(b"%PDF-") for n in nombres)
+
+    assert list(ExportacionPDF.exportar(session, "zip", desde=date(2021, 1, 1)))
+    with pytest.raises(ValueError):
+        ExportacionPDF.exportar(session, "xls")
+
+
+def test_pdf_unido_length_indirecto():
+    # El stream contiene "endobj" y "stream": sólo puede delimitarse por su /Length
+    contenido = b"BT (endobj stream) Tj ET"
+    pdf = (
+        b"%PDF-1.4\n"
+        b"4 0 obj\n<< /Length 5 0 R >>\nstream\n" + contenido + b"\nendstream\nendobj\n"
+        b"5 0 obj\n%d\nendobj\n" % len(contenido)
+        + b"6 0 obj\n<< /Length 9 >>\nstream\n123456789\nendstream\nendobj\n"
+    )
+    objetos = _PDFUnido._objetos(pdf)
+    assert objetos[4] == (
+        b"<< /Length 5 0 R >>\n",
+        b"stream\n" + contenido + b"\nendstream\n",
+    )
+    assert objetos[5] == (b"%d\n" % len(contenido), b"")
+    assert objetos[6][1] == b"stream\n123456789\nendstream\n"
+
+    with pytest.raises(ValueError):
+        _PDFUnido._objetos(pdf.replace(b"5 0 R", b"7 0 R"))
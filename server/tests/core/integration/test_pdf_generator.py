@@ -0,0 +1,65 @@
+import io
+import re
+import pytest
+from datetime import datetime
+from server.core.controllers import VentaController
+from server.core.models import Articulo, Venta
+from server.core.services import A4PDFGenerator
+from server.core.services import pdf_generator
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+from .test_resumen_ventas import venta_data
+
+
+def generar(venta) -> bytes:
+    output = io.BytesIO()
+    A4PDFGenerator(output).generate_pdf(venta)
+    return output.getvalue()
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+)
+def test_pdf_a4_varias_paginas(test_app, session, monkeypatch):
+    articulos = [
+        Articulo(
+            codigo_principal=f"PDF{n:03}",
+            descripcion=f"PRODUCTO {n}",
+            linea_factura=f"PRODUCTO {n}",
+            stock_actual=0,
+            tipo_articulo_id=1,
+            tipo_unidad_id=1,
+            alicuota_iva_id=1,
+            created_by=1,
+            updated_by=1,
+        )
+        for n in range(45)
+    ]
+    session.add_all(articulos)
+    session.commit()
+    venta_id = VentaController.create(
+        venta_data(datetime(2020, 5, 4, 12), [(a.id, 1) for a in articulos]), session
+    )
+    venta = session.get(Venta, venta_id)
+    monkeypatch.setattr(A4PDFGenerator, "_imagenes", {})
+
+    pdf = generar(venta)
+    # 20 items por página, con la imagen de la cabecera escrita una sola vez
+    assert len(re.findall(rb"/Type /Page\b", pdf)) == 3
+    assert pdf.count(b"/Subtype /Image") == 1
+    imagenes = dict(A4PDFGenerator._imagenes)
+    assert len(imagenes) == 1
+
+    # Los comprobantes siguientes reutilizan la imagen ya codificada
+    assert generar(venta).count(b"/Subtype /Image") == 1
+    assert A4PDFGenerator._imagenes == imagenes
+
+    # Con otra versión de ReportLab, drawImage codifica la imagen en cada comprobante
+    monkeypatch.setattr(A4PDFGenerator, "_imagenes", {})
+    monkeypatch.setattr(pdf_generator, "REPORTLAB_VERSION_IMAGENES", "0")
+    pdf = generar(venta)
+    assert len(re.findall(rb"/Type /Page\b", pdf)) == 3
+    assert pdf.count(b"/Subtype /Image") == 1
+    assert A4PDFGenerator._imagenes == {}
@@ -0,0 +1,71 @@
+import pytest
+from datetime import datetime
+from server.core.controllers import VentaController
+from server.core.models import Moneda, Tributo, Articulo
+from server.utils.reference_data import reference_data
+from server.utils.utils import get_select_options, get_options_response
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+from .test_resumen_ventas import venta_data
+
+
+@pytest.mark.usefixtures("load_fixtures")
+def test_registry_cache_e_invalidacion(test_app, session):
+    reference_data.invalidate()
+    stats = reference_data.stats()
+
+    with count_queries() as statements:
+        monedas = get_select_options([Moneda])[Moneda.__pluralname__]
+        assert get_select_options([Moneda])[Moneda.__pluralname__] == monedas
+    assert len(statements) == 1
+    assert reference_data.stats()["misses"] == stats["misses"] + 1
+    assert reference_data.stats()["hits"] == stats["hits"] + 1
+
+    # Una escritura sobre un modelo de referencia invalida el registro
+    version = reference_data.version
+    session.add(Moneda(nombre="Moneda de prueba", simbolo="MP", codigo_iso="XMP", codigo_afip="XMP"))
+    session.commit()
+    assert reference_data.version > version
+    assert len(get_select_options([Moneda])[Moneda.__pluralname__]) == len(monedas) + 1
+
+    # Los modelos que no son de referencia no se guardan en el registro
+    entries = reference_data.stats()["entries"]
+    reference_data.get(Articulo, "datagrid")
+    assert reference_data.stats()["entries"] == entries
+
+
+@pytest.mark.usefixtures("load_fixtures")
+def test_options_response_etag(test_app, session):
+    with test_app.test_request_context():
+        response = get_options_response([Moneda], [Tributo])
+        assert response.status_code == 200
+        etag, _ = response.get_etag()
+        assert etag
+        assert "tributos" in response.get_json()
+
+    headers = {"If-None-Match": f'"{etag}"'}
+    with test_app.test_request_context(headers=headers):
+        response = get_options_response([Moneda], [Tributo])
+        assert response.status_code == 304
+        assert response.get_data() == b""
+
+    reference_data.invalidate()
+    with test_app.test_request_context(headers=headers):
+        response = get_options_response([Moneda], [Tributo])
+        assert response.status_code == 200
+        assert response.get_etag()[0] != etag
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_venta_no_invalida_registro(test_app, session):
+    # Las ventas agregan filas a las relaciones inversas del punto de venta y del tipo
+    # de comprobante, pero no modifican sus columnas
+    get_select_options([Moneda])
+    version = reference_data.version
+    VentaController.create(venta_data(datetime(2020, 9, 1, 12), [(1, 1)]), session)
+    assert reference_data.version == version
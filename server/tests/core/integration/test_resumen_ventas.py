@@ -0,0 +1,141 @@
+import pytest
+import pytz
+from datetime import date, datetime, timedelta
+from sqlalchemy import select
+from server.core.controllers import VentaController
+from server.core.models import (
+    Venta,
+    VentaResumenArticulo,
+    VentaResumenComprobante,
+)
+from server.core.services import ResumenVentas
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+
+
+def venta_data(fecha_hora: datetime, items: list) -> dict:
+    return {
+        "cliente": 1,
+        "tipo_comprobante": 9,  # Remito, no requiere CAE
+        "punto_venta": 1,
+        "fecha_hora": fecha_hora.isoformat(),
+        "descuento": 0,
+        "recargo": 0,
+        "created_by": 1,
+        "updated_by": 1,
+        "items": [
+            {
+                "articulo_id": articulo_id,
+                "descripcion": f"PRODUCTO {articulo_id}",
+                "cantidad": cantidad,
+                "precio_unidad": 100,
+                "alicuota_iva": 0,
+                "subtotal_iva": 0,
+                "subtotal_gravado": 100 * cantidad,
+                "subtotal": 100 * cantidad,
+            }
+            for articulo_id, cantidad in items
+        ],
+        "tributos": [],
+    }
+
+
+def resumenes(session) -> dict:
+    "Contenido de los resúmenes, sin las filas en cero"
+    res = {}
+    for model in (VentaResumenArticulo, VentaResumenComprobante):
+        claves = [c.name for c in model.__table__.primary_key]
+        valores = [c.name for c in model.__table__.c if c.name not in claves]
+        res[model.__tablename__] = {
+            tuple(getattr(fila, c) for c in claves): tuple(
+                float(getattr(fila, c)) for c in valores
+            )
+            for fila in session.scalars(select(model))
+            if any(getattr(fila, c) for c in valores)
+        }
+    return res
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_resumen_ventas(test_app, session):
+    ahora = datetime.now(pytz.timezone("America/Argentina/Buenos_Aires"))
+    hoy = ahora.date()
+    ayer = ahora - timedelta(days=1)
+    hace_una_semana = ahora - timedelta(days=7)
+    VentaController.create(venta_data(hace_una_semana, [(1, 2), (2, 1)]), session)
+    anulada_id = VentaController.create(venta_data(ayer, [(1, 5)]), session)
+    movida_id = VentaController.create(venta_data(ayer, [(3, 1)]), session)
+    VentaController.create(venta_data(ahora, [(2, 4)]), session)
+    VentaController.create(venta_data(ayer, [(4, 9)]), session, orden=True)
+
+    fila = session.get(VentaResumenArticulo, (ayer.date(), 1))
+    assert (fila.cantidad, fila.total) == (5, 500)
+    assert session.get(VentaResumenArticulo, (ayer.date(), 4)) is None
+
+    # Las ventas anuladas o movidas de fecha actualizan los resúmenes
+    VentaController.anular(session.get(Venta, anulada_id))
+    session.get(Venta, movida_id).fecha_hora = hace_una_semana.replace(tzinfo=None)
+    session.commit()
+    assert session.get(VentaResumenArticulo, (ayer.date(), 1)).cantidad == 0
+    fila = session.get(VentaResumenComprobante, (hace_una_semana.date(), 9))
+    assert (fila.ventas, fila.total) == (2, 400)
+
+    # Los resúmenes mantenidos coinciden con los recalculados desde las ventas
+    mantenidos = resumenes(session)
+    ResumenVentas.reconstruir(session)
+    session.commit()
+    assert resumenes(session) == mantenidos
+
+    # El reporte combina los días cerrados con las ventas del día
+    articulos = ResumenVentas.articulos_mas_vendidos(
+        session, hace_una_semana.date(), hoy
+    )
+    assert [(a.id, float(a.cantidad_total)) for a in articulos] == [
+        (2, 5),
+        (1, 2),
+        (3, 1),
+    ]
+    articulos = ResumenVentas.articulos_mas_vendidos(session, hoy)
+    assert [(a.id, float(a.total_vendido)) for a in articulos] == [(2, 400)]
+    comprobantes = ResumenVentas.por_comprobante(session, hasta=ayer.date())
+    assert [(c.id, c.ventas, float(c.total)) for c in comprobantes] == [(9, 2, 400)]
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_reporte_por_vendedor(test_app, session):
+    lunes = datetime(2020, 3, 2, 12)
+    fin = date(2020, 3, 31)
+    for dias, items in ((0, [(1, 1)]), (2, [(2, 3)]), (7, [(3, 2)])):
+        VentaController.create(venta_data(lunes + timedelta(days=dias), items), session)
+    VentaController.create(venta_data(lunes, [(4, 1)]), session, orden=True)
+
+    res = ResumenVentas.por_vendedor(
+        session, [1], "semana", desde=lunes.date(), hasta=fin
+    )
+    assert res["resumen"] == {"ventas": 4, "total": 700.0}
+    assert [(v["usuario_id"], v["ventas"]) for v in res["por_vendedor"]] == [(1, 4)]
+    assert [(p["periodo"], p["ventas"], p["total"]) for p in res["por_periodo"]] == [
+        (lunes.date().isoformat(), 3, 500.0),
+        ((lunes + timedelta(days=7)).date().isoformat(), 1, 200.0),
+    ]
+    assert [(e["estado"], e["ventas"]) for e in res["por_estado"]] == [
+        ("orden", 1),
+        ("ticket", 3),
+    ]
+
+    res = ResumenVentas.por_vendedor(
+        session, [1, 2], "dia", desde=lunes.date(), hasta=fin, estados=["ticket"]
+    )
+    assert res["resumen"] == {"ventas": 3, "total": 600.0}
+    assert len(res["por_periodo"]) == 3
+    assert ResumenVentas.por_vendedor(session, [2])["resumen"]["ventas"] == 0
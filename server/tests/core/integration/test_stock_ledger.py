@@ -0,0 +1,128 @@
+import csv
+import json
+import pytest
+from datetime import datetime
+from server.core.models import (
+    Articulo,
+    MovimientoStock,
+    MovimientoStockItem,
+    StockSnapshot,
+)
+from server.core.services import StockLedger
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+
+
+def registrar(session, tipo, fecha_hora, renglones, retroactivo=False):
+    movimiento = MovimientoStock(
+        tipo_movimiento=tipo,
+        origen="ajuste",
+        fecha_hora=fecha_hora,
+        created_by=1,
+        updated_by=1,
+    )
+    session.add(movimiento)
+    StockLedger.registrar(session, movimiento, renglones, retroactivo=retroactivo)
+    session.commit()
+    return movimiento
+
+
+@pytest.mark.usefixtures("load_fixtures", "faker_articulos")
+def test_stock_al(test_app, session):
+    stock_inicial = session.get(Articulo, 1).stock_actual
+    registrar(session, "ingreso", datetime(2024, 1, 10), [(1, 10), (2, 5)])
+    registrar(session, "egreso", datetime(2024, 2, 10), [(1, 3)])
+    registrar(session, "egreso", datetime(2024, 3, 10), [(1, 2)])
+    assert session.get(Articulo, 1).stock_actual == stock_inicial + 5
+
+    # Sin fotos, el stock se calcula desde el stock actual
+    assert StockLedger.stock_al(session, 1, datetime(2024, 1, 1)) == stock_inicial
+    assert StockLedger.stock_al(session, 1, datetime(2024, 2, 1)) == stock_inicial + 10
+
+    assert StockLedger.crear_snapshots(session, datetime(2024, 2, 28)) == 10
+    session.commit()
+    foto = session.query(StockSnapshot).filter_by(articulo_id=1).one()
+    assert foto.stock == stock_inicial + 7
+
+    # Con fotos, desde la foto más cercana y los movimientos entre ambas fechas
+    assert StockLedger.stock_al(session, 1, datetime(2024, 3, 31)) == stock_inicial + 5
+    assert StockLedger.stock_al(session, 1, datetime(2024, 2, 1)) == stock_inicial + 10
+    assert StockLedger.stock_al(session, 1, datetime(2024, 1, 1)) == stock_inicial
+
+    # Un movimiento anterior a la foto la corrige
+    registrar(session, "ingreso", datetime(2024, 1, 20), [(1, 1)], retroactivo=True)
+    session.refresh(foto)
+    assert foto.stock == stock_inicial + 8
+
+    # La foto siguiente parte de la anterior
+    StockLedger.crear_snapshots(session, datetime(2024, 3, 31))
+    session.commit()
+    ultima = session.query(StockSnapshot).filter_by(
+        articulo_id=1, fecha_hora=datetime(2024, 3, 31)
+    )
+    assert ultima.one().stock == session.get(Articulo, 1).stock_actual
+
+    with pytest.raises(ValueError):
+        StockLedger.crear_snapshots(session, datetime(2999, 1, 1))
+
+
+@pytest.mark.usefixtures("load_fixtures", "faker_articulos")
+def test_ajuste_con_cantidad_negativa(test_app, session):
+    "Los ajustes de stock desde el formulario del artículo registran la cantidad con signo"
+    stock = session.get(Articulo, 3).stock_actual
+    movimiento = MovimientoStock(
+        tipo_movimiento="egreso",
+        origen="ajuste",
+        fecha_hora=datetime(2024, 1, 10),
+        created_by=1,
+        updated_by=1,
+    )
+    session.add(
+        MovimientoStockItem(
+            articulo_id=3,
+            movimiento_stock=movimiento,
+            codigo_principal="x",
+            cantidad=-4,
+            stock_posterior=stock,
+        )
+    )
+    session.commit()
+    assert StockLedger.stock_al(session, 3, datetime(2024, 1, 1)) == stock + 4
+
+
+@pytest.mark.usefixtures("load_fixtures", "faker_articulos")
+def test_stock_catalogo_al(test_app, session):
+    registrar(session, "ingreso", datetime(2024, 1, 10), [(1, 10), (2, 5)])
+    registrar(session, "egreso", datetime(2024, 2, 10), [(1, 3), (3, 1)])
+    registrar(session, "egreso", datetime(2024, 3, 10), [(2, 2)])
+
+    def comparar(fecha_hora):
+        catalogo = list(StockLedger.stock_catalogo_al(session, fecha_hora, yield_per=3))
+        assert [fila[0] for fila in catalogo] == list(range(1, 11))
+        for articulo_id, _, _, stock in catalogo:
+            assert stock == StockLedger.stock_al(session, articulo_id, fecha_hora)
+
+    fechas = [datetime(2024, m, 1) for m in (1, 2, 3, 4)]
+    for fecha_hora in fechas:
+        comparar(fecha_hora)
+
+    # Con fotos de sólo algunos artículos, el resto se calcula desde el stock actual
+    StockLedger.crear_snapshots(session, datetime(2024, 2, 15))
+    session.query(StockSnapshot).filter(StockSnapshot.articulo_id > 2).delete()
+    session.commit()
+    for fecha_hora in [*fechas, datetime(2024, 2, 15)]:
+        comparar(fecha_hora)
+
+    # Exportación
+    fecha_hora = datetime(2024, 2, 1)
+    stock = {
+        fila[0]: float(fila[3])
+        for fila in StockLedger.stock_catalogo_al(session, fecha_hora)
+    }
+    texto = "".join(StockLedger.exportar_catalogo(session, fecha_hora, "csv", filas=3))
+    filas = list(csv.DictReader(texto.splitlines()))
+    assert {int(f["articulo_id"]): float(f["stock"]) for f in filas} == stock
+    texto = "".join(StockLedger.exportar_catalogo(session, fecha_hora, "json", filas=3))
+    assert {f["articulo_id"]: f["stock"] for f in json.loads(texto)} == stock
+    with pytest.raises(ValueError):
+        list(StockLedger.exportar_catalogo(session, fecha_hora, "xml"))
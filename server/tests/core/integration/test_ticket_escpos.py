@@ -0,0 +1,92 @@
+import io
+import os
+import pytest
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from server.core.models import EstadoVenta
+from server.core.services import TicketEscPosGenerator
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), "golden")
+
+
+def venta(tipo_comprobante: dict, estado: EstadoVenta, items: list, **datos):
+    "Venta con los datos que imprime el ticket, sin acceder a la base de datos"
+    return SimpleNamespace(
+        tipo_comprobante=SimpleNamespace(**tipo_comprobante),
+        punto_venta=SimpleNamespace(
+            numero=3, comercio=SimpleNamespace(cuit="30712345678")
+        ),
+        numero=125,
+        nro_comprobante=lambda: "0003-00000125",
+        fecha_hora=datetime(2024, 6, 14, 18, 5, 30),
+        cliente=SimpleNamespace(
+            razon_social="Ñandú Repuestos y Accesorios para el Automotor S.R.L.",
+            nro_documento="30701234567",
+            tipo_documento=SimpleNamespace(codigo_afip=80),
+        ),
+        moneda=SimpleNamespace(codigo_afip="PES"),
+        moneda_cotizacion=Decimal("1"),
+        estado=estado,
+        items=[
+            SimpleNamespace(
+                articulo=SimpleNamespace(codigo_principal=codigo),
+                descripcion=descripcion,
+                cantidad=cantidad,
+                precio_unidad=Decimal(precio),
+                subtotal=cantidad * Decimal(precio),
+            )
+            for codigo, descripcion, cantidad, precio in items
+        ],
+        **datos,
+    )
+
+
+ITEMS = [
+    ("7791234567890", "FILTRO DE ACEITE", 2, "8450.50"),
+    ("ABC-123", "JUEGO DE PASTILLAS DE FRENO DELANTERAS CERÁMICAS", 1, "45999.99"),
+]
+
+VENTAS = {
+    "remito": venta(
+        {"nombre": "REMITO", "letra": "X", "codigo_afip": None},
+        EstadoVenta.ticket,
+        ITEMS,
+        total=Decimal("62900.99"),
+    ),
+    "factura_b": venta(
+        {"nombre": "FACTURA", "letra": "B", "codigo_afip": 6},
+        EstadoVenta.facturado,
+        ITEMS,
+        gravado=Decimal("51984.29"),
+        total_iva=Decimal("10916.70"),
+        total_tributos=Decimal("0"),
+        total=Decimal("62900.99"),
+        cae="74251234567890",
+        vencimiento_cae=date(2024, 6, 24),
+    ),
+}
+
+
+@pytest.mark.parametrize("nombre", VENTAS)
+def test_ticket_escpos(nombre):
+    "Compara el ticket con el archivo esperado (UPDATE_GOLDEN=1 lo regenera)"
+    buffer = io.BytesIO()
+    TicketEscPosGenerator(buffer).generate(VENTAS[nombre])
+    ruta = os.path.join(GOLDEN_DIR, f"ticket_{nombre}.bin")
+    if os.environ.get("UPDATE_GOLDEN"):
+        with open(ruta, "wb") as archivo:
+            archivo.write(buffer.getvalue())
+    with open(ruta, "rb") as archivo:
+        assert buffer.getvalue() == archivo.read()
+
+
+def test_ticket_escpos_qr():
+    buffer = io.BytesIO()
+    generator = TicketEscPosGenerator(buffer)
+    generator.generate(VENTAS["factura_b"])
+    datos = generator.qr_url().encode()
+    largo = len(datos) + 3
+    guardar = b"\x1d(k" + bytes([largo % 256, largo // 256]) + b"1P0" + datos
+    assert guardar + b"\x1d(k\x03\x001Q0" in buffer.getvalue()
+    assert "Ñandú".encode("cp858") in buffer.getvalue()
@@ -0,0 +1,223 @@
+import threading
+import pytest
+from server import create_app
+from server.config import db
+from server.core.models import (
+    Venta,
+    Articulo,
+    EstadoVenta,
+    MovimientoStock,
+    TareaFacturacion,
+    EstadoTareaFacturacion,
+)
+from server.core.controllers import VentaController
+from server.core.services import AfipService, StockLedger
+from server.core.services.afip_service import AfipServiceError
+from server.utils.database import begin_write
+from ..base_fixtures import *
+from .test_venta_create import remito_data
+
+CAJEROS = 8
+
+
+@pytest.fixture(scope="module")
+def test_app(tmp_path_factory):
+    """
+    Aplicación con una base de datos SQLite en archivo, ya que la base de datos en
+    memoria de los demás tests admite una única conexión.
+    """
+    path = tmp_path_factory.mktemp("concurrencia") / "datos.db"
+    app = create_app(testing=True, database_uri=f"sqlite:///{path}")
+    db.init_app(app)
+
+    with app.app_context():
+        db.session = db._make_scoped_session({})
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture(autouse=True)
+def session(test_app):
+    """
+    Sesión sin transacción externa: los datos se confirman en la base de datos para
+    que sean visibles desde las conexiones de los demás hilos.
+    """
+    yield db.session
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_venta_create_concurrente(test_app, session):
+    """
+    Varias ventas registradas al mismo tiempo, cada una en su propio hilo y conexión
+    (como en el servidor con SERVER_THREADS > 1), se confirman sin errores de bloqueo
+    y con números de comprobante correlativos.
+    """
+    assert session.execute(db.text("PRAGMA journal_mode")).scalar() == "wal"
+    stock_inicial = {a.id: a.stock_actual for a in session.query(Articulo).all()}
+    session.commit()
+
+    barrera = threading.Barrier(CAJEROS)
+    ventas = []
+    errores = []
+
+    def vender():
+        with test_app.app_context():
+            barrera.wait()
+            try:
+                # Equivalente a la transacción de una petición POST
+                begin_write(db.session)
+                ventas.append(VentaController.create(remito_data(2), db.session))
+            except Exception as e:
+                errores.append(e)
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+    hilos = [threading.Thread(target=vender) for _ in range(CAJEROS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert errores == []
+    assert len(ventas) == CAJEROS
+
+    session.expire_all()
+    numeros = [v.numero for v in session.query(Venta).filter(Venta.id.in_(ventas))]
+    assert sorted(numeros) == list(range(1, CAJEROS + 1))
+    for articulo_id in (1, 2):
+        articulo = session.get(Articulo, articulo_id)
+        assert articulo.stock_actual == stock_inicial[articulo_id] - CAJEROS
+
+
+@pytest.mark.usefixtures("load_fixtures", "faker_articulos")
+def test_stock_ledger_concurrente(test_app, session):
+    """
+    Egresos simultáneos de un mismo artículo, sin bloqueo previo de la fila: cada
+    movimiento descuenta sobre el stock vigente y registra su propio stock posterior.
+    """
+    stock_inicial = session.get(Articulo, 1).stock_actual
+    session.commit()
+
+    barrera = threading.Barrier(CAJEROS)
+    items = []
+    errores = []
+
+    def vender():
+        with test_app.app_context():
+            barrera.wait()
+            try:
+                movimiento = MovimientoStock(
+                    tipo_movimiento="egreso",
+                    origen="venta",
+                    observacion="Venta concurrente",
+                    created_by=1,
+                    updated_by=1,
+                )
+                db.session.add(movimiento)
+                renglones = StockLedger.registrar(
+                    db.session, movimiento, [(1, 1), (2, 1), (1, 2)]
+                )
+                db.session.commit()
+                items.extend(
+                    (r.articulo_id, r.cantidad, r.stock_posterior) for r in renglones
+                )
+            except Exception as e:
+                errores.append(e)
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+    hilos = [threading.Thread(target=vender) for _ in range(CAJEROS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert errores == []
+    session.expire_all()
+    assert session.get(Articulo, 1).stock_actual == stock_inicial - 3 * CAJEROS
+    # Cada movimiento observa un stock distinto: no se pierden actualizaciones
+    posteriores = sorted(
+        stock for articulo_id, cantidad, stock in items if articulo_id == 1
+    )
+    esperados = sorted(
+        [stock_inicial - 3 * i + 2 for i in range(1, CAJEROS + 1)]
+        + [stock_inicial - 3 * i for i in range(1, CAJEROS + 1)]
+    )
+    assert posteriores == esperados
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_cae_fuera_del_bloqueo(test_app, session, monkeypatch):
+    """
+    Mientras se espera el CAE de AFIP, las demás peticiones pueden escribir: el
+    bloqueo de escritura no se retiene durante la llamada.
+    """
+    remitos = []
+
+    def vender_remito():
+        with test_app.app_context():
+            try:
+                begin_write(db.session)
+                remitos.append(VentaController.create(remito_data(1), db.session))
+            finally:
+                db.session.remove()
+
+    bloqueado = []
+
+    def obtener_cae(self, venta):
+        cajero = threading.Thread(target=vender_remito)
+        cajero.start()
+        cajero.join(timeout=5)
+        bloqueado.append(cajero.is_alive())
+        return {"numero": 7, "cae": "74000000000000", "vencimiento_cae": "2024-09-08"}
+
+    monkeypatch.setattr(AfipService, "obtener_cae", obtener_cae)
+    stock_inicial = session.get(Articulo, 1).stock_actual
+    data = {**remito_data(1), "tipo_comprobante": 5}  # Factura B
+    begin_write(session)
+    venta_id = VentaController.create(data, session)
+
+    assert bloqueado == [False]
+    assert len(remitos) == 1
+    venta = session.get(Venta, venta_id)
+    assert (venta.estado, venta.numero, venta.cae) == (
+        EstadoVenta.facturado,
+        7,
+        "74000000000000",
+    )
+    assert session.get(Articulo, 1).stock_actual == stock_inicial - 2
+    session.commit()
+
+    # Si la solicitud falla, AFIP pudo haber autorizado el comprobante: la venta no se
+    # elimina, queda con error de CAE para buscarlo, reencolarla o anularla
+    def rechazar(self, venta):
+        raise AfipServiceError("Error obteniendo CAE: timeout")
+
+    monkeypatch.setattr(AfipService, "obtener_cae", rechazar)
+    ventas = session.query(Venta).count()
+    begin_write(session)
+    with pytest.raises(AfipServiceError):
+        VentaController.create(data, session)
+    session.expire_all()
+    assert session.query(Venta).count() == ventas + 1
+    venta = session.query(Venta).order_by(Venta.id.desc()).first()
+    assert venta.estado == EstadoVenta.error_cae
+    tarea = session.query(TareaFacturacion).filter_by(venta_id=venta.id).one()
+    assert tarea.estado == EstadoTareaFacturacion.error
+    assert "timeout" in tarea.error
+    assert session.get(Articulo, 1).stock_actual == stock_inicial - 3
+    session.commit()
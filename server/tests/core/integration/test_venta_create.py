@@ -325,3 +325,80 @@ def test_facturas_a(test_app, session, data):
         assert movimiento_item.cantidad == item.cantidad
         assert movimiento_item.codigo_principal == item.articulo.codigo_principal
         assert movimiento_item.stock_posterior == item.articulo.stock_actual
+
+
+def remito_data(cantidad_items: int) -> dict:
+    items = []
+    for articulo_id in range(1, cantidad_items + 1):
+        items.append(
+            {
+                "articulo_id": articulo_id,
+                "descripcion": f"PRODUCTO {articulo_id}",
+                "cantidad": 1.00,
+                "precio_unidad": 100,
+                "alicuota_iva": 21 if articulo_id % 2 else 10.5,
+                "subtotal_iva": 17.36 if articulo_id % 2 else 9.50,
+                "subtotal_gravado": 82.64 if articulo_id % 2 else 90.50,
+                "subtotal": 100.00,
+            }
+        )
+    return {
+        "cliente": 1,
+        "tipo_comprobante": 9,  # Remito, no requiere CAE
+        "punto_venta": 1,
+        "descuento": 0,
+        "recargo": 0,
+        "created_by": 1,
+        "updated_by": 1,
+        "items": items,
+        "tributos": [],
+    }
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_venta_create_statements(test_app, session):
+    """
+    Las consultas ejecutadas al crear una venta no dependen de la cantidad de
+    renglones: sólo crecen los INSERT de venta_item y movimiento_stock_item. Los
+    resúmenes diarios se actualizan con una sentencia por resumen.
+    """
+    session.expire_all()
+    with assert_num_queries(13) as statements:
+        VentaController.create(remito_data(1), session)
+    selects = len([s for s in statements if s.startswith("SELECT")])
+
+    session.expire_all()
+    with assert_num_queries(13 + 2 * 9) as statements:
+        venta_id = VentaController.create(remito_data(10), session)
+    assert len([s for s in statements if s.startswith("SELECT")]) == selects
+
+    venta = session.get(Venta, venta_id)
+    assert venta.estado == EstadoVenta.ticket
+    assert len(venta.items) == 10
+    for item in venta.items:
+        movimiento_item = (
+            session.query(MovimientoStockItem)
+            .join(MovimientoStock)
+            .filter(
+                MovimientoStock.observacion == f"Venta nro. {venta.id}",
+                MovimientoStockItem.articulo_id == item.articulo_id,
+            )
+            .one()
+        )
+        assert movimiento_item.stock_posterior == item.articulo.stock_actual
+
+
+@pytest.mark.usefixtures("load_fixtures")
+def test_alicuota_iva_codigo_afip(test_app, session):
+    with count_queries() as statements:
+        assert AlicuotaIVA.get_codigo_afip(21) == 5
+        assert AlicuotaIVA.get_codigo_afip(Decimal("10.50")) == 4
+        assert AlicuotaIVA.get_codigo_afip(0) == 3
+    assert len(statements) <= 1
+    with pytest.raises(ValueError):
+        AlicuotaIVA.get_codigo_afip(99)
@@ -0,0 +1,244 @@
+import pytest
+from datetime import datetime, timedelta
+from server.core.models import (
+    Venta,
+    EstadoVenta,
+    TareaFacturacion,
+    EstadoTareaFacturacion,
+    Articulo,
+)
+from server.core.controllers import VentaController
+from server.core.services import AfipService, FacturacionQueue
+from server.core.services.afip_service import AfipServiceError
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+from .test_venta_create import remito_data
+
+
+@pytest.fixture
+def afip(monkeypatch, test_app):
+    "AFIP de prueba: falla en el primer intento de cada venta, sin autorizarla"
+    monkeypatch.setitem(test_app.config, "FACTURACION_ASINCRONA", True)
+    intentos = {}
+    autorizados = {}
+
+    def obtener_cae(self, venta):
+        intentos[venta.id] = intentos.get(venta.id, 0) + 1
+        if intentos[venta.id] == 1:
+            raise AfipServiceError("Error obteniendo CAE: timeout")
+        autorizados[venta.id] = {
+            "numero": 100 + venta.id,
+            "cae": "74000000000000",
+            "vencimiento_cae": "2024-09-08",
+        }
+        return autorizados[venta.id]
+
+    def buscar_cae(self, venta, registrado=None):
+        return autorizados.get(venta.id)
+
+    monkeypatch.setattr(AfipService, "obtener_cae", obtener_cae)
+    monkeypatch.setattr(AfipService, "buscar_cae", buscar_cae)
+    return intentos
+
+
+def vencer_tareas(session):
+    "Adelanta el próximo intento de las tareas, como si hubiera transcurrido la espera"
+    for tarea in session.query(TareaFacturacion):
+        tarea.proximo_intento = datetime(2000, 1, 1)
+    session.commit()
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_facturacion_asincronica(test_app, session, afip):
+    stock_inicial = session.get(Articulo, 1).stock_actual
+    data = {**remito_data(1), "tipo_comprobante": 5}  # Factura B
+    venta_id = VentaController.create(data, session)
+
+    # La venta se confirma sin esperar el CAE y descuenta el stock
+    venta = session.get(Venta, venta_id)
+    assert venta.estado == EstadoVenta.pendiente_cae
+    assert venta.cae is None
+    assert session.get(Articulo, 1).stock_actual == stock_inicial - 1
+    assert afip == {}
+
+    # El primer intento falla y se posterga según la espera exponencial
+    assert FacturacionQueue.procesar_pendientes(session) == 1
+    tarea = session.query(TareaFacturacion).filter_by(venta_id=venta_id).one()
+    assert tarea.estado == EstadoTareaFacturacion.pendiente
+    assert tarea.intentos == 1
+    assert "timeout" in tarea.error
+    assert tarea.proximo_intento > datetime.utcnow() + timedelta(
+        seconds=FacturacionQueue.BACKOFF_BASE - 1
+    )
+    assert FacturacionQueue.procesar_pendientes(session) == 0
+
+    vencer_tareas(session)
+    assert FacturacionQueue.procesar_pendientes(session) == 1
+    estado = FacturacionQueue.estado(session.get(Venta, venta_id))
+    assert estado["estado"] == EstadoVenta.facturado.value
+    assert estado["numero"] == 100 + venta_id
+    assert estado["cae"] == "74000000000000"
+    assert estado["tarea"]["estado"] == EstadoTareaFacturacion.completada.value
+    assert estado["tarea"]["intentos"] == 2
+    assert session.get(Articulo, 1).stock_actual == stock_inicial - 1
+
+    # Los comprobantes que no requieren CAE no se encolan
+    remito_id = VentaController.create(remito_data(1), session)
+    assert session.get(Venta, remito_id).estado == EstadoVenta.ticket
+    assert FacturacionQueue.estado(session.get(Venta, remito_id))["tarea"] is None
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_facturacion_asincronica_max_intentos(test_app, session, afip, monkeypatch):
+    monkeypatch.setattr(FacturacionQueue, "MAX_INTENTOS", 1)
+    data = {**remito_data(1), "tipo_comprobante": 5}  # Factura B
+    venta_id = VentaController.create(data, session)
+
+    assert FacturacionQueue.procesar_pendientes(session) == 1
+    tarea = session.query(TareaFacturacion).filter_by(venta_id=venta_id).one()
+    assert tarea.estado == EstadoTareaFacturacion.error
+    assert session.get(Venta, venta_id).estado == EstadoVenta.error_cae
+
+    vencer_tareas(session)
+    assert FacturacionQueue.procesar_pendientes(session) == 0
+
+    # La venta con error puede volver a encolarse
+    FacturacionQueue.reencolar(session.get(Venta, venta_id), session)
+    session.commit()
+    assert session.get(Venta, venta_id).estado == EstadoVenta.pendiente_cae
+    assert FacturacionQueue.procesar_pendientes(session) == 1
+    assert session.get(Venta, venta_id).estado == EstadoVenta.facturado
+    assert afip[venta_id] == 2
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_facturacion_asincronica_autorizada_sin_respuesta(
+    test_app, session, afip, monkeypatch
+):
+    "Un intento autorizado por AFIP cuya respuesta no se recibió no se repite"
+    data = {**remito_data(1), "tipo_comprobante": 5}  # Factura B
+    venta_id = VentaController.create(data, session)
+
+    def obtener_cae(self, venta):
+        afip[venta.id] = afip.get(venta.id, 0) + 1
+        raise AfipServiceError("Error obteniendo CAE: timeout")
+
+    def buscar_cae(self, venta, registrado=None):
+        assert not registrado(100 + venta.id)
+        return {
+            "numero": 100 + venta.id,
+            "cae": "74000000000001",
+            "vencimiento_cae": "2024-09-08",
+        }
+
+    monkeypatch.setattr(AfipService, "obtener_cae", obtener_cae)
+    assert FacturacionQueue.procesar_pendientes(session) == 1
+    monkeypatch.setattr(AfipService, "buscar_cae", buscar_cae)
+    vencer_tareas(session)
+    assert FacturacionQueue.procesar_pendientes(session) == 1
+
+    venta = session.get(Venta, venta_id)
+    assert venta.estado == EstadoVenta.facturado
+    assert venta.numero == 100 + venta_id
+    assert venta.cae == "74000000000001"
+    assert afip[venta_id] == 1
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_anular_venta_con_error_cae(test_app, session, afip, monkeypatch):
+    monkeypatch.setattr(FacturacionQueue, "MAX_INTENTOS", 1)
+    stock_inicial = session.get(Articulo, 1).stock_actual
+    data = {**remito_data(1), "tipo_comprobante": 5}  # Factura B
+    venta_id = VentaController.create(data, session)
+    assert FacturacionQueue.procesar_pendientes(session) == 1
+    assert session.get(Articulo, 1).stock_actual == stock_inicial - 1
+
+    venta = session.get(Venta, venta_id)
+    assert VentaController.anular(venta) == (venta_id, "Venta anulada correctamente")
+    assert session.get(Venta, venta_id).estado == EstadoVenta.anulado
+    assert session.get(Articulo, 1).stock_actual == stock_inicial
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_facturacion_sincronica_interrumpida(test_app, session, afip, monkeypatch):
+    """
+    Si el proceso se interrumpe mientras espera el CAE, la venta conserva su tarea en
+    proceso y luego se recupera: con el CAE que AFIP llegó a autorizar, o anulándola.
+    """
+    monkeypatch.setitem(test_app.config, "FACTURACION_ASINCRONA", False)
+    stock_inicial = session.get(Articulo, 1).stock_actual
+    data = {**remito_data(1), "tipo_comprobante": 5}  # Factura B
+    autorizados = {}
+
+    def interrumpir(self, venta):
+        # AFIP autoriza el comprobante, pero el proceso finaliza antes de registrarlo
+        autorizados[venta.id] = {
+            "numero": 200 + venta.id,
+            "cae": "74000000000002",
+            "vencimiento_cae": "2024-09-08",
+        }
+        raise KeyboardInterrupt
+
+    def buscar_cae(self, venta, registrado=None):
+        return autorizados.get(venta.id)
+
+    monkeypatch.setattr(AfipService, "obtener_cae", interrumpir)
+    monkeypatch.setattr(AfipService, "buscar_cae", buscar_cae)
+    for _ in range(2):
+        with pytest.raises(KeyboardInterrupt):
+            VentaController.create(data, session)
+    session.expire_all()
+    venta_id, otra_id = sorted(autorizados)
+    venta = session.get(Venta, venta_id)
+    tarea = session.query(TareaFacturacion).filter_by(venta_id=venta_id).one()
+    assert venta.estado == EstadoVenta.pendiente_cae
+    assert tarea.estado == EstadoTareaFacturacion.en_proceso
+    assert session.get(Articulo, 1).stock_actual == stock_inicial - 2
+
+    # Hasta que vence la reserva de la tarea, la venta no puede anularse
+    with pytest.raises(Exception, match="pendiente de CAE"):
+        VentaController.anular(venta)
+    assert FacturacionQueue.procesar_pendientes(session) == 0
+
+    # Vencida la reserva, el worker registra el CAE ya autorizado sin solicitar otro
+    # (una nueva solicitud volvería a interrumpirse)
+    vencer_tareas(session)
+    del autorizados[otra_id]
+    assert FacturacionQueue.procesar_pendientes(session, limite=1) == 1
+    venta = session.get(Venta, venta_id)
+    assert (venta.estado, venta.numero, venta.cae) == (
+        EstadoVenta.facturado,
+        200 + venta_id,
+        "74000000000002",
+    )
+
+    # La venta que AFIP no autorizó se anula, devolviendo el stock
+    otra = session.get(Venta, otra_id)
+    assert VentaController.anular(otra) == (otra_id, "Venta anulada correctamente")
+    assert session.get(Venta, otra_id).estado == EstadoVenta.anulado
+    assert session.get(Articulo, 1).stock_actual == stock_inicial - 1
@@ -0,0 +1,107 @@
+import pytest
+from contextlib import contextmanager
+from server.core.models import Venta, EstadoVenta, Articulo
+from server.core.controllers import VentaController
+from server.core.services import AfipService
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+from .test_venta_create import remito_data
+
+
+class FakeWSFEv1:
+    "WSFEv1 de prueba: rechaza los comprobantes de más de $250"
+
+    def __init__(self):
+        self.lotes = []
+        self.ultimo = {}
+
+    def CAESolicitarLote(self, comprobantes: list):
+        self.lotes.append([(c["PtoVta"], c["CbteTipo"]) for c in comprobantes])
+        resultados = []
+        for data in comprobantes:
+            key = (data["PtoVta"], data["CbteTipo"])
+            numero = self.ultimo.get(key, 0) + 1
+            if data["ImpTotal"] > 250:
+                resultados.append(
+                    {
+                        "NroCbte": numero,
+                        "Resultado": "R",
+                        "CAE": None,
+                        "CAEFchVto": None,
+                        "Observaciones": [{"Code": 10015, "Msg": "Importe"}],
+                    }
+                )
+                continue
+            self.ultimo[key] = numero
+            resultados.append(
+                {
+                    "NroCbte": numero,
+                    "Resultado": "A",
+                    "CAE": f"7400000000000{numero}",
+                    "CAEFchVto": "20240908",
+                    "Observaciones": [],
+                }
+            )
+        return resultados
+
+
+@pytest.fixture
+def wsfev1(monkeypatch):
+    ws = FakeWSFEv1()
+
+    class Pool:
+        @contextmanager
+        def client(self):
+            yield ws
+
+    monkeypatch.setattr(AfipService, "_get_pool", lambda self, ws_class: Pool())
+    return ws
+
+
+def orden_data(tipo_comprobante: int, cliente: int, cantidad_items: int) -> dict:
+    return {
+        **remito_data(cantidad_items),
+        "tipo_comprobante": tipo_comprobante,
+        "cliente": cliente,
+    }
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_facturar_ordenes(test_app, session, wsfev1):
+    facturas_a = [
+        VentaController.create(orden_data(1, 2, 1), session, orden=True)
+        for _ in range(3)
+    ]
+    facturas_b = [
+        VentaController.create(orden_data(5, 1, 2), session, orden=True)
+        for _ in range(2)
+    ]
+    rechazada = VentaController.create(orden_data(5, 1, 3), session, orden=True)
+    remito = VentaController.create(remito_data(1), session, orden=True)
+    stock_inicial = session.get(Articulo, 1).stock_actual
+
+    res = VentaController.facturar_ordenes(session, chunk_size=2)
+
+    # Un lote por cada punto de venta y tipo de comprobante, de hasta 2 comprobantes
+    assert wsfev1.lotes == [[(1, 1)] * 2, [(1, 1)], [(1, 6)] * 2, [(1, 6)]]
+    assert sorted(res["facturadas"]) == sorted(facturas_a + facturas_b)
+    assert res["rechazadas"] == {rechazada: ["10015: Importe"]}
+
+    for numero, venta_id in enumerate(facturas_a, start=1):
+        venta = session.get(Venta, venta_id)
+        assert venta.estado == EstadoVenta.facturado
+        assert venta.numero == numero
+        assert venta.cae == f"7400000000000{numero}"
+        assert venta.vencimiento_cae is not None
+    assert session.get(Venta, rechazada).estado == EstadoVenta.orden
+    assert session.get(Venta, remito).estado == EstadoVenta.orden
+    assert session.get(Articulo, 1).stock_actual == stock_inicial - 5
+
+    # Las órdenes ya facturadas no se vuelven a enviar
+    res = VentaController.facturar_ordenes(session, venta_ids=facturas_a)
+    assert res == {"facturadas": [], "rechazadas": {}}
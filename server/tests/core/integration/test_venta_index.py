@@ -0,0 +1,100 @@
+import pytest
+from datetime import datetime
+from server.core.models import Venta
+from server.core.controllers import VentaController
+from server.core.schemas import VentaIndexSchema, VentaDetailSchema
+from server.utils.pagination import total_count_cache
+from server.tests.conftest import test_app, session
+from ..base_fixtures import *
+from .test_venta_create import remito_data
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_venta_keyset_paginate(test_app, session):
+    ids = [VentaController.create(remito_data(1), session) for _ in range(7)]
+    # Ventas con la misma fecha y hora se desempatan por id
+    for venta_id in ids[2:5]:
+        session.get(Venta, venta_id).fecha_hora = datetime(2024, 5, 10, 12, 0)
+    session.get(Venta, ids[5]).delete()
+    session.commit()
+
+    esperado = [
+        v.id
+        for v in sorted(
+            Venta.query.all(), key=lambda v: (v.fecha_hora, v.id), reverse=True
+        )
+    ]
+    assert ids[5] not in esperado
+
+    obtenido = []
+    cursor = None
+    while True:
+        page = Venta.query.keyset_paginate(
+            order_by=(Venta.fecha_hora, Venta.id),
+            cursor=cursor,
+            per_page=2,
+            total="exact",
+        )
+        assert page.total == len(esperado)
+        obtenido += [v.id for v in page.items]
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert obtenido == esperado
+
+    # El total en cache se descarta al registrar una nueva venta
+    page = Venta.query.keyset_paginate(order_by=(Venta.fecha_hora, Venta.id))
+    assert page.total == len(esperado)
+    VentaController.create(remito_data(1), session)
+    page = Venta.query.keyset_paginate(order_by=(Venta.fecha_hora, Venta.id))
+    assert page.total == len(esperado) + 1
+    total_count_cache.invalidate({"venta"})
+
+    with pytest.raises(ValueError):
+        Venta.query.keyset_paginate(order_by=(Venta.fecha_hora, Venta.id), cursor="x")
+
+    # Las consultas con LIMIT u OFFSET también excluyen las ventas eliminadas
+    ordenadas = Venta.query.order_by(Venta.id)
+    assert ids[5] not in [v.id for v in ordenadas.limit(100).all()]
+    assert ids[5] not in [v.id for v in ordenadas.offset(1).limit(100)]
+    assert ids[5] not in [v.id for v in ordenadas[0:100]]
+    assert ids[5] in [v.id for v in ordenadas.with_deleted().limit(100)]
+
+
+@pytest.mark.usefixtures(
+    "load_fixtures",
+    "new_punto_venta",
+    "multiple_clientes",
+    "faker_articulos",
+)
+def test_venta_schema_statements(test_app, session):
+    """
+    La serialización del listado y del detalle de ventas ejecuta una cantidad fija de
+    sentencias, independiente del tamaño de la página y de la cantidad de renglones.
+    """
+    ids = [VentaController.create(remito_data(i % 3 + 1), session) for i in range(10)]
+
+    # Se vacía la sesión para simular una nueva petición
+    for page_size in (2, 10):
+        session.expunge_all()
+        with assert_num_queries(1):
+            page = Venta.query.options(*VentaIndexSchema.load_options).keyset_paginate(
+                order_by=(Venta.fecha_hora, Venta.id), per_page=page_size, total=None
+            )
+            VentaIndexSchema().dump(page.items, many=True)
+
+    venta_id = VentaController.create(remito_data(10), session)
+    for pk in (ids[0], venta_id):
+        session.expunge_all()
+        with assert_num_queries(4):
+            venta = (
+                session.query(Venta)
+                .options(*VentaDetailSchema.load_options)
+                .get_or_404(pk)
+            )
+            VentaDetailSchema().dump(venta)
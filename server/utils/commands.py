@@ -1,7 +1,11 @@
 import importlib
+import io
+import time
+import pickle
 import click
 import pandas as pd
 from faker import Faker
+from sqlalchemy import func, inspect, insert, select, text
 
 from server.config import db, app
 from server.core.models import (
@@ -18,9 +22,28 @@ from server.core.models import (
     TipoTributo,
     Tributo,
     Comercio,
-    Articulo
+    Articulo,
+    ArticuloCodigo,
+    EstadoVenta,
+    Venta,
 )
+from server.core.models.articulo import PRIORIDAD_CODIGO
+from server.core.models.enums import TipoCodigoArticulo
+from server.core.services import (
+    A4PDFGenerator,
+    TicketPDFGenerator,
+    ArticuloSearchService,
+    ClienteSearchService,
+    ExportacionPDF,
+    FacturacionQueue,
+    PadronCache,
+    StockLedger,
+    ResumenVentas,
+)
+from server.core.controllers import VentaController
+from server.imports.articulo import CHUNK_SIZE, dump_sintetico, insertar, preparar
 from server.auth.models import Usuario, Rol, Permiso
+from server.utils.database import begin_write
 
 
 @app.cli.command("load_fixtures")
@@ -191,6 +214,387 @@ def generate_fake_articles():
                 updated_by=1,
             )
             fake_articles.append(fake_article)
-        db.session.bulk_save_objects(fake_articles)
+        db.session.add_all(fake_articles)
         db.session.commit()
+        fake_articles.clear()
         click.echo("1000 fake articles generated successfully!")
+
+
+@app.cli.command("rebuild_search_index")
+def rebuild_search_index():
+    """Rebuild the full-text search indexes of articles and clients."""
+    total = ArticuloSearchService.rebuild_index(db.session)
+    total_clientes = ClienteSearchService.rebuild_index(db.session)
+    db.session.commit()
+    click.echo(
+        f"Search index rebuilt successfully! ({total} articles, "
+        f"{total_clientes} clients indexed)"
+    )
+
+
+@app.cli.command("backfill_articulo_codigos")
+def backfill_articulo_codigos():
+    """Copy the legacy barcode columns of articulo into the articulo_codigo table.
+
+    Must be run before the migration that drops the columns codigo_secundario,
+    codigo_terciario, codigo_cuaternario and codigo_adicional.
+    """
+    ArticuloCodigo.__table__.create(db.engine, checkfirst=True)
+    connection = db.session.connection()
+    columnas = {c["name"] for c in inspect(connection).get_columns("articulo")}
+    legacy = [
+        (TipoCodigoArticulo.secundario, "codigo_secundario"),
+        (TipoCodigoArticulo.terciario, "codigo_terciario"),
+        (TipoCodigoArticulo.cuaternario, "codigo_cuaternario"),
+    ]
+    select_columns = ["id", "codigo_principal"] + [
+        columna for _, columna in legacy if columna in columnas
+    ]
+    if "codigo_adicional" in columnas:
+        select_columns.append("codigo_adicional")
+
+    existentes = set(
+        connection.execute(
+            select(ArticuloCodigo.articulo_id, ArticuloCodigo.codigo)
+        ).all()
+    )
+    filas = []
+    result = connection.execute(
+        text(f"SELECT {', '.join(select_columns)} FROM articulo")
+    ).mappings()
+    for row in result:
+        codigos = [
+            (
+                TipoCodigoArticulo.principal,
+                row["codigo_principal"],
+                PRIORIDAD_CODIGO[TipoCodigoArticulo.principal],
+            ),
+            *(
+                (tipo, row[columna], PRIORIDAD_CODIGO[tipo])
+                for tipo, columna in legacy
+                if columna in row
+            ),
+        ]
+        if row.get("codigo_adicional"):
+            adicionales = pickle.loads(row["codigo_adicional"]) or []
+            base = PRIORIDAD_CODIGO[TipoCodigoArticulo.adicional]
+            codigos += [
+                (TipoCodigoArticulo.adicional, codigo, base + orden)
+                for orden, codigo in enumerate(adicionales)
+            ]
+        for tipo, codigo, prioridad in codigos:
+            if not codigo or (row["id"], codigo) in existentes:
+                continue
+            existentes.add((row["id"], codigo))
+            filas.append(
+                {
+                    "articulo_id": row["id"],
+                    "codigo": codigo,
+                    "tipo": tipo,
+                    "prioridad": prioridad,
+                }
+            )
+
+    if filas:
+        connection.execute(insert(ArticuloCodigo.__table__), filas)
+    ArticuloSearchService.rebuild_index(db.session)
+    db.session.commit()
+    click.echo(f"Barcodes backfilled successfully! ({len(filas)} codes inserted)")
+
+
+@app.cli.command("benchmark_import_articulos")
+@click.option(
+    "--productos",
+    type=int,
+    default=100000,
+    help="Number of products of the synthetic dump.",
+)
+@click.option(
+    "--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per INSERT batch."
+)
+def benchmark_import_articulos(productos, chunk_size):
+    """Measure the article import (`flask import articulo`) on a synthetic dump.
+
+    The articles are inserted after the existing ones in a transaction that is rolled
+    back at the end, so the database is not modified.
+    """
+    id_inicial = (db.session.scalar(select(func.max(Articulo.id))) or 0) + 1
+    dump = dump_sintetico(productos, id_inicial)
+    try:
+        inicio = time.perf_counter()
+        articulos, codigos = preparar(*dump)
+        preparado = time.perf_counter()
+        insertar(db.session.connection(), articulos, codigos, chunk_size)
+        insertado = time.perf_counter()
+    finally:
+        db.session.rollback()
+    click.echo(f"{len(articulos)} articles, {len(codigos)} codes")
+    for etapa, duracion in (
+        ("prepare", preparado - inicio),
+        ("insert", insertado - preparado),
+        ("total", insertado - inicio),
+    ):
+        click.echo(f"{etapa:<8} {duracion:>8.2f} s")
+
+
+@app.cli.command("facturar_ordenes")
+@click.option("--venta", "venta_ids", type=int, multiple=True, help="Id of an order to invoice.")
+@click.option("--chunk-size", type=int, default=None, help="Invoices sent per AFIP request.")
+def facturar_ordenes(venta_ids, chunk_size):
+    """Request the CAE of the pending sale orders in batches (CantReg > 1).
+
+    Orders are grouped by punto de venta and tipo de comprobante. Rejected orders
+    are kept as orders and listed with the AFIP observations.
+    """
+    res = VentaController.facturar_ordenes(
+        db.session, venta_ids=list(venta_ids) or None, chunk_size=chunk_size
+    )
+    for venta_id, observaciones in res["rechazadas"].items():
+        click.echo(f"Order {venta_id} rejected: {'; '.join(observaciones)}")
+    click.echo(
+        f"Orders invoiced successfully! ({len(res['facturadas'])} invoiced, "
+        f"{len(res['rechazadas'])} rejected)"
+    )
+
+
+@app.cli.command("facturacion_worker")
+@click.option("--once", is_flag=True, help="Process the pending jobs and exit.")
+@click.option(
+    "--requeue-failed",
+    is_flag=True,
+    help="Requeue the sales whose CAE request failed (Error CAE) before starting.",
+)
+def facturacion_worker(once, requeue_failed):
+    """Process the invoicing queue (CAE requests of the sales pending CAE).
+
+    Runs until interrupted, polling the queue every FacturacionQueue.POLL_INTERVAL
+    seconds. Several workers may run at the same time.
+    """
+    if requeue_failed:
+        begin_write(db.session)
+        ventas = Venta.query.filter_by(estado=EstadoVenta.error_cae).all()
+        for venta in ventas:
+            FacturacionQueue.reencolar(venta, db.session)
+        db.session.commit()
+        click.echo(f"{len(ventas)} failed sales requeued")
+    while True:
+        procesadas = FacturacionQueue.procesar_pendientes(db.session)
+        if procesadas:
+            click.echo(f"{procesadas} invoicing jobs processed")
+        if once:
+            break
+        time.sleep(FacturacionQueue.POLL_INTERVAL)
+
+
+@app.cli.command("prefetch_padron")
+@click.option("--refresh", is_flag=True, help="Also query the CUITs already cached.")
+@click.option("--workers", type=int, default=None, help="Concurrent AFIP queries.")
+def prefetch_padron(refresh, workers):
+    """Warm the padrón A13 cache with the CUITs of the clientes and proveedores."""
+    cuits = PadronCache.cuits_registrados(db.session)
+    res = PadronCache.prefetch(db.session, cuits, refresh=refresh, workers=workers)
+    click.echo(
+        f"Padrón cache warmed! ({res['consultados']} queried, "
+        f"{res['encontrados']} found, {res['no_encontrados']} not found, "
+        f"{res['errores']} errors)"
+    )
+
+
+@app.cli.command("snapshot_stock")
+@click.option(
+    "--fecha",
+    type=click.DateTime(),
+    default=None,
+    help="Snapshot date and time (local time). Defaults to now.",
+)
+def snapshot_stock(fecha):
+    """Save a snapshot of the stock of every article.
+
+    Meant to be run periodically (for example, daily from cron) so that the stock at a
+    past date is computed from the nearest snapshot instead of the whole ledger.
+    """
+    cantidad = StockLedger.crear_snapshots(db.session, fecha)
+    db.session.commit()
+    click.echo(f"Stock snapshot saved! ({cantidad} articles)")
+
+
+@app.cli.command("stock_al")
+@click.option(
+    "--fecha",
+    type=click.DateTime(),
+    required=True,
+    help="Date and time (local time) of the stock.",
+)
+@click.option(
+    "--formato",
+    type=click.Choice(StockLedger.FORMATOS_EXPORTACION),
+    default="csv",
+    help="Output format.",
+)
+@click.option(
+    "--output",
+    type=click.File("w"),
+    default="-",
+    help="Output file. Defaults to stdout.",
+)
+def stock_al(fecha, formato, output):
+    """Export the stock of every article at a given date.
+
+    The stock is computed from the nearest snapshots (see snapshot_stock) and written
+    as it is read from the database.
+    """
+    for bloque in StockLedger.exportar_catalogo(db.session, fecha, formato):
+        output.write(bloque)
+
+
+@app.cli.command("rebuild_resumen_ventas")
+@click.option(
+    "--desde",
+    type=click.DateTime(["%Y-%m-%d"]),
+    default=None,
+    help="First date to rebuild. Defaults to the first sale.",
+)
+@click.option(
+    "--hasta",
+    type=click.DateTime(["%Y-%m-%d"]),
+    default=None,
+    help="Last date to rebuild. Defaults to the last sale.",
+)
+def rebuild_resumen_ventas(desde, hasta):
+    """Rebuild the daily sales summaries from the stored sales.
+
+    The summaries are kept up to date as sales are saved; this command fills them for
+    an existing database, or recomputes a date range (both dates inclusive).
+    """
+    ResumenVentas.reconstruir(
+        db.session, desde and desde.date(), hasta and hasta.date()
+    )
+    db.session.commit()
+    click.echo("Sales summaries rebuilt!")
+
+
+class _VentaConItems:
+    "Venta con otros items, para medir comprobantes de distinta longitud"
+
+    def __init__(self, venta, items):
+        self._venta = venta
+        self.items = items
+
+    def __getattr__(self, name):
+        return getattr(self._venta, name)
+
+
+@app.cli.command("benchmark_pdf")
+@click.option(
+    "--venta",
+    "venta_id",
+    type=int,
+    default=None,
+    help="Id of the sale to render. Defaults to the last invoiced sale.",
+)
+@click.option(
+    "--items",
+    "cantidades",
+    type=int,
+    multiple=True,
+    default=(1, 20, 500),
+    help="Number of items of the rendered sale (repeatable).",
+)
+@click.option("--repeat", type=int, default=5, help="Renders per measurement.")
+def benchmark_pdf(venta_id, cantidades, repeat):
+    """Measure the render time per page of the A4 and ticket PDFs.
+
+    The items of the sale are repeated (or truncated) to each number of items, so a
+    single invoiced sale is enough to measure short and long invoices.
+    """
+    if venta_id is None:
+        venta_id = db.session.scalar(
+            select(Venta.id)
+            .where(Venta.estado == EstadoVenta.facturado)
+            .order_by(Venta.id.desc())
+            .limit(1)
+        )
+    venta = db.session.get(Venta, venta_id) if venta_id else None
+    if venta is None or not venta.items:
+        raise click.ClickException("Sale not found or without items")
+
+    for cantidad in cantidades:
+        items = (list(venta.items) * cantidad)[:cantidad]
+        for generator in (A4PDFGenerator, TicketPDFGenerator):
+            # La primera generación carga las imágenes y fuentes del proceso
+            generator(io.BytesIO()).generate_pdf(_VentaConItems(venta, items))
+            inicio = time.perf_counter()
+            for _ in range(repeat):
+                pdf = generator(io.BytesIO())
+                pdf.generate_pdf(_VentaConItems(venta, items))
+            duracion = (time.perf_counter() - inicio) / repeat * 1000
+            paginas = pdf.getPageNumber() - 1
+            click.echo(
+                f"{generator.__name__:<20} {cantidad:>5} items {paginas:>4} pages "
+                f"{duracion:>9.1f} ms/pdf {duracion / paginas:>8.1f} ms/page"
+            )
+
+
+@app.cli.command("exportar_comprobantes")
+@click.option(
+    "--desde",
+    type=click.DateTime(["%Y-%m-%d"]),
+    required=True,
+    help="First sale date.",
+)
+@click.option(
+    "--hasta",
+    type=click.DateTime(["%Y-%m-%d"]),
+    required=True,
+    help="Last sale date.",
+)
+@click.option(
+    "--formato",
+    type=click.Choice(ExportacionPDF.FORMATOS),
+    default="pdf",
+    help="A single merged PDF or a ZIP with one PDF per sale.",
+)
+@click.option(
+    "--size", type=click.Choice(["A4", "80"]), default="A4", help="Print size."
+)
+@click.option(
+    "--tipo-comprobante",
+    "tipo_comprobante_ids",
+    type=int,
+    multiple=True,
+    help="Id of a tipo de comprobante to export (repeatable).",
+)
+@click.option(
+    "--punto-venta",
+    "punto_venta_ids",
+    type=int,
+    multiple=True,
+    help="Id of a punto de venta to export (repeatable).",
+)
+@click.option("--workers", type=int, default=None, help="Rendering processes.")
+@click.option(
+    "--output",
+    type=click.File("wb"),
+    required=True,
+    help="Output file ('-' for stdout).",
+)
+def exportar_comprobantes(
+    desde, hasta, formato, size, tipo_comprobante_ids, punto_venta_ids, workers, output
+):
+    """Export the invoices of the sales in a date range (both dates inclusive).
+
+    The PDFs are rendered in parallel worker processes and written as they are
+    generated, so memory use does not depend on the number of sales.
+    """
+    contenido = ExportacionPDF.exportar(
+        db.session,
+        formato,
+        size,
+        workers,
+        desde=desde.date(),
+        hasta=hasta.date(),
+        tipo_comprobante_ids=list(tipo_comprobante_ids),
+        punto_venta_ids=list(punto_venta_ids),
+    )
+    for bloque in contenido:
+        output.write(bloque)
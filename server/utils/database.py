@@ -0,0 +1,143 @@
+import os
+import sqlite3
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import scoped_session
+
+
+# Clave de connection.info con las acciones a ejecutar al confirmar la transacción
+_AL_CONFIRMAR = "al_confirmar"
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def is_sqlite_file(database_uri: str) -> bool:
+    """
+    Indica si la URI corresponde a una base de datos SQLite en archivo.
+    """
+    url = make_url(database_uri)
+    return url.get_backend_name() == "sqlite" and url.database not in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+def get_engine_options(database_uri: str) -> dict:
+    """
+    Devuelve las opciones del motor de base de datos (SQLALCHEMY_ENGINE_OPTIONS).
+
+    El tamaño del pool de conexiones se configura con las variables de entorno:
+    - DB_POOL_SIZE: Conexiones mantenidas en el pool (por defecto 10).
+    - DB_MAX_OVERFLOW: Conexiones adicionales permitidas en picos (por defecto 10).
+    - DB_POOL_TIMEOUT: Segundos de espera por una conexión libre (por defecto 30).
+    - DB_POOL_RECYCLE: Segundos luego de los cuales se renueva una conexión (por defecto 1800).
+
+    En SQLite, SQLITE_BUSY_TIMEOUT indica los milisegundos que una conexión espera a que
+    se libere el bloqueo de escritura antes de fallar con "database is locked" (por
+    defecto 30000).
+    """
+    url = make_url(database_uri)
+    if url.get_backend_name() == "sqlite" and not is_sqlite_file(database_uri):
+        # Las bases de datos en memoria utilizan una única conexión
+        return {}
+
+    options = {
+        "pool_size": _env_int("DB_POOL_SIZE", 10),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": True,
+    }
+    if url.get_backend_name() == "sqlite":
+        options["pool_pre_ping"] = False
+        options["connect_args"] = {
+            "timeout": _env_int("SQLITE_BUSY_TIMEOUT", 30000) / 1000,
+            # Las conexiones del pool se reutilizan entre los hilos del servidor
+            "check_same_thread": False,
+        }
+    return options
+
+
+def begin_write(session):
+    """
+    Inicia la transacción de la sesión reservando el bloqueo de escritura de SQLite
+    (BEGIN IMMEDIATE). De este modo, las escrituras concurrentes esperan su turno
+    (hasta SQLITE_BUSY_TIMEOUT) en lugar de fallar al intentar pasar de lectura a
+    escritura, y las lecturas previas a la escritura (por ejemplo, el último número
+    de comprobante) no quedan desactualizadas.
+
+    No tiene efecto en otros motores ni si la transacción ya fue iniciada.
+    """
+    if isinstance(session, scoped_session):
+        session = session()
+    if session.in_transaction():
+        return
+    session.connection(execution_options={"sqlite_begin_immediate": True})
+
+
+def restart_write(session):
+    """
+    Confirma la transacción en curso y reserva el bloqueo de escritura para la
+    siguiente (ver begin_write). Se utiliza para escribir luego de leer o de esperar
+    fuera del bloqueo, por ejemplo, luego de solicitar un CAE a AFIP, sin que una
+    escritura de otra conexión invalide la transacción de lectura.
+    """
+    session.commit()
+    begin_write(session)
+
+
+def al_confirmar(connection, clave, accion):
+    """
+    Registra `accion` para ejecutarse cuando se confirme la transacción en curso de la
+    conexión, y la descarta si la transacción se revierte. Se utiliza para memorizar
+    en el proceso el resultado de una escritura (por ejemplo, la creación de un índice)
+    sólo una vez confirmada. Cada `clave` se registra una única vez por transacción.
+    """
+    connection.info.setdefault(_AL_CONFIRMAR, {})[clave] = accion
+
+
+def pendiente_de_confirmar(connection, clave) -> bool:
+    "Indica si la transacción en curso de la conexión registró la acción `clave`"
+    return clave in connection.info.get(_AL_CONFIRMAR, {})
+
+
+@event.listens_for(Engine, "commit")
+def _ejecutar_al_confirmar(conn):
+    for accion in conn.info.pop(_AL_CONFIRMAR, {}).values():
+        accion()
+
+
+@event.listens_for(Engine, "rollback")
+def _descartar_al_confirmar(conn):
+    conn.info.pop(_AL_CONFIRMAR, None)
+
+
+@event.listens_for(Engine, "connect")
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """
+    Configura las conexiones a bases de datos SQLite en archivo: modo WAL, para que las
+    lecturas no se bloqueen durante una escritura, y control manual de las transacciones,
+    para poder emitir BEGIN IMMEDIATE (ver begin_write).
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    archivo = cursor.execute("PRAGMA database_list").fetchone()[2]
+    if archivo:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        dbapi_connection.isolation_level = None
+        connection_record.info["sqlite_manual_begin"] = True
+    cursor.close()
+
+
+@event.listens_for(Engine, "begin")
+def _begin_sqlite_transaction(conn):
+    if conn.info.get("sqlite_manual_begin"):
+        if conn.get_execution_options().get("sqlite_begin_immediate"):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            conn.exec_driver_sql("BEGIN")
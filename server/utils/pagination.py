@@ -0,0 +1,153 @@
+import base64
+import json
+import threading
+import time
+from datetime import datetime, date
+from sqlalchemy import event, tuple_
+from sqlalchemy.orm import Session
+
+
+class TotalCountCache:
+    """
+    Cache en memoria, compartido por todo el proceso, de los totales de los listados.
+
+    Cada entrada se identifica por la consulta compilada y sus parámetros, y vence luego de
+    `ttl` segundos. Las escrituras sobre una tabla descartan los totales de esa tabla.
+
+    Métodos:
+    - get: Devuelve el total de la consulta, calculándolo si no está en cache.
+    - invalidate: Descarta los totales de las tablas indicadas.
+    """
+
+    def __init__(self, ttl: int = 60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @staticmethod
+    def _key(query) -> tuple:
+        compiled = query.statement.compile()
+        return (str(compiled), tuple(sorted(compiled.params.items(), key=str)))
+
+    def get(self, query, tablename: str) -> int:
+        key = (tablename, *self._key(query))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+        total = query.order_by(None).count()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, total)
+        return total
+
+    def invalidate(self, tablenames):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] in tablenames]:
+                del self._entries[key]
+
+
+total_count_cache = TotalCountCache()
+
+
+class KeysetPagination:
+    """
+    Página de resultados ordenada en forma descendente por las columnas indicadas
+    (por ejemplo, `fecha_hora` e `id`), que deben identificar unívocamente cada fila.
+
+    La página siguiente se obtiene con el cursor `next_cursor`, que codifica los valores
+    de ordenamiento de la última fila devuelta, de modo que la base de datos puede
+    posicionarse directamente sobre el índice en lugar de recorrer las filas anteriores
+    como ocurre con `OFFSET`.
+
+    El total de filas se calcula según el parámetro `total`:
+    - "exact": Se ejecuta un `COUNT(*)` sobre la consulta.
+    - "cached": Se utiliza el total en cache (ver TotalCountCache), que puede no incluir
+      las escrituras de los últimos segundos.
+    - None: No se calcula el total.
+    """
+
+    def __init__(
+        self,
+        query,
+        order_by: tuple,
+        cursor: str = None,
+        per_page: int = 25,
+        max_per_page: int = 100,
+        total: str = "cached",
+        page: int = None,
+    ):
+        self.order_by = order_by
+        self.per_page = min(max(per_page or 25, 1), max_per_page)
+
+        if total == "exact":
+            self.total = query.order_by(None).count()
+        elif total == "cached":
+            tablename = query.column_descriptions[0]["entity"].__tablename__
+            self.total = total_count_cache.get(query, tablename)
+        else:
+            self.total = None
+
+        query = query.order_by(*(column.desc() for column in order_by))
+        if cursor:
+            query = query.filter(
+                tuple_(*order_by) < tuple_(*self.decode_cursor(cursor))
+            )
+        elif page and page > 1:
+            # Compatibilidad con los clientes que paginan por número de página
+            query = query.offset((page - 1) * self.per_page)
+
+        items = query.limit(self.per_page + 1).all()
+        self.has_next = len(items) > self.per_page
+        self.items = items[: self.per_page]
+
+    @property
+    def next_cursor(self) -> str | None:
+        if not self.has_next:
+            return None
+        last = self.items[-1]
+        return self.encode_cursor([getattr(last, c.key) for c in self.order_by])
+
+    @staticmethod
+    def encode_cursor(values: list) -> str:
+        values = [v.isoformat() if isinstance(v, (datetime, date)) else v for v in values]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor: str) -> list:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            raise ValueError("Cursor de paginación inválido")
+        if not isinstance(values, list) or len(values) != len(self.order_by):
+            raise ValueError("Cursor de paginación inválido")
+        return [
+            (
+                datetime.fromisoformat(value)
+                if column.type.python_type is datetime
+                else column.type.python_type(value)
+            )
+            for column, value in zip(self.order_by, values)
+        ]
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_total_count_cache(session, flush_context):
+    """
+    Descarta los totales de las tablas escritas en el flush. Las tablas se registran en la
+    transacción para volver a descartarlos al confirmarse o revertirse, de modo que no
+    queden en cache totales calculados antes de que la escritura sea visible.
+    """
+    tablenames = {
+        obj.__tablename__ for obj in (*session.new, *session.dirty, *session.deleted)
+    }
+    if tablenames:
+        session.info.setdefault("total_count_tables", set()).update(tablenames)
+        total_count_cache.invalidate(tablenames)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalidate_total_count_cache_on_transaction_end(session):
+    tablenames = session.info.pop("total_count_tables", None)
+    if tablenames:
+        total_count_cache.invalidate(tablenames)
@@ -0,0 +1,133 @@
+import threading
+import uuid
+from hashlib import sha1
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class ReferenceDataMixin:
+    """
+    Clase que marca un modelo como dato de referencia.
+
+    Las opciones de los select y datagrid de los modelos marcados se mantienen en memoria
+    (ver ReferenceDataRegistry) y se invalidan cuando se escribe cualquiera de ellos.
+    """
+
+
+class ReferenceDataRegistry:
+    """
+    Registro en memoria, compartido por todo el proceso, de las opciones de los modelos
+    de referencia (parámetros, tributos, puntos de venta, etc).
+
+    El registro tiene una versión que se incrementa con cada escritura sobre un modelo de
+    referencia; al cambiar la versión se descartan todas las entradas. La versión se utiliza
+    para generar los ETag de los endpoints que devuelven opciones de formularios.
+
+    Métodos:
+    - get: Devuelve las opciones de un modelo en el formato indicado ("select" o "datagrid").
+    - invalidate: Descarta las entradas e incrementa la versión.
+    - etag: Devuelve el ETag correspondiente a un conjunto de opciones en la versión actual.
+    - stats: Devuelve la versión, la cantidad de entradas y los contadores de aciertos y fallos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Identificador del proceso, evita reutilizar ETags luego de un reinicio
+        self._token = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @staticmethod
+    def is_cacheable(model) -> bool:
+        return isinstance(model, type) and issubclass(model, ReferenceDataMixin)
+
+    def get(self, model, formato: str) -> list:
+        """
+        Devuelve las opciones del modelo serializadas con `to_<formato>_dict`.
+        Los modelos que no son de referencia se consultan siempre a la base de datos.
+        """
+        if not self.is_cacheable(model):
+            return [getattr(r, f"to_{formato}_dict")() for r in model.query.all()]
+
+        key = (model.__name__, formato)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            version = self._version
+
+        data = [getattr(r, f"to_{formato}_dict")() for r in model.query.all()]
+        with self._lock:
+            # Si hubo una escritura mientras se consultaba, no se guarda el resultado
+            if version == self._version:
+                self._entries[key] = data
+        return data
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def etag(self, *keys) -> str:
+        """
+        Devuelve el ETag de las opciones identificadas por `keys` en la versión actual.
+        """
+        digest = sha1("|".join(map(str, keys)).encode()).hexdigest()[:8]
+        return f"{self._token}-{self._version}-{digest}"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self._version,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+reference_data = ReferenceDataRegistry()
+
+
+def _has_reference_data(session) -> bool:
+    """
+    Indica si el flush escribió modelos de referencia. Los objetos modificados sólo
+    cuentan si cambió alguna de sus columnas: las colecciones de las relaciones
+    inversas (por ejemplo, las ventas de un punto de venta) no forman parte de las
+    opciones.
+    """
+    if any(
+        isinstance(obj, ReferenceDataMixin)
+        for obj in (*session.new, *session.deleted)
+    ):
+        return True
+    return any(
+        isinstance(obj, ReferenceDataMixin)
+        and session.is_modified(obj, include_collections=False)
+        for obj in session.dirty
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_on_flush(session, flush_context):
+    """
+    Invalida el registro cuando se escriben modelos de referencia. La transacción se marca
+    para volver a invalidarlo al confirmarse o revertirse, de modo que no queden en memoria
+    datos leídos antes de que la escritura sea visible.
+    """
+    if _has_reference_data(session):
+        session.info["reference_data_written"] = True
+        reference_data.invalidate()
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalidate_on_transaction_end(session):
+    if session.info.pop("reference_data_written", False):
+        reference_data.invalidate()
@@ -2,8 +2,11 @@ import pytz
 from sqlalchemy import Column, func, DateTime, Boolean, Integer, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declared_attr
+from flask import jsonify, make_response, request
 from flask_sqlalchemy.query import Query
 from server.auth.models import Usuario
+from server.utils.reference_data import reference_data
+from server.utils.pagination import KeysetPagination
 
 
 local_tz = pytz.timezone("America/Argentina/Buenos_Aires")
@@ -87,6 +90,8 @@ class SoftDeleteMixin:
 
 class QueryWithSoftDelete(Query):
     _with_deleted = False
+    # Indica si la consulta ya incluye la condición deleted = false
+    _sin_eliminados = False
 
     def __init__(self, *args, **kwargs):
         self._with_deleted = kwargs.pop("_with_deleted", False)
@@ -95,14 +100,34 @@ class QueryWithSoftDelete(Query):
             self = self.filter_by(deleted=False)
 
     def with_deleted(self):
-        return self.__class__(
-            self._only_full_mapper_zero("get"), session=self.session, _with_deleted=True
-        )
+        # Se clona la query para conservar las opciones de carga (joinedload, etc.)
+        query = self._clone()
+        query._with_deleted = True
+        return query
+
+    def _filtrar_eliminados(self):
+        """
+        Agrega la condición deleted = false, salvo que la consulta incluya los registros
+        eliminados o que ya la tenga. Debe aplicarse antes de limit() u offset(), ya que
+        SQLAlchemy no permite filtrar una consulta con LIMIT u OFFSET.
+        """
+        if self._with_deleted or self._sin_eliminados:
+            return self
+        query = self.filter_by(deleted=False)
+        query._sin_eliminados = True
+        return query
+
+    def limit(self, limit):
+        return super(QueryWithSoftDelete, self._filtrar_eliminados()).limit(limit)
+
+    def offset(self, offset):
+        return super(QueryWithSoftDelete, self._filtrar_eliminados()).offset(offset)
+
+    def slice(self, start, stop):
+        return super(QueryWithSoftDelete, self._filtrar_eliminados()).slice(start, stop)
 
     def __iter__(self):
-        if not self._with_deleted:
-            self = self.filter_by(deleted=False)
-        return super(QueryWithSoftDelete, self).__iter__()
+        return super(QueryWithSoftDelete, self._filtrar_eliminados()).__iter__()
 
     def _get(self, *args, **kwargs):
         # this calls the original query.get function from the base class
@@ -123,24 +148,15 @@ class QueryWithSoftDelete(Query):
         return rv
 
     def first(self):
-        if not self._with_deleted:
-            self = self.filter_by(deleted=False)
-        return super(QueryWithSoftDelete, self).first()
+        return super(QueryWithSoftDelete, self._filtrar_eliminados()).first()
 
     def all(self):
-        # Para evitar el error: Query.filter() being called on a Query which already has LIMIT or OFFSET applied.  Call filter() before limit() or offset() are applied.
-        # Se verifica si la query no posee limit o offset clauses antes de agregar la cláusula where deleted = false
-        if not self._limit_clause is not None or not self._offset_clause is not None:
-            if not self._with_deleted:
-                self = self.filter_by(deleted=False)
-        return super(QueryWithSoftDelete, self).all()
+        return super(QueryWithSoftDelete, self._filtrar_eliminados()).all()
 
     def paginate(
         self, *, page=None, per_page=None, max_per_page=None, error_out=True, count=True
     ):
-        if not self._with_deleted:
-            self = self.filter_by(deleted=False)
-        return super(QueryWithSoftDelete, self).paginate(
+        return super(QueryWithSoftDelete, self._filtrar_eliminados()).paginate(
             page=page,
             per_page=per_page,
             max_per_page=max_per_page,
@@ -148,17 +164,40 @@ class QueryWithSoftDelete(Query):
             count=count,
         )
 
+    def keyset_paginate(
+        self,
+        *,
+        order_by: tuple,
+        cursor: str = None,
+        per_page: int = 25,
+        max_per_page: int = 100,
+        total: str = "cached",
+        page: int = None,
+    ) -> KeysetPagination:
+        """
+        Devuelve una página de resultados paginada por clave (ver KeysetPagination).
+        """
+        return KeysetPagination(
+            self._filtrar_eliminados(),
+            order_by,
+            cursor=cursor,
+            per_page=per_page,
+            max_per_page=max_per_page,
+            total=total,
+            page=page,
+        )
+
 
 def get_select_options(models: list = []) -> dict:
     """
     Obtiene los datos necesarios para los campos select de los formularios de usuarios.
+    Las opciones de los modelos de referencia se obtienen del registro en memoria.
     """
     select_options = {}
 
     for model in models:
         model_name = model.__pluralname__
-        records = model.query.all()
-        select_options[model_name] = list(map(lambda x: x.to_select_dict(), records))
+        select_options[model_name] = reference_data.get(model, "select")
 
     return select_options
 
@@ -166,14 +205,52 @@ def get_select_options(models: list = []) -> dict:
 def get_datagrid_options(models: list = []) -> dict:
     """
     Obtiene los datos necesarios para las columnas de los datagrid en los formularios de usuarios.
+    Las opciones de los modelos de referencia se obtienen del registro en memoria.
     """
     datagrid_options = {}
 
     for model in models:
         model_name = model.__pluralname__
-        records = model.query.all()
-        datagrid_options[model_name] = list(
-            map(lambda x: x.to_datagrid_dict(), records)
-        )
+        datagrid_options[model_name] = reference_data.get(model, "datagrid")
 
     return datagrid_options
+
+
+def get_options_response(
+    select_models: list = [], datagrid_models: list = [], extra: dict = None
+):
+    """
+    Devuelve la respuesta con las opciones de un formulario y los datos de `extra` (por
+    ejemplo, el registro de un formulario de edición), con un ETag: se responde 304
+    cuando el cliente envía un `If-None-Match` con la versión vigente.
+
+    Si todos los modelos son de referencia y no hay datos adicionales, el ETag se obtiene
+    de la versión del registro en memoria, sin generar la respuesta. En caso contrario,
+    las opciones de los demás modelos (por ejemplo, Proveedor) y los datos adicionales
+    cambian sin invalidar el registro, por lo que el ETag se calcula sobre el contenido.
+    """
+    models = [*select_models, *datagrid_models]
+    etag = None
+    if not extra and all(reference_data.is_cacheable(model) for model in models):
+        etag = reference_data.etag(
+            *(f"select:{m.__name__}" for m in select_models),
+            *(f"datagrid:{m.__name__}" for m in datagrid_models),
+        )
+        if etag in request.if_none_match:
+            response = make_response("", 304)
+            response.set_etag(etag)
+            return response
+
+    response = jsonify(
+        {
+            **get_select_options(select_models),
+            **get_datagrid_options(datagrid_models),
+            **(extra or {}),
+        }
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    if etag:
+        response.set_etag(etag)
+        return response
+    response.add_etag()
+    return response.make_conditional(request)
@@ -10,6 +10,7 @@ from waitress import serve
 from server.config import app
 from server.core.routes import *
 from server.auth.routes import *
+from server.core.services import FacturacionWorker
 
 # noinspection PyUnresolvedReferences
 from server.utils.commands import load_fixtures
@@ -28,16 +29,27 @@ app.register_blueprint(auth_bp)
 app.register_blueprint(movimiento_stock_bp)
 app.register_blueprint(proveedor_bp)
 app.register_blueprint(venta_reports_bp)
+app.register_blueprint(monitoring_bp)
 
 
 @app.route("/")
 def index():
     return jsonify({"message": "Hello, World!"})
 
-mode = "prod"
+mode = os.environ.get("SERVER_MODE", "prod")
 
 if __name__ == "__main__":
+    if app.config.get("FACTURACION_ASINCRONA"):
+        FacturacionWorker(app).start()
     if mode == "dev":
         app.run(host="0.0.0.0", port=50100, debug=True)
     else:
-        serve(app, host="0.0.0.0", port=50100, threads=1)
+        # Cada hilo atiende una petición; el pool de conexiones (DB_POOL_SIZE +
+        # DB_MAX_OVERFLOW) debe admitir al menos esa cantidad de conexiones.
+        serve(
+            app,
+            host="0.0.0.0",
+            port=int(os.environ.get("SERVER_PORT", 50100)),
+            threads=int(os.environ.get("SERVER_THREADS", 8)),
+            connection_limit=int(os.environ.get("SERVER_CONNECTION_LIMIT", 100)),
+        )